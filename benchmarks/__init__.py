@@ -0,0 +1 @@
+"""Performance benchmarks for struco (not part of the installed package)."""
@@ -0,0 +1,201 @@
+"""Benchmark the extraction pipeline per stage against a stored baseline.
+
+Generates synthetic C/C++ sources (see :mod:`benchmarks.synthetic`), runs
+them through :func:`struco.extract_ir` and :func:`struco.extract_cfg_from_ir`
+under :func:`struco.profile.profiling` and reports the throughput of every
+stage (frontend, function scan, slice, opt, parse, render, ...) in
+operations per second, best of ``--repeat`` runs. Three scenarios are run:
+the opt engine and the native engine rendering PNGs, and JSON output.
+
+By default the stand-in toolchain from :mod:`benchmarks.toolchain` is used,
+so the numbers are comparable across machines without LLVM or Graphviz
+and dominated by struco's own code. A stage whose throughput drops more
+than ``--tolerance`` below the baseline fails the run (exit status 1).
+
+Usage:
+    python -m benchmarks.bench_pipeline [--files N] [--functions N] [--blocks M]
+                                        [--language c|cpp] [--repeat R]
+                                        [--real-tools] [--baseline FILE]
+                                        [--update-baseline] [--tolerance T]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any
+
+from benchmarks.synthetic import write_source
+from benchmarks.toolchain import fake_toolchain
+from struco.cfg import extract_cfg_from_ir, extract_ir
+from struco.profile import profiling
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+# (engine, output format) per scenario
+SCENARIOS = {
+    "opt-png": ("opt", "png"),
+    "native-png": ("native", "png"),
+    "json": ("native", "json"),
+}
+
+Results = dict[str, dict[str, dict[str, float]]]
+
+
+def run_scenario(
+    sources: list[Path], engine: str, output_format: str, repeat: int
+) -> dict[str, dict[str, float]]:
+    """Run every source through the pipeline and return per-stage throughput.
+
+    Returns
+    -------
+    dict
+        ``{stage: {"count": n, "wall": seconds, "ops_per_s": n / seconds}}``
+        from the fastest of repeat runs, per stage.
+    """
+    best: dict[str, dict[str, float]] = {}
+    for _ in range(repeat):
+        with profiling() as profiler:
+            for source in sources:
+                ir_result = extract_ir(source)
+                extract_cfg_from_ir(
+                    ir_result.ir_path,
+                    language=ir_result.language,
+                    output_format=output_format,
+                    engine=engine,
+                    render_jobs=1,
+                )
+        for stage, totals in profiler.stages().items():
+            wall = totals["wall"]
+            ops_per_s = totals["count"] / wall if wall > 0 else float("inf")
+            if stage not in best or ops_per_s > best[stage]["ops_per_s"]:
+                best[stage] = {"count": totals["count"], "wall": wall, "ops_per_s": ops_per_s}
+    return best
+
+
+def run(
+    workdir: Path,
+    n_files: int,
+    n_functions: int,
+    n_blocks: int,
+    language: str = "cpp",
+    repeat: int = 3,
+    real_tools: bool = False,
+) -> Results:
+    """Generate sources in workdir and run all scenarios on them."""
+    suffix = ".c" if language == "c" else ".cpp"
+    sources = []
+    for index in range(n_files):
+        source = workdir / f"synthetic{index}{suffix}"
+        write_source(source, n_functions, n_blocks, offset=index * n_functions)
+        sources.append(source)
+
+    toolchain = contextlib.nullcontext() if real_tools else fake_toolchain(workdir / "fake-bin")
+    with toolchain:
+        return {
+            name: run_scenario(sources, engine, output_format, repeat)
+            for name, (engine, output_format) in SCENARIOS.items()
+        }
+
+
+def compare(results: Results, baseline: Results, tolerance: float) -> list[str]:
+    """Return a message for every stage slower than baseline by more than tolerance."""
+    regressions = []
+    for scenario, stages in baseline.items():
+        for stage, expected in stages.items():
+            current = results.get(scenario, {}).get(stage)
+            if current is None:
+                regressions.append(f"{scenario}/{stage}: stage missing")
+                continue
+            floor = expected["ops_per_s"] * (1 - tolerance)
+            if current["ops_per_s"] < floor:
+                regressions.append(
+                    f"{scenario}/{stage}: {current['ops_per_s']:.1f} ops/s, "
+                    f"baseline {expected['ops_per_s']:.1f} ops/s"
+                )
+    return regressions
+
+
+def _format_table(results: Results, baseline: Results | None) -> str:
+    lines = [f"{'scenario/stage':<32} {'count':>6} {'wall ms':>9} {'ops/s':>10} {'vs base':>8}"]
+    for scenario, stages in results.items():
+        for stage, current in stages.items():
+            change = ""
+            expected = (baseline or {}).get(scenario, {}).get(stage)
+            if expected:
+                change = f"{current['ops_per_s'] / expected['ops_per_s'] - 1:+.0%}"
+            lines.append(
+                f"{scenario + '/' + stage:<32} {current['count']:>6.0f} "
+                f"{current['wall'] * 1e3:>9.1f} {current['ops_per_s']:>10.1f} {change:>8}"
+            )
+    return "\n".join(lines)
+
+
+def _load_baseline(path: Path, config: dict[str, Any]) -> Results | None:
+    """Return the stored results if they were recorded with the same config."""
+    if not path.exists():
+        print(f"No baseline at {path}; run with --update-baseline")  # noqa: T201
+        return None
+    stored = json.loads(path.read_text())
+    if stored.get("config") != config:
+        print(f"Baseline {path} was recorded with {stored.get('config')}; skipping")  # noqa: T201
+        return None
+    return stored["results"]
+
+
+def main() -> int:
+    """Run the pipeline benchmark and compare it against the baseline."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--functions", type=int, default=100)
+    parser.add_argument("--blocks", type=int, default=20)
+    parser.add_argument("--language", choices=("c", "cpp"), default="cpp")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--real-tools", action="store_true")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    args = parser.parse_args()
+
+    config = {
+        "files": args.files,
+        "functions": args.functions,
+        "blocks": args.blocks,
+        "language": args.language,
+        "real_tools": args.real_tools,
+    }
+    with tempfile.TemporaryDirectory(prefix="struco-bench-") as tmp:
+        results = run(
+            Path(tmp),
+            args.files,
+            args.functions,
+            args.blocks,
+            language=args.language,
+            repeat=args.repeat,
+            real_tools=args.real_tools,
+        )
+
+    if args.update_baseline:
+        args.baseline.write_text(
+            json.dumps({"config": config, "results": results}, indent=1, sort_keys=True) + "\n"
+        )
+        print(_format_table(results, None))  # noqa: T201
+        print(f"Baseline written to {args.baseline}")  # noqa: T201
+        return 0
+
+    baseline = _load_baseline(args.baseline, config)
+    print(_format_table(results, baseline))  # noqa: T201
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")  # noqa: T201
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
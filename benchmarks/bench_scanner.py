@@ -0,0 +1,92 @@
+"""Benchmark the streaming function scanner against the legacy regex.
+
+Generates a synthetic C++ module with long attribute lists on every
+``define`` line (see :mod:`benchmarks.synthetic`) and times
+:func:`struco.ir.iter_function_definitions` against the regex that
+``get_function_names`` used before.
+
+Usage:
+    python -m benchmarks.bench_scanner [--functions N] [--blocks M] [--repeat R]
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+
+from benchmarks.synthetic import write_ir_module
+from struco.ir import iter_function_definitions
+
+# The regex previously used by get_function_names for C++ IR
+LEGACY_FUNC_PATTERN_CPP = re.compile(
+    r"define\s+"
+    r"(?:(?:internal|private|available_externally|linkonce"
+    r"|weak|common|appending|extern_weak|linkonce_odr|weak_odr|external)\s+)?"
+    r"(?:(?:dso_local|dso_preemptable)\s+)?"
+    r"(?:\w+\s+)*"
+    r"@([\w$.]+)\s*\("
+    r"[^)]*\)"
+    r"(?:\s*(?:#\d+|![^\n]+|\{\s*[^}]*\}|\[[^\]]+\]|\w+\s*\([^)]*\)))*"
+)
+
+
+def _legacy(path: Path) -> list[str]:
+    return LEGACY_FUNC_PATTERN_CPP.findall(path.read_text())
+
+
+def _streaming(path: Path) -> list[str]:
+    return [d.name for d in iter_function_definitions(path)]
+
+
+def _measure(fn: Callable[[Path], list[str]], path: Path, repeat: int) -> tuple[float, int]:
+    """Return (best wall time in seconds, peak traced memory in bytes)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(path)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main() -> int:
+    """Run the scanner benchmark and print a comparison table."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--functions", type=int, default=5000)
+    parser.add_argument("--blocks", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "synthetic.ll"
+        write_ir_module(path, args.functions, args.blocks, language="cpp")
+        size_mb = path.stat().st_size / 1e6
+
+        legacy_names = _legacy(path)
+        streaming_names = _streaming(path)
+        if legacy_names != streaming_names:
+            print(  # noqa: T201
+                f"WARNING: results differ ({len(legacy_names)} vs {len(streaming_names)})"
+            )
+
+        print(f"module: {size_mb:.1f} MB, {args.functions} functions")  # noqa: T201
+        for label, fn in (("legacy regex", _legacy), ("streaming", _streaming)):
+            seconds, peak = _measure(fn, path, args.repeat)
+            print(  # noqa: T201
+                f"{label:>14}: {seconds * 1e3:9.1f} ms  "
+                f"{size_mb / seconds:8.1f} MB/s  peak {peak / 1e6:8.1f} MB"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
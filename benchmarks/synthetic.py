@@ -0,0 +1,107 @@
+"""Synthetic sources and LLVM IR modules for benchmarks.
+
+Every generator produces N functions of M basic blocks. C++ output uses the
+long attribute lists clang emits for templates and ``-g`` builds on every
+``define`` line, which is the worst case for the function scanner, and
+adds standard-library instantiations that struco slices out before opt.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+_PARAM = "ptr noundef nonnull align 8 dereferenceable(16) %{i}"
+_PARAMS = ", ".join(_PARAM.format(i=i) for i in range(6))
+
+
+def function_name(index: int) -> str:
+    """Return the source-level name of the index-th synthetic function."""
+    return f"fn{index}"
+
+
+def mangle(name: str) -> str:
+    """Return a C++ mangled name for a free function taking no arguments."""
+    return f"_Z{len(name)}{name}v"
+
+
+def _write_blocks(f, n_blocks: int, ret: str) -> None:
+    """Write a chain of n_blocks blocks with one conditional branch each."""
+    for b in range(n_blocks):
+        f.write(
+            f"bb{b}:\n"
+            f"  %v{b} = add i32 {b}, 1\n"
+            f"  %c{b} = icmp eq i32 %v{b}, 0\n"
+            f"  br i1 %c{b}, label %bb{n_blocks}, label %bb{b + 1}\n\n"
+        )
+    f.write(f"bb{n_blocks}:\n  {ret}\n}}\n\n")
+
+
+def write_ir_module(
+    path: Path,
+    n_functions: int,
+    n_blocks: int,
+    language: str = "cpp",
+    names: list[str] | None = None,
+) -> None:
+    """Write a synthetic LLVM IR module.
+
+    Parameters
+    ----------
+    path : Path
+        Destination .ll file.
+    n_functions : int
+        Number of user-defined functions (ignored if names is given).
+    n_blocks : int
+        Basic blocks per function, plus one exit block.
+    language : str
+        "c" for plain ``define`` lines, "cpp" for mangled names with
+        pathological attribute lists and standard-library instantiations.
+    names : list of str or None
+        Source-level function names. Defaults to ``fn0 .. fnN-1``.
+    """
+    if names is None:
+        names = [function_name(i) for i in range(n_functions)]
+    with open(path, "w") as f:
+        f.write(f"; ModuleID = '{path.stem}'\nsource_filename = \"{path.stem}\"\n\n")
+        for index, name in enumerate(names):
+            if language == "cpp":
+                f.write(
+                    f"define linkonce_odr dso_local noundef zeroext i1 "
+                    f"@{mangle(name)}({_PARAMS}) "
+                    f"unnamed_addr #{index % 7} comdat align 2 "
+                    f"personality ptr @__gxx_personality_v0 "
+                    f"!dbg !{index} !prof !{index + 1} {{\n"
+                )
+                _write_blocks(f, n_blocks, "ret i1 false")
+                f.write(
+                    f"define linkonce_odr void @_ZNSt6vectorIiSaIiEE9push_backERKi{index}() "
+                    f"#0 comdat align 2 {{\nentry:\n  ret void\n}}\n\n"
+                )
+            else:
+                f.write(f"define dso_local i32 @{name}(i32 noundef %x) #0 {{\n")
+                _write_blocks(f, n_blocks, "ret i32 0")
+
+
+def write_source(path: Path, n_functions: int, n_blocks: int, offset: int = 0) -> list[str]:
+    """Write a synthetic C or C++ source file (by extension) and return its function names.
+
+    Each function is a chain of n_blocks ``if`` statements, so a real
+    compiler at -O0 produces roughly the same block count as
+    :func:`write_ir_module`.
+    """
+    names = [function_name(offset + i) for i in range(n_functions)]
+    with open(path, "w") as f:
+        for name in names:
+            f.write(f"int {name}(int x) {{\n")
+            for b in range(n_blocks):
+                f.write(f"  if (x + {b} == 0) return {b};\n")
+            f.write("  return 0;\n}\n\n")
+    return names
+
+
+__all__ = [
+    "function_name",
+    "mangle",
+    "write_ir_module",
+    "write_source",
+]
@@ -0,0 +1,147 @@
+"""Stand-ins for clang, clang++, llvm-extract, opt and dot.
+
+:func:`fake_toolchain` puts small Python executables with those names at
+the front of ``PATH``, so the whole pipeline runs on machines without LLVM
+or Graphviz. They do a realistic amount of file I/O but no compilation:
+
+- ``clang``/``clang++`` turn every ``int name(...) {`` of the source into a
+  synthetic function (see :func:`benchmarks.synthetic.write_ir_module`)
+  with one block per ``if``, and honour ``-MD -MF``. Given
+  ``-x c-header``/``-x c++-header`` they copy the header to the output as
+  its "precompiled header".
+- ``llvm-extract`` copies the requested ``--func=`` definitions.
+- ``opt`` writes ``.<name>.dot`` for every definition into its cwd.
+- ``dot`` copies its input to the output file; it is a shell script
+  because render stages call it once per function.
+
+Timings with the stand-ins measure struco's own overhead plus one process
+start per tool call; use ``--real-tools`` to time the real toolchain.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from pathlib import Path
+
+TOOLS = ("clang", "clang++", "llvm-extract", "opt", "dot")
+
+_SOURCE_FUNCTION = re.compile(r"^int\s+(\w+)\s*\([^)]*\)\s*\{(.*?)^\}", re.MULTILINE | re.DOTALL)
+_DEFINE_NAME = re.compile(r"@([\w$.]+)\(")
+_BRANCH_TARGETS = re.compile(r"label %([\w.]+)")
+
+_REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# dot -T<fmt> <input> -o <output>
+_DOT_SCRIPT = '#!/bin/sh\nexec cp "$2" "$4"\n'
+
+
+def _option(argv: Sequence[str], flag: str) -> str:
+    return argv[argv.index(flag) + 1]
+
+
+def _definitions(text: str) -> Iterator[tuple[str, str]]:
+    """Yield (name, full text) of every definition in an IR module."""
+    for chunk in ("\n" + text).split("\ndefine ")[1:]:
+        body = "define " + chunk[: chunk.index("\n}\n") + 3]
+        match = _DEFINE_NAME.search(body)
+        if match is not None:
+            yield match.group(1), body
+
+
+def _clang(argv: Sequence[str]) -> int:
+    from benchmarks.synthetic import write_ir_module
+
+    if "-x" in argv and _option(argv, "-x").endswith("-header"):
+        header = Path(argv[argv.index("-o") - 1])
+        Path(_option(argv, "-o")).write_text(header.read_text())
+        if "-MF" in argv:
+            Path(_option(argv, "-MF")).write_text(f"{header.stem}.pch: {header}\n")
+        return 0
+    source = Path(next(arg for arg in argv if arg.endswith((".c", ".cpp", ".cc", ".cxx"))))
+    functions = _SOURCE_FUNCTION.findall(source.read_text())
+    n_blocks = max((body.count("if (") for _, body in functions), default=0)
+    language = "c" if source.suffix == ".c" else "cpp"
+    write_ir_module(
+        Path(_option(argv, "-o")),
+        len(functions),
+        n_blocks,
+        language=language,
+        names=[name for name, _ in functions],
+    )
+    if "-MF" in argv:
+        Path(_option(argv, "-MF")).write_text(f"{source.stem}.o: {source}\n")
+    return 0
+
+
+def _llvm_extract(argv: Sequence[str]) -> int:
+    wanted = {arg.removeprefix("--func=") for arg in argv if arg.startswith("--func=")}
+    source = Path(next(arg for arg in argv if arg.endswith(".ll")))
+    kept = [body for name, body in _definitions(source.read_text()) if name in wanted]
+    Path(_option(argv, "-o")).write_text("\n".join(kept))
+    return 0
+
+
+def _opt(argv: Sequence[str]) -> int:
+    text = Path(argv[-1]).read_text()
+    for name, body in _definitions(text):
+        lines = [f"digraph \"CFG for '{name}' function\" {{"]
+        block = None
+        for line in body.splitlines()[1:]:
+            if line and not line.startswith((" ", "}")):
+                block = line.rstrip(":")
+                lines.append(f'  {block} [shape=record,label="{{{block}:}}"];')
+            elif block is not None:
+                lines.extend(f"  {block} -> {target};" for target in _BRANCH_TARGETS.findall(line))
+        lines.append("}")
+        Path(f".{name}.dot").write_text("\n".join(lines) + "\n")
+    return 0
+
+
+_HANDLERS = {
+    "clang": _clang,
+    "clang++": _clang,
+    "llvm-extract": _llvm_extract,
+    "opt": _opt,
+}
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Dispatch on the executable name, like a multi-call binary."""
+    argv = list(sys.argv if argv is None else argv)
+    return _HANDLERS[Path(argv[0]).name](argv[1:])
+
+
+def install(bin_dir: Path) -> None:
+    """Write the stand-in executables into bin_dir."""
+    bin_dir.mkdir(parents=True, exist_ok=True)
+    script = (
+        f"#!{sys.executable} -S\n"
+        "import sys\n"
+        f"sys.path.insert(0, {str(_REPO_ROOT)!r})\n"
+        "from benchmarks.toolchain import main\n"
+        "sys.exit(main())\n"
+    )
+    for tool in TOOLS:
+        path = bin_dir / tool
+        path.write_text(_DOT_SCRIPT if tool == "dot" else script)
+        path.chmod(0o755)
+
+
+@contextmanager
+def fake_toolchain(bin_dir: Path) -> Iterator[Path]:
+    """Install the stand-ins into bin_dir and put it first on PATH."""
+    install(bin_dir)
+    old_path = os.environ.get("PATH", "")
+    os.environ["PATH"] = f"{bin_dir}{os.pathsep}{old_path}"
+    try:
+        yield bin_dir
+    finally:
+        os.environ["PATH"] = old_path
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,17 +1,39 @@
 """Struco: structural code representation extraction and analysis."""
 
+from struco.aio import extract_cfg_from_ir_async, extract_ir_async
+from struco.ast_cfg import SourceDocument, build_ast_cfgs, extract_cfg_from_source
+from struco.batch import BatchReport, FileResult, collect_sources, run_batch
+from struco.cache import IRCache
 from struco.cfg import (
     IRResult,
     Language,
+    build_cfgs,
     extract_cfg_from_ir,
     extract_ir,
     get_function_names,
 )
+from struco.graph import BasicBlock, FunctionCFG, StringPool
+from struco.ir import parse_ir
 
 __all__ = [
+    "BasicBlock",
+    "BatchReport",
+    "FileResult",
+    "FunctionCFG",
+    "IRCache",
     "IRResult",
     "Language",
+    "SourceDocument",
+    "StringPool",
+    "build_ast_cfgs",
+    "build_cfgs",
+    "collect_sources",
     "extract_cfg_from_ir",
+    "extract_cfg_from_ir_async",
+    "extract_cfg_from_source",
     "extract_ir",
+    "extract_ir_async",
     "get_function_names",
+    "parse_ir",
+    "run_batch",
 ]
@@ -1,34 +1,277 @@
 """CLI entry point for struco.
 
 Usage:
-    python -m struco <file_path> [--cfg_format png|pdf] [-v]
+    python -m struco <path> [<path> ...] [--files-from FILE] [--jobs N]
+                     [--cfg_format png|pdf|json|graphml|npz] [--engine opt|native|ast]
+                     [--opt-pipeline PRESET|PASSES]
+                     [--summarize] [--layout-threshold N] [--render-timeout SECONDS]
+                     [--stage-timeout STAGE=SECONDS] [--memory-limit MIB] [--retries N]
+                     [--dedup] [--shape-store DIR] [--demangle-names]
+                     [--include-namespace NS] [--exclude-namespace NS]
+                     [--incremental] [--watch] [--no-cache]
+                     [--compile-commands PATH] [--pch] [--pch-dir DIR]
+                     [--output-root DIR] [--discard-ir] [--profile FILE] [-v]
+    python -m struco serve [--socket PATH] [--workers N] [--stop]
+
+Each path may be a source file, a directory (searched recursively), or a
+glob pattern. A single source file is processed in-process; anything else
+runs as a batch on a process pool.
+
+``--profile FILE`` writes per-stage and per-function timings as JSON (see
+:mod:`struco.profile`); with ``-v`` a summary table is logged as well.
+
+``struco serve`` starts a daemon with warm worker processes listening on a
+Unix socket; ``python -m struco.client`` forwards the regular arguments to
+it (see :mod:`struco.server`).
 """
 
 from __future__ import annotations
 
 import argparse
+import contextlib
 import logging
 import sys
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any
 
-from struco.cfg import extract_cfg_from_ir, extract_ir
+from struco.ast_cfg import extract_cfg_from_source
+from struco.batch import IR_ONLY_OPTIONS, collect_sources, read_file_list, run_batch
+from struco.cache import DEFAULT_MAX_BYTES, IRCache
+from struco.cfg import ENGINES, OPT_PIPELINES, extract_cfg_from_ir, extract_ir
+from struco.compdb import CompilationDatabase, load_compilation_database
+from struco.formats import OUTPUT_FORMATS
+from struco.incremental import build_incremental, watch
+from struco.pch import PchPlan, default_pch_dir, plan_pch
+from struco.profile import Profiler, profiling, span
+from struco.render import DEFAULT_LAYOUT_THRESHOLD, DEFAULT_RENDER_TIMEOUT
+from struco.scheduler import STAGES, ResourceLimits, resource_limits
 
 
-def main() -> int:
-    """Run IR extraction and CFG generation from the command line."""
+def build_parser() -> argparse.ArgumentParser:
+    """Return the argument parser for the struco CLI."""
     parser = argparse.ArgumentParser(
         description="Extract LLVM IR and CFG from C, C++, and Python source files.",
     )
     parser.add_argument(
-        "file_path",
+        "paths",
+        nargs="*",
+        metavar="path",
+        help="Source files (.c, .cpp, .cxx, or .py), directories, or glob patterns",
+    )
+    parser.add_argument(
+        "--files-from",
         type=str,
-        help="Path to the source file (.c, .cpp, .cxx, or .py)",
+        metavar="FILE",
+        help="Read additional source paths from FILE, one per line",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes for batch runs (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--render-jobs",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Maximum concurrent Graphviz processes per file "
+        "(default: number of CPUs, or 1 in batch runs)",
+    )
+    parser.add_argument(
+        "--summarize",
+        action="store_true",
+        help="Collapse straight-line block chains and truncate long instruction labels "
+        "before rendering",
+    )
+    parser.add_argument(
+        "--layout-threshold",
+        type=int,
+        default=DEFAULT_LAYOUT_THRESHOLD,
+        metavar="N",
+        help="Lay out graphs with more than N blocks with sfdp instead of dot; 0 always "
+        f"uses dot (default: {DEFAULT_LAYOUT_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--render-timeout",
+        type=float,
+        default=DEFAULT_RENDER_TIMEOUT,
+        metavar="SECONDS",
+        help="Kill a Graphviz render after this long and render the graph's structure "
+        f"only; 0 waits indefinitely (default: {DEFAULT_RENDER_TIMEOUT:g})",
     )
     parser.add_argument(
         "--cfg_format",
         type=str,
-        choices=["png", "pdf"],
+        choices=OUTPUT_FORMATS,
         default="png",
-        help="Output format for CFG visualization (default: png)",
+        help="CFG output format: rendered png/pdf, or structured json/graphml/npz "
+        "which skip Graphviz (default: png)",
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=(*ENGINES, "ast"),
+        default="opt",
+        help="CFG engine: LLVM opt, the in-process IR parser, or 'ast' to build CFGs "
+        "from tree-sitter parse trees without a compiler (default: opt)",
+    )
+    parser.add_argument(
+        "--opt-pipeline",
+        type=str,
+        default=None,
+        metavar="PIPELINE",
+        help="Canonicalize the IR with this opt pass pipeline before taking CFGs: a preset ("
+        + ", ".join(OPT_PIPELINES)
+        + ") or an opt -passes= string (default: none)",
+    )
+    parser.add_argument(
+        "--function",
+        action="append",
+        dest="functions",
+        metavar="NAME",
+        help="Only generate the CFG of this function (IR name, or qualified source name "
+        "with --engine ast; repeatable)",
+    )
+    parser.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Render or store each distinct CFG shape once per file; dedup.json next to "
+        "the outputs maps every function to its artifact",
+    )
+    parser.add_argument(
+        "--shape-store",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="Share deduplicated artifacts across files in DIR, named by shape (implies --dedup)",
+    )
+    parser.add_argument(
+        "--include-namespace",
+        action="append",
+        dest="include_namespaces",
+        metavar="NS",
+        help="Only generate CFGs of functions in this C++ namespace or Python module, "
+        "e.g. acme::core or acme.core (demangled; repeatable)",
+    )
+    parser.add_argument(
+        "--exclude-namespace",
+        action="append",
+        dest="exclude_namespaces",
+        metavar="NS",
+        help="Skip functions in this namespace or module, in addition to std and boost "
+        "(C++) or the Codon standard library (Python) (the longest matching rule wins; "
+        "repeatable)",
+    )
+    parser.add_argument(
+        "--demangle-names",
+        action="store_true",
+        help="Name C++ outputs after the demangled function signature instead of the mangled name",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Skip sources whose files and headers are unchanged and re-render only "
+        "functions whose IR changed",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After the first run, keep polling the sources and rebuild them "
+        "incrementally on change (implies --incremental)",
+    )
+    parser.add_argument(
+        "--stage-timeout",
+        type=_stage_timeout,
+        action="append",
+        dest="stage_timeouts",
+        metavar="STAGE=SECONDS",
+        help="Kill a tool of this stage after SECONDS (repeatable); stages: " + ", ".join(STAGES),
+    )
+    parser.add_argument(
+        "--memory-limit",
+        type=int,
+        default=None,
+        metavar="MIB",
+        help="Address-space limit for every compiler, opt and dot process (RLIMIT_AS)",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        metavar="N",
+        help="Restart a tool up to N times when it could not be started or was killed "
+        "from outside (default: 2)",
+    )
+    parser.add_argument(
+        "--watch-interval",
+        type=float,
+        default=1.0,
+        metavar="SECONDS",
+        help="Polling interval for --watch (default: 1.0)",
+    )
+    parser.add_argument(
+        "--output-root",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="Write IR and CFGs below DIR, mirroring the sources' absolute paths, "
+        "instead of next to the sources",
+    )
+    parser.add_argument(
+        "--discard-ir",
+        action="store_true",
+        help="Pass IR from the compiler's stdout to CFG extraction in memory "
+        "instead of writing .ll files",
+    )
+    parser.add_argument(
+        "--compile-commands",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Compile C/C++ files with their flags from this compile_commands.json, or "
+        "the one in this build directory",
+    )
+    parser.add_argument(
+        "--pch",
+        action="store_true",
+        help="Precompile the leading system includes shared by several C/C++ files once "
+        "and compile the files with the precompiled header",
+    )
+    parser.add_argument(
+        "--pch-dir",
+        type=str,
+        default=None,
+        metavar="DIR",
+        help="Precompiled header directory (implies --pch; default: next to the IR cache, "
+        "~/.cache/struco/pch)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always run the compiler frontend instead of reusing cached IR",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        default=None,
+        help="IR cache directory (default: $STRUCO_CACHE_DIR or ~/.cache/struco/ir)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES >> 20,
+        metavar="MB",
+        help=f"Maximum IR cache size in MiB (default: {DEFAULT_MAX_BYTES >> 20})",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        default=None,
+        metavar="FILE",
+        help="Write per-stage wall/CPU time and subprocess peak RSS as JSON to FILE",
     )
     parser.add_argument(
         "-v",
@@ -36,20 +279,49 @@ def main() -> int:
         action="store_true",
         help="Enable verbose logging",
     )
-    args = parser.parse_args()
+    return parser
+
+
+def _is_plain_file(path: str) -> bool:
+    """Return True if path is neither a directory nor a glob pattern."""
+    return not any(ch in path for ch in "*?[") and not Path(path).is_dir()
 
-    logging.basicConfig(
-        level=logging.DEBUG if args.verbose else logging.INFO,
-        format="%(name)s | %(levelname)s | %(message)s",
-    )
 
+def _run_single(
+    file_path: str,
+    cache: IRCache | None,
+    cfg_options: dict[str, Any],
+    incremental: bool = False,
+    ir_options: dict[str, Any] | None = None,
+) -> int:
+    """Process one source file in the current process."""
+    ir_options = ir_options or {}
     try:
-        ir_result = extract_ir(args.file_path)
-        outputs = extract_cfg_from_ir(
-            ir_result.ir_path,
-            language=ir_result.language,
-            output_format=args.cfg_format,
-        )
+        with span("file", Path(file_path).name):
+            if cfg_options["engine"] == "ast":
+                outputs = extract_cfg_from_source(
+                    file_path,
+                    output_root=ir_options.get("output_root"),
+                    **{k: v for k, v in cfg_options.items() if k not in IR_ONLY_OPTIONS},
+                )
+            elif incremental:
+                built = build_incremental(
+                    file_path,
+                    cache=cache,
+                    output_root=ir_options.get("output_root"),
+                    compile_db=ir_options.get("compile_db"),
+                    pch=ir_options.get("pch"),
+                    **cfg_options,
+                )
+                outputs = list(built.outputs)
+            else:
+                ir_result = extract_ir(file_path, cache=cache, **ir_options)
+                outputs = extract_cfg_from_ir(
+                    ir_result.ir_path,
+                    language=ir_result.language,
+                    ir_text=ir_result.ir_text,
+                    **cfg_options,
+                )
         for path in outputs:
             print(path)  # noqa: T201
     except (FileNotFoundError, ValueError, RuntimeError) as exc:
@@ -59,5 +331,249 @@ def main() -> int:
     return 0
 
 
+def _watch(
+    sources: list[Path],
+    cache: IRCache | None,
+    interval: float,
+    cfg_options: dict[str, Any],
+    output_root: str | None = None,
+    compile_db: CompilationDatabase | None = None,
+    pch: PchPlan | None = None,
+) -> int:
+    """Rebuild sources as they change until interrupted."""
+    logger = logging.getLogger(__name__)
+    logger.info("Watching %d files for changes (Ctrl-C to stop)", len(sources))
+    try:
+        for results in watch(
+            sources,
+            cache=cache,
+            interval=interval,
+            output_root=output_root,
+            compile_db=compile_db,
+            pch=pch,
+            **cfg_options,
+        ):
+            for result in results:
+                logger.info("%s: regenerated %s", result.source, ", ".join(result.rebuilt))
+                for path in result.outputs:
+                    print(path)  # noqa: T201
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _write_profile(profiler: Profiler, path: str, verbose: bool) -> None:
+    """Write the profiling report, logging the summary table when verbose."""
+    logger = logging.getLogger(__name__)
+    try:
+        profiler.write_json(path)
+    except OSError as exc:
+        logger.error("Could not write profile: %s", exc)
+        return
+    logger.info("Profile written to %s", path)
+    if verbose:
+        logger.info("Per-stage totals:\n%s", profiler.summary_table())
+
+
+def _stage_timeout(value: str) -> tuple[str, float]:
+    """Parse a ``STAGE=SECONDS`` argument."""
+    stage, _, seconds = value.partition("=")
+    if stage not in STAGES:
+        msg = f"unknown stage '{stage}' (choose from {', '.join(STAGES)})"
+        raise argparse.ArgumentTypeError(msg)
+    try:
+        timeout = float(seconds)
+    except ValueError:
+        timeout = 0.0
+    if timeout <= 0:
+        msg = f"'{value}' needs a positive number of seconds"
+        raise argparse.ArgumentTypeError(msg)
+    return stage, timeout
+
+
+def validate_args(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    """Reject option values argparse cannot check by itself."""
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.render_jobs is not None and args.render_jobs < 1:
+        parser.error("--render-jobs must be at least 1")
+    if args.layout_threshold < 0:
+        parser.error("--layout-threshold must be non-negative")
+    if args.render_timeout < 0:
+        parser.error("--render-timeout must be non-negative")
+    if args.memory_limit is not None and args.memory_limit < 1:
+        parser.error("--memory-limit must be at least 1")
+    if args.retries < 0:
+        parser.error("--retries must be non-negative")
+    if args.watch_interval <= 0:
+        parser.error("--watch-interval must be positive")
+    if args.cache_size < 0:
+        parser.error("--cache-size must be non-negative")
+    if args.discard_ir and (args.incremental or args.watch):
+        parser.error("--discard-ir cannot be combined with --incremental or --watch")
+    if (args.dedup or args.shape_store) and (args.incremental or args.watch):
+        parser.error("--dedup cannot be combined with --incremental or --watch")
+    if args.demangle_names and (args.incremental or args.watch):
+        parser.error("--demangle-names cannot be combined with --incremental or --watch")
+    if args.engine == "ast" and args.opt_pipeline:
+        parser.error("--opt-pipeline needs an IR engine, not --engine ast")
+    if args.engine == "ast" and (args.compile_commands or args.pch or args.pch_dir):
+        parser.error("--compile-commands and --pch need an IR engine, not --engine ast")
+    if args.engine == "ast" and (args.incremental or args.watch):
+        parser.error("--engine ast cannot be combined with --incremental or --watch")
+
+
+def make_cache(args: argparse.Namespace) -> IRCache | None:
+    """Return the IR cache selected by the arguments."""
+    if args.no_cache:
+        return None
+    return IRCache(args.cache_dir, max_bytes=args.cache_size << 20)
+
+
+def cfg_options_from_args(args: argparse.Namespace) -> dict[str, Any]:
+    """Return the extract_cfg_from_ir keyword arguments selected by the arguments."""
+    return {
+        "output_format": args.cfg_format,
+        "engine": args.engine,
+        "render_jobs": args.render_jobs,
+        "functions": args.functions,
+        "dedup": args.dedup,
+        "shape_store": args.shape_store,
+        "include_namespaces": args.include_namespaces,
+        "exclude_namespaces": args.exclude_namespaces,
+        "demangle_names": args.demangle_names,
+        "opt_pipeline": args.opt_pipeline,
+        "summarize": args.summarize,
+        "layout_threshold": args.layout_threshold or None,
+        "render_timeout": args.render_timeout or None,
+    }
+
+
+def limits_from_args(args: argparse.Namespace) -> ResourceLimits:
+    """Return the child process limits selected by the arguments."""
+    return ResourceLimits(
+        timeouts=dict(args.stage_timeouts or ()),
+        memory_limit=args.memory_limit << 20 if args.memory_limit else None,
+        retries=args.retries,
+    )
+
+
+def ir_options_from_args(args: argparse.Namespace, cwd: Path | None = None) -> dict[str, Any]:
+    """Return the extract_ir keyword arguments selected by the arguments.
+
+    A relative --compile-commands path is resolved against cwd.
+
+    Raises
+    ------
+    FileNotFoundError, ValueError
+        If the compilation database is missing or invalid.
+    """
+    compile_db = None
+    if args.compile_commands:
+        compile_db = load_compilation_database((cwd or Path()) / args.compile_commands)
+    return {
+        "output_root": args.output_root,
+        "keep_ir": not args.discard_ir,
+        "compile_db": compile_db,
+    }
+
+
+def pch_dir_from_args(args: argparse.Namespace, cwd: Path | None = None) -> Path | None:
+    """Return the precompiled header directory, or None without --pch."""
+    if args.pch_dir:
+        return (cwd or Path()) / args.pch_dir
+    return default_pch_dir() if args.pch else None
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Run IR extraction and CFG generation from the command line."""
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if argv[:1] == ["serve"]:
+        from struco.server import serve_main
+
+        return serve_main(argv[1:])
+
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(name)s | %(levelname)s | %(message)s",
+    )
+    logger = logging.getLogger(__name__)
+
+    paths: list[str] = list(args.paths)
+    if args.files_from:
+        try:
+            paths.extend(read_file_list(args.files_from))
+        except FileNotFoundError as exc:
+            logger.error("%s", exc)
+            return 1
+    if not paths:
+        parser.error("at least one path or --files-from is required")
+    validate_args(parser, args)
+
+    incremental = args.incremental or args.watch
+    cache = make_cache(args)
+    cfg_options = cfg_options_from_args(args)
+    try:
+        ir_options = ir_options_from_args(args)
+    except (FileNotFoundError, ValueError) as exc:
+        logger.error("%s", exc)
+        return 1
+    pch_dir = pch_dir_from_args(args)
+
+    limits = limits_from_args(args)
+    profiler = Profiler() if args.profile else None
+    with (
+        resource_limits(limits),
+        profiling(profiler) if profiler is not None else contextlib.nullcontext(),
+    ):
+        if len(paths) == 1 and _is_plain_file(paths[0]):
+            sources = [Path(paths[0]).resolve()]
+            if pch_dir is not None:
+                # A single file reuses PCHs built by earlier batches
+                ir_options["pch"] = plan_pch(sources, ir_options["compile_db"], pch_dir)
+            status = _run_single(paths[0], cache, cfg_options, incremental, ir_options)
+        else:
+            sources = collect_sources(paths)
+            if not sources:
+                logger.error("No supported source files found")
+                return 1
+
+            report = run_batch(
+                sources,
+                jobs=args.jobs,
+                cache=cache,
+                incremental=incremental,
+                pch_dir=pch_dir,
+                **ir_options,
+                **cfg_options,
+            )
+            for result in report.results:
+                for path in result.outputs:
+                    print(path)  # noqa: T201
+            logger.info("%s", report.summary())
+            status = 0 if not report.failed else 1
+
+    if profiler is not None:
+        _write_profile(profiler, args.profile, args.verbose)
+
+    if args.watch:
+        compile_db = ir_options["compile_db"]
+        pch = plan_pch(sources, compile_db, pch_dir) if pch_dir is not None else None
+        with resource_limits(limits):
+            return _watch(
+                sources,
+                cache,
+                args.watch_interval,
+                cfg_options,
+                args.output_root,
+                compile_db,
+                pch,
+            )
+    return status
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,534 @@
+"""asyncio versions of the IR and CFG extraction API.
+
+The pipeline is the same as in :mod:`struco.cfg`, but every external tool
+(compiler, ``llvm-extract``, ``opt``, ``dot``) runs through
+:func:`asyncio.create_subprocess_exec`, so an event loop can drive many
+extractions at once without tying up a thread per request. In-process work
+(IR parsing, cache I/O) runs in the default executor.
+
+All subprocesses wait on one semaphore per event loop, capping concurrent
+compilers and renderers across requests, and run under the
+:class:`~struco.scheduler.ResourceLimits` of the calling context (stage
+timeouts, memory limit and retries, as with the synchronous API).
+Cancelling a call kills its child processes.
+
+Renders take the same :class:`~struco.render.RenderOptions` as the
+synchronous API (summaries, ``sfdp`` for large graphs and a render
+timeout with a structure-only fallback). Deduplication, namespace
+filters, demangled names, opt pass pipelines, in-memory IR and
+compilation databases are only available in :mod:`struco.cfg`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import tempfile
+import weakref
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+from struco.cache import IRCache
+from struco.cfg import (
+    C_FAMILY,
+    IRResult,
+    Language,
+    cache_dependencies,
+    check_frontend,
+    check_opt,
+    collect_dots,
+    dot_command,
+    frontend_command,
+    get_frontend_config,
+    ir_output_path,
+    opt_command,
+    prepare_cfg_request,
+    private_depfile,
+    rendered_path,
+    restore_cached_ir,
+    scratch_file,
+    select_functions,
+    slice_command,
+    source_language,
+    structured_cfgs,
+    write_native_dots,
+)
+from struco.formats import STRUCTURED_FORMATS
+from struco.ir import iter_function_definitions
+from struco.profile import span
+from struco.render import (
+    DEFAULT_LAYOUT_THRESHOLD,
+    DEFAULT_RENDER_TIMEOUT,
+    LARGE_GRAPH_LAYOUT,
+    RenderOptions,
+    layout_engine,
+    skeleton_dot,
+    summarize_dot,
+)
+from struco.scheduler import (
+    StageTimeoutError,
+    current_limits,
+    is_transient_failure,
+    limit_address_space,
+    stage_timeout,
+)
+
+logger = logging.getLogger(__name__)
+
+# Default cap on concurrent child processes per event loop
+DEFAULT_MAX_PROCESSES = os.cpu_count() or 1
+
+_LIMITERS: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def default_limiter() -> asyncio.Semaphore:
+    """Return the semaphore shared by all calls on the running event loop.
+
+    It allows :data:`DEFAULT_MAX_PROCESSES` concurrent child processes.
+    Pass your own semaphore as ``limiter`` to use a different cap.
+    """
+    loop = asyncio.get_running_loop()
+    limiter = _LIMITERS.get(loop)
+    if limiter is None:
+        limiter = _LIMITERS[loop] = asyncio.Semaphore(DEFAULT_MAX_PROCESSES)
+    return limiter
+
+
+async def _run_process(
+    cmd: Sequence[str],
+    limiter: asyncio.Semaphore,
+    stage: str,
+    cwd: Path | None = None,
+    timeout: float | None = None,
+) -> tuple[int, str]:
+    """Run a command under the limiter and the active resource limits.
+
+    Applies the :class:`~struco.scheduler.ResourceLimits` of the calling
+    context like :func:`struco.scheduler.run_tool`: the stage timeout when
+    it is shorter than timeout, the memory limit and retries of transient
+    failures. Returns (returncode, stderr).
+    """
+    limits = current_limits()
+    timeout = stage_timeout(stage, timeout)
+    delay = limits.retry_delay
+    attempt = 0
+    while True:
+        last = attempt == limits.retries
+        try:
+            returncode, stderr = await _run_once(
+                cmd, limiter, stage, cwd, timeout, limits.memory_limit
+            )
+        except OSError as exc:
+            if last or not is_transient_failure(exc):
+                raise
+            logger.warning("Could not start %s (%s); retrying in %gs", cmd[0], exc, delay)
+        else:
+            if last or not is_transient_failure(returncode=returncode):
+                return returncode, stderr
+            logger.warning("%s was killed; retrying in %gs", cmd[0], delay)
+        await asyncio.sleep(delay)
+        delay *= 2
+        attempt += 1
+
+
+async def _run_once(
+    cmd: Sequence[str],
+    limiter: asyncio.Semaphore,
+    stage: str,
+    cwd: Path | None,
+    timeout: float | None,
+    memory_limit: int | None,
+) -> tuple[int, str]:
+    """Run a command once under the limiter and return (returncode, stderr).
+
+    If the awaiting task is cancelled, or the child runs longer than
+    timeout once it has started, the child is killed and reaped before the
+    cancellation or :class:`~struco.scheduler.StageTimeoutError` propagates.
+    """
+    async with limiter:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+            cwd=cwd,
+        )
+        if memory_limit is not None:
+            limit_address_space(proc.pid, memory_limit)
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout)
+        except BaseException as exc:
+            if proc.returncode is None:
+                with contextlib.suppress(ProcessLookupError):
+                    proc.kill()
+                await asyncio.shield(proc.wait())
+            if isinstance(exc, asyncio.TimeoutError) and timeout is not None:
+                raise StageTimeoutError(stage, cmd, timeout) from exc
+            raise
+    return proc.returncode, stderr.decode(errors="replace")
+
+
+async def extract_ir_async(
+    file_path: str | Path,
+    cache: IRCache | None = None,
+    depfile: str | Path | None = None,
+    limiter: asyncio.Semaphore | None = None,
+    output_root: str | Path | None = None,
+) -> IRResult:
+    """Extract LLVM IR from a source file without blocking the event loop.
+
+    Async counterpart of :func:`struco.cfg.extract_ir`; writes the same
+    files and returns the same result.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to the source file (C, C++, or Python).
+    cache : IRCache or None
+        Optional IR cache; on a hit the compiler is skipped.
+    depfile : str or Path or None
+        If given, C/C++ header dependencies are written there.
+    limiter : asyncio.Semaphore or None
+        Caps concurrent child processes. Defaults to
+        :func:`default_limiter`.
+    output_root : str or Path or None
+        Write the IR below this directory instead of next to the source
+        (see :func:`struco.cfg.ir_output_path`).
+
+    Returns
+    -------
+    IRResult
+        The path to the generated .ll file and the source language.
+
+    Raises
+    ------
+    ValueError
+        If the file extension is not supported.
+    FileNotFoundError
+        If the source file does not exist.
+    RuntimeError
+        If compilation fails.
+    """
+    source_path = Path(file_path).resolve()
+    language = source_language(source_path)
+    if not source_path.exists():
+        msg = f"Source file not found: {source_path}"
+        raise FileNotFoundError(msg)
+
+    limiter = limiter if limiter is not None else default_limiter()
+    config = get_frontend_config(language)
+    dest = ir_output_path(source_path, output_root)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    depfile_path = Path(depfile) if depfile is not None and language in C_FAMILY else None
+
+    cache_key = None
+    if cache is not None:
+        cache_key = await asyncio.to_thread(
+            lambda: cache.key(source_path.read_bytes(), config.command, config.args, source_path)
+        )
+        if depfile_path is None and await asyncio.to_thread(
+            restore_cached_ir, cache, cache_key, dest
+        ):
+            return IRResult(ir_path=dest, language=language)
+
+    # Without a requested depfile, a private one records the headers for the cache entry
+    with private_depfile(
+        cache is not None and depfile_path is None and language in C_FAMILY
+    ) as deps:
+        depfile_path = depfile_path if deps is None else deps
+        output_file = scratch_file(dest)
+        try:
+            cmd = frontend_command(config, source_path, output_file, depfile_path)
+            logger.info("Running frontend: %s", " ".join(cmd))
+            with span("frontend", source_path.name):
+                returncode, stderr = await _run_process(cmd, limiter, "frontend")
+            check_frontend(source_path, returncode, stderr)
+            os.replace(output_file, dest)
+        finally:
+            output_file.unlink(missing_ok=True)
+
+        if cache is not None and cache_key is not None:
+            dependencies = cache_dependencies(depfile_path, source_path, None)
+            await asyncio.to_thread(cache.put, cache_key, dest, dependencies)
+
+    logger.info("IR written to %s", dest)
+    return IRResult(ir_path=dest, language=language)
+
+
+async def _slice_module_async(
+    ir_path: Path,
+    function_names: Sequence[str],
+    dest: Path,
+    limiter: asyncio.Semaphore,
+) -> bool:
+    """Async counterpart of :func:`struco.cfg._slice_module`."""
+    cmd = slice_command(ir_path, function_names, dest)
+    logger.info("Slicing %d functions out of %s", len(function_names), ir_path.name)
+    try:
+        with span("slice", ir_path.name):
+            returncode, stderr = await _run_process(cmd, limiter, "slice")
+    except FileNotFoundError:
+        logger.debug("llvm-extract not found; running opt on the full module")
+        return False
+    if returncode != 0:
+        logger.warning("llvm-extract failed, running opt on the full module: %s", stderr)
+        return False
+    return True
+
+
+async def _render_skeleton_async(
+    dot_path: Path, output_path: Path, fmt: str, timeout: float | None, limiter: asyncio.Semaphore
+) -> tuple[int, str] | None:
+    """Async counterpart of :func:`struco.cfg._render_skeleton`."""
+    skeleton = scratch_file(dot_path)
+    try:
+        text = await asyncio.to_thread(lambda: skeleton_dot(dot_path.read_text()))
+        await asyncio.to_thread(skeleton.write_text, text)
+        cmd = dot_command(skeleton, output_path, fmt, LARGE_GRAPH_LAYOUT)
+        with span("render_skeleton", output_path.stem):
+            return await _run_process(cmd, limiter, "render", timeout=timeout)
+    except StageTimeoutError:
+        return None
+    finally:
+        skeleton.unlink(missing_ok=True)
+
+
+async def _convert_dot_async(
+    dot_path: Path,
+    output_dir: Path,
+    fmt: str,
+    limiter: asyncio.Semaphore,
+    options: RenderOptions | None = None,
+) -> Path | None:
+    """Async counterpart of :func:`struco.cfg._convert_dot`."""
+    options = options or RenderOptions()
+    output_path = rendered_path(dot_path, output_dir, fmt)
+    tmp_path = scratch_file(output_path)
+    summary = scratch_file(dot_path) if options.summarize else None
+    source = summary or dot_path
+    logger.info("Converting %s -> %s", dot_path.name, output_path.name)
+    try:
+        layout = "dot"
+        if options.summarize or options.layout_threshold is not None:
+            text = await asyncio.to_thread(dot_path.read_text)
+            if summary is not None:
+                with span("summarize", output_path.stem):
+                    text = await asyncio.to_thread(summarize_dot, text)
+                await asyncio.to_thread(summary.write_text, text)
+            layout = await asyncio.to_thread(layout_engine, text, options.layout_threshold)
+        if layout != "dot":
+            logger.info("Laying out %s with %s", dot_path.name, layout)
+
+        cmd = dot_command(source, tmp_path, fmt, layout)
+        try:
+            with span("render", output_path.stem):
+                result = await _run_process(cmd, limiter, "render", timeout=options.timeout)
+        except StageTimeoutError as exc:
+            logger.warning(
+                "Graphviz timed out after %gs on %s; rendering its structure only",
+                exc.timeout,
+                dot_path.name,
+            )
+            result = await _render_skeleton_async(source, tmp_path, fmt, options.timeout, limiter)
+            if result is None:
+                logger.error("Graphviz timed out on the structure of %s", dot_path.name)
+                return None
+
+        returncode, stderr = result
+        if returncode != 0:
+            logger.error("Graphviz error for %s: %s", dot_path.name, stderr)
+            return None
+        os.replace(tmp_path, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+        if summary is not None:
+            summary.unlink(missing_ok=True)
+    return output_path
+
+
+async def _render_dots_async(
+    dot_paths: Sequence[Path],
+    output_dir: Path,
+    fmt: str,
+    jobs: int | None,
+    limiter: asyncio.Semaphore,
+    options: RenderOptions | None = None,
+) -> list[Path]:
+    """Render .dot files concurrently, keeping the order of dot_paths.
+
+    jobs further caps this call's renders below the shared limiter. If one
+    render raises or the caller is cancelled, the remaining renders are
+    cancelled (and their processes killed) before returning.
+    """
+    local = asyncio.Semaphore(jobs) if jobs is not None else None
+
+    async def render(dot_path: Path) -> Path | None:
+        if local is None:
+            return await _convert_dot_async(dot_path, output_dir, fmt, limiter, options)
+        async with local:
+            return await _convert_dot_async(dot_path, output_dir, fmt, limiter, options)
+
+    tasks = [asyncio.ensure_future(render(dot_path)) for dot_path in dot_paths]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return [path for path in results if path is not None]
+
+
+async def _opt_cfgs_async(
+    ir_path: Path,
+    language: Language,
+    cfg_dir: Path,
+    output_dir: Path,
+    output_format: str,
+    render_jobs: int | None,
+    functions: Iterable[str] | None,
+    limiter: asyncio.Semaphore,
+    options: RenderOptions | None = None,
+) -> list[Path]:
+    """Async counterpart of :func:`struco.cfg._opt_cfgs`."""
+    cfg_dir.mkdir(parents=True, exist_ok=True)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    function_names = await asyncio.to_thread(select_functions, ir_path, language, functions)
+    if not function_names:
+        return []
+    n_defined = await asyncio.to_thread(lambda: sum(1 for _ in iter_function_definitions(ir_path)))
+
+    with tempfile.TemporaryDirectory(prefix="struco-") as scratch_dir:
+        scratch = Path(scratch_dir)
+        opt_input = ir_path
+        if len(function_names) < n_defined:
+            sliced = scratch / ir_path.name
+            if await _slice_module_async(ir_path, function_names, sliced, limiter):
+                opt_input = sliced
+
+        cmd = opt_command(opt_input)
+        logger.info("Running opt: %s", " ".join(cmd))
+        with span("opt", ir_path.name):
+            returncode, stderr = await _run_process(cmd, limiter, "opt", cwd=scratch)
+        check_opt(opt_input, returncode, stderr)
+        with span("collect_dots", ir_path.name):
+            dot_paths = collect_dots(scratch, function_names, cfg_dir)
+
+    return await _render_dots_async(
+        dot_paths, output_dir, output_format, render_jobs, limiter, options
+    )
+
+
+async def extract_cfg_from_ir_async(
+    ir_path: str | Path,
+    language: Language | str = Language.C,
+    output_format: str = "png",
+    engine: str = "opt",
+    render_jobs: int | None = None,
+    functions: Iterable[str] | None = None,
+    limiter: asyncio.Semaphore | None = None,
+    summarize: bool = False,
+    layout_threshold: int | None = DEFAULT_LAYOUT_THRESHOLD,
+    render_timeout: float | None = DEFAULT_RENDER_TIMEOUT,
+) -> list[Path]:
+    """Extract CFGs from an LLVM IR file without blocking the event loop.
+
+    Async counterpart of :func:`struco.cfg.extract_cfg_from_ir`; writes the
+    same files and returns the same paths for the options below. The
+    synchronous API's dedup, shape_store, namespace, demangle_names,
+    opt_pipeline and ir_text options are not supported here.
+
+    Parameters
+    ----------
+    ir_path : str or Path
+        Path to the .ll file.
+    language : Language or str
+        Source language (affects function name extraction).
+    output_format : str
+        Output format, see :data:`struco.formats.OUTPUT_FORMATS`.
+    engine : str
+        CFG construction engine for rendered formats: "opt" or "native".
+    render_jobs : int or None
+        Maximum concurrent Graphviz processes for this call, on top of the
+        shared limiter. Defaults to no extra cap.
+    functions : iterable of str or None
+        Only generate CFGs for these functions. Defaults to all
+        user-defined functions.
+    limiter : asyncio.Semaphore or None
+        Caps concurrent child processes. Defaults to
+        :func:`default_limiter`.
+    summarize : bool
+        For rendered formats, collapse straight-line block chains and
+        truncate long instruction labels before rendering (see
+        :func:`struco.render.summarize_dot`).
+    layout_threshold : int or None
+        For rendered formats, lay out graphs with more nodes than this with
+        ``sfdp`` instead of ``dot``; None always uses ``dot``.
+    render_timeout : float or None
+        Seconds a single Graphviz render may take once started before it
+        is killed and the graph's structure alone is rendered instead;
+        None waits indefinitely.
+
+    Returns
+    -------
+    list[Path]
+        Paths to the generated files.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the IR file does not exist.
+    ValueError
+        If output_format or engine is unknown.
+    RuntimeError
+        If opt or graphviz fails, or numpy is missing for "npz".
+    """
+    ir_path, language, output_format, cfg_dir, output_dir = prepare_cfg_request(
+        ir_path, language, output_format, engine
+    )
+    limiter = limiter if limiter is not None else default_limiter()
+    render_options = RenderOptions(summarize, layout_threshold, render_timeout)
+
+    if output_format in STRUCTURED_FORMATS:
+        outputs = await asyncio.to_thread(
+            structured_cfgs, ir_path, language, output_dir, output_format, functions
+        )
+    elif engine == "native":
+        dot_paths = await asyncio.to_thread(
+            write_native_dots, ir_path, language, cfg_dir, output_dir, functions
+        )
+        outputs = await _render_dots_async(
+            dot_paths, output_dir, output_format, render_jobs, limiter, render_options
+        )
+    else:
+        outputs = await _opt_cfgs_async(
+            ir_path,
+            language,
+            cfg_dir,
+            output_dir,
+            output_format,
+            render_jobs,
+            functions,
+            limiter,
+            render_options,
+        )
+
+    logger.info(
+        "Generated %d CFG %s files in %s",
+        len(outputs),
+        output_format.upper(),
+        output_dir,
+    )
+    return outputs
+
+
+__all__ = [
+    "DEFAULT_MAX_PROCESSES",
+    "default_limiter",
+    "extract_cfg_from_ir_async",
+    "extract_ir_async",
+]
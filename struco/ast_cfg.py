@@ -0,0 +1,872 @@
+"""Compiler-free CFG construction from tree-sitter parse trees.
+
+The ``ast`` engine builds one :class:`~struco.graph.FunctionCFG` per
+function straight from the source, without running Clang, Codon, opt or
+anything else. Blocks hold source statements instead of IR instructions and
+are labelled like Clang's ``-O0`` blocks (``entry``, ``if.then``,
+``for.cond``, ``sw.bb``, ...), so the graphs are comparable in shape to the
+IR-level ones but not identical: there is no lowering of short-circuit
+operators, no cleanup blocks and no separate return block.
+
+tree-sitter recovers from syntax errors, so code that does not compile
+(missing headers, unsupported Codon features, half-written edits) still
+yields CFGs; unparsable fragments become plain statements.
+
+:class:`SourceDocument` keeps the parse tree of one file. After
+:meth:`SourceDocument.edit` the file is reparsed incrementally from the old
+tree and only functions whose text changed get a new CFG.
+
+Requires the optional ``tree-sitter``, ``tree-sitter-c``,
+``tree-sitter-cpp`` and ``tree-sitter-python`` packages.
+"""
+
+from __future__ import annotations
+
+import functools
+import importlib
+import logging
+import re
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from struco.cfg import (
+    EXTENSION_TO_LANGUAGE,
+    Language,
+    ir_output_path,
+    render_dots,
+    serialize_cfgs,
+    source_language,
+    write_deduplicated,
+    write_dots,
+)
+from struco.codon import CodonFilter
+from struco.formats import OUTPUT_FORMATS, STRUCTURED_FORMATS
+from struco.graph import BasicBlock, FunctionCFG, StringPool
+from struco.profile import span
+from struco.render import DEFAULT_LAYOUT_THRESHOLD, DEFAULT_RENDER_TIMEOUT, RenderOptions
+from struco.symbols import SymbolFilter
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Grammar module per language
+_GRAMMARS = {
+    Language.C: "tree_sitter_c",
+    Language.CPP: "tree_sitter_cpp",
+    Language.CXX: "tree_sitter_cpp",
+    Language.PYTHON: "tree_sitter_python",
+}
+
+# Nodes whose named children are searched for function definitions
+_C_SCOPES = {"namespace_definition", "class_specifier", "struct_specifier", "union_specifier"}
+_PY_SCOPES = {"class_definition"}
+
+# Statements that end a block without a successor
+_TERMINATORS = {
+    "return_statement",
+    "raise_statement",
+    "throw_statement",
+    "co_return_statement",
+}
+
+# Nested definitions that only contribute their header to a Python CFG
+_PY_DEFINITIONS = {"function_definition", "class_definition", "decorated_definition"}
+
+
+@functools.cache
+def _ts_language(language: Language) -> Any:
+    """Return the tree-sitter language object for a source language."""
+    try:
+        import tree_sitter
+
+        grammar = importlib.import_module(_GRAMMARS[language])
+    except ImportError as exc:
+        msg = (
+            "the ast engine requires tree-sitter and its grammars "
+            "(pip install tree-sitter tree-sitter-c tree-sitter-cpp tree-sitter-python)"
+        )
+        raise RuntimeError(msg) from exc
+    return tree_sitter.Language(grammar.language())
+
+
+def _make_parser(language: Language) -> Any:
+    import tree_sitter
+
+    return tree_sitter.Parser(_ts_language(language))
+
+
+def _text(node: Any) -> str:
+    """Return the source text of node on a single line."""
+    return _WHITESPACE.sub(" ", node.text.decode("utf-8", errors="replace")).strip()
+
+
+def _header(node: Any, body: Any | None) -> str:
+    """Return the text of node up to the start of body, e.g. ``if (x > 0)``."""
+    if body is None:
+        return _text(node)
+    source = node.text[: body.start_byte - node.start_byte]
+    return _WHITESPACE.sub(" ", source.decode("utf-8", errors="replace")).strip()
+
+
+def _point(source: bytes, offset: int) -> tuple[int, int]:
+    """Return the (row, byte column) of a byte offset."""
+    row = source.count(b"\n", 0, offset)
+    return row, offset - (source.rfind(b"\n", 0, offset) + 1)
+
+
+# function discovery
+
+
+def _declarator_name(node: Any) -> str | None:
+    """Return the name declared by a C/C++ function_definition."""
+    declarator = node.child_by_field_name("declarator")
+    while declarator is not None and declarator.type != "function_declarator":
+        declarator = declarator.child_by_field_name("declarator")
+    if declarator is None:
+        return None
+    name = declarator.child_by_field_name("declarator")
+    return _text(name) if name is not None else None
+
+
+def _iter_functions(node: Any, python: bool, scope: tuple[str, ...] = ()) -> Iterator[tuple]:
+    """Yield (qualified name, node) for every function definition below node.
+
+    Function bodies are not searched, so local functions and lambdas belong
+    to the CFG of their enclosing function.
+    """
+    separator = "." if python else "::"
+    scopes = _PY_SCOPES if python else _C_SCOPES
+    for child in node.named_children:
+        if child.type == "function_definition":
+            if python:
+                name_node = child.child_by_field_name("name")
+                name = _text(name_node) if name_node is not None else None
+            else:
+                name = _declarator_name(child)
+            if name is not None:
+                yield separator.join((*scope, name)), child
+        elif child.type in scopes:
+            name_node = child.child_by_field_name("name")
+            inner = (*scope, _text(name_node)) if name_node is not None else scope
+            body = child.child_by_field_name("body")
+            if body is not None:
+                yield from _iter_functions(body, python, inner)
+        elif child.named_child_count:
+            yield from _iter_functions(child, python, scope)
+
+
+def _unique_functions(root: Any, language: Language) -> list[tuple[str, Any]]:
+    """Return the functions of a tree, suffixing repeated names with ``.N``."""
+    seen: dict[str, int] = {}
+    functions = []
+    for name, node in _iter_functions(root, language is Language.PYTHON):
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        functions.append((f"{name}.{count}" if count else name, node))
+    return functions
+
+
+# CFG construction
+
+
+@dataclass
+class _Builder:
+    """Lower the statements of one function body into basic blocks.
+
+    ``current`` is the block receiving statements, or None after a
+    terminator; statements that follow a terminator start a new block
+    without predecessors.
+    """
+
+    python: bool
+    blocks: list[BasicBlock] = field(default_factory=list)
+    current: BasicBlock | None = None
+    breaks: list[BasicBlock] = field(default_factory=list)
+    continues: list[BasicBlock] = field(default_factory=list)
+    labels: dict[str, BasicBlock] = field(default_factory=dict)
+    _counts: dict[str, int] = field(default_factory=dict)
+
+    def new(self, name: str) -> BasicBlock:
+        """Return a block with a fresh label, not yet placed in the function."""
+        count = self._counts.get(name, 0)
+        self._counts[name] = count + 1
+        return BasicBlock(f"{name}{count}" if count else name)
+
+    def start(self, block: BasicBlock) -> None:
+        self.blocks.append(block)
+        self.current = block
+
+    def emit(self, text: str) -> None:
+        if self.current is None:
+            self.start(self.new("dead"))
+        self.current.instructions.append(text)
+
+    def jump(self, target: BasicBlock) -> None:
+        """End the current block with an edge to target (no-op after a terminator)."""
+        if self.current is not None:
+            self.current.successors.append(target.label)
+        self.current = None
+
+    def branch(self, *targets: BasicBlock) -> None:
+        if self.current is None:
+            self.start(self.new("dead"))
+        self.current.successors.extend(target.label for target in targets)
+        self.current = None
+
+    def build(self, name: str, body: Any, pool: StringPool | None) -> FunctionCFG:
+        self.start(self.new("entry"))
+        if body is not None:
+            self.statement(body)
+        return FunctionCFG.from_blocks(name, self._reachable_blocks(), pool)
+
+    def _reachable_blocks(self) -> list[BasicBlock]:
+        """Drop empty join blocks that no edge reaches, e.g. after if/else that both return."""
+        targets = {label for block in self.blocks for label in block.successors}
+        return [
+            block
+            for i, block in enumerate(self.blocks)
+            if i == 0 or block.instructions or block.label in targets
+        ]
+
+    # statements
+
+    def statement(self, node: Any) -> None:
+        handler = getattr(self, f"_{node.type}", None)
+        if handler is not None:
+            handler(node)
+        elif node.type in _TERMINATORS:
+            self.emit(_text(node))
+            self.current = None
+        elif node.type in ("comment", "{", "}", ";", ":") or not node.is_named:
+            return
+        elif self.python and node.type in _PY_DEFINITIONS:
+            definition = node.child_by_field_name("definition") or node
+            self.emit(_header(node, definition.child_by_field_name("body")))
+        else:
+            self.emit(_text(node))
+
+    def _statements(self, node: Any) -> None:
+        for child in node.named_children:
+            self.statement(child)
+
+    _compound_statement = _statements
+    _block = _statements
+    _declaration_list = _statements
+
+    def _loop_body(self, body: Any | None, continue_to: BasicBlock, break_to: BasicBlock) -> None:
+        self.continues.append(continue_to)
+        self.breaks.append(break_to)
+        try:
+            if body is not None:
+                self.statement(body)
+        finally:
+            self.continues.pop()
+            self.breaks.pop()
+
+    def _else_body(self, node: Any) -> Any | None:
+        """Return the statement of an else clause (C) or its body block (Python)."""
+        body = node.child_by_field_name("body")
+        if body is not None:
+            return body
+        return node.named_children[-1] if node.named_children else None
+
+    def _if_statement(self, node: Any) -> None:
+        consequence = node.child_by_field_name("consequence")
+        self.emit(_header(node, consequence))
+        self._if_chain(consequence, node.children_by_field_name("alternative"))
+
+    def _if_chain(self, consequence: Any, alternatives: list[Any]) -> None:
+        then = self.new("if.then")
+        otherwise = self.new("if.else") if alternatives else None
+        end = self.new("if.end")
+        self.branch(then, otherwise or end)
+
+        self.start(then)
+        if consequence is not None:
+            self.statement(consequence)
+        self.jump(end)
+
+        if otherwise is not None:
+            self.start(otherwise)
+            alternative, rest = alternatives[0], alternatives[1:]
+            if alternative.type == "elif_clause":
+                elif_body = alternative.child_by_field_name("consequence")
+                self.emit(_header(alternative, elif_body))
+                self._if_chain(elif_body, rest)
+            else:
+                body = self._else_body(alternative)
+                if body is not None:
+                    self.statement(body)
+            self.jump(end)
+        self.start(end)
+
+    def _while_statement(self, node: Any) -> None:
+        body = node.child_by_field_name("body")
+        cond = self.new("while.cond")
+        self.jump(cond)
+        self.start(cond)
+        self.emit(_header(node, body))
+        self._loop(body, cond, cond, node.child_by_field_name("alternative"), "while")
+
+    def _loop(
+        self,
+        body: Any | None,
+        head: BasicBlock,
+        continue_to: BasicBlock,
+        alternative: Any | None,
+        prefix: str,
+    ) -> None:
+        """Lower a loop whose header block is current; alternative is Python's ``else``."""
+        loop_body = self.new(f"{prefix}.body")
+        otherwise = self.new(f"{prefix}.else") if alternative is not None else None
+        end = self.new(f"{prefix}.end")
+        self.branch(loop_body, otherwise or end)
+
+        self.start(loop_body)
+        self._loop_body(body, continue_to, end)
+        self.jump(continue_to)
+
+        if otherwise is not None:
+            self.start(otherwise)
+            else_body = self._else_body(alternative)
+            if else_body is not None:
+                self.statement(else_body)
+            self.jump(end)
+        self.start(end)
+
+    def _for_statement(self, node: Any) -> None:
+        body = node.child_by_field_name("body")
+        if self.python:
+            cond = self.new("for.cond")
+            self.jump(cond)
+            self.start(cond)
+            self.emit(_header(node, body))
+            self._loop(body, cond, cond, node.child_by_field_name("alternative"), "for")
+            return
+
+        initializer = node.child_by_field_name("initializer")
+        condition = node.child_by_field_name("condition")
+        update = node.child_by_field_name("update")
+        if initializer is not None:
+            self.emit(_text(initializer))
+        cond = self.new("for.cond")
+        self.jump(cond)
+        self.start(cond)
+        self.emit(f"for ({_text(condition)})" if condition is not None else "for (;;)")
+        loop_body = self.new("for.body")
+        inc = self.new("for.inc") if update is not None else cond
+        end = self.new("for.end")
+        if condition is None:
+            self.jump(loop_body)
+        else:
+            self.branch(loop_body, end)
+        self.start(loop_body)
+        self._loop_body(body, inc, end)
+        self.jump(inc)
+        if update is not None:
+            self.start(inc)
+            self.emit(_text(update))
+            self.jump(cond)
+        self.start(end)
+
+    def _for_range_loop(self, node: Any) -> None:
+        body = node.child_by_field_name("body")
+        cond = self.new("for.cond")
+        self.jump(cond)
+        self.start(cond)
+        self.emit(_header(node, body))
+        self._loop(body, cond, cond, None, "for")
+
+    def _do_statement(self, node: Any) -> None:
+        body = node.child_by_field_name("body")
+        condition = node.child_by_field_name("condition")
+        loop_body, cond, end = self.new("do.body"), self.new("do.cond"), self.new("do.end")
+        self.jump(loop_body)
+        self.start(loop_body)
+        self._loop_body(body, cond, end)
+        self.jump(cond)
+        self.start(cond)
+        self.emit(f"while {_text(condition)}" if condition is not None else "while")
+        self.branch(loop_body, end)
+        self.start(end)
+
+    def _switch_statement(self, node: Any) -> None:
+        body = node.child_by_field_name("body")
+        self.emit(_header(node, body))
+        cases = [c for c in body.named_children if c.type == "case_statement"] if body else []
+        has_value = [c.child_by_field_name("value") is not None for c in cases]
+        case_blocks = [self.new("sw.bb" if value else "sw.default") for value in has_value]
+        end = self.new("sw.epilog")
+        has_default = not all(has_value)
+        self.branch(*case_blocks, *(() if has_default else (end,)))
+
+        self.breaks.append(end)
+        try:
+            for case, block in zip(cases, case_blocks, strict=True):
+                # Falls through from the previous case unless it ended in a jump
+                self.jump(block)
+                self.start(block)
+                value = case.child_by_field_name("value")
+                for child in case.named_children:
+                    if value is None or child.id != value.id:
+                        self.statement(child)
+        finally:
+            self.breaks.pop()
+        self.jump(end)
+        self.start(end)
+
+    def _match_statement(self, node: Any) -> None:
+        body = node.child_by_field_name("body")
+        self.emit(_header(node, body))
+        cases = [c for c in body.named_children if c.type == "case_clause"] if body else []
+        case_blocks = [self.new("match.case") for _ in cases]
+        end = self.new("match.end")
+        self.branch(*case_blocks, end)
+        for case, block in zip(cases, case_blocks, strict=True):
+            consequence = case.child_by_field_name("consequence")
+            self.start(block)
+            self.emit(_header(case, consequence))
+            if consequence is not None:
+                self.statement(consequence)
+            self.jump(end)
+        self.start(end)
+
+    def _break_statement(self, node: Any) -> None:
+        self.emit(_text(node))
+        if self.breaks:
+            self.jump(self.breaks[-1])
+        else:
+            self.current = None
+
+    def _continue_statement(self, node: Any) -> None:
+        self.emit(_text(node))
+        if self.continues:
+            self.jump(self.continues[-1])
+        else:
+            self.current = None
+
+    def _label_block(self, name: str) -> BasicBlock:
+        if name not in self.labels:
+            self.labels[name] = self.new(name)
+        return self.labels[name]
+
+    def _goto_statement(self, node: Any) -> None:
+        self.emit(_text(node))
+        label = node.child_by_field_name("label")
+        if label is not None:
+            self.jump(self._label_block(_text(label)))
+        else:
+            self.current = None
+
+    def _labeled_statement(self, node: Any) -> None:
+        label = node.child_by_field_name("label")
+        target = self._label_block(_text(label)) if label is not None else self.new("label")
+        self.jump(target)
+        self.start(target)
+        for child in node.named_children:
+            if label is None or child.id != label.id:
+                self.statement(child)
+
+    def _with_statement(self, node: Any) -> None:
+        body = node.child_by_field_name("body")
+        self.emit(_header(node, body))
+        if body is not None:
+            self.statement(body)
+
+    def _try_statement(self, node: Any) -> None:
+        """Lower try/catch (C++) or try/except/else/finally (Python).
+
+        Every block of the try body gets an edge to every handler, since
+        any statement in it may throw.
+        """
+        body = node.child_by_field_name("body")
+        handlers = [
+            c
+            for c in node.named_children
+            if c.type in ("catch_clause", "except_clause", "except_group_clause")
+        ]
+        else_clause = next((c for c in node.named_children if c.type == "else_clause"), None)
+        finally_clause = next((c for c in node.named_children if c.type == "finally_clause"), None)
+
+        prefix = "except" if self.python else "catch"
+        try_block = self.new("try")
+        handler_blocks = [self.new(prefix) for _ in handlers]
+        end = self.new("try.end")
+        exit_block = self.new("finally") if finally_clause is not None else end
+
+        self.jump(try_block)
+        first = len(self.blocks)
+        self.start(try_block)
+        self.emit("try")
+        if body is not None:
+            self.statement(body)
+        for block in self.blocks[first:]:
+            block.successors.extend(handler.label for handler in handler_blocks)
+        if else_clause is not None:
+            else_block = self.new("try.else")
+            self.jump(else_block)
+            self.start(else_block)
+            else_body = self._else_body(else_clause)
+            if else_body is not None:
+                self.statement(else_body)
+        self.jump(exit_block)
+
+        for handler, block in zip(handlers, handler_blocks, strict=True):
+            handler_body = handler.child_by_field_name("body") or next(
+                (c for c in handler.named_children if c.type in ("block", "compound_statement")),
+                None,
+            )
+            self.start(block)
+            self.emit(_header(handler, handler_body))
+            if handler_body is not None:
+                self.statement(handler_body)
+            self.jump(exit_block)
+
+        if finally_clause is not None:
+            self.start(exit_block)
+            self.emit("finally")
+            self._statements(finally_clause)
+            self.jump(end)
+        self.start(end)
+
+
+# public API
+
+
+def _normalize_language(language: Language | str) -> Language:
+    if isinstance(language, Language):
+        return language
+    try:
+        return EXTENSION_TO_LANGUAGE[language]
+    except KeyError:
+        msg = f"Unsupported language: {language}"
+        raise ValueError(msg) from None
+
+
+class SourceDocument:
+    """A parsed source file whose CFGs are rebuilt incrementally after edits.
+
+    Parameters
+    ----------
+    source : str or bytes
+        The file contents.
+    language : Language or str
+        Source language, as an enum or file extension (``"c"``, ``"cpp"``,
+        ``"cxx"``, ``"py"``).
+
+    Raises
+    ------
+    ValueError
+        If the language is not supported.
+    RuntimeError
+        If tree-sitter or the grammar is not installed.
+    """
+
+    def __init__(self, source: str | bytes, language: Language | str) -> None:
+        self.language = _normalize_language(language)
+        self._parser = _make_parser(self.language)
+        self._source = source.encode() if isinstance(source, str) else bytes(source)
+        self._tree = self._parser.parse(self._source)
+        # name -> (function text, pool, CFG) from the last call to cfgs()
+        self._built: dict[str, tuple[bytes, StringPool | None, FunctionCFG]] = {}
+
+    @classmethod
+    def from_file(cls, file_path: str | Path) -> SourceDocument:
+        """Parse a source file, picking the language from its extension.
+
+        Raises
+        ------
+        FileNotFoundError
+            If the file does not exist.
+        ValueError
+            If the extension is not supported.
+        """
+        path = Path(file_path)
+        language = source_language(path)
+        if not path.exists():
+            msg = f"Source file not found: {path}"
+            raise FileNotFoundError(msg)
+        return cls(path.read_bytes(), language)
+
+    @property
+    def source(self) -> bytes:
+        """The current file contents."""
+        return self._source
+
+    @property
+    def tree(self) -> Any:
+        """The current ``tree_sitter.Tree``."""
+        return self._tree
+
+    @property
+    def has_errors(self) -> bool:
+        """True if the parser had to recover from syntax errors."""
+        return self._tree.root_node.has_error
+
+    def edit(self, start: int, end: int, replacement: str | bytes) -> None:
+        """Replace the bytes ``source[start:end]`` and reparse incrementally.
+
+        The old tree is edited in place and handed to the parser, which
+        reuses every subtree outside the changed range.
+        """
+        if not 0 <= start <= end <= len(self._source):
+            msg = f"Invalid edit range {start}:{end} for {len(self._source)} bytes"
+            raise ValueError(msg)
+        new_text = replacement.encode() if isinstance(replacement, str) else replacement
+        old_source = self._source
+        new_source = old_source[:start] + new_text + old_source[end:]
+        new_end = start + len(new_text)
+        self._tree.edit(
+            start_byte=start,
+            old_end_byte=end,
+            new_end_byte=new_end,
+            start_point=_point(old_source, start),
+            old_end_point=_point(old_source, end),
+            new_end_point=_point(new_source, new_end),
+        )
+        self._source = new_source
+        with span("ast_parse", "edit"):
+            self._tree = self._parser.parse(new_source, self._tree)
+
+    def set_source(self, source: str | bytes) -> None:
+        """Replace the whole contents, e.g. after the file changed on disk.
+
+        Only the differing middle section is treated as edited, so unchanged
+        functions before and after it keep their subtrees and CFGs.
+        """
+        new = source.encode() if isinstance(source, str) else bytes(source)
+        old = self._source
+        prefix = 0
+        limit = min(len(old), len(new))
+        while prefix < limit and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[-1 - suffix] == new[-1 - suffix]:
+            suffix += 1
+        if prefix == len(old) == len(new):
+            return
+        self.edit(prefix, len(old) - suffix, new[prefix : len(new) - suffix])
+
+    def function_names(self) -> list[str]:
+        """Return the qualified names of the functions defined in the file.
+
+        C++ names are joined with ``::`` and Python names with ``.``;
+        repeated definitions get a ``.N`` suffix.
+        """
+        return [name for name, _ in _unique_functions(self._tree.root_node, self.language)]
+
+    def cfgs(
+        self, functions: Iterable[str] | None = None, pool: StringPool | None = None
+    ) -> list[FunctionCFG]:
+        """Return the CFGs of the file's functions, in source order.
+
+        A function whose text is unchanged since the previous call returns
+        the same :class:`FunctionCFG` object without being rebuilt.
+
+        Parameters
+        ----------
+        functions : iterable of str or None
+            Only build these functions (see :meth:`function_names`).
+            Defaults to all.
+        pool : StringPool or None
+            Pool for the CFG strings. Defaults to a new pool per call.
+        """
+        wanted = set(functions) if functions is not None else None
+        python = self.language is Language.PYTHON
+        built: dict[str, tuple[bytes, StringPool | None, FunctionCFG]] = {}
+        strings = pool if pool is not None else StringPool()
+        cfgs = []
+        for name, node in _unique_functions(self._tree.root_node, self.language):
+            if wanted is not None and name not in wanted:
+                continue
+            text = node.text
+            previous = self._built.get(name)
+            if previous is not None and previous[0] == text and previous[1] is pool:
+                cfg = previous[2]
+            else:
+                with span("ast_cfg", name):
+                    cfg = _Builder(python).build(name, node.child_by_field_name("body"), strings)
+            built[name] = (text, pool, cfg)
+            cfgs.append(cfg)
+        if wanted is None:
+            self._built = built
+        else:
+            self._built.update(built)
+        return cfgs
+
+
+def build_ast_cfgs(
+    file_path: str | Path,
+    functions: Iterable[str] | None = None,
+    pool: StringPool | None = None,
+) -> list[FunctionCFG]:
+    """Parse a source file with tree-sitter and build the CFG of each function.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to a C, C++ or Python source file.
+    functions : iterable of str or None
+        Only build these functions (qualified source names, see
+        :meth:`SourceDocument.function_names`). Defaults to all.
+    pool : StringPool or None
+        Pool for the CFG strings. Defaults to a new pool per call.
+
+    Returns
+    -------
+    list[FunctionCFG]
+        One CFG per function, in source order.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the source file does not exist.
+    ValueError
+        If the file extension is not supported.
+    RuntimeError
+        If tree-sitter or the grammar is not installed.
+    """
+    path = Path(file_path)
+    with span("ast_parse", path.name):
+        document = SourceDocument.from_file(path)
+    if document.has_errors:
+        logger.warning("Syntax errors in %s; CFGs are built from the recovered tree", path)
+    return document.cfgs(functions, pool)
+
+
+def ast_cfg_dir(source_path: Path, output_root: str | Path | None = None) -> Path:
+    """Return the directory for the ast engine's outputs of a source file.
+
+    E.g. ``/path/to/hello.c`` -> ``/path/to/hello_c_ast_cfg``, or mirrored
+    below output_root like :func:`struco.cfg.ir_output_path`.
+    """
+    ext = source_path.suffix.lstrip(".")
+    return ir_output_path(source_path, output_root).parent.parent / (
+        f"{source_path.stem}_{ext}_ast_cfg"
+    )
+
+
+def extract_cfg_from_source(
+    file_path: str | Path,
+    output_format: str = "png",
+    render_jobs: int | None = None,
+    functions: Iterable[str] | None = None,
+    output_root: str | Path | None = None,
+    dedup: bool = False,
+    shape_store: str | Path | None = None,
+    include_namespaces: Sequence[str] | None = None,
+    exclude_namespaces: Sequence[str] | None = None,
+    summarize: bool = False,
+    layout_threshold: int | None = DEFAULT_LAYOUT_THRESHOLD,
+    render_timeout: float | None = DEFAULT_RENDER_TIMEOUT,
+) -> list[Path]:
+    """Build CFGs from a source file without a compiler and render or serialize them.
+
+    Outputs go to ``<stem>_<ext>_ast_cfg/<format>s/`` next to the source
+    (or below output_root), with the .dot files of rendered formats in
+    ``<stem>_<ext>_ast_cfg/``.
+
+    Parameters
+    ----------
+    file_path : str or Path
+        Path to a C, C++ or Python source file.
+    output_format : str
+        "png" or "pdf" (rendered with Graphviz), or "json", "graphml" or
+        "npz".
+    render_jobs : int or None
+        Maximum number of concurrent Graphviz processes. Defaults to the
+        number of CPUs.
+    functions : iterable of str or None
+        Only generate CFGs for these functions (qualified source names).
+        Defaults to all.
+    output_root : str, Path or None
+        Write below this directory instead of next to the source.
+    dedup : bool
+        Produce each distinct CFG shape once and write a ``dedup.json``
+        manifest, as in :func:`struco.cfg.extract_cfg_from_ir`.
+    shape_store : str, Path or None
+        Directory shared across files for deduplicated artifacts. Implies
+        dedup.
+    include_namespaces, exclude_namespaces : sequence of str or None
+        Namespace rules matched against the qualified source names, as for
+        C++ in :func:`struco.cfg.extract_cfg_from_ir`; Python names use
+        ``.`` where C++ uses ``::``.
+    summarize, layout_threshold, render_timeout
+        Render limits for rendered formats, as in
+        :func:`struco.cfg.extract_cfg_from_ir`.
+
+    Returns
+    -------
+    list[Path]
+        Paths to the generated files, in source order (one per distinct
+        shape with dedup).
+
+    Raises
+    ------
+    FileNotFoundError
+        If the source file does not exist.
+    ValueError
+        If the extension or output_format is not supported, or a render
+        limit is not positive.
+    RuntimeError
+        If tree-sitter, Graphviz or numpy (for "npz") is missing.
+    """
+    source_path = Path(file_path).resolve()
+    output_format = output_format.lower()
+    if output_format not in OUTPUT_FORMATS:
+        msg = (
+            f"Invalid output format '{output_format}'. "
+            f"Must be one of: {', '.join(OUTPUT_FORMATS)}."
+        )
+        raise ValueError(msg)
+    render_options = RenderOptions(summarize, layout_threshold, render_timeout)
+
+    cfgs = build_ast_cfgs(source_path, functions)
+    language = source_language(source_path)
+    if functions is None and (include_namespaces or exclude_namespaces):
+        if language is Language.PYTHON:
+            symbol_filter = CodonFilter.from_options(include_namespaces, exclude_namespaces)
+            separator = "."
+        else:
+            symbol_filter = SymbolFilter.from_options(include_namespaces, exclude_namespaces)
+            separator = "::"
+        cfgs = [cfg for cfg in cfgs if symbol_filter.keeps_path(cfg.name.split(separator))]
+    cfg_dir = ast_cfg_dir(source_path, output_root)
+    output_dir = cfg_dir / f"{output_format}s"
+
+    if dedup or shape_store is not None:
+        outputs = write_deduplicated(
+            cfgs,
+            language,
+            cfg_dir,
+            output_dir,
+            output_format,
+            render_jobs,
+            shape_store,
+            render_options=render_options,
+        )
+    elif output_format in STRUCTURED_FORMATS:
+        outputs = serialize_cfgs(cfgs, language, output_dir, output_format)
+    else:
+        output_dir.mkdir(parents=True, exist_ok=True)
+        dot_paths = write_dots(cfgs, cfg_dir)
+        outputs = render_dots(dot_paths, output_dir, output_format, render_jobs, render_options)
+
+    logger.info(
+        "Generated %d CFG %s files in %s",
+        len(outputs),
+        output_format.upper(),
+        output_dir,
+    )
+    return outputs
+
+
+__all__ = [
+    "SourceDocument",
+    "ast_cfg_dir",
+    "build_ast_cfgs",
+    "extract_cfg_from_source",
+]
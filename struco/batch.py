@@ -0,0 +1,419 @@
+"""Batch IR and CFG extraction over whole source trees.
+
+Expands directories, glob patterns and file lists into a list of source
+files, then runs the frontend -> opt -> dot pipeline for each of them on a
+process pool. Failures are collected per file instead of aborting the run.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import glob
+import logging
+import os
+import time
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from struco.ast_cfg import extract_cfg_from_source
+from struco.cache import IRCache
+from struco.cfg import EXTENSION_TO_LANGUAGE, extract_cfg_from_ir, extract_ir
+from struco.compdb import CompilationDatabase
+from struco.incremental import build_incremental
+from struco.pch import plan_pch
+from struco.profile import Span, capture, current_profiler, emit, is_enabled, span
+from struco.scheduler import ResourceLimits, current_limits, order_by_cost, resource_limits
+
+logger = logging.getLogger(__name__)
+
+_GLOB_CHARS = frozenset("*?[")
+
+# cfg_options that only apply to IR engines and are not passed to the ast engine
+IR_ONLY_OPTIONS = frozenset({"engine", "demangle_names", "opt_pipeline"})
+
+
+@dataclass(frozen=True)
+class FileResult:
+    """Outcome of processing a single source file.
+
+    Attributes
+    ----------
+    source : Path
+        The source file that was processed.
+    outputs : tuple[Path, ...]
+        Paths to the generated CFG files.
+    error : str or None
+        Error message if processing failed, otherwise None.
+    up_to_date : bool
+        True if an incremental run skipped the file as unchanged.
+    spans : tuple[Span, ...]
+        Profiling spans recorded by a worker process, to be merged into
+        the parent's profiler.
+    """
+
+    source: Path
+    outputs: tuple[Path, ...] = ()
+    error: str | None = None
+    up_to_date: bool = False
+    spans: tuple[Span, ...] = ()
+
+    @property
+    def ok(self) -> bool:
+        """Return True if the file was processed without error."""
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class BatchReport:
+    """Aggregated results of a batch run.
+
+    Attributes
+    ----------
+    results : tuple[FileResult, ...]
+        Per-file results, in the same order as the input sources.
+    elapsed : float
+        Wall-clock duration of the run in seconds.
+    """
+
+    results: tuple[FileResult, ...]
+    elapsed: float
+
+    @property
+    def succeeded(self) -> list[FileResult]:
+        """Results for files that were processed successfully."""
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> list[FileResult]:
+        """Results for files that failed."""
+        return [r for r in self.results if not r.ok]
+
+    def summary(self) -> str:
+        """Return a human-readable summary of the run."""
+        n_outputs = sum(len(r.outputs) for r in self.results)
+        n_current = sum(r.up_to_date for r in self.results)
+        header = (
+            f"Processed {len(self.results)} files in {self.elapsed:.1f}s: "
+            f"{len(self.succeeded)} succeeded, {len(self.failed)} failed, "
+            f"{n_outputs} CFG files written"
+        )
+        if n_current:
+            header += f", {n_current} up to date"
+        lines = [header]
+        lines.extend(f"  FAILED {r.source}: {r.error}" for r in self.failed)
+        return "\n".join(lines)
+
+
+def _is_supported(path: Path) -> bool:
+    """Return True if the file extension maps to a supported language."""
+    return path.suffix.lstrip(".") in EXTENSION_TO_LANGUAGE
+
+
+def read_file_list(list_path: str | Path) -> list[str]:
+    """Read source paths from a text file, one per line.
+
+    Blank lines and lines starting with ``#`` are ignored. Relative paths
+    are resolved against the directory containing the list file.
+
+    Parameters
+    ----------
+    list_path : str or Path
+        Path to the file list.
+
+    Returns
+    -------
+    list[str]
+        The paths listed in the file.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the list file does not exist.
+    """
+    list_path = Path(list_path)
+    if not list_path.exists():
+        msg = f"File list not found: {list_path}"
+        raise FileNotFoundError(msg)
+
+    base = list_path.resolve().parent
+    entries: list[str] = []
+    for line in list_path.read_text().splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        entries.append(str(base / line))
+    return entries
+
+
+def collect_sources(paths: Iterable[str | Path]) -> list[Path]:
+    """Expand files, directories and glob patterns into source files.
+
+    Directories are searched recursively and glob patterns support ``**``.
+    Only files with a supported extension are picked up from directories
+    and globs; files named explicitly are kept as-is so that unsupported
+    inputs are reported as per-file failures.
+
+    Parameters
+    ----------
+    paths : iterable of str or Path
+        Files, directories, or glob patterns.
+
+    Returns
+    -------
+    list[Path]
+        Absolute source paths, deduplicated, in a deterministic order.
+    """
+    seen: set[Path] = set()
+    sources: list[Path] = []
+
+    def _add(path: Path) -> None:
+        path = path.resolve()
+        if path not in seen:
+            seen.add(path)
+            sources.append(path)
+
+    for entry in paths:
+        entry_str = str(entry)
+        if _GLOB_CHARS.intersection(entry_str):
+            for match in sorted(glob.glob(entry_str, recursive=True)):
+                match_path = Path(match)
+                if match_path.is_file() and _is_supported(match_path):
+                    _add(match_path)
+        elif Path(entry_str).is_dir():
+            for child in sorted(Path(entry_str).rglob("*")):
+                if child.is_file() and _is_supported(child):
+                    _add(child)
+        else:
+            _add(Path(entry_str))
+
+    return sources
+
+
+def process_file(
+    source: Path,
+    cache: IRCache | None,
+    cfg_options: dict[str, Any],
+    incremental: bool = False,
+    ir_options: dict[str, Any] | None = None,
+    collect_spans: bool = False,
+    limits: ResourceLimits | None = None,
+) -> FileResult:
+    """Run IR extraction and CFG generation for one file, capturing errors.
+
+    ir_options are keyword arguments for :func:`struco.cfg.extract_ir`
+    (``output_root``, ``keep_ir``, ``compile_db``, ``pch``). With
+    collect_spans, profiling spans are recorded locally and returned in the
+    result; used in worker processes, whose profiler and hooks are not the
+    parent's. limits apply to the file's child processes (see
+    :mod:`struco.scheduler`); worker processes get them passed in because
+    they do not share the parent's context.
+    """
+    ir_options = ir_options or {}
+    if collect_spans:
+        with capture() as profiler:
+            result = process_file(
+                source, cache, cfg_options, incremental, ir_options, False, limits
+            )
+        return dataclasses.replace(result, spans=tuple(profiler.spans))
+
+    with resource_limits(limits), span("file", source.name):
+        return _process_one(source, cache, cfg_options, incremental, ir_options)
+
+
+def _process_one(
+    source: Path,
+    cache: IRCache | None,
+    cfg_options: dict[str, Any],
+    incremental: bool,
+    ir_options: dict[str, Any],
+) -> FileResult:
+    try:
+        if cfg_options.get("engine") == "ast":
+            outputs = extract_cfg_from_source(
+                source,
+                output_root=ir_options.get("output_root"),
+                **{k: v for k, v in cfg_options.items() if k not in IR_ONLY_OPTIONS},
+            )
+            return FileResult(source=source, outputs=tuple(outputs))
+        if incremental:
+            built = build_incremental(
+                source,
+                cache=cache,
+                output_root=ir_options.get("output_root"),
+                compile_db=ir_options.get("compile_db"),
+                pch=ir_options.get("pch"),
+                **cfg_options,
+            )
+            return FileResult(source=source, outputs=built.outputs, up_to_date=built.up_to_date)
+        ir_result = extract_ir(source, cache=cache, **ir_options)
+        outputs = extract_cfg_from_ir(
+            ir_result.ir_path,
+            language=ir_result.language,
+            ir_text=ir_result.ir_text,
+            **cfg_options,
+        )
+    except (FileNotFoundError, ValueError, RuntimeError, OSError) as exc:
+        return FileResult(source=source, error=str(exc))
+    return FileResult(source=source, outputs=tuple(outputs))
+
+
+def run_batch(
+    sources: Sequence[Path],
+    output_format: str = "png",
+    jobs: int | None = None,
+    cache: IRCache | None = None,
+    incremental: bool = False,
+    output_root: str | Path | None = None,
+    keep_ir: bool = True,
+    limits: ResourceLimits | None = None,
+    compile_db: CompilationDatabase | None = None,
+    pch_dir: str | Path | None = None,
+    **cfg_options: Any,
+) -> BatchReport:
+    """Extract IR and CFGs for many source files in parallel.
+
+    Parameters
+    ----------
+    sources : sequence of Path
+        Source files to process (see :func:`collect_sources`).
+    output_format : str
+        Output format (see :data:`struco.formats.OUTPUT_FORMATS`).
+    jobs : int or None
+        Number of worker processes. Defaults to the number of CPUs. With a
+        single job, files are processed in the current process; otherwise
+        the files with the largest estimated cost start first (see
+        :func:`struco.scheduler.order_by_cost`).
+    cache : IRCache or None
+        Optional IR cache shared by all workers.
+    incremental : bool
+        Skip unchanged sources and re-render only functions whose IR
+        changed (see :func:`struco.incremental.build_incremental`).
+    output_root : str or Path or None
+        Write IR and CFGs below this directory instead of next to the
+        sources (see :func:`struco.cfg.extract_ir`).
+    keep_ir : bool
+        If False, pass IR from the compiler to CFG extraction in memory
+        without writing .ll files. Not supported with incremental.
+    limits : ResourceLimits or None
+        Timeouts, memory cap and retries for every child process (see
+        :mod:`struco.scheduler`). Defaults to the limits active in the
+        calling context.
+    compile_db : CompilationDatabase or None
+        Per-file C/C++ flags from a ``compile_commands.json`` (see
+        :mod:`struco.compdb`).
+    pch_dir : str or Path or None
+        Build precompiled headers for the leading includes shared by the
+        batch's C/C++ files in this directory, and compile with them (see
+        :func:`struco.pch.plan_pch`). None compiles without.
+    **cfg_options
+        Further keyword arguments for :func:`struco.cfg.extract_cfg_from_ir`
+        (``engine``, ``functions``, ...). When files run in parallel,
+        ``render_jobs`` defaults to 1 so the machine is not oversubscribed.
+        ``engine="ast"`` builds the CFGs from the sources with
+        :func:`struco.ast_cfg.extract_cfg_from_source` and never runs the
+        compiler; it is not supported with incremental.
+
+    Returns
+    -------
+    BatchReport
+        Per-file results in input order and the total elapsed time.
+
+    Raises
+    ------
+    ValueError
+        If jobs is less than 1, or keep_ir is False or engine is "ast" in
+        incremental mode.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs < 1:
+        msg = f"jobs must be at least 1, got {jobs}"
+        raise ValueError(msg)
+    if incremental and not keep_ir:
+        msg = "incremental builds need the IR on disk (keep_ir=True)"
+        raise ValueError(msg)
+    if incremental and cfg_options.get("engine") == "ast":
+        msg = "incremental builds need an IR engine, not 'ast'"
+        raise ValueError(msg)
+    ir_options: dict[str, Any] = {
+        "output_root": output_root,
+        "keep_ir": keep_ir,
+        "compile_db": compile_db,
+    }
+    if pch_dir is not None and cfg_options.get("engine") != "ast":
+        with span("plan_pch", f"{len(sources)} files"):
+            ir_options["pch"] = plan_pch(sources, compile_db, pch_dir)
+
+    cfg_options = {"output_format": output_format, **cfg_options}
+    limits = limits if limits is not None else current_limits()
+    start = time.perf_counter()
+    results: list[FileResult | None] = [None] * len(sources)
+
+    if jobs == 1 or len(sources) <= 1:
+        for index, source in enumerate(sources):
+            results[index] = process_file(
+                source, cache, cfg_options, incremental, ir_options, limits=limits
+            )
+            _log_progress(results[index], index + 1, len(sources))
+    else:
+        workers = min(jobs, len(sources))
+        if cfg_options.get("render_jobs") is None:
+            cfg_options["render_jobs"] = 1
+        profiler = current_profiler()
+        collect_spans = is_enabled()
+        logger.info("Processing %d files with %d workers", len(sources), workers)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # Largest first, so no large file starts when the others are done
+            futures = {
+                pool.submit(
+                    process_file,
+                    sources[index],
+                    cache,
+                    cfg_options,
+                    incremental,
+                    ir_options,
+                    collect_spans,
+                    limits,
+                ): index
+                for index in order_by_cost(sources, output_root)
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                try:
+                    result = future.result()
+                except Exception as exc:  # a crashed worker must not stop the batch
+                    result = FileResult(source=sources[index], error=f"worker failed: {exc}")
+                for worker_span in result.spans:
+                    emit(worker_span, profiler)
+                results[index] = result
+                _log_progress(result, done, len(sources))
+
+    elapsed = time.perf_counter() - start
+    return BatchReport(
+        results=tuple(r for r in results if r is not None),
+        elapsed=elapsed,
+    )
+
+
+def _log_progress(result: FileResult, done: int, total: int) -> None:
+    """Log the outcome of one file as it completes."""
+    if result.up_to_date:
+        logger.info("[%d/%d] %s: up to date", done, total, result.source)
+    elif result.ok:
+        logger.info("[%d/%d] %s: %d CFGs", done, total, result.source, len(result.outputs))
+    else:
+        logger.error("[%d/%d] %s: %s", done, total, result.source, result.error)
+
+
+__all__ = [
+    "BatchReport",
+    "FileResult",
+    "collect_sources",
+    "read_file_list",
+    "run_batch",
+    "IR_ONLY_OPTIONS",
+    "process_file",
+]
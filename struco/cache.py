@@ -0,0 +1,318 @@
+"""Content-addressed on-disk cache for frontend IR output.
+
+Entries are keyed by a hash of the source bytes and location, the compiler
+command and arguments, and the compiler version string; the location
+matters because ``#include "..."`` resolves against the source's
+directory, so two copies of a file elsewhere may compile differently. The files the source includes
+are stored with each entry along with their modification time and size,
+and an entry whose headers changed since it was stored is a miss, so a hit
+is only possible when re-running the frontend would produce the same IR.
+The cache is bounded in size and evicts least-recently-used entries.
+
+Each process keeps a running estimate of the cache size and only scans the
+directory when the estimate exceeds the cap or has not been refreshed for
+a while (other processes write to the same cache), so filling the cache
+does not stat every entry on every store.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Sequence
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 1 << 30  # 1 GiB
+
+# Seconds after which a process rescans the cache instead of trusting its size estimate
+_RESCAN_SECONDS = 60.0
+
+# Per-process size estimate of each cache directory: root -> (bytes, time of last scan)
+_sizes: dict[Path, tuple[int, float]] = {}
+_sizes_lock = threading.Lock()
+
+
+def default_cache_dir() -> Path:
+    """Return the default cache directory.
+
+    Uses ``$STRUCO_CACHE_DIR`` if set, otherwise ``$XDG_CACHE_HOME/struco/ir``
+    (falling back to ``~/.cache/struco/ir``).
+    """
+    env_dir = os.environ.get("STRUCO_CACHE_DIR")
+    if env_dir:
+        return Path(env_dir)
+    xdg = os.environ.get("XDG_CACHE_HOME")
+    base = Path(xdg) if xdg else Path.home() / ".cache"
+    return base / "struco" / "ir"
+
+
+@functools.cache
+def compiler_version(command: str) -> str:
+    """Return the ``--version`` output of a compiler, or "unknown".
+
+    The result is cached for the lifetime of the process.
+    """
+    try:
+        result = subprocess.run(
+            [command, "--version"],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+    except OSError:
+        return "unknown"
+    return result.stdout.strip() or "unknown"
+
+
+class IRCache:
+    """Size-bounded, content-addressed store of ``.ll`` files.
+
+    Parameters
+    ----------
+    root : str, Path, or None
+        Cache directory. Defaults to :func:`default_cache_dir`.
+    max_bytes : int
+        Maximum total size of cached IR. Least-recently-used entries are
+        evicted once the cap is exceeded.
+
+    Raises
+    ------
+    ValueError
+        If max_bytes is negative.
+    """
+
+    def __init__(self, root: str | Path | None = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes < 0:
+            msg = f"max_bytes must be non-negative, got {max_bytes}"
+            raise ValueError(msg)
+        self.root = Path(root) if root is not None else default_cache_dir()
+        self.max_bytes = max_bytes
+
+    def key(
+        self,
+        source: bytes,
+        command: str,
+        args: Sequence[str],
+        source_path: str | Path | None = None,
+    ) -> str:
+        """Return the cache key for a source and frontend invocation.
+
+        Parameters
+        ----------
+        source : bytes
+            Raw bytes of the source file.
+        command : str
+            Compiler executable name.
+        args : sequence of str
+            Compiler arguments (excluding input and output paths).
+        source_path : str or Path or None
+            Where the source file is; resolved, so every path to one file
+            gives the same key.
+
+        Returns
+        -------
+        str
+            Hex digest identifying the entry.
+        """
+        digest = hashlib.sha256()
+        location = str(Path(source_path).resolve()) if source_path is not None else ""
+        for part in (command, "\0".join(args), compiler_version(command), location):
+            digest.update(part.encode())
+            digest.update(b"\0")
+        digest.update(source)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.ll"
+
+    def get(self, key: str) -> Path | None:
+        """Return the cached IR path for a key, or None on a miss.
+
+        An entry is a miss if one of the files it was stored with has
+        changed. A hit refreshes the entry's access time for LRU eviction.
+        Another process may still evict the entry before it is read, so
+        readers must treat a missing file as a miss too.
+        """
+        entry = self._entry_path(key)
+        try:
+            os.utime(entry)
+            stale = _changed_dependency(entry.with_suffix(".deps"))
+        except FileNotFoundError:
+            logger.debug("IR cache miss: %s", key[:12])
+            return None
+        if stale is not None:
+            logger.info("IR cache entry %s is stale: %s changed", key[:12], stale)
+            return None
+        logger.info("IR cache hit: %s", key[:12])
+        return entry
+
+    def put(self, key: str, ir_path: Path, dependencies: Sequence[Path] = ()) -> Path:
+        """Copy an IR file into the cache and evict old entries if needed.
+
+        The copy is written to a temporary file and renamed into place, so
+        concurrent writers never expose a partial entry.
+
+        Parameters
+        ----------
+        key : str
+            Cache key from :meth:`key`.
+        ir_path : Path
+            The IR file to store.
+        dependencies : sequence of Path
+            Files the IR depends on besides the source, such as the headers
+            from the compiler's depfile. The entry is a miss once one of
+            them changes.
+
+        Returns
+        -------
+        Path
+            Path of the cached entry.
+        """
+        return self._store(key, lambda tmp_name: shutil.copyfile(ir_path, tmp_name), dependencies)
+
+    def put_text(self, key: str, ir_text: str, dependencies: Sequence[Path] = ()) -> Path:
+        """Store IR text that was never written to disk; see :meth:`put`."""
+        return self._store(key, lambda tmp_name: Path(tmp_name).write_text(ir_text), dependencies)
+
+    def _store(
+        self, key: str, write: Callable[[str], object], dependencies: Sequence[Path]
+    ) -> Path:
+        """Write an entry through a temporary file, then evict if needed."""
+        entry = self._entry_path(key)
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = entry.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+
+        # The dependencies go in first, so an entry is never visible without them
+        _atomic_write(entry.with_suffix(".deps"), _write_dependencies(dependencies))
+        _atomic_write(entry, write)
+
+        if self._grow(entry.stat().st_size - replaced):
+            self.evict()
+        return entry
+
+    def _grow(self, delta: int) -> bool:
+        """Add delta to this process's size estimate; return True if a scan is due."""
+        root = self.root.resolve()
+        with _sizes_lock:
+            known = _sizes.get(root)
+            if known is None or time.monotonic() - known[1] > _RESCAN_SECONDS:
+                return True
+            total = known[0] + delta
+            _sizes[root] = (total, known[1])
+        return total > self.max_bytes
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """Return (mtime, size, path) for every entry in the cache."""
+        entries: list[tuple[float, int, Path]] = []
+        if not self.root.exists():
+            return entries
+        for path in self.root.glob("*/*.ll"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self) -> int:
+        """Return the total size of cached IR in bytes."""
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> int:
+        """Remove least-recently-used entries until the size cap is met.
+
+        Returns
+        -------
+        int
+            Number of entries removed.
+        """
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            path.with_suffix(".deps").unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        with _sizes_lock:
+            _sizes[self.root.resolve()] = (total, time.monotonic())
+        if removed:
+            logger.info("Evicted %d IR cache entries", removed)
+        return removed
+
+    def clear(self) -> None:
+        """Remove every entry from the cache."""
+        for _, _, path in self._entries():
+            path.unlink(missing_ok=True)
+            path.with_suffix(".deps").unlink(missing_ok=True)
+        with _sizes_lock:
+            _sizes.pop(self.root.resolve(), None)
+
+
+def _atomic_write(path: Path, write: Callable[[str], object]) -> None:
+    """Write path through a temporary file in its directory and rename it into place."""
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    os.close(fd)
+    try:
+        write(tmp_name)
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+def _signature(path: Path) -> list[int] | None:
+    """Return (mtime in ns, size) of a file, or None if it does not exist."""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _write_dependencies(dependencies: Sequence[Path]) -> Callable[[str], object]:
+    """Return a writer for the dependency record of an entry."""
+    record = {str(path): _signature(path) for path in dependencies}
+    return lambda tmp_name: Path(tmp_name).write_text(json.dumps(record))
+
+
+def _changed_dependency(deps_path: Path) -> str | None:
+    """Return a dependency of an entry that changed since it was stored, or None.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the entry has no dependency record (it is being evicted or
+        written).
+    """
+    try:
+        record = json.loads(deps_path.read_text())
+    except json.JSONDecodeError:
+        return str(deps_path)
+    for name, signature in record.items():
+        if _signature(Path(name)) != signature:
+            return name
+    return None
+
+
+__all__ = [
+    "DEFAULT_MAX_BYTES",
+    "IRCache",
+    "compiler_version",
+    "default_cache_dir",
+]
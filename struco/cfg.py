@@ -1,18 +1,54 @@
 """IR extraction and CFG generation from C/C++ and Python source files.
 
 Uses Clang for C/C++, Codon for Python. Generates LLVM IR and extracts
-Control Flow Graphs via LLVM's opt tool.
+Control Flow Graphs via LLVM's opt tool, or in-process with the native
+IR parser in :mod:`struco.ir`.
 """
 
 from __future__ import annotations
 
+import contextlib
+import contextvars
+import functools
+import json
 import logging
 import os
 import re
+import shutil
 import subprocess
-from dataclasses import dataclass
+import tempfile
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
+from typing import TypeVar
+
+from struco.cache import IRCache
+from struco.codon import CodonFilter
+from struco.compdb import CompilationDatabase, CompileCommand
+from struco.dedup import MANIFEST_NAME, DedupEntry, group_by_shape, manifest_text
+from struco.formats import OUTPUT_FORMATS, STRUCTURED_FORMATS, serialize_cfg
+from struco.graph import FunctionCFG, StringPool
+from struco.ir import (
+    FunctionDefinition,
+    iter_function_definitions,
+    iter_text_definitions,
+    parse_ir,
+)
+from struco.pch import PchPlan, pch_dependencies, precompiled_header
+from struco.profile import span
+from struco.render import (
+    DEFAULT_LAYOUT_THRESHOLD,
+    DEFAULT_RENDER_TIMEOUT,
+    LARGE_GRAPH_LAYOUT,
+    RenderOptions,
+    layout_engine,
+    skeleton_dot,
+    summarize_dot,
+)
+from struco.scheduler import StageTimeoutError, run_tool
+from struco.symbols import SymbolFilter, file_stem, readable_stems
 
 logger = logging.getLogger(__name__)
 
@@ -34,7 +70,34 @@ EXTENSION_TO_LANGUAGE: dict[str, Language] = {
 }
 
 # Languages that use the C-family frontend (Clang)
-_C_FAMILY = {Language.C, Language.CPP, Language.CXX}
+C_FAMILY = {Language.C, Language.CPP, Language.CXX}
+
+# Languages whose IR function names are mangled
+_CPP_LANGUAGES = {Language.CPP, Language.CXX}
+
+_T = TypeVar("_T")
+
+# Clang diagnostics for a precompiled header it cannot use: stale inputs,
+# another compiler or configuration, a corrupt or missing file
+_PCH_ERROR = re.compile(
+    r"precompiled header|PCH file|AST file|module file (?:not found|is out of date)",
+    re.IGNORECASE,
+)
+
+# CFG construction engines: LLVM's opt tool, or the in-process IR parser
+ENGINES = ("opt", "native")
+
+# Named opt pass pipelines that canonicalize O0 IR before its CFGs are taken;
+# any other pipeline string is passed to ``opt -passes=`` as is
+OPT_PIPELINES = {
+    "none": "",
+    "mem2reg": "mem2reg",
+    "canonical": "mem2reg,simplifycfg",
+    "cleanup": "sroa,early-cse,instcombine,simplifycfg,adce",
+}
+
+# Written next to the outputs of runs with an opt pipeline
+PROVENANCE_NAME = "provenance.json"
 
 
 @dataclass(frozen=True)
@@ -44,13 +107,19 @@ class IRResult:
     Attributes
     ----------
     ir_path : Path
-        Absolute path to the generated .ll file.
+        Absolute path to the generated .ll file. When the IR was kept in
+        memory this is where it would have been written; CFG outputs are
+        still placed relative to it.
     language : Language
         The source language that produced this IR.
+    ir_text : str or None
+        The IR module text if it was not written to ir_path (see
+        ``keep_ir`` in :func:`extract_ir`), otherwise None.
     """
 
     ir_path: Path
     language: Language
+    ir_text: str | None = field(default=None, repr=False)
 
 
 @dataclass(frozen=True)
@@ -69,7 +138,34 @@ class FrontendConfig:
     args: list[str]
 
 
-def _get_frontend_config(language: Language) -> FrontendConfig:
+def scratch_file(dest: Path) -> Path:
+    """Create a unique temporary file next to dest for an atomic write.
+
+    Write to the returned path, then ``os.replace`` it onto dest so that
+    concurrent readers never see a partially written artifact.
+    """
+    fd, name = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.", suffix=".tmp")
+    os.close(fd)
+    return Path(name)
+
+
+def atomic_write_text(dest: Path, text: str) -> None:
+    """Write text to dest atomically."""
+    atomic_write_bytes(dest, text.encode())
+
+
+def atomic_write_bytes(dest: Path, data: bytes) -> None:
+    """Write bytes to dest atomically."""
+    tmp = scratch_file(dest)
+    try:
+        tmp.write_bytes(data)
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def get_frontend_config(language: Language) -> FrontendConfig:
     """Return the compiler command and flags for a given language.
 
     Parameters
@@ -101,14 +197,226 @@ def _get_frontend_config(language: Language) -> FrontendConfig:
     raise ValueError(msg)
 
 
+def frontend_config(
+    language: Language, compile_command: CompileCommand | None = None
+) -> FrontendConfig:
+    """Return the frontend for a language with a file's compile flags appended.
+
+    compile_command only applies to C and C++ (see :mod:`struco.compdb`).
+    """
+    config = get_frontend_config(language)
+    if compile_command is None or language not in C_FAMILY:
+        return config
+    return FrontendConfig(config.command, [*config.args, *compile_command.frontend_args()])
+
+
+def _escape_dep(path: Path | str) -> str:
+    return str(path).replace(" ", "\\ ")
+
+
+def _extend_depfile(
+    depfile: Path, source_path: Path, pch_path: Path | None, compile_command: CompileCommand | None
+) -> None:
+    """Add the headers of a PCH and the compilation database to a depfile.
+
+    Headers read from a PCH are not listed by the compiler, and the flags
+    from a compilation database change the IR as much as a header does.
+    """
+    rules = []
+    if pch_path is not None:
+        rules.append(pch_dependencies(pch_path))
+    if compile_command is not None and compile_command.database is not None:
+        rules.append(f"{_escape_dep(source_path)}: {_escape_dep(compile_command.database)}\n")
+    if rules:
+        with open(depfile, "a") as f:
+            f.write("\n" + "".join(rules))
+
+
+def _with_pch_fallback(
+    attempts: list[FrontendConfig],
+    compile_one: Callable[[FrontendConfig], _T],
+    source_path: Path,
+    pch_path: Path | None,
+) -> tuple[_T, FrontendConfig]:
+    """Compile with each frontend config in turn until one succeeds.
+
+    All but the last config use a precompiled header. Only a failure caused
+    by the PCH (see :data:`_PCH_ERROR`) is retried without it, and the
+    rejected PCH is removed so the next file that needs it builds it again;
+    any other error, such as a syntax error in the source, is raised as is.
+    """
+    for config in attempts[:-1]:
+        try:
+            return compile_one(config), config
+        except RuntimeError as exc:
+            message = str(exc)
+            if _PCH_ERROR.search(message) is None and (
+                pch_path is None or str(pch_path) not in message
+            ):
+                raise
+            logger.warning(
+                "Precompiled header %s rejected for %s; removing it and compiling without it",
+                pch_path,
+                source_path.name,
+            )
+            if pch_path is not None:
+                pch_path.unlink(missing_ok=True)
+    return compile_one(attempts[-1]), attempts[-1]
+
+
+def frontend_command(
+    config: FrontendConfig, source_path: Path, output_file: Path | str, depfile: Path | None
+) -> list[str]:
+    """Return the compiler command line for one source file.
+
+    output_file may be ``"-"`` to have the compiler write to stdout.
+    """
+    cmd = [config.command, *config.args, str(source_path), "-o", str(output_file)]
+    if depfile is not None:
+        cmd.extend(["-MD", "-MF", str(depfile)])
+    return cmd
+
+
+def check_frontend(source_path: Path, returncode: int, stderr: str) -> None:
+    """Raise RuntimeError if the compiler failed; log its warnings otherwise."""
+    if returncode != 0:
+        logger.error("Frontend stderr: %s", stderr)
+        msg = f"Frontend compilation failed for {source_path}: {stderr}"
+        raise RuntimeError(msg)
+
+    if stderr:
+        logger.warning("Frontend warnings: %s", stderr)
+
+
+def ir_output_path(source_path: Path, output_root: str | Path | None = None) -> Path:
+    """Return where the IR of a source file is written.
+
+    E.g. ``/path/to/hello.c`` -> ``/path/to/hello_c_ll_files/hello_c.ll``.
+    With an output_root, the source's absolute directory is mirrored below
+    it instead: ``<output_root>/path/to/hello_c_ll_files/hello_c.ll``.
+    """
+    stem = source_path.stem
+    ext = source_path.suffix.lstrip(".")
+    directory = source_path.parent
+    if output_root is not None:
+        directory = Path(output_root).resolve() / directory.relative_to(directory.anchor)
+    return directory / f"{stem}_{ext}_ll_files" / f"{stem}_{ext}.ll"
+
+
+def restore_cached_ir(cache: IRCache, key: str, dest: Path) -> bool:
+    """Copy cached IR onto dest; return False on a cache miss.
+
+    An entry another process evicts between the lookup and the copy is a
+    miss as well.
+    """
+    cached = cache.get(key)
+    if cached is None:
+        return False
+    tmp = scratch_file(dest)
+    try:
+        shutil.copyfile(cached, tmp)
+    except FileNotFoundError:
+        tmp.unlink(missing_ok=True)
+        logger.debug("IR cache entry %s was evicted before it was read", key[:12])
+        return False
+    os.replace(tmp, dest)
+    logger.info("IR restored from cache to %s", dest)
+    return True
+
+
+def _cached_ir_result(
+    cache: IRCache, key: str, dest: Path, language: Language, keep_ir: bool
+) -> IRResult | None:
+    """Return the result for cached IR, or None on a cache miss."""
+    if keep_ir:
+        if restore_cached_ir(cache, key, dest):
+            return IRResult(ir_path=dest, language=language)
+        return None
+    cached = cache.get(key)
+    if cached is None:
+        return None
+    try:
+        ir_text = cached.read_text()
+    except FileNotFoundError:
+        logger.debug("IR cache entry %s was evicted before it was read", key[:12])
+        return None
+    return IRResult(ir_path=dest, language=language, ir_text=ir_text)
+
+
+@contextlib.contextmanager
+def private_depfile(needed: bool) -> Iterator[Path | None]:
+    """Yield a temporary depfile path if needed, removing it afterwards."""
+    if not needed:
+        yield None
+        return
+    fd, name = tempfile.mkstemp(prefix="struco-", suffix=".d")
+    os.close(fd)
+    try:
+        yield Path(name)
+    finally:
+        os.unlink(name)
+
+
+def cache_dependencies(
+    depfile: Path | None, source_path: Path, compile_command: CompileCommand | None
+) -> list[Path]:
+    """Return the files a cache entry depends on besides its source, from a depfile.
+
+    Relative paths are relative to the directory the compiler ran in. The
+    compilation database is left out: the file's own flags are part of the
+    cache key, and edits to other entries do not change its IR.
+    """
+    from struco.incremental import parse_depfile
+
+    if depfile is None:
+        return []
+    try:
+        text = depfile.read_text()
+    except OSError:
+        logger.debug("No dependency file for %s; caching its IR without headers", source_path)
+        return []
+    base = compile_command.directory if compile_command is not None else Path.cwd()
+    deps = dict.fromkeys(base / path for path in parse_depfile(text))
+    deps.pop(source_path, None)
+    if compile_command is not None and compile_command.database is not None:
+        deps.pop(compile_command.database, None)
+    return list(deps)
+
+
 def _run_frontend(
     source_path: Path,
     language: Language,
+    cache: IRCache | None = None,
+    depfile: Path | None = None,
+    output_root: Path | None = None,
+    keep_ir: bool = True,
+    compile_command: CompileCommand | None = None,
+    pch: PchPlan | None = None,
 ) -> IRResult:
     """Compile a source file to LLVM IR using the appropriate frontend.
 
     Runs the compiler subprocess, places the .ll output in a dedicated
-    directory alongside the source file, and returns the result.
+    directory alongside the source file (or below output_root), and returns
+    the result. When a cache is given and already holds IR for the same
+    source, compiler and flags, the compiler is not run at all.
+
+    The compiler writes to a unique temporary file that is then renamed
+    onto the final path, so concurrent runs on the same source never see
+    each other's partial output. Without keep_ir nothing is written next to
+    the source: the IR is read from the compiler's stdout and returned in
+    :attr:`IRResult.ir_text`.
+
+    When a depfile is requested, C and C++ sources are compiled with
+    ``-MD -MF depfile`` so the headers they include are recorded. A cache
+    hit cannot report those dependencies, so the cache is only filled,
+    never read, in that case. Without one, C and C++ sources are compiled
+    with a temporary depfile when a cache is given, so the cache entry
+    records the headers and stops matching once one of them changes.
+
+    C and C++ files are compiled with the flags of their compile_command,
+    and with a precompiled header when the pch plan has one for their
+    leading includes (see :mod:`struco.pch`). The headers in the PCH and
+    the compilation database are added to the depfile.
 
     Parameters
     ----------
@@ -116,6 +424,19 @@ def _run_frontend(
         Absolute path to the source file.
     language : Language
         The source language.
+    cache : IRCache or None
+        Optional IR cache to consult before compiling and to fill after.
+    depfile : Path or None
+        Where to write a Makefile-style dependency file (C/C++ only).
+    output_root : Path or None
+        Directory to place the IR directory under instead of the source's
+        directory (see :func:`ir_output_path`).
+    keep_ir : bool
+        Write the .ll file. If False, the IR is only kept in memory.
+    compile_command : CompileCommand or None
+        The file's entry from a compilation database (C/C++ only).
+    pch : PchPlan or None
+        Precompiled headers to use (C/C++ only).
 
     Returns
     -------
@@ -133,45 +454,128 @@ def _run_frontend(
         msg = f"Source file not found: {source_path}"
         raise FileNotFoundError(msg)
 
-    config = _get_frontend_config(language)
-
-    # Build output path: e.g. /path/to/hello_c.ll
-    stem = source_path.stem
+    config = frontend_config(language, compile_command)
+
+    dest = ir_output_path(source_path, output_root)
+    if keep_ir:
+        dest.parent.mkdir(parents=True, exist_ok=True)
+    if language not in C_FAMILY:
+        depfile = None
+
+    cache_key = None
+    if cache is not None:
+        cache_key = cache.key(source_path.read_bytes(), config.command, config.args, source_path)
+        if depfile is None:
+            with span("cache", source_path.name):
+                hit = _cached_ir_result(cache, cache_key, dest, language, keep_ir)
+            if hit is not None:
+                return hit
+
+    # Without a requested depfile, a private one records the headers for the cache entry
+    with private_depfile(cache is not None and depfile is None and language in C_FAMILY) as deps:
+        depfile = depfile if deps is None else deps
+        # The PCH only changes how fast the IR is produced, so it is not part of the cache key
+        attempts = [config]
+        pch_path = None
+        if pch is not None and language in C_FAMILY:
+            pch_path = precompiled_header(
+                pch, config.command, config.args, language.value, source_path
+            )
+            if pch_path is not None:
+                pch_args = [*config.args, "-include-pch", str(pch_path)]
+                attempts.insert(0, FrontendConfig(config.command, pch_args))
+
+        if not keep_ir:
+            with span("frontend", source_path.name):
+                ir_text, used = _with_pch_fallback(
+                    attempts,
+                    lambda attempt: _compile_to_text(attempt, source_path, language, depfile),
+                    source_path,
+                    pch_path,
+                )
+            if depfile is not None:
+                _extend_depfile(
+                    depfile, source_path, pch_path if used is not config else None, compile_command
+                )
+            if cache is not None and cache_key is not None:
+                cache.put_text(
+                    cache_key,
+                    ir_text,
+                    cache_dependencies(depfile, source_path, compile_command),
+                )
+            logger.info("IR of %s kept in memory (%d bytes)", source_path.name, len(ir_text))
+            return IRResult(ir_path=dest, language=language, ir_text=ir_text)
+
+        output_file = scratch_file(dest)
+
+        def compile_to_file(attempt: FrontendConfig) -> None:
+            cmd = frontend_command(attempt, source_path, output_file, depfile)
+            logger.info("Running frontend: %s", " ".join(cmd))
+            result = run_tool(cmd, "frontend", capture_output=True, text=True)
+            check_frontend(source_path, result.returncode, result.stderr)
+
+        try:
+            with span("frontend", source_path.name):
+                _, used = _with_pch_fallback(attempts, compile_to_file, source_path, pch_path)
+            os.replace(output_file, dest)
+        finally:
+            output_file.unlink(missing_ok=True)
+        if depfile is not None:
+            _extend_depfile(
+                depfile, source_path, pch_path if used is not config else None, compile_command
+            )
+
+        if cache is not None and cache_key is not None:
+            cache.put(cache_key, dest, cache_dependencies(depfile, source_path, compile_command))
+
+        logger.info("IR written to %s", dest)
+        return IRResult(ir_path=dest, language=language)
+
+
+def _compile_to_text(
+    config: FrontendConfig, source_path: Path, language: Language, depfile: Path | None
+) -> str:
+    """Run the frontend and return the IR text without writing it next to the source.
+
+    Clang streams the module to stdout (``-o -``). Codon cannot, so its
+    output goes to a private temporary directory and is read back.
+    """
+    if language in C_FAMILY:
+        cmd = frontend_command(config, source_path, "-", depfile)
+        logger.info("Running frontend: %s", " ".join(cmd))
+        result = run_tool(cmd, "frontend", capture_output=True, text=True)
+        check_frontend(source_path, result.returncode, result.stderr)
+        return result.stdout
+
+    with tempfile.TemporaryDirectory(prefix="struco-") as scratch:
+        output_file = Path(scratch) / f"{source_path.stem}.ll"
+        cmd = frontend_command(config, source_path, output_file, depfile)
+        logger.info("Running frontend: %s", " ".join(cmd))
+        result = run_tool(cmd, "frontend", capture_output=True, text=True)
+        check_frontend(source_path, result.returncode, result.stderr)
+        return output_file.read_text()
+
+
+def source_language(source_path: Path) -> Language:
+    """Return the language of a source file from its extension."""
     ext = source_path.suffix.lstrip(".")
-    output_file = source_path.with_name(f"{stem}_{ext}.ll")
-
-    # Build command
-    cmd: list[str] = [config.command, *config.args, str(source_path), "-o", str(output_file)]
-
-    logger.info("Running frontend: %s", " ".join(cmd))
-
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        check=False,
-    )
-
-    if result.returncode != 0:
-        logger.error("Frontend stderr: %s", result.stderr)
-        msg = f"Frontend compilation failed for {source_path}: {result.stderr}"
-        raise RuntimeError(msg)
-
-    if result.stderr:
-        logger.warning("Frontend warnings: %s", result.stderr)
-
-    # Move .ll file into a dedicated directory
-    ll_dir = source_path.parent / f"{stem}_{ext}_ll_files"
-    ll_dir.mkdir(parents=True, exist_ok=True)
-
-    dest = ll_dir / output_file.name
-    output_file.rename(dest)
-
-    logger.info("IR written to %s", dest)
-    return IRResult(ir_path=dest, language=language)
+    language = EXTENSION_TO_LANGUAGE.get(ext)
+    if language is None:
+        supported = ", ".join(sorted(EXTENSION_TO_LANGUAGE.keys()))
+        msg = f"Unsupported file extension '.{ext}'. Supported: {supported}"
+        raise ValueError(msg)
+    return language
 
 
-def extract_ir(file_path: str | Path) -> IRResult:
+def extract_ir(
+    file_path: str | Path,
+    cache: IRCache | None = None,
+    depfile: str | Path | None = None,
+    output_root: str | Path | None = None,
+    keep_ir: bool = True,
+    compile_db: CompilationDatabase | None = None,
+    pch: PchPlan | None = None,
+) -> IRResult:
     """Extract LLVM IR from a source file.
 
     Dispatches to the appropriate compiler frontend based on file extension.
@@ -180,6 +584,26 @@ def extract_ir(file_path: str | Path) -> IRResult:
     ----------
     file_path : str or Path
         Path to the source file (C, C++, or Python).
+    cache : IRCache or None
+        Optional IR cache; on a hit the compiler is skipped.
+    depfile : str or Path or None
+        If given, C/C++ header dependencies are written there in Makefile
+        syntax (see :func:`struco.incremental.parse_depfile`).
+    output_root : str or Path or None
+        Write the IR (and, through :func:`extract_cfg_from_ir`, the CFGs)
+        below this directory instead of next to the source, e.g. for
+        read-only checkouts. See :func:`ir_output_path`.
+    keep_ir : bool
+        If False, stream the IR from the compiler's stdout into
+        :attr:`IRResult.ir_text` instead of writing a .ll file; pass it on
+        as ``ir_text`` to :func:`extract_cfg_from_ir`.
+    compile_db : CompilationDatabase or None
+        Compile C/C++ files with their flags from a ``compile_commands.json``
+        (see :func:`struco.compdb.load_compilation_database`). Files not
+        in the database use the default flags.
+    pch : PchPlan or None
+        Precompiled headers for the leading includes of C/C++ files (see
+        :func:`struco.pch.plan_pch`).
 
     Returns
     -------
@@ -196,153 +620,432 @@ def extract_ir(file_path: str | Path) -> IRResult:
         If compilation fails.
     """
     source_path = Path(file_path).resolve()
-    ext = source_path.suffix.lstrip(".")
+    return _run_frontend(
+        source_path,
+        source_language(source_path),
+        cache=cache,
+        depfile=Path(depfile) if depfile is not None else None,
+        output_root=Path(output_root) if output_root is not None else None,
+        keep_ir=keep_ir,
+        compile_command=compile_db.get(source_path) if compile_db is not None else None,
+        pch=pch,
+    )
 
-    language = EXTENSION_TO_LANGUAGE.get(ext)
-    if language is None:
-        supported = ", ".join(sorted(EXTENSION_TO_LANGUAGE.keys()))
-        msg = f"Unsupported file extension '.{ext}'. Supported: {supported}"
-        raise ValueError(msg)
 
-    return _run_frontend(source_path, language)
+def get_function_names(
+    ir_path: Path,
+    language: Language,
+    ir_text: str | None = None,
+    symbol_filter: SymbolFilter | None = None,
+) -> list[str]:
+    """Extract function names defined in an LLVM IR file.
 
+    The file is scanned in a single streaming pass over its ``define``
+    lines (see :func:`struco.ir.iter_function_definitions`).
 
-# Regex patterns for extracting function names from LLVM IR
-_FUNC_PATTERN_SIMPLE = re.compile(r"define\s+(?:\w+\s+)*@(\w+)\s*\(")
+    Parameters
+    ----------
+    ir_path : Path
+        Path to the .ll file.
+    language : Language
+        The source language. For C++, compiler-internal functions and
+        functions in excluded namespaces are filtered out; for Python, the
+        Codon runtime and standard library (see :mod:`struco.codon`).
+    ir_text : str or None
+        The module text, if it is held in memory instead of at ir_path.
+    symbol_filter : SymbolFilter or None
+        Namespace rules for C++ functions, or module rules for Python ones.
+        Defaults to dropping the standard library and Boost (see
+        :mod:`struco.symbols`), or the Codon standard library.
 
-_FUNC_PATTERN_CPP = re.compile(
-    r"define\s+"
-    r"(?:(?:internal|private|available_externally|linkonce"
-    r"|weak|common|appending|extern_weak|linkonce_odr|weak_odr|external)\s+)?"
-    r"(?:(?:dso_local|dso_preemptable)\s+)?"
-    r"(?:\w+\s+)*"
-    r"@([\w$.]+)\s*\("
-    r"[^)]*\)"
-    r"(?:\s*(?:#\d+|![^\n]+|\{\s*[^}]*\}|\[[^\]]+\]|\w+\s*\([^)]*\)))*"
-)
+    Returns
+    -------
+    list[str]
+        Function names found in the IR.
 
+    Raises
+    ------
+    FileNotFoundError
+        If the IR file does not exist.
+    """
+    if ir_text is None and not ir_path.exists():
+        msg = f"IR file not found: {ir_path}"
+        raise FileNotFoundError(msg)
 
-# Patterns for C++ stdlib / compiler-internal mangled names to exclude from CFGs
-_CPP_STDLIB_PREFIXES = (
-    "_ZNSt",     # std:: namespace members
-    "_ZNKSt",    # const std:: namespace members
-    "_ZSt",      # std:: free functions
-    "_ZTI",      # typeinfo
-    "_ZTS",      # typeinfo name
-    "_ZTV",      # vtable
-    "_ZThn",     # thunks
-    "_ZN9__gnu_cxx",  # __gnu_cxx:: namespace
-)
+    with span("get_function_names", ir_path.name):
+        if language == Language.PYTHON:
+            # The Codon filter also reads function bodies, so load the module once
+            data = ir_text.encode() if ir_text is not None else ir_path.read_bytes()
+            definitions = list(iter_text_definitions(data))
+        else:
+            definitions = list(_definitions(ir_path, ir_text))
+        functions = [definition.name for definition in definitions]
+
+    if language in _CPP_LANGUAGES:
+        with span("filter_symbols", ir_path.name):
+            filtered = (symbol_filter or SymbolFilter()).select(functions)
+    elif language == Language.PYTHON:
+        with span("filter_symbols", ir_path.name):
+            filtered = _codon_filter(symbol_filter).select(definitions, data)
+    else:
+        logger.info("Found %d functions in %s", len(functions), ir_path.name)
+        return functions
 
-_CPP_INTERNAL_NAMES = {
-    "__clang_call_terminate",
-    "__cxx_global_var_init",
-    "__cxa_atexit",
-    "_GLOBAL__sub_I_",
-}
+    logger.info(
+        "Found %d functions (%d user-defined) in %s",
+        len(functions),
+        len(filtered),
+        ir_path.name,
+    )
+    return filtered
 
 
-def _is_cpp_internal_function(name: str) -> bool:
-    """Return True if the function name belongs to the C++ stdlib or compiler internals."""
-    if any(name.startswith(prefix) for prefix in _CPP_STDLIB_PREFIXES):
-        return True
-    return any(name.startswith(internal) for internal in _CPP_INTERNAL_NAMES)
+def _codon_filter(symbol_filter: SymbolFilter | None) -> CodonFilter:
+    """Return the Codon filter with the module rules of a symbol filter."""
+    if symbol_filter is None:
+        return CodonFilter()
+    return CodonFilter(symbol_filter.include, symbol_filter.exclude)
 
 
-def _get_function_pattern(language: Language) -> re.Pattern[str]:
-    """Return the regex pattern for function definitions in the given language's IR."""
-    if language in {Language.CPP, Language.CXX}:
-        return _FUNC_PATTERN_CPP
-    return _FUNC_PATTERN_SIMPLE
+def _definitions(ir_path: Path, ir_text: str | None) -> Iterator[FunctionDefinition]:
+    """Yield the definitions of an IR module held in memory or on disk."""
+    if ir_text is not None:
+        return iter_text_definitions(ir_text)
+    return iter_function_definitions(ir_path)
 
 
-def get_function_names(ir_path: Path, language: Language) -> list[str]:
-    """Extract function names defined in an LLVM IR file.
+def select_functions(
+    ir_path: Path,
+    language: Language,
+    functions: Iterable[str] | None,
+    ir_text: str | None = None,
+) -> list[str]:
+    """Return the names of the functions whose CFGs should be generated.
+
+    Without an explicit selection these are the user-defined functions from
+    :func:`get_function_names`. An explicit selection is matched against all
+    definitions in the module, so internal functions can be requested too.
+    """
+    if functions is None:
+        return get_function_names(ir_path, language, ir_text)
+
+    wanted = set(functions)
+    defined = [definition.name for definition in _definitions(ir_path, ir_text)]
+    missing = wanted.difference(defined)
+    if missing:
+        logger.warning(
+            "Requested functions not defined in %s: %s",
+            ir_path.name,
+            ", ".join(sorted(missing)),
+        )
+    return [name for name in defined if name in wanted]
+
+
+def build_cfgs(
+    ir_path: str | Path,
+    language: Language | str = Language.C,
+    functions: Iterable[str] | None = None,
+    pool: StringPool | None = None,
+    ir_text: str | None = None,
+) -> list[FunctionCFG]:
+    """Build in-memory CFGs for the user-defined functions of an IR file.
+
+    Parses the IR in-process, so no ``opt`` binary is needed. The graphs are
+    compact array-backed :class:`~struco.graph.FunctionCFG` objects.
 
     Parameters
     ----------
-    ir_path : Path
+    ir_path : str or Path
         Path to the .ll file.
-    language : Language
-        The source language (affects regex pattern for C++ name mangling).
+    language : Language or str
+        Source language (affects which functions count as user-defined).
+    functions : iterable of str or None
+        Explicit function names to build. Defaults to all user-defined
+        functions.
+    pool : StringPool or None
+        Pool to intern labels and instructions into; share one across calls
+        to deduplicate strings over a corpus. Defaults to a new pool per
+        call.
+    ir_text : str or None
+        The module text, if it is held in memory (see
+        :attr:`IRResult.ir_text`); ir_path is then only used for naming.
 
     Returns
     -------
-    list[str]
-        Function names found in the IR.
+    list[FunctionCFG]
+        One CFG per selected function, in module order.
 
     Raises
     ------
     FileNotFoundError
         If the IR file does not exist.
     """
-    if not ir_path.exists():
-        msg = f"IR file not found: {ir_path}"
-        raise FileNotFoundError(msg)
+    ir_path = Path(ir_path).resolve()
+    if isinstance(language, str):
+        language = EXTENSION_TO_LANGUAGE.get(language, Language.C)
 
-    pattern = _get_function_pattern(language)
-    content = ir_path.read_text()
-    functions = pattern.findall(content)
+    function_names = set(select_functions(ir_path, language, functions, ir_text))
+    with span("parse", ir_path.name):
+        text = ir_text if ir_text is not None else ir_path.read_text()
+        cfgs = parse_ir(text, functions=function_names, pool=pool)
+    logger.info("Built %d CFGs in-process from %s", len(cfgs), ir_path.name)
+    return cfgs
 
-    if language in {Language.CPP, Language.CXX}:
-        filtered = [f for f in functions if not _is_cpp_internal_function(f)]
-        logger.info(
-            "Found %d functions (%d user-defined) in %s",
-            len(functions),
-            len(filtered),
-            ir_path.name,
-        )
-        return filtered
 
-    logger.info("Found %d functions in %s", len(functions), ir_path.name)
-    return functions
+def slice_command(ir_path: Path | str, function_names: Sequence[str], dest: Path) -> list[str]:
+    """Return the llvm-extract command that slices function_names out of ir_path.
+
+    ir_path may be ``"-"`` to read the module from stdin.
+    """
+    return [
+        "llvm-extract",
+        "-S",
+        *(f"--func={name}" for name in function_names),
+        str(ir_path),
+        "-o",
+        str(dest),
+    ]
+
+
+def _slice_module(
+    ir_path: Path, function_names: Sequence[str], dest: Path, ir_text: str | None = None
+) -> bool:
+    """Write a copy of a module that keeps only the given function bodies.
+
+    Uses ``llvm-extract``; every other function becomes a declaration, so
+    opt never visits it. Returns False if slicing is not possible, in which
+    case callers should fall back to the full module.
+
+    Parameters
+    ----------
+    ir_path : Path
+        The .ll module to slice.
+    function_names : sequence of str
+        Functions whose definitions are kept.
+    dest : Path
+        Where to write the sliced module.
+    ir_text : str or None
+        The module text, piped to llvm-extract instead of reading ir_path.
+
+    Returns
+    -------
+    bool
+        True if the sliced module was written.
+    """
+    cmd = slice_command("-" if ir_text is not None else ir_path, function_names, dest)
+    logger.info("Slicing %d functions out of %s", len(function_names), ir_path.name)
 
+    try:
+        with span("slice", ir_path.name):
+            result = run_tool(cmd, "slice", input=ir_text, capture_output=True, text=True)
+    except FileNotFoundError:
+        logger.debug("llvm-extract not found; running opt on the full module")
+        return False
+    except StageTimeoutError as exc:
+        logger.warning("%s; running opt on the full module", exc)
+        return False
+
+    if result.returncode != 0:
+        logger.warning("llvm-extract failed, running opt on the full module: %s", result.stderr)
+        return False
+    return True
 
-def _run_opt(ir_path: Path) -> None:
+
+def _run_opt(ir_path: Path, cwd: Path, ir_text: str | None = None) -> None:
     """Run LLVM opt to generate .dot CFG files.
 
-    The opt tool writes .dot files to the current working directory.
-    We run it with cwd set to a temporary location to control output.
+    The opt tool writes .dot files to its working directory, so it is run
+    with cwd set to a private scratch directory to control output.
 
     Parameters
     ----------
     ir_path : Path
         Absolute path to the .ll file.
+    cwd : Path
+        Directory that receives the .dot files.
+    ir_text : str or None
+        The module text, piped to opt's stdin instead of reading ir_path.
 
     Raises
     ------
     RuntimeError
         If opt fails.
     """
-    cmd = ["opt", "-passes=dot-cfg", "-disable-output", str(ir_path)]
+    cmd = opt_command("-" if ir_text is not None else ir_path)
     logger.info("Running opt: %s", " ".join(cmd))
 
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        check=False,
-    )
+    with span("opt", ir_path.name):
+        result = run_tool(cmd, "opt", input=ir_text, capture_output=True, text=True, cwd=cwd)
+    check_opt(ir_path, result.returncode, result.stderr)
 
-    # opt writes "Writing '<filename>'..." to stderr on success
+
+def opt_command(ir_path: Path | str) -> list[str]:
+    """Return the opt command that writes .dot CFGs for ir_path (``"-"`` for stdin)."""
+    return ["opt", "-passes=dot-cfg", "-disable-output", str(ir_path)]
+
+
+def resolve_opt_pipeline(pipeline: str | None) -> str:
+    """Return the pass pipeline for a preset name (see :data:`OPT_PIPELINES`) or pipeline.
+
+    None and ``"none"`` give an empty string, meaning no pipeline.
+    """
+    if pipeline is None:
+        return ""
+    return OPT_PIPELINES.get(pipeline, pipeline.strip())
+
+
+def _optimize_ir(ir_path: Path, pipeline: str, ir_text: str | None = None) -> str:
+    """Run an opt pass pipeline over a module and return the resulting IR text.
+
+    Raises
+    ------
+    RuntimeError
+        If opt is not installed or rejects the pipeline or the module.
+    """
+    cmd = ["opt", "-S", f"-passes={pipeline}", "-o", "-"]
+    cmd.append("-" if ir_text is not None else str(ir_path))
+    logger.info("Running opt pipeline '%s' on %s", pipeline, ir_path.name)
+    try:
+        with span("opt_pipeline", ir_path.name):
+            result = run_tool(cmd, "opt", input=ir_text, capture_output=True, text=True)
+    except FileNotFoundError as exc:
+        msg = "Running an opt pipeline requires LLVM opt on PATH"
+        raise RuntimeError(msg) from exc
     if result.returncode != 0:
-        logger.error("opt stderr: %s", result.stderr)
-        msg = f"opt failed for {ir_path}: {result.stderr}"
+        msg = f"opt pipeline '{pipeline}' failed for {ir_path}: {result.stderr}"
+        raise RuntimeError(msg)
+    return result.stdout
+
+
+@functools.cache
+def _opt_version() -> str | None:
+    """Return opt's ``LLVM version ...`` line, or None if it cannot be determined."""
+    try:
+        result = subprocess.run(["opt", "--version"], capture_output=True, text=True, check=False)
+    except FileNotFoundError:
+        return None
+    for line in result.stdout.splitlines():
+        if "LLVM version" in line:
+            return line.strip()
+    return None
+
+
+def _record_provenance(
+    output_dir: Path, outputs: Sequence[Path], ir_path: Path, pipeline: str, engine: str
+) -> None:
+    """Record in output_dir's provenance file which pipeline produced each output.
+
+    Entries of outputs not produced by this run are kept. Nothing is written
+    for a run without a pipeline into a directory that has no record yet.
+    """
+    path = output_dir / PROVENANCE_NAME
+    try:
+        doc = json.loads(path.read_text())
+    except (FileNotFoundError, ValueError):
+        if not pipeline:
+            return
+        doc = {"artifacts": {}}
+    entry = {
+        "ir": str(ir_path),
+        "pipeline": pipeline,
+        "opt": _opt_version() if pipeline else None,
+        "engine": engine,
+    }
+    for output in outputs:
+        doc["artifacts"][os.path.relpath(output, output_dir)] = entry
+    output_dir.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(path, json.dumps(doc, indent=1, sort_keys=True) + "\n")
+
+
+def read_provenance(output_dir: str | Path) -> dict[str, dict[str, str | None]]:
+    """Return the provenance entry of every recorded output in a directory.
+
+    Keys are output paths relative to output_dir; each entry holds the
+    ``pipeline`` (empty for none), the ``opt`` version that ran it, the
+    ``engine`` and the ``ir`` module. Returns an empty dict if nothing was
+    recorded.
+    """
+    try:
+        doc = json.loads((Path(output_dir) / PROVENANCE_NAME).read_text())
+    except FileNotFoundError:
+        return {}
+    return doc["artifacts"]
+
+
+def check_opt(ir_path: Path, returncode: int, stderr: str) -> None:
+    """Raise RuntimeError if opt failed; log anything but progress lines otherwise."""
+    # opt writes "Writing '<filename>'..." to stderr on success
+    if returncode != 0:
+        logger.error("opt stderr: %s", stderr)
+        msg = f"opt failed for {ir_path}: {stderr}"
         raise RuntimeError(msg)
 
-    if result.stderr:
-        non_writing = [line for line in result.stderr.splitlines() if "Writing" not in line]
+    if stderr:
+        non_writing = [line for line in stderr.splitlines() if "Writing" not in line]
         if non_writing:
             logger.warning("opt warnings: %s", "\n".join(non_writing))
 
 
+def rendered_path(dot_path: Path, output_dir: Path, fmt: str) -> Path:
+    """Return the image/PDF path for a .dot file."""
+    # .dot filenames from opt look like: .funcname.dot
+    # Extract function name: strip leading dot and .dot extension
+    func_name = dot_path.stem.lstrip(".")
+    return output_dir / f"{func_name}.{fmt}"
+
+
+def dot_command(dot_path: Path, output_path: Path, fmt: str, layout: str = "dot") -> list[str]:
+    """Return the Graphviz command that renders dot_path to output_path."""
+    cmd = ["dot", f"-T{fmt}", str(dot_path), "-o", str(output_path)]
+    if layout != "dot":
+        cmd.append(f"-K{layout}")
+    return cmd
+
+
+def _run_dot(
+    dot_path: Path, output_path: Path, fmt: str, layout: str, timeout: float | None
+) -> subprocess.CompletedProcess[str]:
+    """Run Graphviz; raises StageTimeoutError after killing it on timeout."""
+    return run_tool(
+        dot_command(dot_path, output_path, fmt, layout),
+        "render",
+        timeout=timeout,
+        capture_output=True,
+        text=True,
+    )
+
+
+def _render_skeleton(
+    dot_path: Path, output_path: Path, fmt: str, timeout: float | None
+) -> subprocess.CompletedProcess[str] | None:
+    """Render only the structure of dot_path, or return None if that times out too."""
+    skeleton = scratch_file(dot_path)
+    try:
+        skeleton.write_text(skeleton_dot(dot_path.read_text()))
+        with span("render_skeleton", output_path.stem):
+            return _run_dot(skeleton, output_path, fmt, LARGE_GRAPH_LAYOUT, timeout)
+    except StageTimeoutError:
+        return None
+    finally:
+        skeleton.unlink(missing_ok=True)
+
+
 def _convert_dot(
     dot_path: Path,
     output_dir: Path,
     fmt: str = "png",
+    options: RenderOptions | None = None,
 ) -> Path | None:
     """Convert a .dot file to PNG or PDF using Graphviz dot.
 
+    Graphviz renders into a temporary file that is renamed into place only
+    on success. With options.summarize the graph is rendered from a
+    temporary copy rewritten by :func:`struco.render.summarize_dot`, so
+    the .dot file keeps the full structure; graphs above
+    options.layout_threshold nodes are laid out with ``sfdp``; and a render
+    that exceeds options.timeout is killed and replaced by a render of the
+    graph's structure only (:func:`struco.render.skeleton_dot`).
+
     Parameters
     ----------
     dot_path : Path
@@ -351,40 +1054,469 @@ def _convert_dot(
         Directory to write the output image/PDF.
     fmt : str
         Output format, either "png" or "pdf".
+    options : RenderOptions or None
+        Summarization, layout and timeout settings. Defaults to
+        ``RenderOptions()``.
 
     Returns
     -------
     Path or None
         Path to the output file, or None if conversion failed.
     """
-    # .dot filenames from opt look like: .funcname.dot
-    # Extract function name: strip leading dot and .dot extension
-    func_name = dot_path.stem.lstrip(".")
-    output_path = output_dir / f"{func_name}.{fmt}"
-
-    cmd = ["dot", f"-T{fmt}", str(dot_path), "-o", str(output_path)]
+    options = options or RenderOptions()
+    output_path = rendered_path(dot_path, output_dir, fmt)
+    tmp_path = scratch_file(output_path)
     logger.info("Converting %s -> %s", dot_path.name, output_path.name)
 
-    result = subprocess.run(
-        cmd,
-        capture_output=True,
-        text=True,
-        check=False,
+    summary = scratch_file(dot_path) if options.summarize else None
+    source = summary or dot_path
+    try:
+        layout = "dot"
+        if options.summarize or options.layout_threshold is not None:
+            text = dot_path.read_text()
+            if summary is not None:
+                with span("summarize", output_path.stem):
+                    text = summarize_dot(text)
+                summary.write_text(text)
+            layout = layout_engine(text, options.layout_threshold)
+        if layout != "dot":
+            logger.info("Laying out %s with %s", dot_path.name, layout)
+
+        try:
+            with span("render", output_path.stem):
+                result = _run_dot(source, tmp_path, fmt, layout, options.timeout)
+        except StageTimeoutError as exc:
+            logger.warning(
+                "Graphviz timed out after %gs on %s; rendering its structure only",
+                exc.timeout,
+                dot_path.name,
+            )
+            result = _render_skeleton(source, tmp_path, fmt, options.timeout)
+            if result is None:
+                logger.error("Graphviz timed out on the structure of %s", dot_path.name)
+                return None
+
+        if result.returncode != 0:
+            logger.error("Graphviz error for %s: %s", dot_path.name, result.stderr)
+            return None
+
+        os.replace(tmp_path, output_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+        if summary is not None:
+            summary.unlink(missing_ok=True)
+
+    return output_path
+
+
+def render_dots(
+    dot_paths: Sequence[Path],
+    output_dir: Path,
+    fmt: str,
+    jobs: int | None = None,
+    options: RenderOptions | None = None,
+) -> list[Path]:
+    """Render many .dot files with a bounded pool of Graphviz processes.
+
+    Each render is an independent ``dot`` subprocess, so threads are enough
+    to keep several of them running at once.
+
+    Parameters
+    ----------
+    dot_paths : sequence of Path
+        The .dot files to render.
+    output_dir : Path
+        Directory to write the output images/PDFs.
+    fmt : str
+        Output format, either "png" or "pdf".
+    jobs : int or None
+        Maximum number of concurrent ``dot`` processes. Defaults to the
+        number of CPUs; 1 renders serially.
+    options : RenderOptions or None
+        Summarization, layout and timeout settings for every render.
+
+    Returns
+    -------
+    list[Path]
+        Paths of the successfully rendered files, in the order of dot_paths.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1 or len(dot_paths) <= 1:
+        results = [_convert_dot(dot_path, output_dir, fmt, options) for dot_path in dot_paths]
+    else:
+        # Each task runs in a copy of this context so the active profiler is visible
+        contexts = [contextvars.copy_context() for _ in dot_paths]
+        with ThreadPoolExecutor(max_workers=min(jobs, len(dot_paths))) as pool:
+            results = list(
+                pool.map(
+                    lambda ctx, p: ctx.run(_convert_dot, p, output_dir, fmt, options),
+                    contexts,
+                    dot_paths,
+                )
+            )
+    return [path for path in results if path is not None]
+
+
+def _native_cfgs(
+    ir_path: Path,
+    language: Language,
+    cfg_dir: Path,
+    output_dir: Path,
+    output_format: str,
+    render_jobs: int | None,
+    functions: Iterable[str] | None,
+    ir_text: str | None = None,
+    demangle_names: bool = False,
+    render_options: RenderOptions | None = None,
+) -> list[Path]:
+    """Build CFGs in-process, write their .dot files, and render them."""
+    dot_paths = write_native_dots(
+        ir_path, language, cfg_dir, output_dir, functions, ir_text, demangle_names
     )
+    return render_dots(dot_paths, output_dir, output_format, render_jobs, render_options)
 
-    if result.returncode != 0:
-        logger.error("Graphviz error for %s: %s", dot_path.name, result.stderr)
+
+def write_native_dots(
+    ir_path: Path,
+    language: Language,
+    cfg_dir: Path,
+    output_dir: Path,
+    functions: Iterable[str] | None,
+    ir_text: str | None = None,
+    demangle_names: bool = False,
+) -> list[Path]:
+    """Build CFGs in-process and write one .dot file per function."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cfgs = build_cfgs(ir_path, language, functions, ir_text=ir_text)
+    return write_dots(cfgs, cfg_dir, _output_stems(cfgs, language, demangle_names))
+
+
+def _output_stems(
+    cfgs: Sequence[FunctionCFG], language: Language, demangle_names: bool
+) -> list[str] | None:
+    """Return readable output names for C++ CFGs, or None to name outputs by function."""
+    if not demangle_names or language not in _CPP_LANGUAGES:
         return None
+    return readable_stems([cfg.name for cfg in cfgs])
 
-    return output_path
+
+def write_dots(
+    cfgs: Iterable[FunctionCFG], cfg_dir: Path, stems: Sequence[str] | None = None
+) -> list[Path]:
+    """Write one ``.<stem>.dot`` file per CFG into cfg_dir.
+
+    Stems default to the names (see :func:`struco.symbols.file_stem`).
+    """
+    cfg_dir.mkdir(parents=True, exist_ok=True)
+
+    dot_paths: list[Path] = []
+    for i, cfg in enumerate(cfgs):
+        dot_path = cfg_dir / f".{file_stem(cfg.name) if stems is None else stems[i]}.dot"
+        with span("write_dot", cfg.name):
+            atomic_write_text(dot_path, cfg.to_dot())
+        dot_paths.append(dot_path)
+    return dot_paths
+
+
+def structured_cfgs(
+    ir_path: Path,
+    language: Language,
+    output_dir: Path,
+    output_format: str,
+    functions: Iterable[str] | None,
+    ir_text: str | None = None,
+    demangle_names: bool = False,
+) -> list[Path]:
+    """Build CFGs in-process and write them in a machine-readable format."""
+    cfgs = build_cfgs(ir_path, language, functions, ir_text=ir_text)
+    stems = _output_stems(cfgs, language, demangle_names)
+    return serialize_cfgs(cfgs, language, output_dir, output_format, stems)
+
+
+def serialize_cfgs(
+    cfgs: Iterable[FunctionCFG],
+    language: Language,
+    output_dir: Path,
+    output_format: str,
+    stems: Sequence[str] | None = None,
+) -> list[Path]:
+    """Write one file per CFG in a machine-readable format into output_dir.
+
+    Files are named after the functions (see :func:`struco.symbols.file_stem`)
+    unless stems are given.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    outputs: list[Path] = []
+    for i, cfg in enumerate(cfgs):
+        stem = file_stem(cfg.name) if stems is None else stems[i]
+        output_path = output_dir / f"{stem}.{output_format}"
+        with span("serialize", cfg.name):
+            atomic_write_bytes(output_path, serialize_cfg(cfg, output_format, language.value))
+        outputs.append(output_path)
+    return outputs
+
+
+def collect_dots(
+    scratch: Path,
+    function_names: Sequence[str],
+    cfg_dir: Path,
+    stems: Sequence[str] | None = None,
+) -> list[Path]:
+    """Move the .dot files of the selected functions from opt's scratch dir.
+
+    The file of function_names[i] is renamed to ``.<stems[i]>.dot``, or to
+    the function's :func:`struco.symbols.file_stem` without stems.
+    """
+    expected_dots = {
+        f".{name}.dot": f".{file_stem(name) if stems is None else stems[i]}.dot"
+        for i, name in enumerate(function_names)
+    }
+    dot_paths: list[Path] = []
+    # Anything else opt wrote is discarded with the scratch directory
+    for item in sorted(scratch.iterdir()):
+        if item.name in expected_dots:
+            dest_dot = cfg_dir / expected_dots[item.name]
+            os.replace(item, dest_dot)
+            dot_paths.append(dest_dot)
+    return dot_paths
+
+
+def _opt_cfgs(
+    ir_path: Path,
+    language: Language,
+    cfg_dir: Path,
+    output_dir: Path,
+    output_format: str,
+    render_jobs: int | None,
+    functions: Iterable[str] | None,
+    ir_text: str | None = None,
+    demangle_names: bool = False,
+    render_options: RenderOptions | None = None,
+) -> list[Path]:
+    """Run opt to write .dot files for the selected functions and render them.
+
+    opt runs in a private scratch directory, so concurrent extractions never
+    see each other's .dot files and nothing is written to the process cwd.
+    When only some of the module's functions are selected, the module is
+    sliced first so opt does not write .dot files that would be discarded.
+    """
+    cfg_dir.mkdir(parents=True, exist_ok=True)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    function_names = select_functions(ir_path, language, functions, ir_text)
+    if not function_names:
+        return []
+    demangle_names = demangle_names and language in _CPP_LANGUAGES
+    n_defined = sum(1 for _ in _definitions(ir_path, ir_text))
+
+    with tempfile.TemporaryDirectory(prefix="struco-") as scratch_dir:
+        scratch = Path(scratch_dir)
+        opt_input, opt_text = ir_path, ir_text
+        if len(function_names) < n_defined:
+            sliced = scratch / ir_path.name
+            if _slice_module(ir_path, function_names, sliced, ir_text):
+                opt_input, opt_text = sliced, None
+
+        _run_opt(opt_input, cwd=scratch, ir_text=opt_text)
+        with span("collect_dots", ir_path.name):
+            stems = readable_stems(function_names) if demangle_names else None
+            dot_paths = collect_dots(scratch, function_names, cfg_dir, stems)
+
+    return render_dots(dot_paths, output_dir, output_format, render_jobs, render_options)
+
+
+def write_deduplicated(
+    cfgs: Sequence[FunctionCFG],
+    language: Language,
+    cfg_dir: Path,
+    output_dir: Path,
+    output_format: str,
+    render_jobs: int | None,
+    shape_store: str | Path | None = None,
+    render_with_opt: Callable[[list[str]], list[Path]] | None = None,
+    demangle_names: bool = False,
+    render_options: RenderOptions | None = None,
+) -> list[Path]:
+    """Produce one artifact per distinct CFG shape and write the dedup manifest.
+
+    Without a shape store, each shape is written to output_dir under the name
+    of its first function. With one, artifacts are named by shape below the
+    store and shapes already present there are not produced again.
+    render_with_opt renders the named functions through opt instead of the
+    in-process CFGs and returns the rendered paths in output_dir, named by
+    function (readable names with demangle_names and no store).
+
+    Returns
+    -------
+    list[Path]
+        One artifact per distinct shape, in order of first occurrence.
+    """
+    with span("dedup", cfg_dir.name):
+        groups = group_by_shape(cfgs)
+    first = [members[0] for members in groups.values()]
+    names = _output_stems(first, language, demangle_names) or [
+        file_stem(cfg.name) for cfg in first
+    ]
+    if shape_store is None:
+        artifact_dir, dot_dir = output_dir, cfg_dir
+        stems = dict(zip(groups, names, strict=True))
+    else:
+        store = Path(shape_store).resolve()
+        artifact_dir, dot_dir = store / f"{output_format}s", store
+        stems = {shape: shape for shape in groups}
+    artifact_dir.mkdir(parents=True, exist_ok=True)
+    artifacts = {shape: artifact_dir / f"{stem}.{output_format}" for shape, stem in stems.items()}
+
+    todo = [shape for shape in groups if shape_store is None or not artifacts[shape].exists()]
+    canonical = [groups[shape][0] for shape in todo]
+    todo_stems = [stems[shape] for shape in todo]
+    if output_format in STRUCTURED_FORMATS:
+        serialize_cfgs(canonical, language, artifact_dir, output_format, todo_stems)
+    elif render_with_opt is not None:
+        rendered_as = (
+            stems if shape_store is None else {s: file_stem(groups[s][0].name) for s in todo}
+        )
+        shape_of = {rendered_as[shape]: shape for shape in todo}
+        for path in render_with_opt([cfg.name for cfg in canonical]):
+            if shape_store is not None:
+                os.replace(path, artifacts[shape_of[path.stem]])
+    else:
+        dot_paths = write_dots(canonical, dot_dir, todo_stems)
+        render_dots(dot_paths, artifact_dir, output_format, render_jobs, render_options)
+
+    produced = set(todo)
+    entries = [
+        DedupEntry(cfg.name, shape, artifacts[shape], canonical=shape in produced and i == 0)
+        for shape, members in groups.items()
+        if artifacts[shape].exists()
+        for i, cfg in enumerate(members)
+    ]
+    output_dir.mkdir(parents=True, exist_ok=True)
+    atomic_write_text(output_dir / MANIFEST_NAME, manifest_text(entries, output_format))
+    logger.info(
+        "%d functions share %d CFG shapes; produced %d, reused %d",
+        len(cfgs),
+        len(groups),
+        len(todo),
+        len(groups) - len(todo),
+    )
+    return [artifacts[shape] for shape in groups if artifacts[shape].exists()]
+
+
+def _dedup_cfgs(
+    ir_path: Path,
+    language: Language,
+    cfg_dir: Path,
+    output_dir: Path,
+    output_format: str,
+    engine: str,
+    render_jobs: int | None,
+    functions: Iterable[str] | None,
+    ir_text: str | None = None,
+    shape_store: str | Path | None = None,
+    demangle_names: bool = False,
+    render_options: RenderOptions | None = None,
+) -> list[Path]:
+    """Build CFGs in-process, group them by shape and produce each shape once."""
+    cfgs = build_cfgs(ir_path, language, functions, ir_text=ir_text)
+    render_with_opt = None
+    if engine == "opt" and output_format not in STRUCTURED_FORMATS:
+        # Store artifacts are renamed by shape, so only per-file outputs get readable names
+        readable = demangle_names and shape_store is None
+
+        def render_with_opt(names: list[str]) -> list[Path]:
+            return _opt_cfgs(
+                ir_path,
+                language,
+                cfg_dir,
+                output_dir,
+                output_format,
+                render_jobs,
+                names,
+                ir_text,
+                readable,
+                render_options,
+            )
+
+    return write_deduplicated(
+        cfgs,
+        language,
+        cfg_dir,
+        output_dir,
+        output_format,
+        render_jobs,
+        shape_store,
+        render_with_opt,
+        demangle_names,
+        render_options,
+    )
+
+
+def prepare_cfg_request(
+    ir_path: str | Path,
+    language: Language | str,
+    output_format: str,
+    engine: str,
+    ir_text: str | None = None,
+) -> tuple[Path, Language, str, Path, Path]:
+    """Validate CFG extraction arguments and return the normalized values.
+
+    Returns the resolved IR path, language enum, lower-cased format, the
+    ``<stem>_cfg`` directory and the per-format output directory.
+    """
+    ir_path = Path(ir_path).resolve()
+
+    if ir_text is None and not ir_path.exists():
+        msg = f"IR file not found: {ir_path}"
+        raise FileNotFoundError(msg)
+
+    output_format = output_format.lower()
+    if output_format not in OUTPUT_FORMATS:
+        msg = (
+            f"Invalid output format '{output_format}'. "
+            f"Must be one of: {', '.join(OUTPUT_FORMATS)}."
+        )
+        raise ValueError(msg)
+
+    if engine not in ENGINES:
+        msg = f"Invalid engine '{engine}'. Must be one of: {', '.join(ENGINES)}."
+        raise ValueError(msg)
+
+    # Normalize language to enum
+    if isinstance(language, str):
+        language = EXTENSION_TO_LANGUAGE.get(language, Language.C)
+
+    # Set up output directories
+    cfg_dir = ir_path.parent / f"{ir_path.stem}_cfg"
+    output_dir = cfg_dir / f"{output_format}s"
+    return ir_path, language, output_format, cfg_dir, output_dir
 
 
 def extract_cfg_from_ir(
     ir_path: str | Path,
     language: Language | str = Language.C,
     output_format: str = "png",
+    engine: str = "opt",
+    render_jobs: int | None = None,
+    functions: Iterable[str] | None = None,
+    ir_text: str | None = None,
+    dedup: bool = False,
+    shape_store: str | Path | None = None,
+    include_namespaces: Sequence[str] | None = None,
+    exclude_namespaces: Sequence[str] | None = None,
+    demangle_names: bool = False,
+    opt_pipeline: str | None = None,
+    summarize: bool = False,
+    layout_threshold: int | None = DEFAULT_LAYOUT_THRESHOLD,
+    render_timeout: float | None = DEFAULT_RENDER_TIMEOUT,
 ) -> list[Path]:
-    """Extract CFGs from an LLVM IR file and render as PNG or PDF.
+    """Extract CFGs from an LLVM IR file and render or serialize them.
+
+    Rendered formats (PNG, PDF) go through Graphviz. Structured formats
+    (JSON, GraphML, NPZ) are written straight from the in-process CFGs and
+    never invoke ``opt`` or ``dot``.
 
     Parameters
     ----------
@@ -393,71 +1525,137 @@ def extract_cfg_from_ir(
     language : Language or str
         Source language (affects function name extraction).
     output_format : str
-        Output format: "png" or "pdf".
+        Output format: "png" or "pdf" (rendered), or "json", "graphml" or
+        "npz" (structured; see :mod:`struco.formats`).
+    engine : str
+        CFG construction engine for rendered formats: "opt" runs
+        ``opt -passes=dot-cfg``, "native" parses the IR in-process and needs
+        no LLVM tools. Structured formats always use the native parser.
+    render_jobs : int or None
+        Maximum number of concurrent Graphviz processes. Defaults to the
+        number of CPUs.
+    functions : iterable of str or None
+        Only generate CFGs for these functions (IR names, i.e. mangled for
+        C++). Defaults to all user-defined functions. Unselected functions
+        are pruned before CFG construction rather than discarded after.
+    ir_text : str or None
+        The module text from an in-memory :class:`IRResult`. It is parsed
+        or piped to the LLVM tools directly and ir_path need not exist; the
+        outputs are still placed relative to ir_path.
+    dedup : bool
+        Render or serialize each distinct CFG shape (see
+        :func:`struco.dedup.structural_hash`) once, and write a
+        ``dedup.json`` manifest mapping every function to its artifact
+        into the per-format output directory.
+    shape_store : str or Path or None
+        Directory shared across files for deduplicated artifacts, which are
+        named by shape there; shapes already in the store are not produced
+        again. Implies dedup.
+    include_namespaces : sequence of str or None
+        For C++, only generate CFGs of functions in these namespaces
+        (demangled, e.g. ``"acme::core"``; see :class:`struco.symbols.SymbolFilter`).
+    exclude_namespaces : sequence of str or None
+        For C++, skip functions in these namespaces in addition to the
+        standard library and Boost.
+    demangle_names : bool
+        Name C++ outputs after the demangled function signature
+        (``ns.Stack.push(int const&).png``) instead of the mangled name.
+    opt_pipeline : str or None
+        Run this opt pass pipeline over the module before any CFG is taken,
+        for every engine and format: a preset from :data:`OPT_PIPELINES`
+        (``"canonical"`` is ``mem2reg,simplifycfg``) or a pipeline string
+        for ``opt -passes=``. Outputs written with a pipeline are recorded
+        in ``provenance.json`` in the per-format output directory (see
+        :func:`read_provenance`).
+    summarize : bool
+        For rendered formats, collapse straight-line block chains and
+        truncate long instruction labels before rendering (see
+        :func:`struco.render.summarize_dot`).
+    layout_threshold : int or None
+        For rendered formats, lay out graphs with more nodes than this with
+        ``sfdp`` instead of ``dot``; None always uses ``dot``.
+    render_timeout : float or None
+        Seconds a single Graphviz render may take before it is killed and
+        the graph's structure alone is rendered instead; None waits
+        indefinitely.
 
     Returns
     -------
     list[Path]
-        Paths to the generated image/PDF files.
+        Paths to the generated files, in a deterministic order: module
+        order for the native engine and structured formats, by name for opt.
+        With dedup, one artifact per distinct shape in order of first
+        occurrence.
 
     Raises
     ------
     FileNotFoundError
         If the IR file does not exist.
     ValueError
-        If output_format is not "png" or "pdf".
+        If output_format or engine is unknown, or a render limit is not positive.
     RuntimeError
-        If opt or graphviz fails.
+        If opt or graphviz fails, or numpy is missing for "npz".
     """
-    ir_path = Path(ir_path).resolve()
-
-    if not ir_path.exists():
-        msg = f"IR file not found: {ir_path}"
-        raise FileNotFoundError(msg)
-
-    output_format = output_format.lower()
-    if output_format not in {"png", "pdf"}:
-        msg = f"Invalid output format '{output_format}'. Must be 'png' or 'pdf'."
-        raise ValueError(msg)
-
-    # Normalize language to enum
-    if isinstance(language, str):
-        language = EXTENSION_TO_LANGUAGE.get(language, Language.C)
-
-    # Run opt — .dot files land in cwd
-    original_cwd = Path.cwd()
-    try:
-        _run_opt(ir_path)
-    finally:
-        os.chdir(original_cwd)
-
-    # Set up output directories
-    cfg_dir = ir_path.parent / f"{ir_path.stem}_cfg"
-    output_dir = cfg_dir / f"{output_format}s"
-    cfg_dir.mkdir(parents=True, exist_ok=True)
-    output_dir.mkdir(parents=True, exist_ok=True)
-
-    # Find expected .dot files based on function names
-    function_names = get_function_names(ir_path, language)
-    expected_dots = {f".{name}.dot" for name in function_names}
+    ir_path, language, output_format, cfg_dir, output_dir = prepare_cfg_request(
+        ir_path, language, output_format, engine, ir_text
+    )
+    render_options = RenderOptions(summarize, layout_threshold, render_timeout)
+    pipeline = resolve_opt_pipeline(opt_pipeline)
+    if pipeline:
+        # Every engine then reads the canonicalized module from memory
+        ir_text = _optimize_ir(ir_path, pipeline, ir_text)
+    if functions is None and (include_namespaces or exclude_namespaces):
+        # Select once here so every engine skips the filtered functions
+        symbol_filter = SymbolFilter.from_options(include_namespaces, exclude_namespaces)
+        functions = get_function_names(ir_path, language, ir_text, symbol_filter)
+
+    if dedup or shape_store is not None:
+        outputs = _dedup_cfgs(
+            ir_path,
+            language,
+            cfg_dir,
+            output_dir,
+            output_format,
+            engine,
+            render_jobs,
+            functions,
+            ir_text,
+            shape_store,
+            demangle_names,
+            render_options,
+        )
+    elif output_format in STRUCTURED_FORMATS:
+        outputs = structured_cfgs(
+            ir_path, language, output_dir, output_format, functions, ir_text, demangle_names
+        )
+    elif engine == "native":
+        outputs = _native_cfgs(
+            ir_path,
+            language,
+            cfg_dir,
+            output_dir,
+            output_format,
+            render_jobs,
+            functions,
+            ir_text,
+            demangle_names,
+            render_options,
+        )
+    else:
+        outputs = _opt_cfgs(
+            ir_path,
+            language,
+            cfg_dir,
+            output_dir,
+            output_format,
+            render_jobs,
+            functions,
+            ir_text,
+            demangle_names,
+            render_options,
+        )
 
-    outputs: list[Path] = []
-    cwd = Path.cwd()
-
-    for item in cwd.iterdir():
-        if item.suffix == ".dot" and item.name.startswith("."):
-            if item.name in expected_dots:
-                # Move .dot into cfg directory
-                dest_dot = cfg_dir / item.name
-                item.rename(dest_dot)
-
-                # Convert to output format
-                result = _convert_dot(dest_dot, output_dir, output_format)
-                if result is not None:
-                    outputs.append(result)
-            else:
-                # Remove leftover .dot files (e.g. stdlib/internal functions)
-                item.unlink()
+    _record_provenance(output_dir, outputs, ir_path, pipeline, engine)
 
     logger.info(
         "Generated %d CFG %s files in %s",
@@ -469,9 +1667,42 @@ def extract_cfg_from_ir(
 
 
 __all__ = [
+    "ENGINES",
+    "OPT_PIPELINES",
+    "FunctionCFG",
     "Language",
     "IRResult",
+    "build_cfgs",
     "extract_ir",
     "extract_cfg_from_ir",
     "get_function_names",
+    "ir_output_path",
+    "read_provenance",
+    "resolve_opt_pipeline",
+    "C_FAMILY",
+    "atomic_write_bytes",
+    "atomic_write_text",
+    "cache_dependencies",
+    "check_frontend",
+    "check_opt",
+    "collect_dots",
+    "dot_command",
+    "frontend_command",
+    "frontend_config",
+    "get_frontend_config",
+    "opt_command",
+    "prepare_cfg_request",
+    "private_depfile",
+    "render_dots",
+    "rendered_path",
+    "restore_cached_ir",
+    "scratch_file",
+    "select_functions",
+    "serialize_cfgs",
+    "slice_command",
+    "source_language",
+    "structured_cfgs",
+    "write_deduplicated",
+    "write_dots",
+    "write_native_dots",
 ]
@@ -0,0 +1,168 @@
+"""Thin client for the struco daemon.
+
+Forwards regular ``python -m struco`` arguments to a running
+``struco serve`` daemon over its Unix socket and prints the output paths as
+they are streamed back, so each call costs one connection instead of a
+full pipeline start-up::
+
+    python -m struco serve &
+    python -m struco.client src/ --cfg_format json
+
+The protocol is one JSON object per line. A request is a single line,
+either ``{"argv": [...], "cwd": "..."}`` to run a job or
+``{"command": "shutdown"}``. The server answers with any number of
+``{"type": "output", "path": ...}`` and
+``{"type": "error", "message": ..., "source": ...}`` lines, then exactly one
+``{"type": "done", "status": N}`` line, after which it closes the
+connection.
+
+The client only connects to a socket owned by the current user, so another
+user cannot stand in for the daemon and read the requests.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import os
+import socket
+import stat
+import sys
+import tempfile
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+def _private_dir(path: Path) -> Path:
+    """Create a directory only the current user can access, or check an existing one.
+
+    Raises
+    ------
+    PermissionError
+        If path exists but is not a directory private to the current user.
+    """
+    with contextlib.suppress(FileExistsError):
+        path.mkdir(mode=0o700)
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != os.getuid() or st.st_mode & 0o077:
+        msg = f"{path} is not private to the current user; remove it or set $STRUCO_SOCKET"
+        raise PermissionError(msg)
+    return path
+
+
+def default_socket_path() -> Path:
+    """Return the daemon socket path.
+
+    ``$STRUCO_SOCKET`` if set, otherwise ``struco.sock`` in
+    ``$XDG_RUNTIME_DIR`` or in a per-user ``0700`` directory of the temp
+    directory, which is created if needed.
+
+    Raises
+    ------
+    PermissionError
+        If that per-user directory exists but another user owns it or can
+        access it.
+    """
+    env = os.environ.get("STRUCO_SOCKET")
+    if env:
+        return Path(env)
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "struco.sock"
+    return _private_dir(Path(tempfile.gettempdir()) / f"struco-{os.getuid()}") / "struco.sock"
+
+
+def send_request(
+    message: dict[str, Any], socket_path: str | Path | None = None
+) -> Iterator[dict[str, Any]]:
+    """Send one request to the daemon and yield its response messages.
+
+    Parameters
+    ----------
+    message : dict
+        The request object.
+    socket_path : str or Path or None
+        Daemon socket. Defaults to :func:`default_socket_path`.
+
+    Yields
+    ------
+    dict
+        Response messages in the order the server sent them.
+
+    Raises
+    ------
+    ConnectionError
+        If no daemon is listening, the socket belongs to another user, or
+        the daemon closes the connection before sending ``done``.
+    """
+    path = Path(socket_path) if socket_path is not None else default_socket_path()
+    with contextlib.suppress(FileNotFoundError):
+        owner = path.stat().st_uid
+        if owner != os.getuid():
+            msg = f"{path} belongs to user {owner}, not to the current user; refusing to connect"
+            raise ConnectionError(msg)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(path))
+        except (FileNotFoundError, ConnectionRefusedError) as exc:
+            msg = f"No struco daemon listening on {path} (start one with 'struco serve')"
+            raise ConnectionError(msg) from exc
+        sock.sendall(json.dumps(message).encode() + b"\n")
+        with sock.makefile("r", encoding="utf-8") as stream:
+            for line in stream:
+                reply = json.loads(line)
+                yield reply
+                if reply.get("type") == "done":
+                    return
+    msg = f"struco daemon on {path} closed the connection unexpectedly"
+    raise ConnectionError(msg)
+
+
+def run_remote(argv: Sequence[str], socket_path: str | Path | None = None) -> int:
+    """Run a struco command line on the daemon, printing outputs as they arrive.
+
+    Relative paths in argv are resolved against the current directory.
+
+    Returns
+    -------
+    int
+        The exit status reported by the daemon.
+    """
+    request = {"argv": list(argv), "cwd": os.getcwd()}
+    status = 1
+    for reply in send_request(request, socket_path):
+        kind = reply.get("type")
+        if kind == "output":
+            print(reply["path"])  # noqa: T201
+        elif kind == "error":
+            source = reply.get("source")
+            prefix = f"{source}: " if source else ""
+            logger.error("%s%s", prefix, reply["message"])
+        elif kind == "done":
+            status = int(reply["status"])
+    return status
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Forward the command line to the daemon."""
+    logging.basicConfig(format="%(name)s | %(levelname)s | %(message)s")
+    try:
+        return run_remote(sys.argv[1:] if argv is None else argv)
+    except (ConnectionError, PermissionError) as exc:
+        logger.error("%s", exc)
+        return 1
+
+
+__all__ = [
+    "default_socket_path",
+    "run_remote",
+    "send_request",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+"""Filtering Codon runtime and standard library functions from Python IR.
+
+``codon build -release -llvm`` links the whole standard library into every
+module, so even a ten-line script defines thousands of functions, nearly
+all of them realizations of ``std`` code. Codon names functions by their
+qualified Python name, followed by the overload index, the generic
+arguments and a numeric id that is unique within one build::
+
+    std.internal.gc.alloc:0[int].412
+    std.internal.types.array.List.append:0[List[int],int].1877
+    binary_search:0[List[int],int].95
+
+:func:`codon_path` reduces such a name to its module path
+(``('std', 'internal', 'gc', 'alloc')``), which :class:`CodonFilter`
+matches against include and exclude rules exactly like
+:class:`struco.symbols.SymbolFilter` does for C++ namespaces, with
+:data:`DEFAULT_CODON_EXCLUDES` (the standard library and Codon's internal
+modules) dropped by default. Functions of the C runtime (``seq_*``) are
+always dropped.
+
+Methods of the builtin types are realized under the bare type name
+(``List[int].__getitem__``), which a user class of the same name shares.
+:data:`CODON_BUILTIN_TYPES` therefore only drop a function when the
+module also realizes that type from the standard library (a
+``std....List...`` function), so a script's own ``class C`` keeps its
+methods.
+
+Some standard library code is realized outside the ``std`` modules, for
+example generic methods specialized for a user type. Every realization
+the default rules drop is therefore fingerprinted: a digest of its body
+with the build-specific ids removed and of its name qualified by its class
+or module (``Counter.total``, ``gc.alloc``). A function no rule decides
+on is dropped too if a runtime function with the same qualified name and
+body was seen before, so a user method only matches the same method of a
+class of the same name, never an unrelated one that happens to have a
+trivial body. Fingerprints are cached per process, keyed by the
+realization's name without its unique id, so the runtime functions every
+module repeats are hashed once per worker, not once per file.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import re
+import threading
+from collections.abc import Collection, Iterable, Sequence
+from dataclasses import dataclass, field
+
+from struco.ir import FunctionDefinition
+from struco.symbols import NamespaceTrie
+
+logger = logging.getLogger(__name__)
+
+# Modules dropped from Python outputs unless an include rule overrides them
+DEFAULT_CODON_EXCLUDES = (
+    "std",
+    "internal",
+    "__internal__",
+)
+
+# Builtin types whose methods are dropped when the module realizes them from std
+CODON_BUILTIN_TYPES = frozenset(
+    {
+        "C",
+        "int",
+        "float",
+        "bool",
+        "byte",
+        "str",
+        "Int",
+        "UInt",
+        "Ptr",
+        "Array",
+        "List",
+        "Dict",
+        "Set",
+        "Tuple",
+        "Optional",
+        "Generator",
+        "Function",
+        "range",
+        "complex",
+    }
+)
+
+# Functions of Codon's C runtime (libcodonrt) and its generated helpers
+_RUNTIME_PREFIXES = ("seq_", "__codon", "codon.")
+
+# Build-specific unique id appended to every realized name
+_UNIQUE_ID = re.compile(r"\.\d+$")
+
+# Global identifiers in a function body, and the unique id at their end
+_GLOBAL = re.compile(rb'@(?:"[^"]*"|[-\w$.]+)')
+_GLOBAL_ID = re.compile(rb"\.\d+$")
+
+# Attribute group and metadata numbers, which depend on the rest of the module
+_VOLATILE_REFS = re.compile(rb"#\d+|!\d+")
+
+
+def codon_path(name: str) -> tuple[str, ...]:
+    """Split a Codon function name into its qualified Python name components.
+
+    The unique id, overload index and generic arguments are dropped::
+
+        >>> codon_path("std.internal.gc.alloc:0[int].412")
+        ('std', 'internal', 'gc', 'alloc')
+        >>> codon_path("List[Tuple[int,str]].append:0[int].9")
+        ('List', 'append')
+    """
+    name = _realization(name)
+    kept: list[str] = []
+    depth = 0
+    for ch in name:
+        if ch == "[":
+            depth += 1
+        elif ch == "]":
+            depth -= 1
+        elif depth == 0:
+            if ch == ":":
+                break
+            kept.append(ch)
+    return tuple(part for part in "".join(kept).split(".") if part)
+
+
+def _split_rule(rule: str) -> tuple[str, ...]:
+    return tuple(part for part in rule.strip().replace("::", ".").split(".") if part)
+
+
+def _normalize_global(match: re.Match[bytes]) -> bytes:
+    name = match.group()
+    quoted = name.endswith(b'"')
+    core = name[:-1] if quoted else name
+    core = _GLOBAL_ID.sub(b"", core)
+    return core + b'"' if quoted else core
+
+
+def _realization(name: str) -> str:
+    """Return a function name without the unique id of its build."""
+    return _UNIQUE_ID.sub("", name)
+
+
+def fingerprint(path: Sequence[str], body: bytes) -> str:
+    """Return a digest of a function that is stable across Codon builds.
+
+    Covers the function name qualified by its enclosing class or module
+    (the last two components of path) and the ``define`` line and body,
+    with unique ids and attribute group and metadata numbers removed.
+
+    Parameters
+    ----------
+    path : sequence of str
+        The function's :func:`codon_path`.
+    body : bytes
+        The function's IR from its ``define`` line to its closing brace.
+    """
+    digest = hashlib.sha256(".".join(path[-2:]).encode())
+    digest.update(b"\0")
+    # The first global on the define line is the function's own qualified name
+    body = _GLOBAL.sub(b"@", _VOLATILE_REFS.sub(b"", body), count=1)
+    digest.update(_GLOBAL.sub(_normalize_global, body))
+    return digest.hexdigest()
+
+
+class RuntimeFingerprints:
+    """Thread-safe set of fingerprints of Codon runtime functions.
+
+    Keeps every fingerprinted realization (the function name without its
+    unique id, so each specialization of a generic function is recorded)
+    as well, so a runtime function is only hashed the first time it is seen.
+    """
+
+    def __init__(self) -> None:
+        self._realizations: set[str] = set()
+        self._digests: set[str] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._digests)
+
+    def __contains__(self, digest: object) -> bool:
+        with self._lock:
+            return digest in self._digests
+
+    def has_realization(self, name: str) -> bool:
+        """Return True if a runtime function of this name (any build) was fingerprinted."""
+        with self._lock:
+            return _realization(name) in self._realizations
+
+    def add(self, name: str, digest: str) -> None:
+        """Record the fingerprint of a runtime function."""
+        with self._lock:
+            self._realizations.add(_realization(name))
+            self._digests.add(digest)
+
+    def clear(self) -> None:
+        """Forget all fingerprints."""
+        with self._lock:
+            self._realizations.clear()
+            self._digests.clear()
+
+
+_fingerprints = RuntimeFingerprints()
+
+
+def runtime_fingerprints() -> RuntimeFingerprints:
+    """Return the process-wide fingerprint cache."""
+    return _fingerprints
+
+
+def clear_fingerprints() -> None:
+    """Forget all runtime fingerprints of this process."""
+    _fingerprints.clear()
+
+
+def std_types(paths: Iterable[Sequence[str]]) -> frozenset[str]:
+    """Return the builtin types realized from the standard library in a module.
+
+    A :data:`CODON_BUILTIN_TYPES` name counts when it is a component of a
+    ``std`` function's path (``std.internal.types.array.List.append``), so
+    a user class that merely shares the name is not mistaken for it.
+
+        >>> std_types([("std", "internal", "types", "array", "List", "append"), ("C", "f")])
+        frozenset({'List'})
+    """
+    return frozenset(
+        part
+        for path in paths
+        if path and path[0] == "std"
+        for part in path[1:]
+        if part in CODON_BUILTIN_TYPES
+    )
+
+
+def _body(data: bytes, definition: FunctionDefinition) -> bytes:
+    end = data.find(b"\n}", definition.offset)
+    return data[definition.offset : end if end >= 0 else len(data)]
+
+
+@dataclass(frozen=True)
+class CodonFilter:
+    """Include/exclude rules for Codon functions by module path.
+
+    Attributes
+    ----------
+    include : tuple of str
+        Modules or classes (``"mypkg.core"``) to keep. If any are given,
+        functions outside them are dropped.
+    exclude : tuple of str
+        Modules or classes to drop, in addition to
+        :data:`DEFAULT_CODON_EXCLUDES` and the methods of the
+        :data:`CODON_BUILTIN_TYPES` the module realizes from ``std``.
+    """
+
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+    _trie: NamespaceTrie = field(init=False, repr=False, compare=False)
+    _defaults: NamespaceTrie = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        defaults = NamespaceTrie()
+        trie = NamespaceTrie()
+        for rule in DEFAULT_CODON_EXCLUDES:
+            defaults.insert(_split_rule(rule), include=False)
+            trie.insert(_split_rule(rule), include=False)
+        for rule in self.include:
+            trie.insert(_split_rule(rule), include=True)
+        for rule in self.exclude:
+            trie.insert(_split_rule(rule), include=False)
+        object.__setattr__(self, "_trie", trie)
+        object.__setattr__(self, "_defaults", defaults)
+
+    @classmethod
+    def from_options(
+        cls, include: Iterable[str] | None = None, exclude: Iterable[str] | None = None
+    ) -> CodonFilter:
+        """Build a filter from optional lists of modules."""
+        return cls(include=tuple(include or ()), exclude=tuple(exclude or ()))
+
+    def keeps_path(self, path: Sequence[str], library_types: Collection[str] = ()) -> bool:
+        """Return True if a function with this module path is kept.
+
+        Methods of a type in library_types (builtin types the module realizes
+        from the standard library, see :func:`std_types`) are dropped unless
+        a rule names them; any other top-level name is user code.
+        """
+        rule = self._trie.match(path)
+        if rule is None and path and path[0] in library_types:
+            return False
+        return not self.include if rule is None else rule
+
+    def select(
+        self,
+        definitions: Iterable[FunctionDefinition],
+        data: bytes,
+        fingerprints: RuntimeFingerprints | None = None,
+    ) -> list[str]:
+        """Return the names of the user-defined functions, in module order.
+
+        Parameters
+        ----------
+        definitions : iterable of FunctionDefinition
+            The definitions of a module.
+        data : bytes
+            The module text the definition offsets point into.
+        fingerprints : RuntimeFingerprints or None
+            Where runtime functions are recorded and looked up. Defaults to
+            the process-wide cache (see :func:`runtime_fingerprints`).
+        """
+        fingerprints = fingerprints if fingerprints is not None else _fingerprints
+        paths = [(definition, codon_path(definition.name)) for definition in definitions]
+        builtins = std_types(path for _, path in paths)
+        undecided: list[tuple[FunctionDefinition, tuple[str, ...]]] = []
+        kept: list[str] = []
+        for definition, path in paths:
+            runtime = definition.name.startswith(_RUNTIME_PREFIXES)
+            if not runtime and self.keeps_path(path, builtins):
+                if self._trie.match(path) is None:
+                    undecided.append((definition, path))
+                kept.append(definition.name)
+                continue
+            library = self._defaults.match(path) is False or (
+                self._trie.match(path) is None and path[0] in builtins
+            )
+            if (runtime or library) and not fingerprints.has_realization(definition.name):
+                fingerprints.add(definition.name, fingerprint(path, _body(data, definition)))
+
+        known = {
+            definition.name
+            for definition, path in undecided
+            if fingerprint(path, _body(data, definition)) in fingerprints
+        }
+        if known:
+            logger.debug("Dropping %d functions matching Codon runtime code", len(known))
+        return [name for name in kept if name not in known]
+
+
+__all__ = [
+    "CODON_BUILTIN_TYPES",
+    "DEFAULT_CODON_EXCLUDES",
+    "CodonFilter",
+    "RuntimeFingerprints",
+    "clear_fingerprints",
+    "codon_path",
+    "fingerprint",
+    "runtime_fingerprints",
+    "std_types",
+]
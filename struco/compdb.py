@@ -0,0 +1,200 @@
+"""Per-file compiler flags from a JSON compilation database.
+
+Build systems (CMake with ``CMAKE_EXPORT_COMPILE_COMMANDS``, Bear, Meson,
+...) write a ``compile_commands.json`` listing the exact command each
+translation unit is compiled with. :func:`load_compilation_database`
+reads one, and :meth:`CompilationDatabase.get` returns the flags of a
+source file: include paths, macro definitions, the language standard and
+everything else that decides what the file means, with the parts that
+select inputs, outputs and dependency files removed, since struco
+supplies its own. The frontend is then run with these flags and
+``-working-directory`` set to the entry's directory, so relative include
+paths resolve as they do in the real build.
+
+Entries written for GCC are passed to Clang as they are; the rare
+GCC-only flags Clang rejects have to be removed from the database.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import shlex
+from collections.abc import Iterator, Mapping, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+COMPDB_NAME = "compile_commands.json"
+
+# Flags that only select what the compiler does or where it writes
+_DROPPED_FLAGS = frozenset({"-c", "-S", "-E", "-emit-llvm", "-M", "-MM", "-MD", "-MMD", "-MP"})
+
+# Flags whose value is the next argument or joined to the flag, and is dropped with it
+_DROPPED_WITH_VALUE = ("-o", "-MF", "-MT", "-MQ", "-include-pch")
+
+
+@dataclass(frozen=True)
+class CompileCommand:
+    """The flags a translation unit is built with.
+
+    Attributes
+    ----------
+    file : Path
+        Absolute path of the source file.
+    directory : Path
+        Working directory of the command; relative paths in flags resolve
+        against it.
+    flags : tuple of str
+        Compiler flags, without the compiler, the source file, outputs
+        and dependency file options.
+    database : Path or None
+        The ``compile_commands.json`` the command was read from.
+    """
+
+    file: Path
+    directory: Path
+    flags: tuple[str, ...]
+    database: Path | None = None
+
+    def frontend_args(self) -> list[str]:
+        """Return the flags to append to the frontend command line."""
+        return [*self.flags, "-working-directory", str(self.directory)]
+
+
+@dataclass(frozen=True)
+class CompilationDatabase:
+    """Compile commands by absolute source path.
+
+    Attributes
+    ----------
+    commands : mapping of Path to CompileCommand
+        The command of every source file in the database. A file listed
+        more than once keeps its first command.
+    path : Path or None
+        The file the database was read from.
+    """
+
+    commands: Mapping[Path, CompileCommand] = field(default_factory=dict)
+    path: Path | None = None
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def __iter__(self) -> Iterator[Path]:
+        return iter(self.commands)
+
+    def get(self, source: str | Path) -> CompileCommand | None:
+        """Return the command of a source file, or None if it is not listed."""
+        return self.commands.get(Path(source).resolve())
+
+
+def _split_command(entry: Mapping[str, object]) -> list[str]:
+    arguments = entry.get("arguments")
+    if isinstance(arguments, list) and all(isinstance(arg, str) for arg in arguments):
+        return list(arguments)
+    command = entry.get("command")
+    if isinstance(command, str):
+        return shlex.split(command)
+    msg = "entry has neither an 'arguments' list nor a 'command' string"
+    raise ValueError(msg)
+
+
+def compile_flags(arguments: Sequence[str], source: Path, directory: Path) -> tuple[str, ...]:
+    """Return the flags of a compile command line that struco passes on.
+
+    Drops the compiler (the first argument), the source file, ``-c`` and
+    other action flags, and ``-o``, ``-MF``, ``-MT``, ``-MQ`` and
+    ``-include-pch`` with their values.
+
+    Parameters
+    ----------
+    arguments : sequence of str
+        The full command line, compiler first.
+    source : Path
+        Absolute path of the source file.
+    directory : Path
+        Directory relative paths on the command line are relative to.
+    """
+    flags: list[str] = []
+    args = iter(arguments[1:])
+    for arg in args:
+        if arg in _DROPPED_FLAGS:
+            continue
+        if arg in _DROPPED_WITH_VALUE:
+            next(args, None)
+            continue
+        if arg.startswith(_DROPPED_WITH_VALUE) and not arg.startswith("-include"):
+            continue
+        if not arg.startswith("-") and (directory / arg).resolve() == source:
+            continue
+        flags.append(arg)
+    return tuple(flags)
+
+
+def _database_file(path: Path) -> Path:
+    return path / COMPDB_NAME if path.is_dir() else path
+
+
+def load_compilation_database(path: str | Path) -> CompilationDatabase:
+    """Read a ``compile_commands.json``.
+
+    Parameters
+    ----------
+    path : str or Path
+        The database file, or a directory containing one (for example a
+        CMake build directory).
+
+    Returns
+    -------
+    CompilationDatabase
+        The commands of all listed files.
+
+    Raises
+    ------
+    FileNotFoundError
+        If there is no database at path.
+    ValueError
+        If the file is not a valid compilation database.
+    """
+    db_path = _database_file(Path(path)).resolve()
+    if not db_path.is_file():
+        msg = f"Compilation database not found: {db_path}"
+        raise FileNotFoundError(msg)
+    try:
+        entries = json.loads(db_path.read_text())
+    except json.JSONDecodeError as exc:
+        msg = f"Invalid compilation database {db_path}: {exc}"
+        raise ValueError(msg) from exc
+    if not isinstance(entries, list):
+        msg = f"Invalid compilation database {db_path}: expected a list of entries"
+        raise ValueError(msg)
+
+    commands: dict[Path, CompileCommand] = {}
+    for index, entry in enumerate(entries):
+        try:
+            if not isinstance(entry, dict):
+                msg = "entry is not an object"
+                raise ValueError(msg)
+            directory = (db_path.parent / str(entry["directory"])).resolve()
+            source = (directory / str(entry["file"])).resolve()
+            arguments = _split_command(entry)
+        except (KeyError, ValueError) as exc:
+            msg = f"Invalid entry {index} in compilation database {db_path}: {exc}"
+            raise ValueError(msg) from exc
+        if source in commands:
+            continue
+        flags = compile_flags(arguments, source, directory)
+        commands[source] = CompileCommand(source, directory, flags, db_path)
+    logger.info("Loaded %d compile commands from %s", len(commands), db_path)
+    return CompilationDatabase(commands, db_path)
+
+
+__all__ = [
+    "COMPDB_NAME",
+    "CompilationDatabase",
+    "CompileCommand",
+    "compile_flags",
+    "load_compilation_database",
+]
@@ -0,0 +1,495 @@
+"""Sharded, memory-mapped CFG datasets for training pipelines.
+
+:class:`DatasetWriter` packs function CFGs into fixed-size shards, so a
+corpus becomes a handful of files instead of thousands of per-function
+artifacts. Every shard is one flat file of columnar arrays, each aligned
+to 64 bytes:
+
+- ``block_offsets``, ``edge_offsets``: ``(G + 1,)`` int64 ranges of each
+  function's blocks and edges
+- ``edges``: ``(E, 2)`` int32 (source, target) block indices local to
+  their function, grouped by source block
+- ``instruction_offsets``: ``(N + 1,)`` int64 range of each block's
+  instructions
+- string columns ``name``, ``language``, ``source`` (one per function),
+  ``label`` (one per block) and ``instruction`` (one per instruction),
+  each stored as ``<column>_text_offsets`` int64 byte offsets into a
+  ``<column>_text`` uint8 blob of UTF-8 text
+
+``index.json`` in the dataset directory lists the shards, their function
+counts and where each column lives in the shard file (byte offset, dtype,
+shape). It is written last, so a dataset is complete exactly when its
+index exists.
+
+:class:`Dataset` memory-maps shards on first use and builds numpy views
+onto them without copying; reading a function decodes only that
+function's slices, so random access and iteration cost the same whatever
+the corpus size and the page cache is shared by every data loader worker
+reading the dataset.
+
+Requires numpy.
+
+Usage:
+    python -m struco.dataset -o <dataset dir> [--shard-size N] <file.ll | source> [...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import bisect
+import contextlib
+import json
+import logging
+import mmap
+import sys
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from struco.cfg import Language, atomic_write_bytes, atomic_write_text
+from struco.features import load_cfgs, require_numpy
+from struco.graph import FunctionCFG, StringPool, opcode
+
+logger = logging.getLogger(__name__)
+
+# Index file written into the dataset directory
+INDEX_NAME = "index.json"
+
+# Functions per shard unless the writer is told otherwise
+DEFAULT_SHARD_SIZE = 4096
+
+_FORMAT = "struco-cfg-dataset"
+_VERSION = 1
+_ALIGN = 64
+# Text columns with one entry per function
+_FUNCTION_TEXT = ("name", "language", "source")
+
+
+def _shard_name(index: int) -> str:
+    return f"shard-{index:05d}.bin"
+
+
+def _text_column(strings: list[str]) -> tuple[Any, Any]:
+    """Encode strings as (int64 byte offsets, uint8 blob)."""
+    np = require_numpy()
+    encoded = [s.encode() for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def _pack_shard(entries: Sequence[tuple[FunctionCFG, str, str]]) -> tuple[bytes, dict[str, Any]]:
+    """Lay out the columns of one shard; return its bytes and column table."""
+    np = require_numpy()
+    block_counts = [len(cfg) for cfg, _, _ in entries]
+    edge_counts = [len(cfg.successor_targets) for cfg, _, _ in entries]
+    block_offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+    edge_offsets = np.zeros(len(entries) + 1, dtype=np.int64)
+    np.cumsum(block_counts, out=block_offsets[1:])
+    np.cumsum(edge_counts, out=edge_offsets[1:])
+
+    labels: list[str] = []
+    instructions: list[str] = []
+    instruction_offsets = [0]
+    sources: list[Any] = []
+    targets: list[Any] = []
+    for cfg, _, _ in entries:
+        pool = cfg.pool
+        base = instruction_offsets[-1]
+        labels.extend(pool[idx] for idx in cfg.label_ids)
+        instructions.extend(pool[idx] for idx in cfg.instruction_ids)
+        instruction_offsets.extend(base + off for off in cfg.instruction_offsets[1:])
+        succ_offsets = np.frombuffer(cfg.successor_offsets, dtype=np.uint32)
+        sources.append(np.repeat(np.arange(len(cfg), dtype=np.int32), np.diff(succ_offsets)))
+        targets.append(np.frombuffer(cfg.successor_targets, dtype=np.int32))
+    edges = np.empty((int(edge_offsets[-1]), 2), dtype=np.int32)
+    if sources:
+        edges[:, 0] = np.concatenate(sources)
+        edges[:, 1] = np.concatenate(targets)
+
+    arrays: dict[str, Any] = {
+        "block_offsets": block_offsets,
+        "edge_offsets": edge_offsets,
+        "edges": edges,
+        "instruction_offsets": np.array(instruction_offsets, dtype=np.int64),
+    }
+    texts = {
+        "name": [cfg.name for cfg, _, _ in entries],
+        "language": [language for _, language, _ in entries],
+        "source": [source for _, _, source in entries],
+        "label": labels,
+        "instruction": instructions,
+    }
+    for column, strings in texts.items():
+        arrays[f"{column}_text_offsets"], arrays[f"{column}_text"] = _text_column(strings)
+
+    data = bytearray()
+    columns: dict[str, Any] = {}
+    for column, array in arrays.items():
+        data.extend(bytes(-len(data) % _ALIGN))
+        columns[column] = {
+            "offset": len(data),
+            "dtype": array.dtype.newbyteorder("<").str,
+            "shape": list(array.shape),
+        }
+        data.extend(array.astype(array.dtype.newbyteorder("<"), copy=False).tobytes())
+    return bytes(data), columns
+
+
+class DatasetWriter:
+    """Write CFGs into a sharded dataset directory.
+
+    Functions are buffered until a shard is full; :meth:`close` writes the
+    last, partial shard and the index. Writing into a directory that
+    already holds a dataset replaces it: the old index is removed up front
+    and shards it listed but the new dataset does not use are deleted on
+    close.
+
+    Parameters
+    ----------
+    directory : str | Path
+        Dataset directory, created if needed.
+    shard_size : int
+        Functions per shard.
+
+    Raises
+    ------
+    ValueError
+        If shard_size is not positive.
+    RuntimeError
+        If numpy is not installed.
+    """
+
+    def __init__(self, directory: str | Path, shard_size: int = DEFAULT_SHARD_SIZE) -> None:
+        if shard_size < 1:
+            msg = f"shard_size must be positive, got {shard_size}"
+            raise ValueError(msg)
+        require_numpy()
+        self.directory = Path(directory)
+        self.shard_size = shard_size
+        self._pending: list[tuple[FunctionCFG, str, str]] = []
+        self._shards: list[dict[str, Any]] = []
+        self._closed = False
+        self.directory.mkdir(parents=True, exist_ok=True)
+        (self.directory / INDEX_NAME).unlink(missing_ok=True)
+
+    def add(self, cfg: FunctionCFG, language: Language | str, source: str | Path = "") -> None:
+        """Append one function.
+
+        Parameters
+        ----------
+        cfg : FunctionCFG
+            The function's CFG.
+        language : Language | str
+            Source language, stored as its extension (``"c"``, ``"py"`` ...).
+        source : str | Path
+            File the function came from.
+        """
+        if self._closed:
+            msg = "DatasetWriter is closed"
+            raise ValueError(msg)
+        if isinstance(language, Language):
+            language = language.value
+        self._pending.append((cfg, language, str(source)))
+        if len(self._pending) >= self.shard_size:
+            self._flush()
+
+    def extend(
+        self, cfgs: Iterable[FunctionCFG], language: Language | str, source: str | Path = ""
+    ) -> None:
+        """Append several functions from the same source file."""
+        for cfg in cfgs:
+            self.add(cfg, language, source)
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        name = _shard_name(len(self._shards))
+        data, columns = _pack_shard(self._pending)
+        atomic_write_bytes(self.directory / name, data)
+        self._shards.append({"file": name, "functions": len(self._pending), "columns": columns})
+        self._pending = []
+
+    def close(self) -> Path:
+        """Write the remaining functions and the index; return the index path."""
+        index_path = self.directory / INDEX_NAME
+        if self._closed:
+            return index_path
+        self._flush()
+        self._closed = True
+        doc = {
+            "format": _FORMAT,
+            "version": _VERSION,
+            "shard_size": self.shard_size,
+            "functions": sum(shard["functions"] for shard in self._shards),
+            "shards": self._shards,
+        }
+        atomic_write_text(index_path, json.dumps(doc, indent=1) + "\n")
+        used = {shard["file"] for shard in self._shards}
+        for stale in self.directory.glob("shard-*.bin"):
+            if stale.name not in used:
+                stale.unlink(missing_ok=True)
+        logger.info(
+            "Wrote %d functions in %d shards to %s",
+            doc["functions"],
+            len(self._shards),
+            self.directory,
+        )
+        return index_path
+
+    def __enter__(self) -> DatasetWriter:
+        return self
+
+    def __exit__(self, exc_type: object, *exc: object) -> None:
+        # An export that failed leaves no index, so readers never see it
+        if exc_type is None:
+            self.close()
+
+
+def write_dataset(
+    directory: str | Path,
+    items: Iterable[tuple[FunctionCFG, Language | str, str | Path]],
+    shard_size: int = DEFAULT_SHARD_SIZE,
+) -> Path:
+    """Write (cfg, language, source) triples as a dataset; return the index path."""
+    with DatasetWriter(directory, shard_size) as writer:
+        for cfg, language, source in items:
+            writer.add(cfg, language, source)
+    return writer.close()
+
+
+@dataclass(frozen=True)
+class CFGRecord:
+    """One function read back from a dataset.
+
+    Attributes
+    ----------
+    name : str
+        Function name.
+    language : str
+        Source language extension.
+    source : str
+        File the function came from, or an empty string.
+    labels : tuple of str
+        Block labels in layout order.
+    instructions : tuple of tuple of str
+        Instruction text of each block.
+    edges : numpy.ndarray
+        ``(E, 2)`` int32 (source, target) block indices, grouped by source.
+        A read-only view into the memory-mapped shard.
+    """
+
+    name: str
+    language: str
+    source: str
+    labels: tuple[str, ...]
+    instructions: tuple[tuple[str, ...], ...]
+    edges: Any
+
+    def to_cfg(self, pool: StringPool | None = None) -> FunctionCFG:
+        """Rebuild the :class:`~struco.graph.FunctionCFG`, interning into pool."""
+        cfg = FunctionCFG(self.name, pool)
+        intern = cfg.pool.intern
+        for label, block in zip(self.labels, self.instructions, strict=True):
+            cfg.label_ids.append(intern(label))
+            for instruction in block:
+                cfg.instruction_ids.append(intern(instruction))
+                cfg.opcode_ids.append(intern(opcode(instruction)))
+            cfg.instruction_offsets.append(len(cfg.instruction_ids))
+        np = require_numpy()
+        counts = np.bincount(self.edges[:, 0], minlength=len(self.labels))
+        cfg.successor_offsets.extend(np.cumsum(counts).tolist())
+        cfg.successor_targets.extend(self.edges[:, 1].tolist())
+        return cfg
+
+
+class _Shard:
+    """Read-only numpy views onto one memory-mapped shard file."""
+
+    def __init__(self, path: Path, columns: dict[str, Any]) -> None:
+        np = require_numpy()
+        with path.open("rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._starts = {column: spec["offset"] for column, spec in columns.items()}
+        self.columns: dict[str, Any] = {}
+        for column, spec in columns.items():
+            shape = tuple(spec["shape"])
+            count = int(np.prod(shape, dtype=np.int64))
+            array = np.frombuffer(self._mmap, spec["dtype"], count=count, offset=spec["offset"])
+            self.columns[column] = array.reshape(shape)
+
+    def texts(self, column: str, start: int, stop: int) -> list[str]:
+        """Decode entries start..stop - 1 of a text column."""
+        offsets = self.columns[f"{column}_text_offsets"][start : stop + 1].tolist()
+        base = self._starts[f"{column}_text"]
+        view = self._view
+        return [
+            str(view[base + lo : base + hi], "utf-8")
+            for lo, hi in zip(offsets, offsets[1:], strict=False)
+        ]
+
+    def record(self, i: int) -> CFGRecord:
+        columns = self.columns
+        block_lo, block_hi = columns["block_offsets"][i : i + 2].tolist()
+        edge_lo, edge_hi = columns["edge_offsets"][i : i + 2].tolist()
+        bounds = columns["instruction_offsets"][block_lo : block_hi + 1].tolist()
+        first = bounds[0]
+        text = self.texts("instruction", first, bounds[-1])
+        name, language, source = (self.texts(column, i, i + 1)[0] for column in _FUNCTION_TEXT)
+        return CFGRecord(
+            name=name,
+            language=language,
+            source=source,
+            labels=tuple(self.texts("label", block_lo, block_hi)),
+            instructions=tuple(
+                tuple(text[lo - first : hi - first])
+                for lo, hi in zip(bounds, bounds[1:], strict=False)
+            ),
+            edges=columns["edges"][edge_lo:edge_hi],
+        )
+
+    def close(self) -> None:
+        self.columns = {}
+        self._view.release()
+        # Records may still hold edge views; the map then closes when they go away
+        with contextlib.suppress(BufferError):
+            self._mmap.close()
+
+
+class Dataset:
+    """Random-access, memory-mapped reader for a dataset directory.
+
+    Shards are mapped lazily the first time one of their functions is read,
+    so opening a dataset costs one small JSON read. Indexing returns a
+    :class:`CFGRecord`; iteration walks the shards in order. To spread a
+    dataset over data loader workers, give each worker whole shards with
+    :meth:`iter_shard`.
+
+    Parameters
+    ----------
+    directory : str | Path
+        Directory written by :class:`DatasetWriter`.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the directory has no index (missing or incomplete dataset).
+    ValueError
+        If the index is not a struco dataset index of a known version.
+    RuntimeError
+        If numpy is not installed.
+    """
+
+    def __init__(self, directory: str | Path) -> None:
+        require_numpy()
+        self.directory = Path(directory)
+        index_path = self.directory / INDEX_NAME
+        try:
+            doc = json.loads(index_path.read_text())
+        except FileNotFoundError:
+            msg = f"No dataset index at {index_path}"
+            raise FileNotFoundError(msg) from None
+        if doc.get("format") != _FORMAT or doc.get("version") != _VERSION:
+            msg = f"{index_path} is not a version {_VERSION} struco dataset index"
+            raise ValueError(msg)
+        self._specs: list[dict[str, Any]] = doc["shards"]
+        self._starts = [0]
+        for spec in self._specs:
+            self._starts.append(self._starts[-1] + spec["functions"])
+        self._shards: dict[int, _Shard] = {}
+
+    def __len__(self) -> int:
+        return self._starts[-1]
+
+    @property
+    def num_shards(self) -> int:
+        """Number of shard files."""
+        return len(self._specs)
+
+    def _shard(self, index: int) -> _Shard:
+        shard = self._shards.get(index)
+        if shard is None:
+            spec = self._specs[index]
+            shard = _Shard(self.directory / spec["file"], spec["columns"])
+            self._shards[index] = shard
+        return shard
+
+    def __getitem__(self, i: int) -> CFGRecord:
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            msg = f"dataset index {i} out of range for {n} functions"
+            raise IndexError(msg)
+        shard = bisect.bisect_right(self._starts, i) - 1
+        return self._shard(shard).record(i - self._starts[shard])
+
+    def iter_shard(self, index: int) -> Iterator[CFGRecord]:
+        """Yield the functions of one shard in order."""
+        shard = self._shard(index)
+        for i in range(self._specs[index]["functions"]):
+            yield shard.record(i)
+
+    def __iter__(self) -> Iterator[CFGRecord]:
+        for index in range(self.num_shards):
+            yield from self.iter_shard(index)
+
+    def close(self) -> None:
+        """Unmap every shard."""
+        for shard in self._shards.values():
+            shard.close()
+        self._shards.clear()
+
+    def __enter__(self) -> Dataset:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+def _language_of(path: Path) -> str:
+    """Return the language extension of an IR file or a source file."""
+    if path.suffix == ".ll":
+        # IR files are named <stem>_<ext>.ll by extract_ir
+        return path.stem.rpartition("_")[2]
+    return path.suffix.lstrip(".")
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Export the CFGs in the given files as a sharded dataset."""
+    parser = argparse.ArgumentParser(description="Export CFGs as a sharded dataset")
+    parser.add_argument("paths", nargs="+", help=".ll files, or sources for the ast engine")
+    parser.add_argument("-o", "--output", required=True, help="Dataset directory")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(name)s | %(levelname)s | %(message)s")
+
+    try:
+        writer = DatasetWriter(args.output, args.shard_size)
+    except (ValueError, RuntimeError) as exc:
+        logger.error("%s", exc)
+        return 1
+    for path in map(Path, args.paths):
+        try:
+            writer.extend(load_cfgs(path), _language_of(path), path)
+        except (FileNotFoundError, ValueError, RuntimeError) as exc:
+            logger.error("%s", exc)
+            return 1
+    writer.close()
+    return 0
+
+
+__all__ = [
+    "DEFAULT_SHARD_SIZE",
+    "INDEX_NAME",
+    "CFGRecord",
+    "Dataset",
+    "DatasetWriter",
+    "write_dataset",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+"""Structural deduplication of function CFGs.
+
+Template instantiations and copy-pasted helpers produce many CFGs that
+differ only in names and operands. :func:`structural_hash` gives every CFG a
+key that is equal exactly when two graphs have the same blocks in the same
+order, the same opcode sequence in every block and the same successor
+edges; labels, operands and the function name are ignored.
+
+With deduplication enabled, :func:`struco.cfg.extract_cfg_from_ir` renders
+or serializes one artifact per distinct key and records in a manifest
+(``dedup.json`` next to the artifacts) which artifact each function maps
+to. With a shape store directory, artifacts are named by key and shared by
+every file written to the same store, so a shape seen in an earlier file
+or by another batch worker is not rendered again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sys
+from array import array
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+from struco.graph import FunctionCFG
+
+# Manifest written next to deduplicated artifacts
+MANIFEST_NAME = "dedup.json"
+
+
+def _little_endian(buf: array) -> bytes:
+    if sys.byteorder == "little":
+        return buf.tobytes()
+    swapped = array(buf.typecode, buf)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def structural_hash(cfg: FunctionCFG) -> str:
+    """Return the structural key of a CFG as a hex string.
+
+    Two CFGs get the same key when their blocks, per-block opcode sequences
+    and successor edges (by block index) are identical.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    pool = cfg.pool
+    digest.update(_little_endian(cfg.instruction_offsets))
+    digest.update("\0".join(pool[idx] for idx in cfg.opcode_ids).encode())
+    digest.update(b"\1")
+    digest.update(_little_endian(cfg.successor_offsets))
+    digest.update(_little_endian(cfg.successor_targets))
+    return digest.hexdigest()
+
+
+def group_by_shape(cfgs: Iterable[FunctionCFG]) -> dict[str, list[FunctionCFG]]:
+    """Group CFGs by :func:`structural_hash`, keeping first-seen order."""
+    groups: dict[str, list[FunctionCFG]] = {}
+    for cfg in cfgs:
+        groups.setdefault(structural_hash(cfg), []).append(cfg)
+    return groups
+
+
+@dataclass(frozen=True)
+class DedupEntry:
+    """Where the output of one function lives after deduplication.
+
+    Attributes
+    ----------
+    function : str
+        Function name.
+    shape : str
+        Its :func:`structural_hash`.
+    output : Path
+        The shared artifact for this shape.
+    canonical : bool
+        True if the artifact was produced from this function's CFG.
+    """
+
+    function: str
+    shape: str
+    output: Path
+    canonical: bool
+
+
+def manifest_text(entries: Sequence[DedupEntry], output_format: str) -> str:
+    """Return the manifest JSON for a file's deduplicated outputs."""
+    shapes = {entry.shape for entry in entries}
+    doc = {
+        "format": output_format,
+        "functions": len(entries),
+        "shapes": len(shapes),
+        "entries": {
+            entry.function: {
+                "shape": entry.shape,
+                "output": str(entry.output),
+                "canonical": entry.canonical,
+            }
+            for entry in entries
+        },
+    }
+    return json.dumps(doc, indent=1) + "\n"
+
+
+def read_manifest(path: str | Path) -> dict[str, Path]:
+    """Return the function -> artifact mapping of a manifest.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the manifest does not exist.
+    """
+    doc = json.loads(Path(path).read_text())
+    return {name: Path(entry["output"]) for name, entry in doc["entries"].items()}
+
+
+__all__ = [
+    "MANIFEST_NAME",
+    "DedupEntry",
+    "group_by_shape",
+    "manifest_text",
+    "read_manifest",
+    "structural_hash",
+]
@@ -0,0 +1,425 @@
+"""Vectorized structural features over many CFGs at once.
+
+:func:`extract_features` flattens a corpus of :class:`~struco.graph.FunctionCFG`
+objects into one global node numbering and one edge array, straight from
+their CSR buffers, and computes every feature with NumPy array operations
+instead of a Python loop per graph or per block. The result is a single
+``int64`` matrix with one row per function:
+
+- ``blocks``, ``edges``, ``instructions``: sizes
+- ``exits``: blocks without successors (returns, ``unreachable``)
+- ``back_edges``: edges to the same or an earlier block in layout order;
+  for compiler-emitted and ast-engine layouts these are the loop latches
+- ``loop_headers``: distinct targets of back edges
+- ``out_degree_<k>`` / ``in_degree_<k>``: block degree histograms, the
+  last bin counting every degree of at least ``k``
+- ``wl_<i>``: Weisfeiler-Lehman graph hash after ``i`` refinement rounds
+  (64-bit, stored as ``int64``)
+
+WL node labels start from each block's terminator opcode (``br``,
+``switch``, ``ret`` ...) or, with ``node_labels="none"``, are all equal so
+that only the graph shape is hashed. Every round replaces a label by a hash
+of itself and the multisets of its successor and predecessor labels; the
+multisets are combined by summing mixed labels, which is order-independent
+and maps onto segment sums over the CSR edge arrays. Hashes are stable
+across processes and platforms and do not depend on block order.
+
+Requires numpy.
+
+Usage:
+    python -m struco.features -o features.npz <file.ll | source> [...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import logging
+import sys
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from struco.graph import FunctionCFG
+
+logger = logging.getLogger(__name__)
+
+# Initial WL node labels: terminator opcode of each block, or none (shape only)
+NODE_LABELS = ("terminator", "none")
+
+# splitmix64 finalizer constants
+_MIX_A = 0xBF58476D1CE4E5B9
+_MIX_B = 0x94D049BB133111EB
+# Salts that keep successor, predecessor and self contributions apart
+_SUCC_SALT = 0x9E3779B97F4A7C15
+_PRED_SALT = 0xC2B2AE3D27D4EB4F
+_SELF_MULT = 0x100000001B3
+
+
+def require_numpy() -> Any:
+    try:
+        import numpy as np
+    except ImportError as exc:
+        msg = "struco.features requires numpy (pip install numpy)"
+        raise RuntimeError(msg) from exc
+    return np
+
+
+@dataclass(frozen=True)
+class FeatureMatrix:
+    """Per-function features of a CFG corpus.
+
+    Attributes
+    ----------
+    rows : tuple of str
+        One name per row, by default the function names.
+    columns : tuple of str
+        Feature names, one per column.
+    values : numpy.ndarray
+        ``(len(rows), len(columns))`` int64 matrix.
+    """
+
+    rows: tuple[str, ...]
+    columns: tuple[str, ...]
+    values: Any
+
+    def column(self, name: str) -> Any:
+        """Return the values of one feature as a 1-d array."""
+        return self.values[:, self.columns.index(name)]
+
+    def wl_hashes(self) -> Any:
+        """Return the WL hash columns as a ``(rows, rounds + 1)`` uint64 array."""
+        indices = [i for i, name in enumerate(self.columns) if name.startswith("wl_")]
+        return self.values[:, indices].view(require_numpy().uint64)
+
+    def to_npz(self) -> bytes:
+        """Serialize as ``.npz`` with ``values``, ``columns`` and ``rows`` arrays."""
+        np = require_numpy()
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            values=self.values,
+            columns=np.array(self.columns, dtype=str),
+            rows=np.array(self.rows, dtype=str),
+        )
+        return buffer.getvalue()
+
+    def save(self, path: str | Path) -> None:
+        """Write the matrix to an ``.npz`` file, replacing it atomically."""
+        from struco.cfg import atomic_write_bytes
+
+        atomic_write_bytes(Path(path), self.to_npz())
+
+    @classmethod
+    def load(cls, path: str | Path) -> FeatureMatrix:
+        """Read a matrix written by :meth:`save`."""
+        np = require_numpy()
+        with np.load(path) as data:
+            return cls(
+                rows=tuple(str(row) for row in data["rows"]),
+                columns=tuple(str(col) for col in data["columns"]),
+                values=data["values"],
+            )
+
+
+@dataclass(frozen=True)
+class _Flat:
+    """A corpus of CFGs as one disjoint graph with global node ids."""
+
+    n_blocks: Any  # (G,) blocks per graph
+    node_offsets: Any  # (G + 1,) first global node of each graph
+    node_graph: Any  # (N,) graph of each node
+    out_degree: Any  # (N,)
+    in_degree: Any  # (N,)
+    src: Any  # (E,) global source node, grouped by source
+    dst: Any  # (E,) global target node
+    edge_graph: Any  # (E,) graph of each edge
+    n_instructions: Any  # (G,)
+    instruction_start: Any  # (N,) global instruction range of each node
+    instruction_end: Any  # (N,)
+
+
+def _join(buffers: list[Any], dtype: Any) -> Any:
+    """Concatenate array buffers with one copy and widen them to int64."""
+    np = require_numpy()
+    return np.frombuffer(b"".join(buffers), dtype=dtype).astype(np.int64)
+
+
+def _flatten(cfgs: Sequence[FunctionCFG]) -> _Flat:
+    """Concatenate the CSR buffers of all graphs into global arrays."""
+    np = require_numpy()
+    n_graphs = len(cfgs)
+    n_blocks = np.fromiter((len(cfg) for cfg in cfgs), dtype=np.int64, count=n_graphs)
+    node_offsets = np.zeros(n_graphs + 1, dtype=np.int64)
+    np.cumsum(n_blocks, out=node_offsets[1:])
+    n_nodes = int(node_offsets[-1])
+    node_graph = np.repeat(np.arange(n_graphs, dtype=np.int64), n_blocks)
+
+    # Each graph contributes N + 1 offsets; node i of graph g starts at i + g
+    succ_offsets = _join([cfg.successor_offsets for cfg in cfgs], np.uint32)
+    instr_offsets = _join([cfg.instruction_offsets for cfg in cfgs], np.uint32)
+    first = np.arange(n_nodes, dtype=np.int64) + node_graph
+    last = node_offsets[1:] + np.arange(n_graphs, dtype=np.int64)
+    out_degree = succ_offsets[first + 1] - succ_offsets[first]
+    n_edges = succ_offsets[last]
+    n_instructions = instr_offsets[last]
+    instruction_base = np.zeros(n_graphs, dtype=np.int64)
+    np.cumsum(n_instructions[:-1], out=instruction_base[1:])
+
+    edge_graph = np.repeat(np.arange(n_graphs, dtype=np.int64), n_edges)
+    src = np.repeat(np.arange(n_nodes, dtype=np.int64), out_degree)
+    dst = _join([cfg.successor_targets for cfg in cfgs], np.int32) + node_offsets[edge_graph]
+    in_degree = np.bincount(dst, minlength=n_nodes).astype(np.int64)
+    return _Flat(
+        n_blocks=n_blocks,
+        node_offsets=node_offsets,
+        node_graph=node_graph,
+        out_degree=out_degree,
+        in_degree=in_degree,
+        src=src,
+        dst=dst,
+        edge_graph=edge_graph,
+        n_instructions=n_instructions,
+        instruction_start=instr_offsets[first] + instruction_base[node_graph],
+        instruction_end=instr_offsets[first + 1] + instruction_base[node_graph],
+    )
+
+
+def _segment_sum(values: Any, offsets: Any) -> Any:
+    """Sum values[offsets[i]:offsets[i + 1]] for every i; empty segments give 0."""
+    np = require_numpy()
+    out = np.zeros(len(offsets) - 1, dtype=values.dtype)
+    nonempty = offsets[1:] > offsets[:-1]
+    if values.size:
+        # Consecutive non-empty starts delimit exactly the non-empty segments
+        out[nonempty] = np.add.reduceat(values, offsets[:-1][nonempty])
+    return out
+
+
+def _mix(x: Any) -> Any:
+    """Apply the splitmix64 finalizer to a uint64 array (wrapping arithmetic)."""
+    np = require_numpy()
+    x = x ^ (x >> np.uint64(30))
+    x = x * np.uint64(_MIX_A)
+    x = x ^ (x >> np.uint64(27))
+    x = x * np.uint64(_MIX_B)
+    return x ^ (x >> np.uint64(31))
+
+
+def _string_hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+def _terminator_labels(cfgs: Sequence[FunctionCFG], flat: _Flat) -> Any:
+    """Return a stable uint64 label per node from its last instruction's opcode."""
+    np = require_numpy()
+    labels = np.zeros(len(flat.node_graph), dtype=np.uint64)
+    # Opcode ids are only meaningful within a pool; each file usually has its own
+    pools: dict[int, int] = {}
+    pool_of_graph = np.fromiter(
+        (pools.setdefault(id(cfg.pool), len(pools)) for cfg in cfgs),
+        dtype=np.int64,
+        count=len(cfgs),
+    )
+    pool_by_index = {pools[id(cfg.pool)]: cfg.pool for cfg in cfgs}
+
+    opcode_ids = _join([cfg.opcode_ids for cfg in cfgs], np.uint32)
+    ends = flat.instruction_end
+    nodes = np.flatnonzero(ends > flat.instruction_start)
+    keys = (pool_of_graph[flat.node_graph[nodes]] << 32) | opcode_ids[ends[nodes] - 1]
+    unique, inverse = np.unique(keys, return_inverse=True)
+    hashes = np.fromiter(
+        (_string_hash(pool_by_index[int(k) >> 32][int(k) & 0xFFFFFFFF]) for k in unique),
+        dtype=np.uint64,
+        count=len(unique),
+    )
+    labels[nodes] = hashes[inverse.reshape(-1)]
+    return labels
+
+
+def _wl_hashes(flat: _Flat, labels: Any, rounds: int) -> Any:
+    """Return ``(G, rounds + 1)`` uint64 WL graph hashes."""
+    np = require_numpy()
+    out_offsets = np.zeros(len(flat.out_degree) + 1, dtype=np.int64)
+    np.cumsum(flat.out_degree, out=out_offsets[1:])
+    in_offsets = np.zeros(len(flat.in_degree) + 1, dtype=np.int64)
+    np.cumsum(flat.in_degree, out=in_offsets[1:])
+    # Predecessor lists: sources grouped by target
+    pred_src = flat.src[np.argsort(flat.dst, kind="stable")]
+    succ_salt, pred_salt = np.uint64(_SUCC_SALT), np.uint64(_PRED_SALT)
+
+    hashes = np.empty((len(flat.n_blocks), rounds + 1), dtype=np.uint64)
+    for i in range(rounds + 1):
+        hashes[:, i] = _mix(_segment_sum(_mix(labels), flat.node_offsets) + np.uint64(i))
+        if i == rounds:
+            break
+        succ = _segment_sum(_mix(labels[flat.dst] ^ succ_salt), out_offsets)
+        pred = _segment_sum(_mix(labels[pred_src] ^ pred_salt), in_offsets)
+        labels = _mix(labels * np.uint64(_SELF_MULT) + succ + _mix(pred))
+    return hashes
+
+
+def _degree_histogram(degrees: Any, node_graph: Any, n_graphs: int, bins: int) -> Any:
+    np = require_numpy()
+    keys = node_graph * bins + np.minimum(degrees, bins - 1)
+    return np.bincount(keys, minlength=n_graphs * bins).reshape(n_graphs, bins)
+
+
+def extract_features(
+    cfgs: Sequence[FunctionCFG],
+    wl_rounds: int = 3,
+    degree_bins: int = 5,
+    node_labels: str = "terminator",
+    rows: Sequence[str] | None = None,
+) -> FeatureMatrix:
+    """Compute structural features of many CFGs in one vectorized pass.
+
+    Parameters
+    ----------
+    cfgs : sequence of FunctionCFG
+        The graphs, e.g. from :func:`struco.cfg.build_cfgs` or
+        :func:`struco.ast_cfg.build_ast_cfgs`. They may use different
+        string pools.
+    wl_rounds : int
+        Number of Weisfeiler-Lehman refinement rounds; ``wl_0`` to
+        ``wl_<wl_rounds>`` are returned.
+    degree_bins : int
+        Bins of the in/out degree histograms; the last bin collects all
+        larger degrees.
+    node_labels : str
+        Initial WL labels: "terminator" (opcode of each block's last
+        instruction) or "none".
+    rows : sequence of str or None
+        Row names. Defaults to the function names.
+
+    Returns
+    -------
+    FeatureMatrix
+        One int64 row per CFG, in input order.
+
+    Raises
+    ------
+    ValueError
+        If an argument is out of range or rows has the wrong length.
+    RuntimeError
+        If numpy is not installed.
+    """
+    if wl_rounds < 0:
+        msg = f"wl_rounds must be non-negative, got {wl_rounds}"
+        raise ValueError(msg)
+    if degree_bins < 1:
+        msg = f"degree_bins must be at least 1, got {degree_bins}"
+        raise ValueError(msg)
+    if node_labels not in NODE_LABELS:
+        msg = f"Invalid node_labels '{node_labels}'. Must be one of: {', '.join(NODE_LABELS)}."
+        raise ValueError(msg)
+    rows = tuple(rows) if rows is not None else tuple(cfg.name for cfg in cfgs)
+    if len(rows) != len(cfgs):
+        msg = f"Got {len(rows)} row names for {len(cfgs)} CFGs"
+        raise ValueError(msg)
+
+    np = require_numpy()
+    flat = _flatten(cfgs)
+    n_graphs = len(cfgs)
+
+    def per_graph(graph_ids: Any) -> Any:
+        return np.bincount(graph_ids, minlength=n_graphs).astype(np.int64)
+
+    retreating = flat.dst <= flat.src
+    headers = np.unique(flat.dst[retreating])
+    if node_labels == "terminator":
+        labels = _terminator_labels(cfgs, flat)
+    else:
+        labels = np.zeros(len(flat.node_graph), dtype=np.uint64)
+
+    blocks = [
+        flat.n_blocks[:, None],
+        per_graph(flat.edge_graph)[:, None],
+        flat.n_instructions[:, None],
+        per_graph(flat.node_graph[flat.out_degree == 0])[:, None],
+        per_graph(flat.edge_graph[retreating])[:, None],
+        per_graph(flat.node_graph[headers])[:, None],
+        _degree_histogram(flat.out_degree, flat.node_graph, n_graphs, degree_bins),
+        _degree_histogram(flat.in_degree, flat.node_graph, n_graphs, degree_bins),
+        _wl_hashes(flat, labels, wl_rounds).view(np.int64),
+    ]
+    columns = (
+        "blocks",
+        "edges",
+        "instructions",
+        "exits",
+        "back_edges",
+        "loop_headers",
+        *(f"out_degree_{k}" for k in range(degree_bins)),
+        *(f"in_degree_{k}" for k in range(degree_bins)),
+        *(f"wl_{i}" for i in range(wl_rounds + 1)),
+    )
+    values = np.hstack([b.astype(np.int64, copy=False) for b in blocks])
+    return FeatureMatrix(rows=rows, columns=columns, values=values)
+
+
+def load_cfgs(path: Path) -> list[FunctionCFG]:
+    """Build the CFGs of an IR file, or of a source file with the ast engine."""
+    from struco.cfg import EXTENSION_TO_LANGUAGE, Language, build_cfgs
+
+    if path.suffix == ".ll":
+        # IR files are named <stem>_<ext>.ll by extract_ir
+        ext = path.stem.rpartition("_")[2]
+        return build_cfgs(path, EXTENSION_TO_LANGUAGE.get(ext, Language.C))
+
+    from struco.ast_cfg import build_ast_cfgs
+
+    return build_ast_cfgs(path)
+
+
+def main(argv: Sequence[str] | None = None) -> int:
+    """Write the feature matrix of the CFGs in the given files."""
+    parser = argparse.ArgumentParser(description="Write CFG features as one matrix")
+    parser.add_argument("paths", nargs="+", help=".ll files, or sources for the ast engine")
+    parser.add_argument("-o", "--output", required=True, help="Output .npz file")
+    parser.add_argument("--wl-rounds", type=int, default=3)
+    parser.add_argument("--degree-bins", type=int, default=5)
+    parser.add_argument("--node-labels", choices=NODE_LABELS, default="terminator")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(name)s | %(levelname)s | %(message)s")
+
+    cfgs: list[FunctionCFG] = []
+    rows: list[str] = []
+    for path in map(Path, args.paths):
+        try:
+            file_cfgs = load_cfgs(path)
+        except (FileNotFoundError, ValueError, RuntimeError) as exc:
+            logger.error("%s", exc)
+            return 1
+        cfgs.extend(file_cfgs)
+        rows.extend(f"{path}:{cfg.name}" for cfg in file_cfgs)
+
+    try:
+        matrix = extract_features(
+            cfgs,
+            wl_rounds=args.wl_rounds,
+            degree_bins=args.degree_bins,
+            node_labels=args.node_labels,
+            rows=rows,
+        )
+        matrix.save(args.output)
+    except (ValueError, RuntimeError) as exc:
+        logger.error("%s", exc)
+        return 1
+    logger.info("Wrote %d x %d features to %s", *matrix.values.shape, args.output)
+    return 0
+
+
+__all__ = [
+    "NODE_LABELS",
+    "FeatureMatrix",
+    "extract_features",
+    "load_cfgs",
+    "require_numpy",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
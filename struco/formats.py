@@ -0,0 +1,183 @@
+"""Machine-readable CFG serialization.
+
+Serializes in-memory CFGs to JSON, GraphML or NumPy ``.npz`` so that
+consumers who only need the graph structure never pay for Graphviz layout.
+All formats hold the same information: basic blocks with their labels and
+instructions, and successor edges between block indices.
+"""
+
+from __future__ import annotations
+
+import io
+import json
+from xml.etree import ElementTree as ET
+
+from struco.graph import FunctionCFG
+
+# Formats rendered through Graphviz
+RENDER_FORMATS = ("png", "pdf")
+
+# Formats written directly from the in-memory CFG
+STRUCTURED_FORMATS = ("json", "graphml", "npz")
+
+OUTPUT_FORMATS = RENDER_FORMATS + STRUCTURED_FORMATS
+
+_GRAPHML_NS = "http://graphml.graphdrawing.org/xmlns"
+
+
+def to_json(cfg: FunctionCFG, language: str | None = None) -> bytes:
+    """Serialize a CFG as JSON.
+
+    The document has the keys ``function``, ``language``, ``entry`` (block
+    index), ``blocks`` (label and instruction list per block) and ``edges``
+    (``[source, target]`` block index pairs in successor order).
+    """
+    doc = {
+        "function": cfg.name,
+        "language": language,
+        "entry": 0 if len(cfg) else None,
+        "blocks": [
+            {"label": cfg.label(i), "instructions": cfg.instructions(i)} for i in range(len(cfg))
+        ],
+        "edges": [list(edge) for edge in cfg.edge_indices()],
+    }
+    return json.dumps(doc, indent=1).encode()
+
+
+def to_graphml(cfg: FunctionCFG, language: str | None = None) -> bytes:
+    """Serialize a CFG as GraphML.
+
+    Nodes carry ``label`` and newline-joined ``instructions`` attributes;
+    edges carry their successor position as ``order``.
+    """
+    ET.register_namespace("", _GRAPHML_NS)
+    root = ET.Element(f"{{{_GRAPHML_NS}}}graphml")
+    for key_id, domain, name, type_ in (
+        ("d0", "graph", "function", "string"),
+        ("d1", "graph", "language", "string"),
+        ("d2", "node", "label", "string"),
+        ("d3", "node", "instructions", "string"),
+        ("d4", "edge", "order", "int"),
+    ):
+        ET.SubElement(
+            root,
+            f"{{{_GRAPHML_NS}}}key",
+            {"id": key_id, "for": domain, "attr.name": name, "attr.type": type_},
+        )
+
+    graph = ET.SubElement(
+        root, f"{{{_GRAPHML_NS}}}graph", {"id": cfg.name, "edgedefault": "directed"}
+    )
+    ET.SubElement(graph, f"{{{_GRAPHML_NS}}}data", {"key": "d0"}).text = cfg.name
+    ET.SubElement(graph, f"{{{_GRAPHML_NS}}}data", {"key": "d1"}).text = language or ""
+
+    for i in range(len(cfg)):
+        node = ET.SubElement(graph, f"{{{_GRAPHML_NS}}}node", {"id": f"n{i}"})
+        ET.SubElement(node, f"{{{_GRAPHML_NS}}}data", {"key": "d2"}).text = cfg.label(i)
+        ET.SubElement(node, f"{{{_GRAPHML_NS}}}data", {"key": "d3"}).text = "\n".join(
+            cfg.instructions(i)
+        )
+
+    for src in range(len(cfg)):
+        for position, dst in enumerate(cfg.successors(src)):
+            edge = ET.SubElement(
+                graph, f"{{{_GRAPHML_NS}}}edge", {"source": f"n{src}", "target": f"n{dst}"}
+            )
+            ET.SubElement(edge, f"{{{_GRAPHML_NS}}}data", {"key": "d4"}).text = str(position)
+
+    return ET.tostring(root, encoding="utf-8", xml_declaration=True)
+
+
+def to_npz(cfg: FunctionCFG, language: str | None = None) -> bytes:
+    """Serialize a CFG as an uncompressed NumPy ``.npz`` archive.
+
+    Arrays:
+
+    - ``edges``: ``(E, 2)`` int32 block index pairs
+    - ``block_labels``: ``(N,)`` unicode block labels
+    - ``instruction_offsets``: ``(N + 1,)`` int64; the instructions of block
+      ``i`` are ``instructions[offsets[i]:offsets[i + 1]]``
+    - ``instructions``: ``(I,)`` unicode instruction text
+    - ``function`` / ``language``: 0-d unicode metadata
+
+    Raises
+    ------
+    RuntimeError
+        If NumPy is not installed.
+    """
+    try:
+        import numpy as np
+    except ImportError as exc:
+        msg = "The 'npz' CFG format requires numpy (pip install numpy)"
+        raise RuntimeError(msg) from exc
+
+    pool = cfg.pool
+    edges = np.column_stack(
+        (
+            np.repeat(
+                np.arange(len(cfg), dtype=np.int32),
+                np.diff(np.frombuffer(cfg.successor_offsets, dtype=np.uint32)),
+            ),
+            np.frombuffer(cfg.successor_targets, dtype=np.int32),
+        )
+    ).reshape(-1, 2)
+    buffer = io.BytesIO()
+    np.savez(
+        buffer,
+        edges=edges,
+        block_labels=np.array([pool[idx] for idx in cfg.label_ids], dtype=str),
+        instruction_offsets=np.frombuffer(cfg.instruction_offsets, dtype=np.uint32).astype(
+            np.int64
+        ),
+        instructions=np.array([pool[idx] for idx in cfg.instruction_ids], dtype=str),
+        function=np.array(cfg.name),
+        language=np.array(language or ""),
+    )
+    return buffer.getvalue()
+
+
+_SERIALIZERS = {
+    "json": to_json,
+    "graphml": to_graphml,
+    "npz": to_npz,
+}
+
+
+def serialize_cfg(cfg: FunctionCFG, fmt: str, language: str | None = None) -> bytes:
+    """Serialize a CFG in one of the structured formats.
+
+    Parameters
+    ----------
+    cfg : FunctionCFG
+        The graph to serialize.
+    fmt : str
+        One of "json", "graphml" or "npz".
+    language : str or None
+        Source language tag stored alongside the graph.
+
+    Returns
+    -------
+    bytes
+        The encoded document.
+
+    Raises
+    ------
+    ValueError
+        If fmt is not a structured format.
+    """
+    serializer = _SERIALIZERS.get(fmt)
+    if serializer is None:
+        msg = f"Unsupported structured format '{fmt}'. Must be one of: {', '.join(_SERIALIZERS)}."
+        raise ValueError(msg)
+    return serializer(cfg, language)
+
+
+__all__ = [
+    "OUTPUT_FORMATS",
+    "RENDER_FORMATS",
+    "STRUCTURED_FORMATS",
+    "serialize_cfg",
+    "to_graphml",
+    "to_json",
+    "to_npz",
+]
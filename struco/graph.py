@@ -0,0 +1,332 @@
+"""Compact, array-backed control flow graphs.
+
+A :class:`FunctionCFG` stores its blocks in flat ``array`` buffers with CSR
+(compressed sparse row) offsets instead of one Python object per block,
+instruction and edge. Instruction and opcode text is interned in a
+:class:`StringPool`, so repeated instructions are stored once. The parsers
+create a pool per file unless one is passed in, so a long-running process
+does not keep the strings of every file it has seen; share a pool (for
+example :data:`DEFAULT_POOL`) explicitly to deduplicate strings over a
+corpus. Memory per block is fixed by the array item sizes plus the pool:
+
+- 12 bytes per block (label id, instruction offset, successor offset)
+- 8 bytes per instruction (text id, opcode id)
+- 4 bytes per successor edge
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+_OPCODE = re.compile(r"^(?:%\S+\s*=\s*)?(?:tail\s+|musttail\s+|notail\s+)?(\w+)")
+_SWITCH_CASE = re.compile(r"\w+\s+(-?\w+),\s*label\s+%")
+
+
+def opcode(instruction: str) -> str:
+    """Return the opcode of an instruction, e.g. ``"br"`` or ``"call"``."""
+    match = _OPCODE.match(instruction)
+    return match.group(1) if match else ""
+
+
+class StringPool:
+    """Append-only table mapping strings to dense integer ids.
+
+    Interning is thread-safe; lookups by id are lock-free.
+    """
+
+    __slots__ = ("_ids", "_lock", "_strings")
+
+    def __init__(self) -> None:
+        self._strings: list[str] = []
+        self._ids: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def intern(self, text: str) -> int:
+        """Return the id of text, adding it to the pool if needed."""
+        idx = self._ids.get(text)
+        if idx is not None:
+            return idx
+        with self._lock:
+            idx = self._ids.get(text)
+            if idx is None:
+                idx = len(self._strings)
+                self._strings.append(text)
+                self._ids[text] = idx
+            return idx
+
+    def __getitem__(self, idx: int) -> str:
+        return self._strings[idx]
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+
+# Process-wide pool for callers that want to share strings across all their graphs
+DEFAULT_POOL = StringPool()
+
+
+@dataclass
+class BasicBlock:
+    """A basic block of an LLVM function.
+
+    Used while parsing and as a materialized view of one block of a
+    :class:`FunctionCFG`; the graph itself does not hold these objects.
+
+    Attributes
+    ----------
+    label : str
+        Block label without the leading ``%`` (numeric for unnamed blocks).
+    instructions : list[str]
+        Instruction text, one entry per instruction.
+    successors : list[str]
+        Labels of successor blocks, in terminator operand order.
+    """
+
+    label: str
+    instructions: list[str] = field(default_factory=list)
+    successors: list[str] = field(default_factory=list)
+
+
+class FunctionCFG:
+    """Control flow graph of a single function in CSR form.
+
+    Blocks are identified by their index in IR order; block 0 is the entry
+    block. The instructions of block ``i`` are
+    ``instruction_ids[instruction_offsets[i]:instruction_offsets[i + 1]]``
+    and its successors are
+    ``successor_targets[successor_offsets[i]:successor_offsets[i + 1]]``,
+    in terminator operand order (duplicates kept, e.g. for switch cases
+    sharing a destination). All ids index into :attr:`pool`.
+
+    Attributes
+    ----------
+    name : str
+        Function name as it appears in the IR (mangled for C++).
+    pool : StringPool
+        Pool holding the label, instruction and opcode strings. A new pool
+        is created if none is given.
+    label_ids : array of uint32
+        Label string id per block.
+    instruction_offsets : array of uint32
+        ``N + 1`` offsets into the instruction arrays.
+    instruction_ids : array of uint32
+        Instruction string id per instruction.
+    opcode_ids : array of uint32
+        Opcode string id per instruction.
+    successor_offsets : array of uint32
+        ``N + 1`` offsets into :attr:`successor_targets`.
+    successor_targets : array of int32
+        Successor block index per edge.
+    """
+
+    __slots__ = (
+        "instruction_ids",
+        "instruction_offsets",
+        "label_ids",
+        "name",
+        "opcode_ids",
+        "pool",
+        "successor_offsets",
+        "successor_targets",
+    )
+
+    def __init__(self, name: str, pool: StringPool | None = None) -> None:
+        self.name = name
+        self.pool = pool if pool is not None else StringPool()
+        self.label_ids = array("I")
+        self.instruction_offsets = array("I", [0])
+        self.instruction_ids = array("I")
+        self.opcode_ids = array("I")
+        self.successor_offsets = array("I", [0])
+        self.successor_targets = array("i")
+
+    @classmethod
+    def from_blocks(
+        cls, name: str, blocks: Sequence[BasicBlock], pool: StringPool | None = None
+    ) -> FunctionCFG:
+        """Build a compact CFG from parsed basic blocks.
+
+        Successor labels that do not name a block of the function are
+        dropped.
+        """
+        cfg = cls(name, pool)
+        intern = cfg.pool.intern
+        index = {block.label: i for i, block in enumerate(blocks)}
+        for block in blocks:
+            cfg.label_ids.append(intern(block.label))
+            for instruction in block.instructions:
+                cfg.instruction_ids.append(intern(instruction))
+                cfg.opcode_ids.append(intern(opcode(instruction)))
+            cfg.instruction_offsets.append(len(cfg.instruction_ids))
+            cfg.successor_targets.extend(index[s] for s in block.successors if s in index)
+            cfg.successor_offsets.append(len(cfg.successor_targets))
+        return cfg
+
+    def __len__(self) -> int:
+        return len(self.label_ids)
+
+    def __repr__(self) -> str:
+        return (
+            f"FunctionCFG(name={self.name!r}, blocks={len(self)}, "
+            f"edges={len(self.successor_targets)})"
+        )
+
+    def label(self, i: int) -> str:
+        """Return the label of block i."""
+        return self.pool[self.label_ids[i]]
+
+    def instructions(self, i: int) -> list[str]:
+        """Return the instruction text of block i."""
+        lo, hi = self.instruction_offsets[i], self.instruction_offsets[i + 1]
+        return [self.pool[idx] for idx in self.instruction_ids[lo:hi]]
+
+    def opcodes(self, i: int) -> list[str]:
+        """Return the opcodes of the instructions of block i."""
+        lo, hi = self.instruction_offsets[i], self.instruction_offsets[i + 1]
+        return [self.pool[idx] for idx in self.opcode_ids[lo:hi]]
+
+    def successors(self, i: int) -> array:
+        """Return the successor block indices of block i."""
+        return self.successor_targets[self.successor_offsets[i] : self.successor_offsets[i + 1]]
+
+    def block(self, i: int) -> BasicBlock:
+        """Materialize block i as a :class:`BasicBlock`."""
+        return BasicBlock(
+            label=self.label(i),
+            instructions=self.instructions(i),
+            successors=[self.label(j) for j in self.successors(i)],
+        )
+
+    @property
+    def blocks(self) -> list[BasicBlock]:
+        """All blocks materialized as :class:`BasicBlock` objects.
+
+        Builds new objects on every access; prefer the index-based accessors
+        for large graphs.
+        """
+        return [self.block(i) for i in range(len(self))]
+
+    @property
+    def entry(self) -> BasicBlock | None:
+        """The entry block, or None for an empty function."""
+        return self.block(0) if len(self) else None
+
+    def edge_indices(self) -> Iterator[tuple[int, int]]:
+        """Yield all (source index, target index) edges in block order."""
+        offsets = self.successor_offsets
+        targets = self.successor_targets
+        for i in range(len(self)):
+            for k in range(offsets[i], offsets[i + 1]):
+                yield i, targets[k]
+
+    def edges(self) -> list[tuple[str, str]]:
+        """Return all (source label, target label) edges."""
+        return [(self.label(i), self.label(j)) for i, j in self.edge_indices()]
+
+    def nbytes(self) -> int:
+        """Return the size of the graph's array buffers in bytes.
+
+        Strings live in the pool and are not counted.
+        """
+        buffers: Iterable[array] = (
+            self.label_ids,
+            self.instruction_offsets,
+            self.instruction_ids,
+            self.opcode_ids,
+            self.successor_offsets,
+            self.successor_targets,
+        )
+        return sum(buf.itemsize * len(buf) for buf in buffers)
+
+    def to_networkx(self) -> Any:
+        """Return the CFG as a ``networkx.DiGraph``.
+
+        Nodes are block indices with ``label`` and ``instructions``
+        attributes. Parallel edges (switch cases with a shared destination)
+        collapse into one.
+
+        Raises
+        ------
+        RuntimeError
+            If networkx is not installed.
+        """
+        try:
+            import networkx as nx
+        except ImportError as exc:
+            msg = "FunctionCFG.to_networkx requires networkx (pip install networkx)"
+            raise RuntimeError(msg) from exc
+
+        graph = nx.DiGraph(name=self.name)
+        for i in range(len(self)):
+            graph.add_node(i, label=self.label(i), instructions=self.instructions(i))
+        graph.add_edges_from(self.edge_indices())
+        return graph
+
+    def to_dot(self) -> str:
+        """Render the CFG in Graphviz dot syntax, in the style of ``opt -dot-cfg``."""
+        title = f"CFG for '{_escape_string(self.name)}' function"
+        lines = [f'digraph "{title}" {{', f'\tlabel="{title}";', ""]
+        for i in range(len(self)):
+            label = self.label(i)
+            instructions = self.instructions(i)
+            successors = self.successors(i)
+            header = f"%{label}" if label.isdigit() else label
+            body = "".join(f"  {_escape_record(instr)}\\l" for instr in instructions)
+            text = f"{_escape_record(header)}:\\l{body}"
+            if len(successors) > 1:
+                names = _port_names(instructions[-1], len(successors))
+                ports = "|".join(f"<s{j}>{_escape_record(n)}" for j, n in enumerate(names))
+                text = f"{text}|{{{ports}}}"
+            lines.append(f'\tNode{i} [shape=record,label="{{{text}}}"];')
+            for j, succ in enumerate(successors):
+                port = f":s{j}" if len(successors) > 1 else ""
+                lines.append(f"\tNode{i}{port} -> Node{succ};")
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+
+def _port_names(terminator: str, count: int) -> list[str]:
+    """Return edge port labels for a multi-successor terminator.
+
+    Conditional branches use ``T``/``F`` and switches use ``def`` followed by
+    the case values, matching ``opt -dot-cfg``; other terminators are
+    numbered.
+    """
+    op = opcode(terminator)
+    if op == "br" and count == 2:
+        return ["T", "F"]
+    if op == "switch":
+        cases = _SWITCH_CASE.findall(terminator)
+        if len(cases) == count - 1:
+            return ["def", *cases]
+    return [str(j) for j in range(count)]
+
+
+def _escape_string(text: str) -> str:
+    """Escape text for use inside a double-quoted dot string."""
+    return text.replace("\\", "\\\\").replace('"', '\\"')
+
+
+def _escape_record(text: str) -> str:
+    """Escape text for use inside a dot record label."""
+    out = []
+    for ch in text:
+        if ch in '{}<>|"\\':
+            out.append("\\" + ch)
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+__all__ = [
+    "DEFAULT_POOL",
+    "BasicBlock",
+    "FunctionCFG",
+    "StringPool",
+    "opcode",
+]
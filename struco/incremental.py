@@ -0,0 +1,564 @@
+"""Incremental rebuilds driven by file stamps and compiler dependency files.
+
+Each source gets a manifest next to its IR recording the source and header
+stamps (mtime, size and content hash), the options the CFGs were built with,
+a digest of every function's IR and the file written for it. On a re-run a
+source whose stamps and options are unchanged is skipped without invoking
+the compiler; otherwise the IR is rebuilt and only functions whose IR
+digest changed are re-rendered. With an opt pipeline, which can inline a
+callee into its callers, a function's digest also covers every function it
+calls directly or transitively. Changing the options deletes the outputs
+of the previous build before rendering again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+from collections.abc import Iterator, Sequence
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+from struco.cache import IRCache
+from struco.cfg import (
+    Language,
+    extract_cfg_from_ir,
+    extract_ir,
+    get_function_names,
+    ir_output_path,
+    resolve_opt_pipeline,
+)
+from struco.compdb import CompilationDatabase
+from struco.ir import iter_function_definitions
+from struco.pch import PchPlan
+from struco.symbols import SymbolFilter, file_stem
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "struco-manifest.json"
+MANIFEST_VERSION = 1
+
+# cfg_options that change what is written (render_timeout can turn a CFG into its
+# structure-only fallback); render_jobs only changes how
+_OUTPUT_OPTIONS = (
+    "output_format",
+    "engine",
+    "functions",
+    "include_namespaces",
+    "exclude_namespaces",
+    "opt_pipeline",
+    "summarize",
+    "layout_threshold",
+    "render_timeout",
+)
+
+# Attribute group and metadata references are renumbered module-wide when
+# unrelated code changes, so they are excluded from function digests
+_VOLATILE_REFS = re.compile(rb"#\d+|!\d+")
+
+# Global identifiers a function body refers to
+_GLOBAL_REF = re.compile(rb'@(?:"([^"]*)"|([-\w$.]+))')
+
+
+@dataclass(frozen=True)
+class FileStamp:
+    """Identity of a file's contents at a point in time.
+
+    Attributes
+    ----------
+    path : str
+        Absolute path of the file.
+    mtime_ns : int
+        Modification time in nanoseconds.
+    size : int
+        Size in bytes.
+    digest : str
+        SHA-256 of the contents, used when the mtime changed but the
+        contents may not have.
+    """
+
+    path: str
+    mtime_ns: int
+    size: int
+    digest: str
+
+    @classmethod
+    def of(cls, path: str | Path) -> FileStamp:
+        """Stamp a file as it is now."""
+        path = Path(path)
+        st = path.stat()
+        return cls(str(path), st.st_mtime_ns, st.st_size, _file_digest(path))
+
+    def is_current(self) -> bool:
+        """Return True if the file still has the stamped contents."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        if st.st_mtime_ns == self.mtime_ns and st.st_size == self.size:
+            return True
+        return st.st_size == self.size and _file_digest(Path(self.path)) == self.digest
+
+
+@dataclass
+class Manifest:
+    """Build record of one source file.
+
+    Attributes
+    ----------
+    options : dict
+        Output-affecting options the CFGs were built with.
+    source : FileStamp or None
+        Stamp of the source file.
+    dependencies : list[FileStamp]
+        Stamps of the headers the source included.
+    functions : dict[str, str]
+        IR digest per rendered function (see :func:`function_digests`).
+    outputs : dict[str, str]
+        Output file per rendered function, in module order.
+    """
+
+    options: dict[str, Any] = field(default_factory=dict)
+    source: FileStamp | None = None
+    dependencies: list[FileStamp] = field(default_factory=list)
+    functions: dict[str, str] = field(default_factory=dict)
+    outputs: dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> Manifest:
+        """Read a manifest, returning an empty one if missing or unreadable."""
+        try:
+            data = json.loads(path.read_text())
+        except (OSError, ValueError):
+            return cls()
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return cls()
+        try:
+            return cls(
+                options=data["options"],
+                source=FileStamp(**data["source"]) if data["source"] else None,
+                dependencies=[FileStamp(**dep) for dep in data["dependencies"]],
+                functions=data["functions"],
+                outputs=data["outputs"],
+            )
+        except (KeyError, TypeError):
+            return cls()
+
+    def save(self, path: Path) -> None:
+        """Write the manifest atomically."""
+        data = {"version": MANIFEST_VERSION, **asdict(self)}
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def is_up_to_date(self, options: dict[str, Any]) -> bool:
+        """Return True if nothing recorded here needs rebuilding."""
+        if self.source is None or self.options != options:
+            return False
+        if not self.source.is_current():
+            return False
+        if not all(dep.is_current() for dep in self.dependencies):
+            return False
+        return all(Path(output).exists() for output in self.outputs.values())
+
+
+@dataclass(frozen=True)
+class IncrementalResult:
+    """Outcome of an incremental build of one source file.
+
+    Attributes
+    ----------
+    source : Path
+        The source file.
+    outputs : tuple[Path, ...]
+        All current CFG files of the source, rebuilt or not.
+    rebuilt : tuple[str, ...]
+        Functions whose CFGs were regenerated in this run.
+    up_to_date : bool
+        True if the source was skipped without compiling.
+    """
+
+    source: Path
+    outputs: tuple[Path, ...]
+    rebuilt: tuple[str, ...] = ()
+    up_to_date: bool = False
+
+
+def _file_digest(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file."""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def manifest_path(source: Path, output_root: str | Path | None = None) -> Path:
+    """Return the manifest location of a source file (next to its IR)."""
+    return ir_output_path(source, output_root).parent / MANIFEST_NAME
+
+
+def parse_depfile(text: str) -> list[Path]:
+    """Return the prerequisites listed in a Makefile-style dependency file.
+
+    Handles line continuations and backslash-escaped spaces as written by
+    ``clang -MD``. Targets are dropped.
+    """
+    text = text.replace("\\\n", " ")
+    deps: list[Path] = []
+    for line in text.splitlines():
+        _, sep, prerequisites = line.partition(": ")
+        if not sep:
+            continue
+        tokens = re.split(r"(?<!\\)\s+", prerequisites.strip())
+        deps.extend(Path(token.replace("\\ ", " ")) for token in tokens if token)
+    return deps
+
+
+def _function_bodies(ir_path: Path) -> Iterator[tuple[str, bytes]]:
+    """Yield the name and text (``define`` line to closing brace) of each function."""
+    data = ir_path.read_bytes()
+    for definition in iter_function_definitions(ir_path):
+        end = data.find(b"\n}", definition.offset)
+        yield definition.name, data[definition.offset : end if end >= 0 else len(data)]
+
+
+def function_digests(ir_path: Path) -> dict[str, str]:
+    """Return a digest of each function definition in an IR file.
+
+    Digests cover the ``define`` line and body with attribute group and
+    metadata numbers removed, so they only change when the function does.
+    """
+    return {
+        name: hashlib.sha256(_VOLATILE_REFS.sub(b"", body)).hexdigest()
+        for name, body in _function_bodies(ir_path)
+    }
+
+
+def function_callees(ir_path: Path) -> dict[str, frozenset[str]]:
+    """Return the functions defined in an IR file that each function refers to.
+
+    Any reference counts (a call, an invoke or taking the address), since
+    an opt pipeline can inline the callee through any of them.
+    """
+    references: dict[str, set[str]] = {}
+    for name, body in _function_bodies(ir_path):
+        references[name] = {
+            (match.group(1) or match.group(2)).decode(errors="replace")
+            for match in _GLOBAL_REF.finditer(body)
+        }
+    return {
+        name: frozenset(callee for callee in refs if callee in references and callee != name)
+        for name, refs in references.items()
+    }
+
+
+def _with_callees(
+    digests: dict[str, str], callees: dict[str, frozenset[str]], names: Sequence[str]
+) -> dict[str, str]:
+    """Return digests of names that also cover every function they reach through callees."""
+    combined: dict[str, str] = {}
+    for name in names:
+        reached = {name}
+        pending = [name]
+        while pending:
+            for callee in callees.get(pending.pop(), ()):
+                if callee not in reached:
+                    reached.add(callee)
+                    pending.append(callee)
+        digest = hashlib.sha256(digests[name].encode())
+        for callee in sorted(reached - {name}):
+            digest.update(f"\0{callee}\0{digests[callee]}".encode())
+        combined[name] = digest.hexdigest()
+    return combined
+
+
+def _options_key(cfg_options: dict[str, Any]) -> dict[str, Any]:
+    """Return the JSON-serializable subset of options that affect outputs."""
+    options = {name: cfg_options.get(name) for name in _OUTPUT_OPTIONS}
+    options["output_format"] = options["output_format"] or "png"
+    options["engine"] = options["engine"] or "opt"
+    if options["functions"] is not None:
+        options["functions"] = sorted(options["functions"])
+    return options
+
+
+def _selected_functions(
+    ir_path: Path,
+    language: Language,
+    digests: dict[str, str],
+    requested: Sequence[str] | None,
+    symbol_filter: SymbolFilter | None = None,
+) -> list[str]:
+    """Return the functions that get a CFG, in module order."""
+    if requested is not None:
+        wanted = set(requested)
+        return [name for name in digests if name in wanted]
+    return get_function_names(ir_path, language, symbol_filter=symbol_filter)
+
+
+def is_stale(
+    source: str | Path, output_root: str | Path | None = None, **cfg_options: Any
+) -> bool:
+    """Return True if a source needs rebuilding.
+
+    Parameters
+    ----------
+    source : str or Path
+        Source file to check.
+    output_root : str or Path or None
+        Output root the source is built under (see :func:`struco.cfg.extract_ir`).
+    **cfg_options
+        Options the CFGs should be built with (see
+        :func:`struco.cfg.extract_cfg_from_ir`).
+    """
+    source = Path(source).resolve()
+    manifest = Manifest.load(manifest_path(source, output_root))
+    return not manifest.is_up_to_date(_options_key(cfg_options))
+
+
+def _load_manifest(path: Path, loaded: dict[Path, tuple[tuple[int, ...], Manifest]]) -> Manifest:
+    """Return the manifest at path, parsing it again only if the file was replaced."""
+    try:
+        st = path.stat()
+    except OSError:
+        return Manifest()
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    cached = loaded.get(path)
+    if cached is None or cached[0] != key:
+        cached = loaded[path] = (key, Manifest.load(path))
+    return cached[1]
+
+
+def build_incremental(
+    source: str | Path,
+    cache: IRCache | None = None,
+    output_root: str | Path | None = None,
+    compile_db: CompilationDatabase | None = None,
+    pch: PchPlan | None = None,
+    **cfg_options: Any,
+) -> IncrementalResult:
+    """Extract IR and CFGs for a source, redoing only what changed.
+
+    Parameters
+    ----------
+    source : str or Path
+        Source file to process.
+    cache : IRCache or None
+        Optional IR cache, filled after each compile.
+    output_root : str or Path or None
+        Keep the IR, manifest and CFGs below this directory (see
+        :func:`struco.cfg.extract_ir`).
+    compile_db : CompilationDatabase or None
+        Per-file C/C++ flags; an edit of the database makes its files
+        stale.
+    pch : PchPlan or None
+        Precompiled headers to compile with (see :mod:`struco.pch`).
+    **cfg_options
+        Keyword arguments for :func:`struco.cfg.extract_cfg_from_ir`.
+
+    Returns
+    -------
+    IncrementalResult
+        Current outputs and the functions that were regenerated.
+
+    Raises
+    ------
+    FileNotFoundError
+        If the source file does not exist.
+    ValueError
+        If the file extension or an option is not supported.
+    RuntimeError
+        If the frontend, opt or graphviz fails.
+    """
+    if cfg_options.get("dedup") or cfg_options.get("shape_store") is not None:
+        msg = "incremental builds do not support CFG deduplication"
+        raise ValueError(msg)
+    if cfg_options.get("demangle_names"):
+        # Outputs are tracked by function name, so they must be named by function
+        msg = "incremental builds do not support demangled output names"
+        raise ValueError(msg)
+    source = Path(source).resolve()
+    options = _options_key(cfg_options)
+    path = manifest_path(source, output_root)
+    manifest = Manifest.load(path)
+
+    if manifest.is_up_to_date(options):
+        logger.info("%s is up to date", source)
+        return IncrementalResult(
+            source=source,
+            outputs=tuple(Path(output) for output in manifest.outputs.values()),
+            up_to_date=True,
+        )
+
+    if manifest.options != options:
+        # Outputs of other options (another format, say) would otherwise be left behind
+        for output in manifest.outputs.values():
+            Path(output).unlink(missing_ok=True)
+        manifest = Manifest()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, depfile = tempfile.mkstemp(dir=path.parent, prefix=".deps.", suffix=".d")
+    os.close(fd)
+    try:
+        ir_result = extract_ir(
+            source,
+            cache=cache,
+            depfile=depfile,
+            output_root=output_root,
+            compile_db=compile_db,
+            pch=pch,
+        )
+        dependencies = parse_depfile(Path(depfile).read_text())
+    finally:
+        Path(depfile).unlink(missing_ok=True)
+
+    digests = function_digests(ir_result.ir_path)
+    symbol_filter = SymbolFilter.from_options(
+        cfg_options.get("include_namespaces"), cfg_options.get("exclude_namespaces")
+    )
+    selected = _selected_functions(
+        ir_result.ir_path, ir_result.language, digests, cfg_options.get("functions"), symbol_filter
+    )
+    if resolve_opt_pipeline(cfg_options.get("opt_pipeline")):
+        # The CFGs are taken after the pipeline, which may inline callees
+        digests = _with_callees(digests, function_callees(ir_result.ir_path), selected)
+    changed = [
+        name
+        for name in selected
+        if manifest.functions.get(name) != digests[name]
+        or not Path(manifest.outputs.get(name, "")).is_file()
+    ]
+
+    rendered: dict[str, Path] = {}
+    if changed:
+        render_options = {**cfg_options, "functions": changed}
+        function_of = {file_stem(name): name for name in changed}
+        for output in extract_cfg_from_ir(
+            ir_result.ir_path, language=ir_result.language, **render_options
+        ):
+            rendered[function_of.get(output.stem, output.stem)] = output
+
+    for name, output in manifest.outputs.items():
+        if name not in selected:
+            Path(output).unlink(missing_ok=True)
+
+    outputs: dict[str, str] = {}
+    functions: dict[str, str] = {}
+    for name in selected:
+        output = str(rendered[name]) if name in rendered else manifest.outputs.get(name)
+        if output is None or (name in changed and name not in rendered):
+            continue
+        outputs[name] = output
+        functions[name] = digests[name]
+
+    Manifest(
+        options=options,
+        source=FileStamp.of(source),
+        dependencies=[FileStamp.of(dep) for dep in dependencies if dep.resolve() != source],
+        functions=functions,
+        outputs=outputs,
+    ).save(path)
+
+    logger.info("%s: regenerated %d of %d CFGs", source, len(rendered), len(selected))
+    return IncrementalResult(
+        source=source,
+        outputs=tuple(Path(output) for output in outputs.values()),
+        rebuilt=tuple(rendered),
+    )
+
+
+def watch(
+    sources: Sequence[Path],
+    cache: IRCache | None = None,
+    interval: float = 1.0,
+    output_root: str | Path | None = None,
+    compile_db: CompilationDatabase | None = None,
+    pch: PchPlan | None = None,
+    **cfg_options: Any,
+) -> Iterator[list[IncrementalResult]]:
+    """Poll sources and rebuild them incrementally whenever they change.
+
+    Runs until the caller stops iterating (or on KeyboardInterrupt).
+    Manifests are kept in memory and parsed again only when a build
+    replaced them, so a poll with no changes only stats the sources, their
+    manifests, recorded headers and outputs.
+
+    Parameters
+    ----------
+    sources : sequence of Path
+        Source files to watch.
+    cache : IRCache or None
+        Optional IR cache.
+    interval : float
+        Seconds between polls.
+    output_root : str or Path or None
+        Output root the sources are built under.
+    compile_db, pch : CompilationDatabase, PchPlan or None
+        Frontend flags and precompiled headers (see :func:`build_incremental`).
+    **cfg_options
+        Keyword arguments for :func:`struco.cfg.extract_cfg_from_ir`.
+
+    Yields
+    ------
+    list[IncrementalResult]
+        Results for the sources rebuilt in one poll; polls with no changes
+        yield nothing. Sources that fail are logged and retried once the
+        source file itself changes again.
+    """
+    options = _options_key(cfg_options)
+    manifests: dict[Path, tuple[tuple[int, ...], Manifest]] = {}
+    failed: dict[Path, int] = {}
+    while True:
+        results: list[IncrementalResult] = []
+        for source in sources:
+            try:
+                mtime_ns = source.stat().st_mtime_ns
+            except OSError:
+                continue
+            if failed.get(source) == mtime_ns:
+                continue
+            manifest = _load_manifest(manifest_path(source.resolve(), output_root), manifests)
+            if manifest.is_up_to_date(options):
+                continue
+            try:
+                results.append(
+                    build_incremental(
+                        source,
+                        cache=cache,
+                        output_root=output_root,
+                        compile_db=compile_db,
+                        pch=pch,
+                        **cfg_options,
+                    )
+                )
+            except (FileNotFoundError, ValueError, RuntimeError, OSError) as exc:
+                logger.error("%s: %s", source, exc)
+                failed[source] = mtime_ns
+            else:
+                failed.pop(source, None)
+        if results:
+            yield results
+        time.sleep(interval)
+
+
+__all__ = [
+    "MANIFEST_NAME",
+    "FileStamp",
+    "IncrementalResult",
+    "Manifest",
+    "build_incremental",
+    "function_callees",
+    "function_digests",
+    "is_stale",
+    "manifest_path",
+    "parse_depfile",
+    "watch",
+]
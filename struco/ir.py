@@ -0,0 +1,273 @@
+"""In-process CFG construction from textual LLVM IR.
+
+Parses ``define`` bodies of a ``.ll`` module into basic blocks and successor
+edges without running ``opt``. Only the structure needed for CFGs is
+recovered: block labels, instruction text and terminator targets.
+"""
+
+from __future__ import annotations
+
+import mmap
+import os
+import re
+from collections.abc import Container, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+
+from struco.graph import BasicBlock, FunctionCFG, StringPool, opcode
+
+# Instructions that end a basic block
+TERMINATORS = frozenset(
+    {
+        "ret",
+        "br",
+        "switch",
+        "indirectbr",
+        "invoke",
+        "callbr",
+        "resume",
+        "catchswitch",
+        "catchret",
+        "cleanupret",
+        "unreachable",
+    }
+)
+
+_NAME = r'(?:"(?:[^"\\]|\\.)*"|[-\w$.]+)'
+_LABEL_DEF = re.compile(rf"^({_NAME}):(?:\s|;|$)")
+_LABEL_REF = re.compile(rf"\blabel\s+%({_NAME})")
+_UNNAMED_ARG = re.compile(r"%\d+\b")
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"')
+# invoke destinations and landingpad clauses are printed on their own lines
+_CONTINUATION_PREFIXES = ("to label ", "catch ", "filter ", "cleanup")
+
+
+# First global identifier on a define line: @"quoted name" or @bare.name
+_DEFINE_NAME = re.compile(rb'@(?:"([^"]*)"|([-\w$.]+))')
+
+
+@dataclass(frozen=True)
+class FunctionDefinition:
+    """Location of a function definition in an IR file.
+
+    Attributes
+    ----------
+    name : str
+        Function name without the leading ``@`` or quotes.
+    offset : int
+        Byte offset of the ``define`` line from the start of the file.
+    """
+
+    name: str
+    offset: int
+
+
+def _definition_name(line: bytes) -> str | None:
+    """Return the function name of a ``define`` line, or None if malformed.
+
+    The first ``@`` on a define line always introduces the function name;
+    attributes, personality functions and comdats only follow it.
+    """
+    match = _DEFINE_NAME.search(line)
+    if match is None:
+        return None
+    name = match.group(1) if match.group(1) is not None else match.group(2)
+    return name.decode("utf-8", errors="replace")
+
+
+def _is_define(line: bytes) -> bool:
+    """Return True if a raw IR line starts a function definition."""
+    return line.startswith(b"define") and line[6:7] in (b" ", b"\t")
+
+
+def iter_function_definitions(ir_path: str | Path) -> Iterator[FunctionDefinition]:
+    """Yield every function definition in an IR file in a single pass.
+
+    The file is memory-mapped and scanned for ``define`` at line starts with
+    ``mmap.find``, so only definition lines are decoded. Memory use does not
+    grow with the file size and the cost is linear regardless of how long
+    the attribute lists are.
+
+    Parameters
+    ----------
+    ir_path : str or Path
+        Path to the .ll file.
+
+    Yields
+    ------
+    FunctionDefinition
+        Name and byte offset of each definition, in file order.
+    """
+    with open(ir_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from _scan_definitions(mm)
+
+
+def iter_text_definitions(ir_text: str | bytes) -> Iterator[FunctionDefinition]:
+    """Yield every function definition of an in-memory IR module.
+
+    Same as :func:`iter_function_definitions` for IR that was never written
+    to disk; offsets are byte offsets into the UTF-8 encoded text.
+    """
+    data = ir_text.encode() if isinstance(ir_text, str) else ir_text
+    if data:
+        yield from _scan_definitions(data)
+
+
+def _scan_definitions(buf: bytes | mmap.mmap) -> Iterator[FunctionDefinition]:
+    """Scan a non-empty buffer for ``define`` lines."""
+    pos = 0 if buf[:7] in (b"define ", b"define\t") else buf.find(b"\ndefine")
+    if pos > 0:
+        pos += 1
+    while pos >= 0:
+        end = buf.find(b"\n", pos)
+        line = buf[pos : end if end >= 0 else len(buf)]
+        if _is_define(line):
+            name = _definition_name(line)
+            if name is not None:
+                yield FunctionDefinition(name=name, offset=pos)
+        if end < 0:
+            break
+        pos = buf.find(b"\ndefine", end)
+        if pos >= 0:
+            pos += 1
+
+
+def _unquote(name: str) -> str:
+    """Strip the quotes from an LLVM quoted identifier."""
+    if len(name) >= 2 and name[0] == '"' and name[-1] == '"':
+        return name[1:-1]
+    return name
+
+
+def _bracket_depth(line: str) -> int:
+    """Return the net ``[``/``]`` nesting change of a line, ignoring strings."""
+    stripped = _STRING.sub("", line.split(";", 1)[0])
+    return stripped.count("[") - stripped.count("]")
+
+
+def _entry_label(define_line: str) -> str:
+    """Return the implicit label of an unnamed entry block.
+
+    Unnamed values are numbered in order, starting with unnamed arguments,
+    so the entry block gets the next number after them.
+    """
+    params = define_line[define_line.find("(") : define_line.rfind(")") + 1]
+    return str(len(_UNNAMED_ARG.findall(params)))
+
+
+def _iter_function_bodies(text: str) -> Iterator[tuple[str, str, list[str]]]:
+    """Yield (name, define line, body lines) for each function definition."""
+    lines = text.splitlines()
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not line.startswith("define "):
+            i += 1
+            continue
+        name = _definition_name(line.encode())
+        body: list[str] = []
+        i += 1
+        while i < len(lines) and lines[i].rstrip() != "}":
+            body.append(lines[i])
+            i += 1
+        i += 1
+        if name is not None:
+            yield name, line, body
+
+
+def _parse_body(
+    name: str, define_line: str, body: list[str], pool: StringPool | None = None
+) -> FunctionCFG:
+    """Split a function body into basic blocks and compute successors."""
+    blocks: list[BasicBlock] = []
+    block: BasicBlock | None = None
+    pending = ""
+    depth = 0
+
+    for raw in body:
+        stripped = raw.strip()
+        if not stripped or stripped.startswith(";"):
+            continue
+
+        if pending:
+            pending = f"{pending} {stripped}"
+            depth += _bracket_depth(stripped)
+            if depth > 0:
+                continue
+            stripped, pending = pending, ""
+        elif not raw[:1].isspace():
+            label_match = _LABEL_DEF.match(stripped)
+            if label_match is not None:
+                block = BasicBlock(label=_unquote(label_match.group(1)))
+                blocks.append(block)
+                continue
+
+        if block is None:
+            block = BasicBlock(label=_entry_label(define_line))
+            blocks.append(block)
+
+        if stripped.startswith(_CONTINUATION_PREFIXES) and block.instructions:
+            block.instructions[-1] = f"{block.instructions[-1]} {stripped}"
+            continue
+
+        depth = _bracket_depth(stripped)
+        if depth > 0:
+            pending = stripped
+            continue
+
+        instruction = stripped.split(" ;", 1)[0].rstrip() if " ;" in stripped else stripped
+        block.instructions.append(instruction)
+
+    for block in blocks:
+        if block.instructions and opcode(block.instructions[-1]) in TERMINATORS:
+            block.successors = [
+                _unquote(target) for target in _LABEL_REF.findall(block.instructions[-1])
+            ]
+
+    return FunctionCFG.from_blocks(name, blocks, pool)
+
+
+def parse_ir(
+    text: str, functions: Container[str] | None = None, pool: StringPool | None = None
+) -> list[FunctionCFG]:
+    """Parse textual LLVM IR into per-function CFGs.
+
+    Parameters
+    ----------
+    text : str
+        Contents of a ``.ll`` module.
+    functions : container of str or None
+        If given, only functions whose names are in this container are
+        parsed; others are skipped without building blocks.
+    pool : StringPool or None
+        Pool to intern labels and instructions into. Defaults to a new
+        pool shared by the functions of this module only.
+
+    Returns
+    -------
+    list[FunctionCFG]
+        One CFG per function definition, in module order.
+    """
+    if pool is None:
+        pool = StringPool()
+    cfgs: list[FunctionCFG] = []
+    for name, define_line, body in _iter_function_bodies(text):
+        if functions is not None and name not in functions:
+            continue
+        cfgs.append(_parse_body(name, define_line, body, pool))
+    return cfgs
+
+
+__all__ = [
+    "TERMINATORS",
+    "BasicBlock",
+    "FunctionCFG",
+    "FunctionDefinition",
+    "iter_function_definitions",
+    "iter_text_definitions",
+    "opcode",
+    "parse_ir",
+]
@@ -0,0 +1,321 @@
+"""Precompiled headers shared by the translation units of a batch.
+
+Most of the frontend time of a typical C++ file goes to parsing the same
+standard library and third-party headers every other file includes as
+well. :func:`plan_pch` looks at the leading ``#include <...>`` lines of
+every C/C++ source of a batch and, for every such header prefix that at
+least ``min_shared`` files start with under the same compiler flags,
+plans a precompiled header. :func:`precompiled_header` builds it the
+first time a file needs it and the frontend then compiles the file with
+``-include-pch``, so the headers are parsed once per batch instead of once
+per file.
+
+Only the leading run of angle-bracket includes is precompiled: those
+resolve the same way for every file, and as a prefix of the file they
+mean exactly what the file's own includes mean. A header already in the
+precompiled header is skipped by its include guard when the file includes
+it again. PCHs are content-addressed (compiler, version, flags and the
+include lines) and kept in a directory across runs, so a later run reuses
+them even for a single file.
+
+A PCH that cannot be built is skipped for the rest of the process, and a
+file that fails to compile with a PCH (for example because a header
+changed since it was built) is compiled again without it, so PCHs only
+ever change how fast the frontend is.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+from collections import Counter
+from collections.abc import Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from struco.cache import compiler_version, default_cache_dir
+from struco.profile import span
+from struco.scheduler import run_tool
+
+if TYPE_CHECKING:
+    from struco.compdb import CompilationDatabase
+
+logger = logging.getLogger(__name__)
+
+# Files that must share a header prefix before it is precompiled
+DEFAULT_MIN_SHARED = 2
+
+# Frontend flags that select the output kind, replaced by -x <lang>-header
+_OUTPUT_KIND_FLAGS = frozenset({"-S", "-emit-llvm"})
+
+# PCH keys whose build failed in this process
+_failed: set[str] = set()
+_failed_lock = threading.Lock()
+
+
+def default_pch_dir() -> Path:
+    """Return the default PCH directory, next to the IR cache (see :mod:`struco.cache`)."""
+    return default_cache_dir().parent / "pch"
+
+
+def include_prefix(source: Path) -> tuple[str, ...]:
+    """Return the leading ``#include <...>`` directives of a C/C++ source file.
+
+    Blank lines, comments and ``#pragma once`` are skipped; the prefix
+    ends at the first other line, including quoted includes and any other
+    preprocessor directive. Directives are returned normalized
+    (``#include <vector>``).
+    """
+    includes: list[str] = []
+    in_comment = False
+    try:
+        text = source.read_text(errors="replace")
+    except OSError:
+        return ()
+    for raw in text.splitlines():
+        line = raw.strip()
+        if in_comment:
+            end = line.find("*/")
+            if end < 0:
+                continue
+            in_comment = False
+            line = line[end + 2 :].strip()
+        if line.startswith("/*"):
+            end = line.find("*/", 2)
+            if end < 0:
+                in_comment = True
+                continue
+            line = line[end + 2 :].strip()
+        if not line or line.startswith("//"):
+            continue
+        directive = " ".join(line.lstrip("#").split()) if line.startswith("#") else ""
+        if directive == "pragma once":
+            continue
+        header = directive.removeprefix("include").strip()
+        if not directive.startswith("include") or not header.startswith("<"):
+            break
+        includes.append(f"#include {header.split('>')[0]}>")
+    return tuple(includes)
+
+
+def pch_key(command: str, args: Sequence[str], includes: Sequence[str]) -> str:
+    """Return the key of the PCH for a header prefix compiled with a command."""
+    digest = hashlib.sha256()
+    for part in (command, "\0".join(args), compiler_version(command), "\n".join(includes)):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class PchPlan:
+    """The precompiled headers a batch uses.
+
+    Attributes
+    ----------
+    root : Path
+        Directory the PCHs are built in and reused from.
+    keys : frozenset of str
+        Keys (see :func:`pch_key`) of the header prefixes to precompile.
+    """
+
+    root: Path
+    keys: frozenset[str] = field(default_factory=frozenset)
+
+    def path(self, key: str) -> Path:
+        """Return where the PCH of a key is stored."""
+        return self.root / f"{key}.pch"
+
+
+def _header_language(language_value: str) -> str:
+    return "c-header" if language_value == "c" else "c++-header"
+
+
+def plan_pch(
+    sources: Sequence[Path],
+    compile_db: CompilationDatabase | None = None,
+    root: str | Path | None = None,
+    min_shared: int = DEFAULT_MIN_SHARED,
+) -> PchPlan:
+    """Choose the header prefixes of a batch worth precompiling.
+
+    Parameters
+    ----------
+    sources : sequence of Path
+        The batch's source files; those that are not C/C++ are ignored.
+    compile_db : CompilationDatabase or None
+        Per-file flags (see :mod:`struco.compdb`); files only share a PCH
+        if they are compiled with the same flags.
+    root : str or Path or None
+        PCH directory. Defaults to :func:`default_pch_dir`.
+    min_shared : int
+        Files that must start with a header prefix for it to be
+        precompiled. Prefixes with a PCH from an earlier run are always
+        used.
+
+    Returns
+    -------
+    PchPlan
+        The PCH directory and the prefixes to precompile.
+
+    Raises
+    ------
+    ValueError
+        If min_shared is less than 1.
+    """
+    from struco.cfg import C_FAMILY, frontend_config, source_language
+
+    if min_shared < 1:
+        msg = f"min_shared must be at least 1, got {min_shared}"
+        raise ValueError(msg)
+    plan = PchPlan(Path(root) if root is not None else default_pch_dir())
+    counts: Counter[str] = Counter()
+    for source in sources:
+        try:
+            language = source_language(source)
+        except ValueError:
+            continue
+        if language not in C_FAMILY:
+            continue
+        includes = include_prefix(source)
+        if not includes:
+            continue
+        compile_command = compile_db.get(source) if compile_db is not None else None
+        config = frontend_config(language, compile_command)
+        counts[pch_key(config.command, config.args, includes)] += 1
+    keys = frozenset(
+        key for key, count in counts.items() if count >= min_shared or plan.path(key).exists()
+    )
+    if keys:
+        logger.info("Precompiling %d shared header sets in %s", len(keys), plan.root)
+    return PchPlan(plan.root, keys)
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    """Hold an exclusive lock on path, so one process builds each PCH."""
+    with open(path, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _build(
+    plan: PchPlan,
+    key: str,
+    command: str,
+    args: Sequence[str],
+    language: str,
+    includes: Sequence[str],
+) -> bool:
+    """Build the PCH of a key; return False if the compiler failed."""
+    header = plan.root / f"{key}.h"
+    header.write_text("".join(f"{line}\n" for line in includes))
+    scratch = plan.root / f".{key}.{os.getpid()}.pch"
+    cmd = [
+        command,
+        *(arg for arg in args if arg not in _OUTPUT_KIND_FLAGS),
+        "-x",
+        _header_language(language),
+        str(header),
+        "-o",
+        str(scratch),
+        "-MD",
+        "-MF",
+        str(plan.root / f"{key}.d"),
+    ]
+    logger.info("Building precompiled header: %s", " ".join(cmd))
+    try:
+        with span("pch", key[:12]):
+            result = run_tool(cmd, "frontend", capture_output=True, text=True)
+        if result.returncode != 0:
+            logger.warning("Could not build precompiled header %s: %s", header, result.stderr)
+            return False
+        os.replace(scratch, plan.path(key))
+    finally:
+        scratch.unlink(missing_ok=True)
+    return True
+
+
+def precompiled_header(
+    plan: PchPlan, command: str, args: Sequence[str], language: str, source: Path
+) -> Path | None:
+    """Return the PCH to compile a source file with, building it if needed.
+
+    Parameters
+    ----------
+    plan : PchPlan
+        The batch's plan (see :func:`plan_pch`).
+    command : str
+        The frontend compiler.
+    args : sequence of str
+        The frontend arguments the file is compiled with.
+    language : str
+        The source language, ``"c"`` or ``"cpp"``.
+    source : Path
+        The source file.
+
+    Returns
+    -------
+    Path or None
+        The PCH, or None if the file's header prefix is not in the plan or
+        its PCH cannot be built.
+    """
+    includes = include_prefix(source)
+    if not includes:
+        return None
+    key = pch_key(command, args, includes)
+    with _failed_lock:
+        if key not in plan.keys or key in _failed:
+            return None
+    path = plan.path(key)
+    if path.exists():
+        return path
+    plan.root.mkdir(parents=True, exist_ok=True)
+    with _locked(plan.root / f"{key}.lock"):
+        if path.exists():
+            return path
+        try:
+            built = _build(plan, key, command, args, language, includes)
+        except OSError as exc:
+            logger.warning("Could not build precompiled header for %s: %s", source.name, exc)
+            built = False
+    if not built:
+        with _failed_lock:
+            _failed.add(key)
+        return None
+    return path
+
+
+def pch_dependencies(pch: Path) -> str:
+    """Return the Makefile dependency rule written when a PCH was built, or ""."""
+    try:
+        return pch.with_suffix(".d").read_text()
+    except OSError:
+        return ""
+
+
+def clear_failures() -> None:
+    """Forget which PCHs could not be built in this process."""
+    with _failed_lock:
+        _failed.clear()
+
+
+__all__ = [
+    "DEFAULT_MIN_SHARED",
+    "PchPlan",
+    "clear_failures",
+    "default_pch_dir",
+    "include_prefix",
+    "pch_dependencies",
+    "pch_key",
+    "plan_pch",
+    "precompiled_header",
+]
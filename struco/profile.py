@@ -0,0 +1,303 @@
+"""Per-stage timing and resource instrumentation.
+
+Pipeline stages (frontend, opt, function scanning, rendering, ...) are
+wrapped in :func:`span` blocks. While a :class:`Profiler` is active (see
+:func:`profiling`) or a hook is registered (see :func:`add_hook`), each
+block records a :class:`Span` with its wall time, the CPU time of the
+calling thread and the CPU time and peak RSS of child processes; otherwise
+spans cost one context variable lookup.
+
+Child process figures are those of the children started through
+:func:`struco.scheduler.run_tool` inside the span: it reaps each child
+with ``wait4`` and reports that child's own resource usage with
+:func:`record_child`. A span's child CPU time is the sum over its
+children and its peak RSS the largest of them, including those of nested
+spans, so figures are per stage and not skewed by other threads or by the
+largest child the process ever ran. Children started elsewhere (the
+asyncio API, ``c++filt``) are not counted.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# ru_maxrss is reported in bytes on macOS and in KiB elsewhere
+_RSS_DIVISOR = 1024 if sys.platform == "darwin" else 1
+
+
+@dataclass(frozen=True)
+class Span:
+    """Measurements of one pipeline stage.
+
+    Attributes
+    ----------
+    stage : str
+        Stage name, e.g. ``"frontend"``, ``"opt"`` or ``"render"``.
+    name : str or None
+        What the stage worked on: a file name or a function name.
+    wall : float
+        Wall-clock seconds.
+    cpu : float
+        CPU seconds of the calling thread.
+    child_cpu : float
+        User plus system CPU seconds of the child processes run during
+        the span.
+    child_max_rss_kb : int
+        Largest peak resident set size of those child processes, in KiB.
+    """
+
+    stage: str
+    name: str | None
+    wall: float
+    cpu: float
+    child_cpu: float
+    child_max_rss_kb: int
+
+
+Hook = Callable[[Span], None]
+
+_hooks: list[Hook] = []
+_hooks_lock = threading.Lock()
+
+
+class Profiler:
+    """Collects spans and summarizes them per stage.
+
+    Recording is thread-safe, so one profiler can be shared by the render
+    threads of an extraction and by merged batch workers.
+    """
+
+    def __init__(self) -> None:
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+
+    def record(self, span: Span) -> None:
+        """Add a span."""
+        with self._lock:
+            self.spans.append(span)
+
+    def stages(self) -> dict[str, dict[str, Any]]:
+        """Return totals per stage, in order of first appearance."""
+        totals: dict[str, dict[str, Any]] = {}
+        for s in self.spans:
+            entry = totals.setdefault(
+                s.stage,
+                {"count": 0, "wall": 0.0, "cpu": 0.0, "child_cpu": 0.0, "child_max_rss_kb": 0},
+            )
+            entry["count"] += 1
+            entry["wall"] += s.wall
+            entry["cpu"] += s.cpu
+            entry["child_cpu"] += s.child_cpu
+            entry["child_max_rss_kb"] = max(entry["child_max_rss_kb"], s.child_max_rss_kb)
+        return totals
+
+    def report(self) -> dict[str, Any]:
+        """Return the JSON-serializable report: per-stage totals and all spans."""
+        return {"stages": self.stages(), "spans": [asdict(s) for s in self.spans]}
+
+    def write_json(self, path: str) -> None:
+        """Write :meth:`report` as JSON to path."""
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=1)
+
+    def summary_table(self) -> str:
+        """Return a fixed-width table of the per-stage totals."""
+        header = (
+            f"{'stage':<20} {'count':>6} {'wall s':>9} {'cpu s':>9} "
+            f"{'child cpu s':>12} {'child rss MiB':>14}"
+        )
+        lines = [header, "-" * len(header)]
+        for stage, t in self.stages().items():
+            lines.append(
+                f"{stage:<20} {t['count']:>6} {t['wall']:>9.3f} {t['cpu']:>9.3f} "
+                f"{t['child_cpu']:>12.3f} {t['child_max_rss_kb'] / 1024:>14.1f}"
+            )
+        return "\n".join(lines)
+
+
+_PROFILER: contextvars.ContextVar[Profiler | None] = contextvars.ContextVar(
+    "struco_profiler", default=None
+)
+_HOOKS_ENABLED: contextvars.ContextVar[bool] = contextvars.ContextVar(
+    "struco_profile_hooks", default=True
+)
+
+
+class _ChildUsage:
+    """Resource usage of the children of one open span."""
+
+    __slots__ = ("cpu", "max_rss_kb", "parent")
+
+    def __init__(self, parent: _ChildUsage | None) -> None:
+        self.cpu = 0.0
+        self.max_rss_kb = 0
+        self.parent = parent
+
+    def add(self, cpu: float, max_rss_kb: int) -> None:
+        self.cpu += cpu
+        self.max_rss_kb = max(self.max_rss_kb, max_rss_kb)
+
+
+_CHILDREN: contextvars.ContextVar[_ChildUsage | None] = contextvars.ContextVar(
+    "struco_profile_children", default=None
+)
+# Render threads share the usage of the span they were started from
+_children_lock = threading.Lock()
+
+
+def current_profiler() -> Profiler | None:
+    """Return the profiler active in this context, if any."""
+    return _PROFILER.get()
+
+
+@contextmanager
+def profiling(profiler: Profiler | None = None) -> Iterator[Profiler]:
+    """Activate a profiler for the current context.
+
+    The profiler is visible to code called from this block, including
+    asyncio tasks it creates and threads started via
+    :func:`contextvars.copy_context`.
+    """
+    profiler = profiler if profiler is not None else Profiler()
+    token = _PROFILER.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _PROFILER.reset(token)
+
+
+def is_enabled() -> bool:
+    """Return True if spans are being recorded in this context."""
+    return _PROFILER.get() is not None or (bool(_hooks) and _HOOKS_ENABLED.get())
+
+
+@contextmanager
+def capture() -> Iterator[Profiler]:
+    """Record spans into a fresh profiler without calling the hooks.
+
+    Used by batch workers, whose spans are sent back to the parent process
+    and only reach the hooks there (see :func:`emit`).
+    """
+    token = _HOOKS_ENABLED.set(False)
+    try:
+        with profiling() as profiler:
+            yield profiler
+    finally:
+        _HOOKS_ENABLED.reset(token)
+
+
+def add_hook(hook: Hook) -> None:
+    """Register a callback invoked with every finished span.
+
+    Hooks run in the thread that finished the span and must be fast and
+    not raise; exceptions are logged and swallowed. Spans of batch workers
+    are delivered in the parent process when the worker's file completes.
+    """
+    with _hooks_lock:
+        _hooks.append(hook)
+
+
+def remove_hook(hook: Hook) -> None:
+    """Unregister a callback added with :func:`add_hook`."""
+    with _hooks_lock:
+        _hooks.remove(hook)
+
+
+def emit(span: Span, profiler: Profiler | None = None) -> None:
+    """Record a finished span in a profiler and pass it to the hooks."""
+    if profiler is not None:
+        profiler.record(span)
+    if not _HOOKS_ENABLED.get():
+        return
+    for hook in list(_hooks):
+        try:
+            hook(span)
+        except Exception:  # a metrics hook must never break extraction
+            logger.exception("Profiling hook %r failed", hook)
+
+
+def record_child(cpu: float, max_rss: int) -> None:
+    """Add the resource usage of a reaped child process to the innermost open span.
+
+    Parameters
+    ----------
+    cpu : float
+        User plus system CPU seconds of the child.
+    max_rss : int
+        The child's ``ru_maxrss`` as reported by ``wait4`` (KiB on Linux,
+        bytes on macOS).
+    """
+    usage = _CHILDREN.get()
+    if usage is None:
+        return
+    with _children_lock:
+        usage.add(cpu, max_rss // _RSS_DIVISOR)
+
+
+@contextmanager
+def span(stage: str, name: str | None = None) -> Iterator[None]:
+    """Measure the enclosed block as one stage.
+
+    Parameters
+    ----------
+    stage : str
+        Stage name.
+    name : str or None
+        File or function the stage works on.
+    """
+    if not is_enabled():
+        yield
+        return
+    profiler = _PROFILER.get()
+
+    children = _ChildUsage(_CHILDREN.get())
+    token = _CHILDREN.set(children)
+    cpu_before = time.thread_time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.thread_time() - cpu_before
+        _CHILDREN.reset(token)
+        with _children_lock:
+            child_cpu, child_rss = children.cpu, children.max_rss_kb
+            if children.parent is not None:
+                children.parent.add(child_cpu, child_rss)
+        emit(
+            Span(
+                stage=stage,
+                name=name,
+                wall=wall,
+                cpu=cpu,
+                child_cpu=child_cpu,
+                child_max_rss_kb=child_rss,
+            ),
+            profiler,
+        )
+
+
+__all__ = [
+    "Profiler",
+    "Span",
+    "add_hook",
+    "capture",
+    "current_profiler",
+    "emit",
+    "is_enabled",
+    "profiling",
+    "record_child",
+    "remove_hook",
+    "span",
+]
@@ -0,0 +1,304 @@
+"""Bounded Graphviz rendering for very large CFGs.
+
+``dot``'s layered layout grows much faster than linearly with the number of
+blocks, so one generated function with tens of thousands of blocks can keep
+a render busy for minutes while every other function of a run has long
+finished. :class:`RenderOptions` bounds what a single render may cost:
+
+- with ``summarize``, :func:`summarize_dot` collapses straight-line chains
+  of blocks (a block with one successor that has no other predecessor)
+  into one node and truncates long instruction labels
+- above ``layout_threshold`` nodes, :func:`layout_engine` switches from
+  ``dot`` to the multiscale force-directed ``sfdp`` layout
+- a render that runs longer than ``timeout`` seconds is killed and the
+  graph is rendered again as :func:`skeleton_dot`: collapsed chains drawn
+  as points with no labels, which is all that is left to show at that size
+
+All three work on the ``.dot`` text, so they apply to every engine: opt's
+``-dot-cfg`` output, :meth:`struco.graph.FunctionCFG.to_dot` and the AST
+engine's graphs.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+
+# Node count above which graphs are laid out with sfdp instead of dot
+DEFAULT_LAYOUT_THRESHOLD = 2000
+
+# Seconds a single Graphviz render may take before it is replaced by a skeleton
+DEFAULT_RENDER_TIMEOUT = 300.0
+
+# Instruction lines kept per summarized node, and characters per line
+DEFAULT_MAX_LINES = 12
+DEFAULT_MAX_CHARS = 80
+
+# Layout used for graphs above the threshold and for skeletons
+LARGE_GRAPH_LAYOUT = "sfdp"
+
+# Node statement: id, attributes before the label, label text, attributes after
+_NODE = re.compile(r'^\s*(\S+) \[(.*?)label="((?:[^"\\]|\\.)*)"(.*)\];\s*$')
+
+# Edge statement: source, optional source port, target, optional attributes
+_EDGE = re.compile(r"^\s*([^\s:]+)(?::(\w+))? -> ([^\s:;\[]+)(?::\w+)?\s*(\[.*\])?;\s*$")
+
+# Record label line separator (left-justified line break)
+_LINE_BREAK = "\\l"
+
+
+@dataclass(frozen=True)
+class RenderOptions:
+    """Limits on what rendering a single CFG may cost.
+
+    Attributes
+    ----------
+    summarize : bool
+        Collapse straight-line block chains and truncate long labels
+        before rendering (see :func:`summarize_dot`).
+    layout_threshold : int or None
+        Node count above which ``sfdp`` is used instead of ``dot``;
+        None always uses ``dot``.
+    timeout : float or None
+        Seconds after which a render is killed and replaced by a render
+        of :func:`skeleton_dot`; None waits indefinitely.
+    """
+
+    summarize: bool = False
+    layout_threshold: int | None = DEFAULT_LAYOUT_THRESHOLD
+    timeout: float | None = DEFAULT_RENDER_TIMEOUT
+
+    def __post_init__(self) -> None:
+        if self.layout_threshold is not None and self.layout_threshold < 1:
+            msg = f"layout_threshold must be at least 1, got {self.layout_threshold}"
+            raise ValueError(msg)
+        if self.timeout is not None and self.timeout <= 0:
+            msg = f"timeout must be positive, got {self.timeout}"
+            raise ValueError(msg)
+
+
+@dataclass
+class _Node:
+    attrs: str
+    header: str
+    lines: list[str]
+    ports: str = ""
+    chain: list[str] = field(default_factory=list)
+
+
+@dataclass
+class _Graph:
+    prelude: list[str]
+    nodes: dict[str, _Node]
+    edges: dict[str, list[tuple[str | None, str, str]]]
+
+
+def _split_record(label: str) -> tuple[str, str]:
+    """Split a record label ``{text|{ports}}`` into its text and port fields."""
+    if label.startswith("{") and label.endswith("}"):
+        label = label[1:-1]
+    depth = 0
+    i = 0
+    while i < len(label):
+        ch = label[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+        elif ch == "|" and depth == 0:
+            return label[:i], label[i + 1 :]
+        i += 1
+    return label, ""
+
+
+def _parse(text: str) -> _Graph | None:
+    """Parse the node and edge statements of a CFG in ``opt -dot-cfg`` style.
+
+    Returns None if any statement is not understood, so callers leave such
+    graphs unchanged.
+    """
+    prelude: list[str] = []
+    nodes: dict[str, _Node] = {}
+    edges: dict[str, list[tuple[str | None, str, str]]] = {}
+    for line in text.splitlines():
+        stripped = line.strip()
+        if " -> " in stripped:
+            edge = _EDGE.match(line)
+            if edge is None:
+                return None
+            source, port, target, attrs = edge.groups()
+            edges.setdefault(source, []).append((port, target, attrs or ""))
+        elif (
+            stripped.endswith("];")
+            and "label=" in stripped
+            and not stripped.startswith(("graph", "node", "edge"))
+        ):
+            node = _NODE.match(line)
+            if node is None:
+                return None
+            node_id, before, label, after = node.groups()
+            body, ports = _split_record(label)
+            header, *lines = [part for part in body.split(_LINE_BREAK) if part] or [""]
+            nodes[node_id] = _Node((before + after).rstrip(","), header.rstrip(), lines, ports)
+        elif stripped != "}" and not nodes:
+            prelude.append(line)
+        elif stripped not in ("", "}"):
+            return None
+    if not nodes:
+        return None
+    return _Graph(prelude, nodes, edges)
+
+
+def _collapse_chains(graph: _Graph) -> None:
+    """Merge every straight-line chain of blocks into its first block, in place."""
+    entry = next(iter(graph.nodes))
+    predecessors: dict[str, int] = {}
+    for out in graph.edges.values():
+        for _, target, _ in out:
+            predecessors[target] = predecessors.get(target, 0) + 1
+
+    def next_in_chain(node_id: str) -> str | None:
+        out = graph.edges.get(node_id, [])
+        if len(out) != 1:
+            return None
+        port, target, _ = out[0]
+        if port is not None or target in (node_id, entry) or target not in graph.nodes:
+            return None
+        return target if predecessors.get(target) == 1 else None
+
+    absorbed = {target for node_id in graph.nodes if (target := next_in_chain(node_id))}
+    # Blocks on a cycle of single-successor blocks have no head; start at the first
+    heads = [node_id for node_id in graph.nodes if node_id not in absorbed]
+    heads += [node_id for node_id in graph.nodes if node_id in absorbed]
+    merged: set[str] = set()
+    for head in heads:
+        if head in merged:
+            continue
+        node = graph.nodes[head]
+        tail = head
+        while (target := next_in_chain(tail)) not in (None, head) and target not in merged:
+            member = graph.nodes[target]
+            node.chain.append(member.header)
+            node.lines.extend(member.lines)
+            node.ports = member.ports
+            merged.add(target)
+            tail = target
+        if tail != head:
+            graph.edges[head] = graph.edges.pop(tail, [])
+    for node_id in merged:
+        del graph.nodes[node_id]
+        graph.edges.pop(node_id, None)
+
+
+def _truncate(line: str, max_chars: int) -> str:
+    if len(line) <= max_chars:
+        return line
+    cut = line[: max(max_chars - 3, 0)]
+    # Never end on half of an escape sequence
+    if (len(cut) - len(cut.rstrip("\\"))) % 2:
+        cut = cut[:-1]
+    return f"{cut}..."
+
+
+def _block_name(header: str) -> str:
+    return header.rstrip().removesuffix(":")
+
+
+def summarize_dot(
+    text: str, max_lines: int = DEFAULT_MAX_LINES, max_chars: int = DEFAULT_MAX_CHARS
+) -> str:
+    """Collapse straight-line chains and truncate labels of a CFG in dot syntax.
+
+    A block whose only successor has no other predecessor is merged with
+    that successor, repeatedly, so every chain becomes one node headed
+    ``first .. last (N blocks):`` that keeps the edges and branch ports of
+    its last block. Nodes keep at most max_lines instruction lines (the
+    last one, usually the terminator, is always kept), each cut to
+    max_chars characters.
+
+    Parameters
+    ----------
+    text : str
+        A CFG written by ``opt -passes=dot-cfg`` or
+        :meth:`struco.graph.FunctionCFG.to_dot`.
+    max_lines : int
+        Instruction lines kept per node.
+    max_chars : int
+        Characters kept per line.
+
+    Returns
+    -------
+    str
+        The summarized graph, or text unchanged if it cannot be parsed.
+    """
+    graph = _parse(text)
+    if graph is None:
+        return text
+    _collapse_chains(graph)
+
+    lines = list(graph.prelude)
+    for node_id, node in graph.nodes.items():
+        header = node.header
+        if node.chain:
+            last = _block_name(node.chain[-1])
+            header = f"{_block_name(header)} .. {last} ({len(node.chain) + 1} blocks):"
+        body = [_truncate(line, max_chars) for line in node.lines]
+        if len(body) > max_lines:
+            hidden = len(body) - max_lines + 1
+            body = [*body[: max_lines - 1], f"  ... ({hidden} more)", body[-1]]
+        label = "".join(f"{part}{_LINE_BREAK}" for part in [header, *body])
+        if node.ports:
+            label = f"{label}|{node.ports}"
+        lines.append(f'\t{node_id} [{node.attrs},label="{{{label}}}"];')
+        lines.extend(
+            f"\t{node_id}{f':{port}' if port else ''} -> {target}{f' {attrs}' if attrs else ''};"
+            for port, target, attrs in graph.edges.get(node_id, [])
+        )
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def skeleton_dot(text: str) -> str:
+    """Reduce a CFG in dot syntax to its structure.
+
+    Chains are collapsed as in :func:`summarize_dot`, every node becomes an
+    unlabeled point and edges lose their ports, so what remains is cheap to
+    lay out. Graphs that cannot be parsed are returned unchanged.
+    """
+    graph = _parse(text)
+    if graph is None:
+        return text
+    _collapse_chains(graph)
+
+    lines = [*graph.prelude, "\tnode [shape=point];", "\tedge [arrowsize=0.5];"]
+    for node_id in graph.nodes:
+        lines.append(f"\t{node_id};")
+        lines.extend(f"\t{node_id} -> {target};" for _, target, _ in graph.edges.get(node_id, []))
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+def count_nodes(text: str) -> int:
+    """Return the number of labeled node statements in a graph in dot syntax."""
+    return sum(1 for line in text.splitlines() if _NODE.match(line))
+
+
+def layout_engine(text: str, threshold: int | None = DEFAULT_LAYOUT_THRESHOLD) -> str:
+    """Return the Graphviz layout for a graph: ``dot``, or ``sfdp`` above threshold nodes."""
+    if threshold is not None and count_nodes(text) > threshold:
+        return LARGE_GRAPH_LAYOUT
+    return "dot"
+
+
+__all__ = [
+    "DEFAULT_LAYOUT_THRESHOLD",
+    "DEFAULT_RENDER_TIMEOUT",
+    "RenderOptions",
+    "count_nodes",
+    "layout_engine",
+    "skeleton_dot",
+    "summarize_dot",
+]
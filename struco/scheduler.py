@@ -0,0 +1,338 @@
+"""Resource limits, retries and cost ordering for child processes and jobs.
+
+Every external tool struco runs (clang/codon, llvm-extract, opt, dot) goes
+through :func:`run_tool`, which applies the :class:`ResourceLimits` active
+in the current context (see :func:`resource_limits`); the asyncio API
+(:mod:`struco.aio`) applies the same limits to its subprocesses with
+:func:`stage_timeout`, :func:`limit_address_space` and
+:func:`is_transient_failure`:
+
+- a timeout per stage (``frontend``, ``slice``, ``opt``, ``render``); a
+  child that exceeds it is killed and :class:`StageTimeoutError` is raised
+- an address-space cap (``RLIMIT_AS``) applied to the child with
+  ``prlimit`` as soon as it starts, so a runaway compile fails on its own
+  instead of taking the node down
+- retries of transient failures: the child could not be started for lack
+  of processes or memory, or was killed by ``SIGKILL`` (typically the OOM
+  killer reclaiming memory from another process)
+
+Each child is reaped with ``wait4`` and its own CPU time and peak RSS are
+added to the open profiling span (see :func:`struco.profile.record_child`).
+
+Limits follow the context like the active profiler: render threads see
+them, and :func:`struco.batch.run_batch` passes them on to its worker
+processes. :func:`order_by_cost` orders a batch so the most expensive
+files start first and the last workers to finish are not waiting on one
+large straggler.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import errno
+import logging
+import os
+import resource
+import signal
+import subprocess
+import threading
+import time
+from collections.abc import Iterator, Mapping, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, Any
+
+from struco.profile import record_child
+
+logger = logging.getLogger(__name__)
+
+# Stages that run external tools and can be given a timeout
+STAGES = ("frontend", "slice", "opt", "render")
+
+# Spawn errors that go away once other processes finish
+_TRANSIENT_ERRNOS = frozenset({errno.EAGAIN, errno.ENOMEM, errno.ETXTBSY})
+
+# Signals a child receives from outside rather than from its own bug
+_TRANSIENT_SIGNALS = frozenset({signal.SIGKILL})
+
+# Bytes of IR per byte of source, for sources that have not been compiled yet
+_IR_BYTES_PER_SOURCE_BYTE = 16
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    """Limits applied to every child process of a stage.
+
+    Attributes
+    ----------
+    timeouts : mapping of str to float
+        Seconds a child of each stage (see :data:`STAGES`) may run; stages
+        not listed run without a timeout.
+    memory_limit : int or None
+        Address-space limit of each child in bytes (``RLIMIT_AS``), or None.
+    retries : int
+        How many times a transiently failed child is started again.
+    retry_delay : float
+        Seconds before the first retry; doubled for every further retry.
+    """
+
+    timeouts: Mapping[str, float] = field(default_factory=dict)
+    memory_limit: int | None = None
+    retries: int = 2
+    retry_delay: float = 0.5
+
+    def __post_init__(self) -> None:
+        unknown = set(self.timeouts) - set(STAGES)
+        if unknown:
+            msg = f"Unknown stage(s) {', '.join(sorted(unknown))}; expected {', '.join(STAGES)}"
+            raise ValueError(msg)
+        if any(seconds <= 0 for seconds in self.timeouts.values()):
+            msg = "Stage timeouts must be positive"
+            raise ValueError(msg)
+        if self.memory_limit is not None and self.memory_limit <= 0:
+            msg = f"memory_limit must be positive, got {self.memory_limit}"
+            raise ValueError(msg)
+        if self.retries < 0:
+            msg = f"retries must be non-negative, got {self.retries}"
+            raise ValueError(msg)
+
+    def timeout(self, stage: str) -> float | None:
+        """Return the timeout of a stage in seconds, or None."""
+        return self.timeouts.get(stage)
+
+
+class StageTimeoutError(RuntimeError):
+    """A child process ran longer than its stage's timeout and was killed."""
+
+    def __init__(self, stage: str, cmd: Sequence[str], timeout: float) -> None:
+        super().__init__(f"{stage}: {Path(cmd[0]).name} timed out after {timeout:g}s")
+        self.stage = stage
+        self.timeout = timeout
+
+
+_DEFAULT_LIMITS = ResourceLimits()
+
+_LIMITS: contextvars.ContextVar[ResourceLimits | None] = contextvars.ContextVar(
+    "struco_resource_limits", default=None
+)
+
+
+def current_limits() -> ResourceLimits:
+    """Return the resource limits active in this context."""
+    return _LIMITS.get() or _DEFAULT_LIMITS
+
+
+@contextmanager
+def resource_limits(limits: ResourceLimits | None) -> Iterator[ResourceLimits]:
+    """Apply limits to the child processes started from this context.
+
+    None keeps the limits already active.
+    """
+    limits = limits if limits is not None else current_limits()
+    token = _LIMITS.set(limits)
+    try:
+        yield limits
+    finally:
+        _LIMITS.reset(token)
+
+
+def limit_address_space(pid: int, limit: int) -> None:
+    """Cap the address space of a started child (``prlimit``; Linux only)."""
+    prlimit = getattr(resource, "prlimit", None)
+    if prlimit is None:
+        logger.warning("Memory limits need prlimit, which this platform lacks; ignoring")
+        return
+    with contextlib.suppress(ProcessLookupError):  # already exited
+        prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+
+
+def _drain(stream: IO[Any], chunks: list[Any]) -> threading.Thread:
+    """Read a child's output stream to the end on a thread."""
+
+    def read() -> None:
+        with stream:
+            chunks.append(stream.read())
+
+    thread = threading.Thread(target=read, daemon=True)
+    thread.start()
+    return thread
+
+
+def _feed(stream: IO[Any], data: Any) -> threading.Thread:
+    """Write a child's input on a thread and close the stream."""
+
+    def write() -> None:
+        with contextlib.suppress(BrokenPipeError), stream:
+            stream.write(data)
+
+    thread = threading.Thread(target=write, daemon=True)
+    thread.start()
+    return thread
+
+
+def _run_child(
+    cmd: Sequence[str],
+    timeout: float | None = None,
+    capture_output: bool = False,
+    memory_limit: int | None = None,
+    **kwargs: Any,
+) -> subprocess.CompletedProcess[Any]:
+    """Run a command like :func:`subprocess.run` and record the child's resource usage.
+
+    The child is reaped with ``wait4`` rather than by Popen, so its own CPU
+    time and peak RSS are known; a timer kills it at the timeout. The
+    memory limit is applied with ``prlimit`` right after the child starts,
+    since a ``preexec_fn`` can deadlock a process that runs threads.
+    """
+    stdin_data = kwargs.pop("input", None)
+    if capture_output:
+        kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+    if stdin_data is not None:
+        kwargs["stdin"] = subprocess.PIPE
+    process = subprocess.Popen(cmd, **kwargs)
+    if memory_limit is not None:
+        limit_address_space(process.pid, memory_limit)
+
+    outputs: dict[str, list[Any]] = {"stdout": [], "stderr": []}
+    threads = [
+        _drain(stream, outputs[name])
+        for name, stream in (("stdout", process.stdout), ("stderr", process.stderr))
+        if stream is not None
+    ]
+    if process.stdin is not None:
+        threads.append(_feed(process.stdin, stdin_data))
+    expired = threading.Event()
+
+    def expire() -> None:
+        expired.set()
+        process.kill()
+
+    timer = threading.Timer(timeout, expire) if timeout is not None else None
+    if timer is not None:
+        timer.start()
+    try:
+        _, status, usage = os.wait4(process.pid, 0)
+    except BaseException:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+    process.returncode = os.waitstatus_to_exitcode(status)
+    for thread in threads:
+        thread.join()
+    record_child(usage.ru_utime + usage.ru_stime, usage.ru_maxrss)
+
+    stdout = outputs["stdout"][0] if outputs["stdout"] else None
+    stderr = outputs["stderr"][0] if outputs["stderr"] else None
+    if expired.is_set():
+        raise subprocess.TimeoutExpired(process.args, timeout, stdout, stderr)
+    return subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
+
+
+def stage_timeout(stage: str, timeout: float | None = None) -> float | None:
+    """Return the timeout of a child: the shorter of timeout and the stage's active timeout."""
+    limit = current_limits().timeout(stage)
+    if timeout is None or (limit is not None and limit < timeout):
+        return limit
+    return timeout
+
+
+def is_transient_failure(error: OSError | None = None, returncode: int = 0) -> bool:
+    """Return True if a child that failed to start or exited like this is worth retrying."""
+    if error is not None:
+        return error.errno in _TRANSIENT_ERRNOS
+    return -returncode in _TRANSIENT_SIGNALS
+
+
+def run_tool(
+    cmd: Sequence[str], stage: str, timeout: float | None = None, **kwargs: Any
+) -> subprocess.CompletedProcess[Any]:
+    """Run a tool under the active :class:`ResourceLimits`.
+
+    Takes the same keyword arguments as :func:`subprocess.run` (never
+    check). Transient failures are retried with exponential backoff; any
+    other outcome, including a non-zero exit, is returned as is. The
+    child's CPU time and peak RSS are recorded in the open profiling span.
+
+    Parameters
+    ----------
+    cmd : sequence of str
+        The command line.
+    stage : str
+        Pipeline stage the command belongs to, which selects its timeout.
+    timeout : float or None
+        Timeout for this call; the stage timeout still applies if shorter.
+
+    Raises
+    ------
+    StageTimeoutError
+        If the tool ran longer than its timeout; it has been killed.
+    OSError
+        If the tool cannot be started (FileNotFoundError if it is missing).
+    """
+    limits = current_limits()
+    timeout = stage_timeout(stage, timeout)
+
+    delay = limits.retry_delay
+    attempt = 0
+    while True:
+        last = attempt == limits.retries
+        try:
+            result = _run_child(cmd, timeout=timeout, memory_limit=limits.memory_limit, **kwargs)
+        except subprocess.TimeoutExpired as exc:
+            raise StageTimeoutError(stage, cmd, timeout) from exc
+        except OSError as exc:
+            if last or not is_transient_failure(exc):
+                raise
+            logger.warning("Could not start %s (%s); retrying in %gs", cmd[0], exc, delay)
+        else:
+            if last or not is_transient_failure(returncode=result.returncode):
+                return result
+            logger.warning("%s was killed; retrying in %gs", cmd[0], delay)
+        time.sleep(delay)
+        delay *= 2
+        attempt += 1
+
+
+def estimate_cost(source: Path, output_root: str | Path | None = None) -> int:
+    """Estimate the work to process a source file, in bytes of IR.
+
+    Uses the size of the IR from a previous run when there is one, and
+    otherwise the source size scaled by a typical IR-to-source ratio.
+    Missing files cost 0.
+    """
+    from struco.cfg import ir_output_path
+
+    try:
+        return ir_output_path(source, output_root).stat().st_size
+    except OSError:
+        pass
+    try:
+        return source.stat().st_size * _IR_BYTES_PER_SOURCE_BYTE
+    except OSError:
+        return 0
+
+
+def order_by_cost(sources: Sequence[Path], output_root: str | Path | None = None) -> list[int]:
+    """Return the indices of sources, most expensive first (ties keep input order)."""
+    costs = [estimate_cost(source, output_root) for source in sources]
+    return sorted(range(len(sources)), key=lambda i: -costs[i])
+
+
+__all__ = [
+    "STAGES",
+    "ResourceLimits",
+    "StageTimeoutError",
+    "current_limits",
+    "estimate_cost",
+    "is_transient_failure",
+    "limit_address_space",
+    "order_by_cost",
+    "resource_limits",
+    "run_tool",
+    "stage_timeout",
+]
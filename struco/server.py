@@ -0,0 +1,360 @@
+"""Long-running struco daemon with warm worker processes.
+
+``struco serve`` keeps a process pool alive and accepts extraction jobs on a
+Unix socket, so build systems that call struco once per translation unit do
+not pay for interpreter start-up, imports and compiler discovery on every
+call. Jobs take the regular command-line arguments and are sent with
+:mod:`struco.client`; see that module for the wire protocol.
+
+Workers keep their per-process caches (demangled names, Codon runtime
+fingerprints) for the files of one job and drop them when they start on
+a file of another job, so a daemon's memory does not grow with the
+number of jobs it has served.
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import itertools
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any
+
+from struco.__main__ import (
+    build_parser,
+    cfg_options_from_args,
+    ir_options_from_args,
+    limits_from_args,
+    make_cache,
+    pch_dir_from_args,
+    validate_args,
+)
+from struco.batch import FileResult, collect_sources, process_file, read_file_list
+from struco.client import default_socket_path, send_request
+from struco.codon import clear_fingerprints
+from struco.pch import plan_pch
+from struco.scheduler import order_by_cost
+from struco.symbols import clear_cache
+
+logger = logging.getLogger(__name__)
+
+Send = Callable[[dict[str, Any]], None]
+
+
+class _UsageError(Exception):
+    """Invalid job arguments; reported to the client instead of exiting."""
+
+
+def _raise_usage(message: str) -> None:
+    raise _UsageError(message)
+
+
+def _warm_up() -> None:
+    """No-op task that makes the pool start its worker processes."""
+
+
+# Job whose files this worker process ran last
+_worker_state: dict[str, int | None] = {"job": None}
+
+
+def _process_job_file(job: int, *args: Any) -> FileResult:
+    """Run :func:`struco.batch.process_file` for a job, dropping other jobs' caches first."""
+    if _worker_state["job"] != job:
+        clear_cache()
+        clear_fingerprints()
+        _worker_state["job"] = job
+    return process_file(*args)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Reads one request line and streams the replies back."""
+
+    server: StrucoServer
+
+    def _send(self, message: dict[str, Any]) -> None:
+        self.wfile.write(json.dumps(message).encode() + b"\n")
+        self.wfile.flush()
+
+    def handle(self) -> None:
+        line = self.rfile.readline()
+        if not line:  # probe connection, e.g. from _remove_stale_socket
+            return
+        try:
+            self._send({"type": "done", "status": self._dispatch(line)})
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Client disconnected before the job finished")
+
+    def _dispatch(self, line: bytes) -> int:
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError(request)
+        except ValueError:
+            self._send({"type": "error", "message": "malformed request"})
+            return 2
+        return self.server.dispatch(request, self._send)
+
+
+class StrucoServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server that runs struco jobs on a shared process pool.
+
+    Each connection carries one job and is handled on its own thread; all
+    jobs share the worker processes, which stay alive between jobs.
+
+    Parameters
+    ----------
+    socket_path : str or Path or None
+        Where to listen. Defaults to
+        :func:`struco.client.default_socket_path`.
+    workers : int or None
+        Number of worker processes. Defaults to the number of CPUs.
+
+    Raises
+    ------
+    RuntimeError
+        If another daemon is already listening on socket_path.
+    PermissionError
+        If the default socket directory is not private to the current user.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str | Path | None = None, workers: int | None = None):
+        self.socket_path = Path(socket_path) if socket_path else default_socket_path()
+        self.workers = workers or os.cpu_count() or 1
+        _remove_stale_socket(self.socket_path)
+        # Create the socket owner-only instead of restricting it after bind
+        umask = os.umask(0o077)
+        try:
+            super().__init__(str(self.socket_path), _Handler)
+        finally:
+            os.umask(umask)
+        self._job_ids = itertools.count(1)
+        self._pool_lock = threading.Lock()
+        self._pool = self._start_pool()
+
+    def _start_pool(self) -> ProcessPoolExecutor:
+        pool = ProcessPoolExecutor(max_workers=self.workers)
+        for future in [pool.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+        logger.info("Started %d warm workers", self.workers)
+        return pool
+
+    def _submit(self, *args: Any) -> Future[FileResult]:
+        with self._pool_lock:
+            try:
+                return self._pool.submit(_process_job_file, *args)
+            except BrokenProcessPool:
+                logger.warning("Worker pool broke; restarting it")
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._start_pool()
+                return self._pool.submit(_process_job_file, *args)
+
+    def dispatch(self, request: dict[str, Any], send: Send) -> int:
+        """Handle one decoded request and return its exit status."""
+        if request.get("command") == "shutdown":
+            logger.info("Shutdown requested")
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return 0
+        if "argv" not in request:
+            send({"type": "error", "message": "request needs 'argv' or 'command'"})
+            return 2
+        try:
+            return self._run_job(request["argv"], Path(request.get("cwd") or "/"), send)
+        except _UsageError as exc:
+            send({"type": "error", "message": f"usage: {exc}"})
+            return 2
+
+    def _run_job(self, argv: Sequence[str], cwd: Path, send: Send) -> int:
+        """Run one command line on the pool, streaming results to send."""
+        parser = build_parser()
+        parser.error = _raise_usage
+        try:
+            args = parser.parse_args(list(argv))
+        except SystemExit as exc:  # --help and --version exit even without errors
+            raise _UsageError("invalid arguments") from exc
+        validate_args(parser, args)
+        if args.watch:
+            raise _UsageError("--watch is not supported by the daemon")
+        if args.profile:
+            raise _UsageError("--profile is not supported by the daemon")
+
+        paths = [str(cwd / path) for path in args.paths]
+        if args.files_from:
+            try:
+                paths.extend(read_file_list(cwd / args.files_from))
+            except FileNotFoundError as exc:
+                send({"type": "error", "message": str(exc)})
+                return 1
+        if not paths:
+            raise _UsageError("at least one path or --files-from is required")
+
+        sources = collect_sources(paths)
+        if not sources:
+            send({"type": "error", "message": "No supported source files found"})
+            return 1
+
+        cfg_options = cfg_options_from_args(args)
+        if cfg_options["render_jobs"] is None:
+            cfg_options["render_jobs"] = 1
+        try:
+            ir_options = ir_options_from_args(args, cwd)
+        except (FileNotFoundError, ValueError) as exc:
+            send({"type": "error", "message": str(exc)})
+            return 1
+        pch_dir = pch_dir_from_args(args, cwd)
+        if pch_dir is not None:
+            ir_options["pch"] = plan_pch(sources, ir_options["compile_db"], pch_dir)
+        if args.output_root:
+            ir_options["output_root"] = str(cwd / args.output_root)
+        if args.shape_store:
+            cfg_options["shape_store"] = str(cwd / args.shape_store)
+        if args.cache_dir:
+            args.cache_dir = str(cwd / args.cache_dir)
+        cache = make_cache(args)
+        logger.info("Job: %d files", len(sources))
+
+        limits = limits_from_args(args)
+        job = next(self._job_ids)
+        futures = {
+            self._submit(
+                job,
+                sources[index],
+                cache,
+                cfg_options,
+                args.incremental,
+                ir_options,
+                False,
+                limits,
+            ): sources[index]
+            for index in order_by_cost(sources, ir_options.get("output_root"))
+        }
+        failed = 0
+        try:
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as exc:  # a crashed worker must not stop the job
+                    result = FileResult(source=futures[future], error=f"worker failed: {exc}")
+                for path in result.outputs:
+                    send({"type": "output", "path": str(path)})
+                if not result.ok:
+                    failed += 1
+                    send({"type": "error", "source": str(result.source), "message": result.error})
+        except OSError:
+            for future in futures:
+                future.cancel()
+            raise
+        return 1 if failed else 0
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self.socket_path.unlink(missing_ok=True)
+
+
+def _remove_stale_socket(path: Path) -> None:
+    """Delete a socket file left behind by a daemon that is no longer running."""
+    if not path.exists():
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(path))
+        except ConnectionRefusedError:
+            path.unlink()
+            return
+        except OSError:
+            return
+    msg = f"A struco daemon is already listening on {path}"
+    raise RuntimeError(msg)
+
+
+def serve(socket_path: str | Path | None = None, workers: int | None = None) -> None:
+    """Run the daemon until a shutdown request or KeyboardInterrupt.
+
+    Parameters
+    ----------
+    socket_path : str or Path or None
+        Where to listen. Defaults to
+        :func:`struco.client.default_socket_path`.
+    workers : int or None
+        Number of worker processes. Defaults to the number of CPUs.
+    """
+    with StrucoServer(socket_path, workers) as server:
+        logger.info("Listening on %s", server.socket_path)
+        with contextlib.suppress(KeyboardInterrupt):
+            server.serve_forever()
+
+
+def _build_serve_parser() -> argparse.ArgumentParser:
+    """Return the argument parser for ``struco serve``."""
+    parser = argparse.ArgumentParser(
+        prog="struco serve",
+        description="Run a struco daemon with warm workers on a Unix socket.",
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Socket path (default: $STRUCO_SOCKET, $XDG_RUNTIME_DIR/struco.sock "
+        "or a per-user path in the temp directory)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Number of warm worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--stop",
+        action="store_true",
+        help="Ask the daemon listening on the socket to shut down",
+    )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="Enable verbose logging",
+    )
+    return parser
+
+
+def serve_main(argv: Sequence[str]) -> int:
+    """Entry point for ``struco serve``."""
+    parser = _build_serve_parser()
+    args = parser.parse_args(argv)
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(name)s | %(levelname)s | %(message)s",
+    )
+
+    try:
+        if args.stop:
+            for _ in send_request({"command": "shutdown"}, args.socket):
+                pass
+            return 0
+        serve(args.socket, args.workers)
+    except (ConnectionError, PermissionError, RuntimeError) as exc:
+        logger.error("%s", exc)
+        return 1
+    return 0
+
+
+__all__ = [
+    "StrucoServer",
+    "serve",
+]
@@ -0,0 +1,426 @@
+"""C++ symbol demangling and namespace-aware function filtering.
+
+Function names in C++ IR are mangled. Deciding from the mangled prefix
+whether a function belongs to the standard library misses inline ABI
+namespaces, Boost and any vendored code, so :class:`SymbolFilter` instead
+demangles every name of a module in one ``llvm-cxxfilt`` (or ``c++filt``)
+call, splits the result into its namespace path and looks the path up in a
+:class:`NamespaceTrie` of include and exclude rules:
+
+- the longest rule that is a prefix of the path decides, so
+  ``--exclude-namespace acme --include-namespace acme::core`` keeps
+  ``acme::core`` and drops the rest of ``acme``
+- paths no rule matches are kept, unless include rules were given, in
+  which case only included namespaces are kept
+- :data:`DEFAULT_EXCLUDES` (``std``, ``__gnu_cxx``, ``__cxxabiv1``,
+  ``boost``) apply unless a longer include rule overrides them
+
+Rules match whole components (``boost`` does not match ``boostrap``), and
+inline ABI namespaces such as libc++'s ``std::__1`` are dropped from
+paths, so ``std::vector`` also matches ``std::__1::vector``. Local
+entities keep their enclosing function and lambdas their name and index,
+so ``main::'lambda0'()::operator()()`` has the path
+``('main', "'lambda0'", 'operator()')``. Vtables,
+typeinfo, thunks, guard variables and compiler-generated initializers are
+always dropped.
+
+The most recently used demangled names are cached per process, so a
+header instantiated in many translation units is demangled once per
+worker while a long-lived worker's cache stays bounded. If neither demangler is
+installed, names fall back to the mangled-prefix check.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import logging
+import re
+import shutil
+import subprocess
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+
+from struco.profile import span
+
+logger = logging.getLogger(__name__)
+
+# Namespaces dropped from C++ outputs unless an include rule overrides them
+DEFAULT_EXCLUDES = ("std", "__gnu_cxx", "__cxxabiv1", "boost")
+
+# Demanglers, in order of preference
+_DEMANGLERS = ("llvm-cxxfilt", "c++filt")
+
+# Mangled prefixes of special names: vtables, typeinfo, thunks (_ZT*),
+# guard variables (_ZGV) and reference temporaries (_ZGR)
+_SPECIAL_PREFIXES = ("_ZT", "_ZGV", "_ZGR")
+
+# Mangled prefixes of standard library names, used when nothing can demangle
+_MANGLED_NAMESPACES = {
+    "_ZNSt": "std",
+    "_ZNKSt": "std",
+    "_ZSt": "std",
+    "_ZN9__gnu_cxx": "__gnu_cxx",
+    "_ZNK9__gnu_cxx": "__gnu_cxx",
+}
+
+# Compiler-generated functions that are never user code
+_COMPILER_INTERNAL_PREFIXES = (
+    "__clang_call_terminate",
+    "__cxx_global_var_init",
+    "__cxa_atexit",
+    "_GLOBAL__sub_I_",
+)
+
+# Inline namespaces that only version the ABI (libc++, libstdc++, NDK)
+_ABI_NAMESPACE = re.compile(r"__\d+|__cxx11|__ndk1")
+
+# Characters that are not portable in file names
+_UNSAFE_FILENAME = re.compile(r'[<>:"/\\|?*\x00-\x1f\s]+')
+
+# Longest readable stem before it is shortened with a hash
+_MAX_STEM = 150
+
+_ANONYMOUS = "(anonymous namespace)"
+
+# Qualifiers between a local entity's enclosing parameter list and its "::"
+_FUNCTION_QUALIFIERS = re.compile(r"(?: const| volatile| &&| &)*::")
+
+# Most demangled names kept per process; least recently used ones are evicted
+_CACHE_SIZE = 1 << 16
+
+_cache: OrderedDict[str, str] = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+@functools.cache
+def _demangler() -> str | None:
+    """Return the first demangler on PATH, or None."""
+    for tool in _DEMANGLERS:
+        if shutil.which(tool):
+            return tool
+    logger.debug("Neither llvm-cxxfilt nor c++filt found; C++ names stay mangled")
+    return None
+
+
+def _is_mangled(name: str) -> bool:
+    return name.startswith("_Z")
+
+
+def demangle(names: Iterable[str]) -> dict[str, str]:
+    """Demangle names with one demangler call for all names not yet cached.
+
+    Names that are not Itanium-mangled, or that the demangler rejects, map
+    to themselves.
+
+    Parameters
+    ----------
+    names : iterable of str
+        Symbol names, mangled or not.
+
+    Returns
+    -------
+    dict[str, str]
+        Demangled name of every input name.
+    """
+    names = list(dict.fromkeys(names))
+    known: dict[str, str] = {}
+    with _cache_lock:
+        for name in names:
+            if name in _cache:
+                _cache.move_to_end(name)
+                known[name] = _cache[name]
+    todo = [name for name in names if _is_mangled(name) and name not in known]
+    if todo:
+        demangled = dict(zip(todo, _run_demangler(todo), strict=True))
+        known.update(demangled)
+        with _cache_lock:
+            _cache.update(demangled)
+            while len(_cache) > _CACHE_SIZE:
+                _cache.popitem(last=False)
+    return {name: known.get(name, name) for name in names}
+
+
+def _run_demangler(names: list[str]) -> list[str]:
+    """Demangle names with the external tool, one name per line."""
+    tool = _demangler()
+    if tool is None:
+        return names
+    with span("demangle", f"{len(names)} names"):
+        try:
+            result = subprocess.run(
+                [tool],
+                input="\n".join(names) + "\n",
+                capture_output=True,
+                text=True,
+                check=False,
+            )
+        except OSError as exc:
+            logger.warning("%s failed: %s", tool, exc)
+            return names
+    lines = result.stdout.splitlines()
+    if result.returncode != 0 or len(lines) != len(names):
+        logger.warning("%s failed, keeping mangled names: %s", tool, result.stderr)
+        return names
+    return lines
+
+
+def clear_cache() -> None:
+    """Forget all demangled names."""
+    with _cache_lock:
+        _cache.clear()
+
+
+def namespace_path(demangled: str) -> tuple[str, ...]:
+    """Split a demangled function name into its qualified name components.
+
+    Return types, template arguments and parameter lists are dropped, as
+    are inline ABI namespaces. Lambdas and other unnamed types stay
+    components, with the index that tells them apart::
+
+        >>> namespace_path("std::__1::vector<int>::push_back(int&&)")
+        ('std', 'vector', 'push_back')
+        >>> namespace_path("int ns::max<int>(int, int)")
+        ('ns', 'max')
+        >>> namespace_path("main::{lambda()#2}::operator()() const")
+        ('main', '{lambda()#2}', 'operator()')
+    """
+    parts: list[str] = []
+    current: list[str] = []
+    depth = 0
+    i, n = 0, len(demangled)
+    while i < n:
+        if demangled.startswith(_ANONYMOUS, i):
+            current.append(_ANONYMOUS)
+            i += len(_ANONYMOUS)
+            continue
+        if depth == 0 and demangled.startswith("operator", i) and not current:
+            # The operator symbol may contain <, ( or spaces; it ends at the parameters
+            end = i + len("operator")
+            if demangled.startswith("()", end):
+                end += 2
+            end = demangled.find("(", end)
+            current.append(demangled[i : end if end >= 0 else n].rstrip())
+            i = end if end >= 0 else n
+            continue
+        ch = demangled[i]
+        if ch == "{" and depth == 0:
+            # GNU name of an unnamed type, e.g. {lambda(int)#1}
+            end = _closing(demangled, i, "{", "}")
+            current.append(demangled[i:end])
+            i = end
+            continue
+        if ch == "(" and depth == 0:
+            # A local entity's scope is its enclosing function; keep looking past it
+            end = _closing(demangled, i, "(", ")")
+            scope = _FUNCTION_QUALIFIERS.match(demangled, end)
+            if scope is None:
+                break
+            parts.append("".join(current))
+            current = []
+            i = scope.end()
+            continue
+        if ch in "<({[":
+            depth += 1
+        elif ch in ">)}]":
+            depth -= 1
+        elif depth == 0 and demangled.startswith("::", i):
+            parts.append("".join(current))
+            current = []
+            i += 2
+            continue
+        elif depth == 0 and ch == " ":
+            # Everything so far was the return type
+            parts, current = [], []
+        elif depth == 0:
+            current.append(ch)
+        i += 1
+    parts.append("".join(current))
+    return tuple(part for part in parts if part and not _ABI_NAMESPACE.fullmatch(part))
+
+
+def _closing(text: str, start: int, opening: str, closing: str) -> int:
+    """Return the index after the bracket that closes the one at start."""
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == opening:
+            depth += 1
+        elif text[i] == closing:
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return len(text)
+
+
+def _split_rule(rule: str) -> tuple[str, ...]:
+    return tuple(part for part in rule.strip().split("::") if part)
+
+
+class NamespaceTrie:
+    """Prefix trie from namespace paths to include (True) / exclude (False) rules."""
+
+    __slots__ = ("_children", "_rule")
+
+    def __init__(self) -> None:
+        self._children: dict[str, NamespaceTrie] = {}
+        self._rule: bool | None = None
+
+    def insert(self, path: Sequence[str], include: bool) -> None:
+        """Add a rule for path and everything below it, replacing any rule for path."""
+        node = self
+        for part in path:
+            node = node._children.setdefault(part, NamespaceTrie())
+        node._rule = include
+
+    def match(self, path: Sequence[str]) -> bool | None:
+        """Return the rule of the longest prefix of path that has one, or None."""
+        node, rule = self, self._rule
+        for part in path:
+            node = node._children.get(part)
+            if node is None:
+                break
+            if node._rule is not None:
+                rule = node._rule
+        return rule
+
+
+@dataclass(frozen=True)
+class SymbolFilter:
+    """Include/exclude rules for C++ functions by demangled namespace.
+
+    Attributes
+    ----------
+    include : tuple of str
+        Namespaces (``"acme::core"``) to keep. If any are given, functions
+        outside them are dropped.
+    exclude : tuple of str
+        Namespaces to drop, in addition to :data:`DEFAULT_EXCLUDES`.
+    """
+
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+    _trie: NamespaceTrie = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        trie = NamespaceTrie()
+        for rule in DEFAULT_EXCLUDES:
+            trie.insert(_split_rule(rule), include=False)
+        for rule in self.include:
+            trie.insert(_split_rule(rule), include=True)
+        for rule in self.exclude:
+            trie.insert(_split_rule(rule), include=False)
+        object.__setattr__(self, "_trie", trie)
+
+    @classmethod
+    def from_options(
+        cls, include: Iterable[str] | None = None, exclude: Iterable[str] | None = None
+    ) -> SymbolFilter:
+        """Build a filter from optional lists of namespaces."""
+        return cls(include=tuple(include or ()), exclude=tuple(exclude or ()))
+
+    def keeps_path(self, path: Sequence[str]) -> bool:
+        """Return True if a function with this qualified name path is kept."""
+        rule = self._trie.match(path)
+        return not self.include if rule is None else rule
+
+    def _path(self, name: str, demangled: str) -> tuple[str, ...]:
+        if demangled != name or not _is_mangled(name):
+            return namespace_path(demangled)
+        # Not demangled: recognize the standard library by its mangled prefix
+        for prefix, namespace in _MANGLED_NAMESPACES.items():
+            if name.startswith(prefix):
+                return (namespace,)
+        return (name,)
+
+    def select(self, names: Sequence[str]) -> list[str]:
+        """Return the names of the functions to keep, in input order.
+
+        Compiler-generated functions and special names are always dropped.
+        The remaining names are demangled in one batch (see
+        :func:`demangle`) and matched against the rules.
+        """
+        candidates = [
+            name
+            for name in names
+            if not name.startswith(_SPECIAL_PREFIXES)
+            and not name.startswith(_COMPILER_INTERNAL_PREFIXES)
+        ]
+        demangled = demangle(candidates)
+        return [name for name in candidates if self.keeps_path(self._path(name, demangled[name]))]
+
+
+def _parameters(demangled: str) -> str:
+    """Return the trailing parameter list (and qualifiers) of a demangled name."""
+    depth = 0
+    for i in range(len(demangled) - 1, -1, -1):
+        ch = demangled[i]
+        if ch == ")":
+            depth += 1
+        elif ch == "(":
+            depth -= 1
+            if depth == 0:
+                return demangled[i:]
+    return ""
+
+
+def readable_stems(names: Sequence[str]) -> list[str]:
+    """Return a readable, unique file name stem for each function name.
+
+    Mangled names become their qualified name and parameter list, with
+    ``::`` written as ``.`` and template arguments and return types left
+    out (``ns.Stack.push(int const&)``); other names are kept. Characters
+    that are not portable in file names become ``_``. Stems that would be
+    too long, or that collide (for example two instantiations of one
+    template), get a short hash of the mangled name so every function keeps
+    its own file.
+    """
+    demangled = demangle(names)
+    stems: list[str] = []
+    seen: set[str] = set()
+    for name in names:
+        text = demangled[name]
+        if text != name:
+            text = ".".join(namespace_path(text)) + _parameters(text)
+        stem = _UNSAFE_FILENAME.sub("_", text)
+        if len(stem.encode()) > _MAX_STEM or stem in seen:
+            stem = _shorten(stem, name)
+        seen.add(stem)
+        stems.append(stem)
+    return stems
+
+
+def file_stem(name: str) -> str:
+    """Return a function name as a portable file name stem.
+
+    Names are kept unless they contain path separators or other characters
+    that are not portable in file names (a C++ ``operator/``, Codon's
+    ``f:0[int]``), which become ``_``, or are longer than 150 bytes
+    (deeply templated C++ instantiations can run to kilobytes, past the
+    255-byte file name limit), which are cut. Either way the stem gets a
+    short hash of the full name, so it stays unique.
+    """
+    stem = _UNSAFE_FILENAME.sub("_", name)
+    if stem == name and len(stem.encode()) <= _MAX_STEM:
+        return name
+    return _shorten(stem, name)
+
+
+def _shorten(stem: str, name: str) -> str:
+    """Return stem cut to fit _MAX_STEM bytes with a hash of name appended."""
+    digest = hashlib.blake2b(name.encode(), digest_size=4).hexdigest()
+    head = stem.encode()[: _MAX_STEM - 9].decode(errors="ignore")
+    return f"{head}~{digest}"
+
+
+__all__ = [
+    "DEFAULT_EXCLUDES",
+    "NamespaceTrie",
+    "SymbolFilter",
+    "clear_cache",
+    "demangle",
+    "file_stem",
+    "namespace_path",
+    "readable_stems",
+]
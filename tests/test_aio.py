@@ -0,0 +1,249 @@
+"""Tests for struco.aio module."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import shutil
+import sys
+import textwrap
+import time
+from pathlib import Path
+
+import pytest
+
+from struco.aio import default_limiter, extract_cfg_from_ir_async, extract_ir_async
+from struco.cfg import IRResult, Language, extract_cfg_from_ir
+from struco.scheduler import ResourceLimits, StageTimeoutError, resource_limits
+
+SAMPLE_IR = textwrap.dedent("""\
+    define dso_local i32 @main() {
+    entry:
+      ret i32 0
+    }
+
+    define dso_local i32 @helper(i32 %x) {
+    entry:
+      %c = icmp eq i32 %x, 0
+      br i1 %c, label %a, label %b
+
+    a:
+      ret i32 1
+
+    b:
+      ret i32 2
+    }
+""")
+
+# Writes SAMPLE_IR; FAKE_CLANG_MODE makes it hang, allocate 512 MiB, or get
+# SIGKILLed on its first run (the marker file records that it ran)
+FAKE_CLANG = f"""\
+import os, signal, sys, time
+mode = os.environ.get("FAKE_CLANG_MODE", "")
+if mode == "hang":
+    time.sleep(60)
+elif mode == "allocate":
+    b = bytearray(512 << 20)
+elif mode.startswith("kill-once:") and not os.path.exists(mode[10:]):
+    open(mode[10:], "w").close()
+    os.kill(os.getpid(), signal.SIGKILL)
+out = sys.argv[sys.argv.index("-o") + 1]
+open(out, "w").write({SAMPLE_IR!r})
+"""
+
+# Copies the .dot input to the output; optionally records its pid and hangs, or
+# hangs on anything but a structure-only graph
+FAKE_DOT = """\
+import os, shutil, sys, time
+pid_file = os.environ.get("FAKE_DOT_PID_FILE")
+if pid_file:
+    open(pid_file, "w").write(str(os.getpid()))
+    time.sleep(60)
+if os.environ.get("FAKE_DOT_SLOW") and "shape=point" not in open(sys.argv[2]).read():
+    time.sleep(60)
+shutil.copyfile(sys.argv[2], sys.argv[sys.argv.index("-o") + 1])
+"""
+
+CHAIN_IR = textwrap.dedent("""\
+    define void @chain() {
+    entry:
+      br label %next
+
+    next:
+      br label %last
+
+    last:
+      ret void
+    }
+""")
+
+
+def _install(bin_dir: Path, name: str, body: str) -> None:
+    script = bin_dir / name
+    script.write_text(f"#!{sys.executable}\n{body}")
+    script.chmod(0o755)
+
+
+@pytest.fixture()
+def fake_tools(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    _install(bin_dir, "clang", FAKE_CLANG)
+    _install(bin_dir, "dot", FAKE_DOT)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return bin_dir
+
+
+# extract_ir_async
+class TestExtractIRAsync:
+    def test_writes_ir_next_to_source(self, tmp_path: Path, fake_tools: Path):
+        source = tmp_path / "prog.c"
+        source.write_text("int main(void) { return 0; }")
+
+        result = asyncio.run(extract_ir_async(source))
+
+        expected = tmp_path / "prog_c_ll_files" / "prog_c.ll"
+        assert result == IRResult(ir_path=expected, language=Language.C)
+        assert expected.read_text() == SAMPLE_IR
+
+    def test_missing_source_raises(self, tmp_path: Path):
+        with pytest.raises(FileNotFoundError, match="Source file not found"):
+            asyncio.run(extract_ir_async(tmp_path / "missing.c"))
+
+    def test_unsupported_extension_raises(self, tmp_path: Path):
+        with pytest.raises(ValueError, match="Unsupported file extension"):
+            asyncio.run(extract_ir_async(tmp_path / "prog.rs"))
+
+
+# Resource limits
+class TestResourceLimits:
+    @pytest.fixture()
+    def source(self, tmp_path: Path, fake_tools: Path) -> Path:
+        source = tmp_path / "prog.c"
+        source.write_text("int main(void) { return 0; }")
+        return source
+
+    def test_stage_timeout(self, source: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("FAKE_CLANG_MODE", "hang")
+        start = time.monotonic()
+        with (
+            resource_limits(ResourceLimits(timeouts={"frontend": 0.5})),
+            pytest.raises(StageTimeoutError, match="frontend: clang timed out"),
+        ):
+            asyncio.run(extract_ir_async(source))
+        assert time.monotonic() - start < 10
+
+    def test_memory_limit(self, source: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("FAKE_CLANG_MODE", "allocate")
+        with (
+            resource_limits(ResourceLimits(memory_limit=256 << 20)),
+            pytest.raises(RuntimeError, match="MemoryError"),
+        ):
+            asyncio.run(extract_ir_async(source))
+        assert asyncio.run(extract_ir_async(source)).ir_path.exists()
+
+    def test_killed_tool_is_retried(
+        self, source: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        marker = tmp_path / "killed"
+        monkeypatch.setenv("FAKE_CLANG_MODE", f"kill-once:{marker}")
+        with resource_limits(ResourceLimits(retry_delay=0.0)):
+            result = asyncio.run(extract_ir_async(source))
+        assert marker.exists()
+        assert result.ir_path.read_text() == SAMPLE_IR
+
+
+# extract_cfg_from_ir_async
+class TestExtractCfgAsync:
+    def test_native_engine_matches_sync(self, tmp_path: Path, fake_tools: Path):
+        ir_file = tmp_path / "prog_c.ll"
+        ir_file.write_text(SAMPLE_IR)
+
+        sync_outputs = extract_cfg_from_ir(ir_file, engine="native")
+        async_outputs = asyncio.run(extract_cfg_from_ir_async(ir_file, engine="native"))
+
+        assert async_outputs == sync_outputs
+        assert [p.name for p in async_outputs] == ["main.png", "helper.png"]
+
+    @pytest.mark.skipif(shutil.which("opt") is None, reason="LLVM opt not installed")
+    def test_opt_engine_matches_sync(self, tmp_path: Path, fake_tools: Path):
+        ir_file = tmp_path / "prog_c.ll"
+        ir_file.write_text(SAMPLE_IR)
+
+        sync_outputs = extract_cfg_from_ir(ir_file, functions=["helper"])
+        async_outputs = asyncio.run(extract_cfg_from_ir_async(ir_file, functions=["helper"]))
+
+        assert async_outputs == sync_outputs == [tmp_path / "prog_c_cfg" / "pngs" / "helper.png"]
+
+    def test_summarize_keeps_full_dot(self, tmp_path: Path, fake_tools: Path):
+        ir_file = tmp_path / "prog_c.ll"
+        ir_file.write_text(CHAIN_IR)
+
+        [output] = asyncio.run(extract_cfg_from_ir_async(ir_file, engine="native", summarize=True))
+
+        assert "entry .. last (3 blocks):" in output.read_text()
+        [dot_file] = (tmp_path / "prog_c_cfg").glob("*.dot")
+        assert "(3 blocks)" not in dot_file.read_text()
+
+    def test_render_timeout_falls_back_to_structure(
+        self, tmp_path: Path, fake_tools: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        ir_file = tmp_path / "prog_c.ll"
+        ir_file.write_text(SAMPLE_IR)
+        monkeypatch.setenv("FAKE_DOT_SLOW", "1")
+
+        start = time.monotonic()
+        outputs = asyncio.run(
+            extract_cfg_from_ir_async(ir_file, engine="native", render_timeout=0.5)
+        )
+
+        assert time.monotonic() - start < 10
+        assert [p.name for p in outputs] == ["main.png", "helper.png"]
+        assert all("shape=point" in p.read_text() for p in outputs)
+
+    def test_structured_format(self, tmp_path: Path):
+        ir_file = tmp_path / "prog_c.ll"
+        ir_file.write_text(SAMPLE_IR)
+        outputs = asyncio.run(extract_cfg_from_ir_async(ir_file, output_format="json"))
+        assert [p.name for p in outputs] == ["main.json", "helper.json"]
+
+    def test_invalid_format_raises(self, tmp_path: Path):
+        ir_file = tmp_path / "prog_c.ll"
+        ir_file.write_text(SAMPLE_IR)
+        with pytest.raises(ValueError, match="Invalid output format"):
+            asyncio.run(extract_cfg_from_ir_async(ir_file, output_format="svg"))
+
+
+# Cancellation and limits
+class TestCancellation:
+    def test_cancel_kills_renderer(
+        self, tmp_path: Path, fake_tools: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        ir_file = tmp_path / "prog_c.ll"
+        ir_file.write_text(SAMPLE_IR)
+        pid_file = tmp_path / "dot.pid"
+        monkeypatch.setenv("FAKE_DOT_PID_FILE", str(pid_file))
+
+        async def run_and_cancel() -> None:
+            task = asyncio.ensure_future(
+                extract_cfg_from_ir_async(ir_file, engine="native", functions=["main"])
+            )
+            deadline = time.monotonic() + 10
+            while not pid_file.exists() or not pid_file.read_text():
+                assert time.monotonic() < deadline
+                await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run_and_cancel())
+
+        with pytest.raises(ProcessLookupError):
+            os.kill(int(pid_file.read_text()), 0)
+        assert not list((tmp_path / "prog_c_cfg" / "pngs").iterdir())
+
+    def test_default_limiter_shared_per_loop(self):
+        async def get_twice() -> bool:
+            return default_limiter() is default_limiter()
+
+        assert asyncio.run(get_twice())
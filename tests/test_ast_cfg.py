@@ -0,0 +1,263 @@
+"""Tests for struco.ast_cfg module."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from struco.__main__ import main
+from struco.ast_cfg import SourceDocument, build_ast_cfgs, extract_cfg_from_source
+from struco.batch import run_batch
+from struco.graph import FunctionCFG
+
+pytest.importorskip("tree_sitter")
+pytest.importorskip("tree_sitter_c")
+pytest.importorskip("tree_sitter_cpp")
+pytest.importorskip("tree_sitter_python")
+
+C_SOURCE = """\
+int clamp(int x) {
+    if (x < 0) {
+        x = 0;
+    } else {
+        x = x * 2;
+    }
+    return x;
+}
+
+int count(int n) {
+    int total = 0;
+    for (int i = 0; i < n; i++) {
+        if (i == 3) continue;
+        if (i == 7) break;
+        total += i;
+    }
+    return total;
+}
+"""
+
+
+def _cfg(document: SourceDocument, name: str) -> FunctionCFG:
+    return next(cfg for cfg in document.cfgs() if cfg.name == name)
+
+
+def _successors(cfg: FunctionCFG) -> dict[str, list[str]]:
+    return {block.label: block.successors for block in cfg.blocks}
+
+
+# function discovery
+class TestFunctionNames:
+    def test_c_functions(self):
+        assert SourceDocument(C_SOURCE, "c").function_names() == ["clamp", "count"]
+
+    def test_cpp_names_are_qualified(self):
+        source = """
+        namespace ns {
+        struct S { int get() { return 1; } };
+        template <class T> T id(T x) { return x; }
+        }
+        int S::put(int y) { return y; }
+        """
+        names = SourceDocument(source, "cpp").function_names()
+        assert names == ["ns::S::get", "ns::id", "S::put"]
+
+    def test_python_methods_and_decorated_functions(self):
+        source = "class A:\n    def m(self):\n        def inner(): pass\n\n@cache\ndef f(): pass\n"
+        assert SourceDocument(source, "py").function_names() == ["A.m", "f"]
+
+    def test_redefinitions_get_suffix(self):
+        source = "#ifdef X\nint f() { return 1; }\n#else\nint f() { return 2; }\n#endif\n"
+        assert SourceDocument(source, "c").function_names() == ["f", "f.1"]
+
+    def test_unsupported_language(self):
+        with pytest.raises(ValueError, match="Unsupported language"):
+            SourceDocument("", "rs")
+
+
+# C/C++ control flow
+class TestCControlFlow:
+    def test_if_else_joins(self):
+        cfg = _cfg(SourceDocument(C_SOURCE, "c"), "clamp")
+        assert _successors(cfg) == {
+            "entry": ["if.then", "if.else"],
+            "if.then": ["if.end"],
+            "if.else": ["if.end"],
+            "if.end": [],
+        }
+        assert cfg.instructions(0) == ["if (x < 0)"]
+        assert cfg.instructions(3) == ["return x;"]
+
+    def test_for_loop_with_break_and_continue(self):
+        succ = _successors(_cfg(SourceDocument(C_SOURCE, "c"), "count"))
+        assert succ["entry"] == ["for.cond"]
+        assert succ["for.cond"] == ["for.body", "for.end"]
+        assert succ["if.then"] == ["for.inc"]
+        assert succ["if.then1"] == ["for.end"]
+        assert succ["for.inc"] == ["for.cond"]
+
+    def test_switch_fallthrough_and_default(self):
+        source = (
+            "int f(int x) { switch (x) { case 1: x++; case 2: break; default: return 1; }"
+            " return x; }"
+        )
+        succ = _successors(SourceDocument(source, "c").cfgs()[0])
+        assert succ["entry"] == ["sw.bb", "sw.bb1", "sw.default"]
+        assert succ["sw.bb"] == ["sw.bb1"]
+        assert succ["sw.bb1"] == ["sw.epilog"]
+        assert succ["sw.default"] == []
+
+    def test_do_while_and_goto(self):
+        source = "void f(int x) { again: do { x--; } while (x > 0); if (x) goto again; }"
+        succ = _successors(SourceDocument(source, "c").cfgs()[0])
+        assert succ["entry"] == ["again"]
+        assert succ["do.cond"] == ["do.body", "do.end"]
+        assert succ["if.then"] == ["again"]
+
+    def test_returns_have_no_successors_and_dead_code_is_kept(self):
+        source = "int f(int x) { if (x) return 1; else return 2; return 3; }"
+        succ = _successors(SourceDocument(source, "c").cfgs()[0])
+        # return 3 lands in the join block, which no edge reaches
+        assert succ == {
+            "entry": ["if.then", "if.else"],
+            "if.then": [],
+            "if.else": [],
+            "if.end": [],
+        }
+
+    def test_cpp_try_catch(self):
+        source = "int f() { try { g(); h(); } catch (int e) { return e; } return 0; }"
+        succ = _successors(SourceDocument(source, "cpp").cfgs()[0])
+        assert succ["try"] == ["catch", "try.end"]
+        assert succ["catch"] == []
+
+
+# Python control flow
+class TestPythonControlFlow:
+    def test_elif_chain(self):
+        source = "def f(x):\n    if x:\n        a()\n    elif y:\n        b()\n    else:\n  c()"
+        succ = _successors(SourceDocument(source, "py").cfgs()[0])
+        assert succ["entry"] == ["if.then", "if.else"]
+        assert succ["if.else"] == ["if.then1", "if.else1"]
+        assert succ["if.end1"] == ["if.end"]
+
+    def test_loop_else_and_try_finally(self):
+        source = (
+            "def f(xs):\n"
+            "    for x in xs:\n"
+            "        if x:\n"
+            "            break\n"
+            "    else:\n"
+            "        g()\n"
+            "    try:\n"
+            "        h()\n"
+            "    except ValueError:\n"
+            "        pass\n"
+            "    finally:\n"
+            "        k()\n"
+        )
+        succ = _successors(SourceDocument(source, "py").cfgs()[0])
+        assert succ["for.cond"] == ["for.body", "for.else"]
+        assert succ["if.then"] == ["for.end"]
+        assert succ["try"] == ["except", "finally"]
+        assert succ["except"] == ["finally"]
+        assert succ["finally"] == ["try.end"]
+
+    def test_code_codon_rejects_still_parses(self):
+        source = "async def f(xs):\n    async with lock:\n        return [x async for x in xs]\n"
+        cfg = SourceDocument(source, "py").cfgs()[0]
+        assert cfg.instructions(0) == ["async with lock:", "return [x async for x in xs]"]
+
+
+# syntax errors and incremental reparse
+class TestSourceDocument:
+    def test_code_that_does_not_compile(self):
+        source = '#include "missing.h"\nint f(int x) { int y = ; if (x) return undefined(x); }\n'
+        document = SourceDocument(source, "c")
+        assert document.has_errors
+        assert _successors(document.cfgs()[0])["entry"] == ["if.then", "if.end"]
+
+    def test_edit_rebuilds_only_changed_functions(self):
+        document = SourceDocument(C_SOURCE, "c")
+        clamp, count = document.cfgs()
+        start = C_SOURCE.index("total += i")
+
+        document.edit(start, start + len("total += i"), "total -= i")
+        new_clamp, new_count = document.cfgs()
+
+        assert new_clamp is clamp
+        assert new_count is not count
+        assert any("total -= i;" in block.instructions for block in new_count.blocks)
+
+    def test_edit_matches_full_parse(self):
+        document = SourceDocument(C_SOURCE, "c")
+        start = C_SOURCE.index("x = 0;")
+        document.edit(start, start + len("x = 0;"), "while (x) x++;")
+
+        fresh = SourceDocument(document.source, "c")
+        assert str(document.tree.root_node) == str(fresh.tree.root_node)
+        assert [cfg.edges() for cfg in document.cfgs()] == [cfg.edges() for cfg in fresh.cfgs()]
+
+    def test_set_source_keeps_unchanged_functions(self):
+        document = SourceDocument(C_SOURCE, "c")
+        clamp, count = document.cfgs()
+        document.set_source(C_SOURCE.replace("x * 2", "x * 3"))
+        new_clamp, new_count = document.cfgs()
+        assert new_clamp is not clamp
+        assert new_count is count
+
+    def test_invalid_edit_range(self):
+        with pytest.raises(ValueError, match="Invalid edit range"):
+            SourceDocument("int f() {}", "c").edit(5, 100, "")
+
+
+# extract_cfg_from_source and the ast engine
+class TestExtractCfgFromSource:
+    def test_json_output(self, tmp_path: Path):
+        source = tmp_path / "m.c"
+        source.write_text(C_SOURCE)
+
+        outputs = extract_cfg_from_source(source, output_format="json", functions=["count"])
+
+        assert outputs == [tmp_path / "m_c_ast_cfg" / "jsons" / "count.json"]
+        assert json.loads(outputs[0].read_text())["function"] == "count"
+
+    def test_renders_without_compiler(self, tmp_path: Path):
+        source = tmp_path / "m.py"
+        source.write_text("def f(x):\n    return x\n")
+
+        with (
+            patch("struco.ast_cfg.render_dots", side_effect=lambda dots, *a: list(dots)),
+            patch("struco.scheduler._run_child") as mock_run,
+        ):
+            outputs = extract_cfg_from_source(source, output_root=tmp_path / "out")
+
+        mock_run.assert_not_called()
+        assert [p.name for p in outputs] == [".f.dot"]
+        assert outputs[0].parent.name == "m_py_ast_cfg"
+        assert outputs[0].is_relative_to(tmp_path / "out")
+
+    def test_missing_file(self, tmp_path: Path):
+        with pytest.raises(FileNotFoundError):
+            build_ast_cfgs(tmp_path / "missing.c")
+
+    def test_batch_engine(self, tmp_path: Path):
+        (tmp_path / "a.c").write_text(C_SOURCE)
+        (tmp_path / "b.py").write_text("def g():\n    pass\n")
+
+        report = run_batch(
+            [tmp_path / "a.c", tmp_path / "b.py"], output_format="json", jobs=1, engine="ast"
+        )
+
+        assert not report.failed
+        assert [p.name for r in report.results for p in r.outputs] == [
+            "clamp.json",
+            "count.json",
+            "g.json",
+        ]
+
+    def test_cli_rejects_incremental(self, tmp_path: Path):
+        with pytest.raises(SystemExit):
+            main([str(tmp_path / "a.c"), "--engine", "ast", "--incremental"])
@@ -0,0 +1,125 @@
+"""Tests for struco.batch module."""
+
+from __future__ import annotations
+
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from struco.batch import (
+    BatchReport,
+    FileResult,
+    collect_sources,
+    read_file_list,
+    run_batch,
+)
+from struco.cfg import IRResult, Language
+
+
+@pytest.fixture()
+def source_tree(tmp_path: Path) -> Path:
+    (tmp_path / "src" / "sub").mkdir(parents=True)
+    (tmp_path / "src" / "a.c").write_text("int a() { return 0; }")
+    (tmp_path / "src" / "b.cpp").write_text("int b() { return 0; }")
+    (tmp_path / "src" / "sub" / "c.py").write_text("def c(): pass")
+    (tmp_path / "src" / "notes.txt").write_text("not source")
+    (tmp_path / "src" / "sub" / "d.h").write_text("int d();")
+    return tmp_path
+
+
+# collect_sources
+class TestCollectSources:
+    def test_directory_is_searched_recursively(self, source_tree: Path):
+        sources = collect_sources([source_tree / "src"])
+        names = [p.name for p in sources]
+        assert names == ["a.c", "b.cpp", "c.py"]
+
+    def test_glob_pattern(self, source_tree: Path):
+        sources = collect_sources([str(source_tree / "src" / "**" / "*.py")])
+        assert [p.name for p in sources] == ["c.py"]
+
+    def test_glob_skips_unsupported_extensions(self, source_tree: Path):
+        sources = collect_sources([str(source_tree / "src" / "*")])
+        assert {p.name for p in sources} == {"a.c", "b.cpp"}
+
+    def test_explicit_file_kept_even_if_unsupported(self, source_tree: Path):
+        explicit = source_tree / "src" / "notes.txt"
+        assert collect_sources([explicit]) == [explicit.resolve()]
+
+    def test_duplicates_removed(self, source_tree: Path):
+        a = source_tree / "src" / "a.c"
+        sources = collect_sources([a, str(a), source_tree / "src"])
+        assert sources.count(a.resolve()) == 1
+
+    def test_returns_absolute_paths(self, source_tree: Path):
+        sources = collect_sources([source_tree / "src"])
+        assert all(p.is_absolute() for p in sources)
+
+
+# read_file_list
+class TestReadFileList:
+    def test_skips_blank_and_comment_lines(self, tmp_path: Path):
+        list_file = tmp_path / "files.txt"
+        list_file.write_text("# header\n\na.c\n  b.cpp  \n")
+        entries = read_file_list(list_file)
+        assert entries == [str(tmp_path / "a.c"), str(tmp_path / "b.cpp")]
+
+    def test_missing_list_raises(self, tmp_path: Path):
+        with pytest.raises(FileNotFoundError, match="File list not found"):
+            read_file_list(tmp_path / "missing.txt")
+
+
+# run_batch
+class TestRunBatch:
+    def test_failures_are_collected_per_file(self, tmp_path: Path):
+        good = tmp_path / "good.c"
+        bad = tmp_path / "bad.c"
+
+        def fake_extract_ir(path, cache=None, **ir_options):
+            if Path(path).name == "bad.c":
+                msg = "Frontend compilation failed"
+                raise RuntimeError(msg)
+            return IRResult(ir_path=tmp_path / "good_c.ll", language=Language.C)
+
+        with (
+            patch("struco.batch.extract_ir", side_effect=fake_extract_ir),
+            patch(
+                "struco.batch.extract_cfg_from_ir",
+                return_value=[tmp_path / "main.png"],
+            ),
+        ):
+            report = run_batch([bad, good], jobs=1)
+
+        assert [r.source for r in report.results] == [bad, good]
+        assert len(report.failed) == 1
+        assert report.failed[0].source == bad
+        assert "Frontend compilation failed" in report.failed[0].error
+        assert report.succeeded[0].outputs == (tmp_path / "main.png",)
+
+    def test_invalid_jobs_raises(self, tmp_path: Path):
+        with pytest.raises(ValueError, match="jobs must be at least 1"):
+            run_batch([tmp_path / "x.c"], jobs=0)
+
+    def test_incremental_needs_ir_on_disk(self, tmp_path: Path):
+        with pytest.raises(ValueError, match="keep_ir"):
+            run_batch([tmp_path / "x.c"], jobs=1, incremental=True, keep_ir=False)
+
+    def test_empty_batch(self):
+        report = run_batch([], jobs=4)
+        assert report.results == ()
+
+
+# BatchReport
+class TestBatchReport:
+    def test_summary_lists_failures(self):
+        report = BatchReport(
+            results=(
+                FileResult(source=Path("/a.c"), outputs=(Path("/a.png"),)),
+                FileResult(source=Path("/b.c"), error="boom"),
+            ),
+            elapsed=1.5,
+        )
+        summary = report.summary()
+        assert "1 succeeded, 1 failed, 1 CFG files written" in summary
+        assert "FAILED /b.c: boom" in summary
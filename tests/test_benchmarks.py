@@ -0,0 +1,56 @@
+"""Tests for the benchmarks package."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from benchmarks.bench_pipeline import compare, run
+from benchmarks.synthetic import write_ir_module, write_source
+from struco.cfg import Language, get_function_names
+from struco.ir import parse_ir
+
+
+# synthetic
+class TestSynthetic:
+    def test_cpp_module_keeps_user_functions(self, tmp_path: Path):
+        path = tmp_path / "m.ll"
+        write_ir_module(path, 3, 4, language="cpp")
+        assert get_function_names(path, Language.CPP) == ["_Z3fn0v", "_Z3fn1v", "_Z3fn2v"]
+
+    def test_blocks_per_function(self, tmp_path: Path):
+        path = tmp_path / "m.ll"
+        write_ir_module(path, 2, 5, language="c")
+        cfgs = parse_ir(path.read_text())
+        assert [cfg.name for cfg in cfgs] == ["fn0", "fn1"]
+        assert all(len(cfg) == 6 for cfg in cfgs)
+
+    def test_source_names_are_offset(self, tmp_path: Path):
+        names = write_source(tmp_path / "a.c", 2, 1, offset=10)
+        assert names == ["fn10", "fn11"]
+
+
+# bench_pipeline
+class TestBenchPipeline:
+    def test_runs_with_fake_toolchain(self, tmp_path: Path):
+        results = run(tmp_path, n_files=1, n_functions=3, n_blocks=2, repeat=1)
+
+        assert set(results) == {"opt-png", "native-png", "json"}
+        assert results["opt-png"]["render"]["count"] == 3
+        assert results["opt-png"]["slice"]["count"] == 1
+        assert results["native-png"]["write_dot"]["count"] == 3
+        assert results["json"]["serialize"]["count"] == 3
+
+    def test_compare_flags_slow_and_missing_stages(self):
+        baseline = {"s": {"opt": {"ops_per_s": 100.0}, "render": {"ops_per_s": 10.0}}}
+        results = {"s": {"opt": {"ops_per_s": 40.0}}}
+
+        regressions = compare(results, baseline, tolerance=0.5)
+
+        assert regressions == [
+            "s/opt: 40.0 ops/s, baseline 100.0 ops/s",
+            "s/render: stage missing",
+        ]
+
+    def test_compare_within_tolerance(self):
+        baseline = {"s": {"opt": {"ops_per_s": 100.0}}}
+        assert compare({"s": {"opt": {"ops_per_s": 60.0}}}, baseline, tolerance=0.5) == []
@@ -0,0 +1,252 @@
+"""Tests for struco.cache module."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from struco.cache import IRCache, default_cache_dir
+from struco.cfg import Language, _run_frontend
+
+
+@pytest.fixture(autouse=True)
+def _fixed_compiler_version():
+    with patch("struco.cache.compiler_version", return_value="clang version 17.0.0"):
+        yield
+
+
+# IRCache keys
+class TestCacheKey:
+    def test_same_inputs_same_key(self, tmp_path: Path):
+        cache = IRCache(tmp_path)
+        assert cache.key(b"int x;", "clang", ["-S"]) == cache.key(b"int x;", "clang", ["-S"])
+
+    def test_source_change_changes_key(self, tmp_path: Path):
+        cache = IRCache(tmp_path)
+        assert cache.key(b"int x;", "clang", ["-S"]) != cache.key(b"int y;", "clang", ["-S"])
+
+    def test_flag_change_changes_key(self, tmp_path: Path):
+        cache = IRCache(tmp_path)
+        assert cache.key(b"int x;", "clang", ["-S"]) != cache.key(b"int x;", "clang", ["-O2"])
+
+    def test_compiler_change_changes_key(self, tmp_path: Path):
+        cache = IRCache(tmp_path)
+        assert cache.key(b"x", "clang", []) != cache.key(b"x", "clang++", [])
+
+    def test_compiler_version_changes_key(self, tmp_path: Path):
+        cache = IRCache(tmp_path)
+        before = cache.key(b"x", "clang", [])
+        with patch("struco.cache.compiler_version", return_value="clang version 18.1.0"):
+            after = cache.key(b"x", "clang", [])
+        assert before != after
+
+    def test_source_location_changes_key(self, tmp_path: Path):
+        cache = IRCache(tmp_path)
+        key = cache.key(b"x", "clang", [], tmp_path / "a" / "main.c")
+        assert key == cache.key(b"x", "clang", [], tmp_path / "a" / ".." / "a" / "main.c")
+        assert key != cache.key(b"x", "clang", [], tmp_path / "b" / "main.c")
+
+
+# IRCache storage
+class TestCacheStorage:
+    def test_miss_returns_none(self, tmp_path: Path):
+        assert IRCache(tmp_path).get("ab" * 32) is None
+
+    def test_put_then_get(self, tmp_path: Path):
+        cache = IRCache(tmp_path / "cache")
+        ir_file = tmp_path / "hello_c.ll"
+        ir_file.write_text("define i32 @main() {}")
+
+        key = cache.key(b"src", "clang", [])
+        cache.put(key, ir_file)
+
+        hit = cache.get(key)
+        assert hit is not None
+        assert hit.read_text() == "define i32 @main() {}"
+
+    def test_lru_eviction_removes_oldest(self, tmp_path: Path):
+        cache = IRCache(tmp_path / "cache", max_bytes=25)
+        ir_file = tmp_path / "x.ll"
+        ir_file.write_text("0123456789")
+
+        old = cache.put("aa" + "0" * 62, ir_file)
+        os.utime(old, (1, 1))
+        newer = cache.put("bb" + "0" * 62, ir_file)
+        os.utime(newer, (2, 2))
+        cache.put("cc" + "0" * 62, ir_file)
+
+        assert cache.get("aa" + "0" * 62) is None
+        assert cache.get("bb" + "0" * 62) is not None
+        assert cache.size() <= 25
+
+    def test_puts_do_not_rescan_the_cache(self, tmp_path: Path):
+        cache = IRCache(tmp_path / "cache", max_bytes=1000)
+        ir_file = tmp_path / "x.ll"
+        ir_file.write_text("0123456789")
+
+        with patch.object(IRCache, "_entries", autospec=True, wraps=IRCache._entries) as scan:
+            for i in range(10):
+                cache.put(f"{i:02}" + "0" * 62, ir_file)
+        assert scan.call_count == 1
+        assert cache.size() == 100
+
+    def test_changed_dependency_is_a_miss(self, tmp_path: Path):
+        cache = IRCache(tmp_path / "cache")
+        header = tmp_path / "util.h"
+        header.write_text("int f(void);")
+        ir_file = tmp_path / "x.ll"
+        ir_file.write_text("ir")
+        key = "aa" + "0" * 62
+
+        cache.put(key, ir_file, [header])
+        assert cache.get(key) is not None
+
+        header.write_text("int f(int);")
+        assert cache.get(key) is None
+        header.unlink()
+        assert cache.get(key) is None
+
+    def test_clear(self, tmp_path: Path):
+        cache = IRCache(tmp_path / "cache")
+        ir_file = tmp_path / "x.ll"
+        ir_file.write_text("ir")
+        cache.put("aa" + "0" * 62, ir_file)
+        cache.clear()
+        assert cache.size() == 0
+
+    def test_negative_size_raises(self, tmp_path: Path):
+        with pytest.raises(ValueError, match="non-negative"):
+            IRCache(tmp_path, max_bytes=-1)
+
+    def test_default_dir_from_env(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setenv("STRUCO_CACHE_DIR", str(tmp_path / "env-cache"))
+        assert default_cache_dir() == tmp_path / "env-cache"
+
+
+# _run_frontend with a cache
+class TestRunFrontendCache:
+    @patch("struco.scheduler._run_child")
+    def test_hit_skips_compiler(self, mock_run: MagicMock, tmp_path: Path):
+        source = tmp_path / "hello.c"
+        source.write_text("int main() { return 0; }")
+        cache = IRCache(tmp_path / "cache")
+
+        def compile_side_effect(cmd, **kwargs):
+            Path(cmd[cmd.index("-o") + 1]).write_text("define i32 @main() {}")
+            return MagicMock(returncode=0, stderr="", stdout="")
+
+        mock_run.side_effect = compile_side_effect
+
+        first = _run_frontend(source, Language.C, cache=cache)
+        assert mock_run.call_count == 1
+
+        first.ir_path.unlink()
+        second = _run_frontend(source, Language.C, cache=cache)
+
+        assert mock_run.call_count == 1
+        assert second == first
+        assert second.ir_path.read_text() == "define i32 @main() {}"
+
+    @patch("struco.scheduler._run_child")
+    def test_in_memory_ir_is_cached(self, mock_run: MagicMock, tmp_path: Path):
+        source = tmp_path / "hello.c"
+        source.write_text("int main() { return 0; }")
+        cache = IRCache(tmp_path / "cache")
+        mock_run.return_value = MagicMock(returncode=0, stderr="", stdout="define i32 @main() {}")
+
+        first = _run_frontend(source, Language.C, cache=cache, keep_ir=False)
+        second = _run_frontend(source, Language.C, cache=cache, keep_ir=False)
+
+        assert mock_run.call_count == 1
+        assert second.ir_text == first.ir_text == "define i32 @main() {}"
+        assert not first.ir_path.exists()
+
+    @patch("struco.scheduler._run_child")
+    def test_source_change_recompiles(self, mock_run: MagicMock, tmp_path: Path):
+        source = tmp_path / "hello.c"
+        source.write_text("int main() { return 0; }")
+        cache = IRCache(tmp_path / "cache")
+
+        def compile_side_effect(cmd, **kwargs):
+            Path(cmd[cmd.index("-o") + 1]).write_text("ir")
+            return MagicMock(returncode=0, stderr="", stdout="")
+
+        mock_run.side_effect = compile_side_effect
+
+        _run_frontend(source, Language.C, cache=cache)
+        source.write_text("int main() { return 1; }")
+        _run_frontend(source, Language.C, cache=cache)
+
+        assert mock_run.call_count == 2
+
+    @patch("struco.scheduler._run_child")
+    def test_header_change_recompiles(self, mock_run: MagicMock, tmp_path: Path):
+        source = tmp_path / "hello.c"
+        source.write_text('#include "util.h"\nint main() { return 0; }')
+        header = tmp_path / "util.h"
+        header.write_text("#define X 1\n")
+        cache = IRCache(tmp_path / "cache")
+
+        def compile_side_effect(cmd, **kwargs):
+            Path(cmd[cmd.index("-MF") + 1]).write_text(f"hello.o: {source} \\\n  {header}\n")
+            return MagicMock(returncode=0, stderr="", stdout="define i32 @main() {}")
+
+        mock_run.side_effect = compile_side_effect
+
+        _run_frontend(source, Language.C, cache=cache, keep_ir=False)
+        _run_frontend(source, Language.C, cache=cache, keep_ir=False)
+        assert mock_run.call_count == 1
+
+        header.write_text("#define X 2\n")
+        os.utime(header, ns=(0, header.stat().st_mtime_ns + 10**9))
+        _run_frontend(source, Language.C, cache=cache, keep_ir=False)
+        assert mock_run.call_count == 2
+
+    @patch("struco.scheduler._run_child")
+    def test_same_source_in_other_directory_recompiles(self, mock_run: MagicMock, tmp_path: Path):
+        cache = IRCache(tmp_path / "cache")
+        sources = []
+        for name in ("a", "b"):
+            (tmp_path / name).mkdir()
+            (tmp_path / name / "config.h").write_text(f"#define WHO {name}\n")
+            sources.append(tmp_path / name / "main.c")
+            sources[-1].write_text('#include "config.h"\nint main() { return 0; }')
+
+        def compile_side_effect(cmd, **kwargs):
+            source = Path(cmd[cmd.index("-o") - 1])
+            Path(cmd[cmd.index("-MF") + 1]).write_text(
+                f"main.o: {source} {source.parent}/config.h\n"
+            )
+            return MagicMock(returncode=0, stderr="", stdout=f"; {source.parent.name}")
+
+        mock_run.side_effect = compile_side_effect
+
+        results = [_run_frontend(s, Language.C, cache=cache, keep_ir=False) for s in sources]
+
+        assert mock_run.call_count == 2
+        assert [r.ir_text for r in results] == ["; a", "; b"]
+
+    @pytest.mark.parametrize("keep_ir", [True, False])
+    @patch("struco.scheduler._run_child")
+    def test_entry_evicted_after_lookup_recompiles(
+        self, mock_run: MagicMock, tmp_path: Path, keep_ir: bool
+    ):
+        source = tmp_path / "hello.c"
+        source.write_text("int main() { return 0; }")
+        cache = IRCache(tmp_path / "cache")
+
+        def compile_side_effect(cmd, **kwargs):
+            if cmd[cmd.index("-o") + 1] != "-":
+                Path(cmd[cmd.index("-o") + 1]).write_text("ir")
+            return MagicMock(returncode=0, stderr="", stdout="ir")
+
+        mock_run.side_effect = compile_side_effect
+
+        with patch.object(cache, "get", return_value=tmp_path / "cache" / "evicted.ll"):
+            result = _run_frontend(source, Language.C, cache=cache, keep_ir=keep_ir)
+
+        assert mock_run.call_count == 1
+        assert (result.ir_path.read_text() if keep_ir else result.ir_text) == "ir"
@@ -3,24 +3,36 @@
 
 from __future__ import annotations
 
+import json
+import shutil
+import subprocess
 import textwrap
+import threading
+import time
 from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
 
+from struco.__main__ import main
 from struco.cfg import (
     EXTENSION_TO_LANGUAGE,
     IRResult,
     Language,
     _convert_dot,
-    _get_frontend_config,
     _run_frontend,
     _run_opt,
+    build_cfgs,
     extract_cfg_from_ir,
     extract_ir,
+    get_frontend_config,
     get_function_names,
+    ir_output_path,
+    read_provenance,
+    render_dots,
+    resolve_opt_pipeline,
 )
+from struco.render import RenderOptions
 
 
 # Language enum and extension mapping
@@ -44,21 +56,21 @@ class TestLanguageMapping:
 # Frontend config
 class TestFrontendConfig:
     def test_c_uses_clang(self):
-        config = _get_frontend_config(Language.C)
+        config = get_frontend_config(Language.C)
         assert config.command == "clang"
         assert "-S" in config.args
         assert "-emit-llvm" in config.args
 
     def test_cpp_uses_clangpp(self):
-        config = _get_frontend_config(Language.CPP)
+        config = get_frontend_config(Language.CPP)
         assert config.command == "clang++"
 
     def test_cxx_uses_clangpp(self):
-        config = _get_frontend_config(Language.CXX)
+        config = get_frontend_config(Language.CXX)
         assert config.command == "clang++"
 
     def test_python_uses_codon(self):
-        config = _get_frontend_config(Language.PYTHON)
+        config = get_frontend_config(Language.PYTHON)
         assert config.command == "codon"
         assert "build" in config.args
         assert "-llvm" in config.args
@@ -98,7 +110,7 @@ class TestExtractIRValidation:
 
 # _run_frontend
 class TestRunFrontend:
-    @patch("struco.cfg.subprocess.run")
+    @patch("struco.scheduler._run_child")
     def test_c_file_produces_correct_output_name(self, mock_run: MagicMock, tmp_path: Path):
         source = tmp_path / "hello.c"
         source.write_text("int main() { return 0; }")
@@ -118,7 +130,7 @@ class TestRunFrontend:
         assert result.ir_path.name == "hello_c.ll"
         assert result.ir_path.parent.name == "hello_c_ll_files"
 
-    @patch("struco.cfg.subprocess.run")
+    @patch("struco.scheduler._run_child")
     def test_subprocess_called_without_shell(self, mock_run: MagicMock, tmp_path: Path):
         source = tmp_path / "hello.c"
         source.write_text("int main() {}")
@@ -138,7 +150,7 @@ class TestRunFrontend:
         # Verify shell=False (check=False is explicit, shell should not be True)
         assert call_args[1].get("shell") is not True
 
-    @patch("struco.cfg.subprocess.run")
+    @patch("struco.scheduler._run_child")
     def test_compiler_failure_raises_runtime_error(self, mock_run: MagicMock, tmp_path: Path):
         source = tmp_path / "bad.c"
         source.write_text("this is not valid c")
@@ -150,7 +162,7 @@ class TestRunFrontend:
         with pytest.raises(RuntimeError, match="Frontend compilation failed"):
             _run_frontend(source, Language.C)
 
-    @patch("struco.cfg.subprocess.run")
+    @patch("struco.scheduler._run_child")
     def test_python_file_uses_codon(self, mock_run: MagicMock, tmp_path: Path):
         source = tmp_path / "hello.py"
         source.write_text("print('hello')")
@@ -165,7 +177,7 @@ class TestRunFrontend:
         cmd = mock_run.call_args[0][0]
         assert cmd[0] == "codon"
 
-    @patch("struco.cfg.subprocess.run")
+    @patch("struco.scheduler._run_child")
     def test_cpp_file_uses_clangpp(self, mock_run: MagicMock, tmp_path: Path):
         source = tmp_path / "hello.cpp"
         source.write_text("int main() {}")
@@ -272,7 +284,7 @@ class TestGetFunctionNames:
 
 # _run_opt
 class TestRunOpt:
-    @patch("struco.cfg.subprocess.run")
+    @patch("struco.scheduler._run_child")
     def test_success(self, mock_run: MagicMock, tmp_path: Path):
         ir_file = tmp_path / "test.ll"
         ir_file.write_text("fake")
@@ -284,13 +296,14 @@ class TestRunOpt:
         )
 
         # Should not raise
-        _run_opt(ir_file)
+        _run_opt(ir_file, cwd=tmp_path)
 
         cmd = mock_run.call_args[0][0]
         assert cmd[0] == "opt"
         assert "-passes=dot-cfg" in cmd
+        assert mock_run.call_args[1]["cwd"] == tmp_path
 
-    @patch("struco.cfg.subprocess.run")
+    @patch("struco.scheduler._run_child")
     def test_failure_raises(self, mock_run: MagicMock, tmp_path: Path):
         ir_file = tmp_path / "test.ll"
         ir_file.write_text("fake")
@@ -300,12 +313,12 @@ class TestRunOpt:
         )
 
         with pytest.raises(RuntimeError, match="opt failed"):
-            _run_opt(ir_file)
+            _run_opt(ir_file, cwd=tmp_path)
 
 
 # _convert_dot
 class TestConvertDot:
-    @patch("struco.cfg.subprocess.run")
+    @patch("struco.scheduler._run_child")
     def test_png_conversion(self, mock_run: MagicMock, tmp_path: Path):
         dot_file = tmp_path / ".main.dot"
         dot_file.write_text("digraph { a -> b }")
@@ -320,7 +333,7 @@ class TestConvertDot:
         assert result.name == "main.png"
         assert result.parent == output_dir
 
-    @patch("struco.cfg.subprocess.run")
+    @patch("struco.scheduler._run_child")
     def test_pdf_conversion(self, mock_run: MagicMock, tmp_path: Path):
         dot_file = tmp_path / ".foo.dot"
         dot_file.write_text("digraph { a -> b }")
@@ -334,7 +347,7 @@ class TestConvertDot:
         assert result is not None
         assert result.name == "foo.pdf"
 
-    @patch("struco.cfg.subprocess.run")
+    @patch("struco.scheduler._run_child")
     def test_graphviz_failure_returns_none(self, mock_run: MagicMock, tmp_path: Path):
         dot_file = tmp_path / ".bad.dot"
         dot_file.write_text("not valid dot")
@@ -347,6 +360,148 @@ class TestConvertDot:
         assert result is None
 
 
+CHAIN_DOT = (
+    "digraph \"CFG for 'f' function\" {\n"
+    + "".join(
+        f'\tNode{i} [shape=record,label="{{b{i}:\\l  br label %b{i + 1}\\l}}"];\n'
+        f"\tNode{i} -> Node{i + 1};\n"
+        for i in range(5)
+    )
+    + '\tNode5 [shape=record,label="{b5:\\l  ret void\\l}"];\n}\n'
+)
+
+
+# Render limits in _convert_dot
+class TestRenderLimits:
+    def _dot_file(self, tmp_path: Path) -> Path:
+        dot_file = tmp_path / ".f.dot"
+        dot_file.write_text(CHAIN_DOT)
+        return dot_file
+
+    @patch("struco.scheduler._run_child")
+    def test_large_graphs_use_sfdp(self, mock_run: MagicMock, tmp_path: Path):
+        mock_run.return_value = MagicMock(returncode=0, stderr="", stdout="")
+        dot_file = self._dot_file(tmp_path)
+
+        _convert_dot(dot_file, tmp_path, "png", RenderOptions(layout_threshold=6))
+        assert "-Ksfdp" not in mock_run.call_args.args[0]
+        _convert_dot(dot_file, tmp_path, "png", RenderOptions(layout_threshold=5))
+        assert mock_run.call_args.args[0][-1] == "-Ksfdp"
+        assert mock_run.call_args.kwargs["timeout"] == 300.0
+
+    @patch("struco.scheduler._run_child")
+    def test_summarize_renders_summary_before_layout(self, mock_run: MagicMock, tmp_path: Path):
+        rendered: list[str] = []
+
+        def dot(cmd, **kwargs):
+            rendered.append(Path(cmd[2]).read_text())
+            return MagicMock(returncode=0, stderr="", stdout="")
+
+        mock_run.side_effect = dot
+        dot_file = self._dot_file(tmp_path)
+
+        _convert_dot(dot_file, tmp_path, "png", RenderOptions(summarize=True, layout_threshold=1))
+
+        assert "b0 .. b5 (6 blocks):" in rendered[0]
+        assert "-Ksfdp" not in mock_run.call_args.args[0]
+        # The .dot artifact keeps the full structure and no summary is left behind
+        assert dot_file.read_text() == CHAIN_DOT
+        assert sorted(p.name for p in tmp_path.iterdir()) == [".f.dot", "f.png"]
+
+    @patch("struco.scheduler._run_child")
+    def test_timeout_falls_back_to_structure(self, mock_run: MagicMock, tmp_path: Path):
+        rendered: list[tuple[list[str], str]] = []
+
+        def slow_dot(cmd, **kwargs):
+            rendered.append((cmd, Path(cmd[2]).read_text()))
+            if len(rendered) == 1:
+                raise subprocess.TimeoutExpired(cmd, kwargs["timeout"])
+            Path(cmd[cmd.index("-o") + 1]).write_text("png")
+            return MagicMock(returncode=0, stderr="", stdout="")
+
+        mock_run.side_effect = slow_dot
+        output_dir = tmp_path / "pngs"
+        output_dir.mkdir()
+
+        result = _convert_dot(
+            self._dot_file(tmp_path), output_dir, "png", RenderOptions(timeout=2)
+        )
+
+        (_, full), (skeleton_cmd, skeleton) = rendered
+        assert full == CHAIN_DOT
+        assert "node [shape=point]" in skeleton
+        assert skeleton_cmd[-1] == "-Ksfdp"
+        assert result == output_dir / "f.png"
+        assert result.read_text() == "png"
+        assert sorted(p.name for p in tmp_path.iterdir()) == [".f.dot", "pngs"]
+
+    @patch("struco.scheduler._run_child")
+    def test_skeleton_timeout_gives_up(self, mock_run: MagicMock, tmp_path: Path):
+        mock_run.side_effect = subprocess.TimeoutExpired("dot", 1)
+        output_dir = tmp_path / "pngs"
+        output_dir.mkdir()
+
+        assert _convert_dot(self._dot_file(tmp_path), output_dir, "png") is None
+        assert mock_run.call_count == 2
+        assert list(output_dir.iterdir()) == []
+
+    def test_cli_render_limits(self, tmp_path: Path):
+        with patch("struco.__main__._run_single", return_value=0) as run:
+            main([str(tmp_path / "a.c"), "--summarize", "--render-timeout", "0"])
+        options = run.call_args.args[2]
+        assert options["summarize"] is True
+        assert options["render_timeout"] is None
+        assert options["layout_threshold"] == 2000
+        with pytest.raises(SystemExit):
+            main([str(tmp_path / "a.c"), "--layout-threshold", "-1"])
+
+
+# render_dots
+class TestRenderDots:
+    def test_preserves_input_order(self, tmp_path: Path):
+        dots = [tmp_path / f".f{i}.dot" for i in range(8)]
+
+        def slow_convert(dot_path, output_dir, fmt, options=None):
+            # Later inputs finish first
+            time.sleep(0.002 * (8 - int(dot_path.stem.lstrip(".f"))))
+            return output_dir / f"{dot_path.stem.lstrip('.')}.{fmt}"
+
+        with patch("struco.cfg._convert_dot", side_effect=slow_convert):
+            outputs = render_dots(dots, tmp_path, "png", jobs=4)
+
+        assert [p.name for p in outputs] == [f"f{i}.png" for i in range(8)]
+
+    def test_concurrency_is_bounded(self, tmp_path: Path):
+        dots = [tmp_path / f".f{i}.dot" for i in range(12)]
+        lock = threading.Lock()
+        active = 0
+        peak = 0
+
+        def tracked_convert(dot_path, output_dir, fmt, options=None):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.005)
+            with lock:
+                active -= 1
+            return output_dir / f"{dot_path.stem}.{fmt}"
+
+        with patch("struco.cfg._convert_dot", side_effect=tracked_convert):
+            render_dots(dots, tmp_path, "png", jobs=3)
+
+        assert 1 < peak <= 3
+
+    def test_failed_renders_are_dropped(self, tmp_path: Path):
+        dots = [tmp_path / ".ok.dot", tmp_path / ".bad.dot"]
+
+        def convert(dot_path, output_dir, fmt, options=None):
+            return None if "bad" in dot_path.name else output_dir / "ok.png"
+
+        with patch("struco.cfg._convert_dot", side_effect=convert):
+            assert render_dots(dots, tmp_path, "png", jobs=2) == [tmp_path / "ok.png"]
+
+
 # extract_cfg_from_ir validation
 class TestExtractCfgValidation:
     def test_missing_ir_raises(self, tmp_path: Path):
@@ -370,14 +525,491 @@ class TestExtractCfgValidation:
         ir_file = tmp_path / "test.ll"
         ir_file.write_text(SAMPLE_C_IR)
 
+        with patch("struco.cfg._run_opt"):
+            # Should not raise even though language is a string
+            extract_cfg_from_ir(ir_file, language="c", output_format="png")
+
+
+# Native engine
+class TestNativeEngine:
+    def test_build_cfgs_returns_user_functions(self, tmp_path: Path):
+        ir_file = tmp_path / "hello_c.ll"
+        ir_file.write_text(SAMPLE_C_IR)
+
+        cfgs = build_cfgs(ir_file, Language.C)
+        assert [cfg.name for cfg in cfgs] == ["main", "binary_search"]
+        assert all(len(cfg.blocks) == 1 for cfg in cfgs)
+
+    def test_build_cfgs_skips_cpp_internals(self, tmp_path: Path):
+        ir_file = tmp_path / "hello_cpp.ll"
+        ir_file.write_text(
+            SAMPLE_CPP_IR + "define linkonce_odr void @_ZNSt6vectorIiSaIiEE9push_backERKi() {\n"
+            "entry:\n  ret void\n}\n"
+        )
+
+        names = [cfg.name for cfg in build_cfgs(ir_file, Language.CPP)]
+        assert names == ["_Z13binary_searchPiii", "main"]
+
+    @patch("struco.cfg._run_opt")
+    @patch("struco.scheduler._run_child")
+    def test_native_engine_does_not_run_opt(
+        self, mock_run: MagicMock, mock_opt: MagicMock, tmp_path: Path
+    ):
+        ir_file = tmp_path / "hello_c.ll"
+        ir_file.write_text(SAMPLE_C_IR)
+        mock_run.return_value = MagicMock(returncode=0, stderr="", stdout="")
+
+        outputs = extract_cfg_from_ir(ir_file, language="c", engine="native")
+
+        mock_opt.assert_not_called()
+        assert [p.name for p in outputs] == ["main.png", "binary_search.png"]
+        dot_file = tmp_path / "hello_c_cfg" / ".main.dot"
+        assert dot_file.read_text().startswith("digraph")
+        assert mock_run.call_args[0][0][0] == "dot"
+
+    @patch("struco.cfg._run_opt")
+    @patch("struco.scheduler._run_child")
+    def test_structured_format_skips_opt_and_dot(
+        self, mock_run: MagicMock, mock_opt: MagicMock, tmp_path: Path
+    ):
+        ir_file = tmp_path / "hello_c.ll"
+        ir_file.write_text(SAMPLE_C_IR)
+
+        outputs = extract_cfg_from_ir(ir_file, language="c", output_format="json")
+
+        mock_opt.assert_not_called()
+        mock_run.assert_not_called()
+        assert outputs == [
+            tmp_path / "hello_c_cfg" / "jsons" / "main.json",
+            tmp_path / "hello_c_cfg" / "jsons" / "binary_search.json",
+        ]
+        assert all(p.exists() for p in outputs)
+
+    def test_invalid_engine_raises(self, tmp_path: Path):
+        ir_file = tmp_path / "test.ll"
+        ir_file.write_text("fake")
+        with pytest.raises(ValueError, match="Invalid engine"):
+            extract_cfg_from_ir(ir_file, engine="llvmlite")
+
+
+# Pruning before opt
+CPP_IR_WITH_STDLIB = SAMPLE_CPP_IR + textwrap.dedent("""\
+    define linkonce_odr void @_ZNSt6vectorIiSaIiEE9push_backERKi() {
+    entry:
+      ret void
+    }
+
+    define internal void @__cxx_global_var_init() {
+    entry:
+      ret void
+    }
+""")
+
+
+class TestSliceBeforeOpt:
+    @staticmethod
+    def _fake_tools(calls: list[list[str]]):
+        def run(cmd, **kwargs):
+            calls.append(cmd)
+            if cmd[0] == "llvm-extract":
+                Path(cmd[cmd.index("-o") + 1]).write_text("sliced")
+            return MagicMock(returncode=0, stderr="", stdout="")
+
+        return run
+
+    def test_stdlib_functions_sliced_out_before_opt(self, tmp_path: Path):
+        ir_file = tmp_path / "hello_cpp.ll"
+        ir_file.write_text(CPP_IR_WITH_STDLIB)
+        calls: list[list[str]] = []
+
+        with patch("struco.scheduler._run_child", side_effect=self._fake_tools(calls)):
+            extract_cfg_from_ir(ir_file, language="cpp")
+
+        extract_cmd, opt_cmd = calls[0], calls[1]
+        assert extract_cmd[0] == "llvm-extract"
+        assert "--func=_Z13binary_searchPiii" in extract_cmd
+        assert "--func=main" in extract_cmd
+        assert not any("_ZNSt" in arg or "__cxx" in arg for arg in extract_cmd)
+        assert opt_cmd[0] == "opt"
+        assert opt_cmd[-1] != str(ir_file)
+
+    def test_no_slice_when_every_function_is_selected(self, tmp_path: Path):
+        ir_file = tmp_path / "hello_c.ll"
+        ir_file.write_text(SAMPLE_C_IR)
+        calls: list[list[str]] = []
+
+        with patch("struco.scheduler._run_child", side_effect=self._fake_tools(calls)):
+            extract_cfg_from_ir(ir_file, language="c")
+
+        assert calls[0][0] == "opt"
+        assert calls[0][-1] == str(ir_file)
+
+    def test_missing_llvm_extract_falls_back_to_full_module(self, tmp_path: Path):
+        ir_file = tmp_path / "hello_cpp.ll"
+        ir_file.write_text(CPP_IR_WITH_STDLIB)
+        opt_inputs: list[str] = []
+
+        def run(cmd, **kwargs):
+            if cmd[0] == "llvm-extract":
+                raise FileNotFoundError(cmd[0])
+            opt_inputs.append(cmd[-1])
+            return MagicMock(returncode=0, stderr="", stdout="")
+
+        with patch("struco.scheduler._run_child", side_effect=run):
+            extract_cfg_from_ir(ir_file, language="cpp")
+
+        assert opt_inputs == [str(ir_file)]
+
+    def test_explicit_function_selection(self, tmp_path: Path):
+        ir_file = tmp_path / "hello_cpp.ll"
+        ir_file.write_text(CPP_IR_WITH_STDLIB)
+        calls: list[list[str]] = []
+
+        with patch("struco.scheduler._run_child", side_effect=self._fake_tools(calls)):
+            extract_cfg_from_ir(
+                ir_file,
+                language="cpp",
+                functions=["main", "_ZNSt6vectorIiSaIiEE9push_backERKi"],
+            )
+
+        assert [a for a in calls[0] if a.startswith("--func=")] == [
+            "--func=main",
+            "--func=_ZNSt6vectorIiSaIiEE9push_backERKi",
+        ]
+
+    def test_no_selected_functions_skips_opt(self, tmp_path: Path):
+        ir_file = tmp_path / "hello_c.ll"
+        ir_file.write_text(SAMPLE_C_IR)
+
+        with patch("struco.scheduler._run_child") as mock_run:
+            outputs = extract_cfg_from_ir(ir_file, language="c", functions=["missing"])
+
+        assert outputs == []
+        mock_run.assert_not_called()
+
+    def test_native_engine_honours_selection(self, tmp_path: Path):
+        ir_file = tmp_path / "hello_c.ll"
+        ir_file.write_text(SAMPLE_C_IR)
+        cfgs = build_cfgs(ir_file, Language.C, functions=["binary_search"])
+        assert [cfg.name for cfg in cfgs] == ["binary_search"]
+
+
+# Isolation between concurrent extractions
+class TestScratchIsolation:
+    def test_opt_runs_in_private_directory(self, tmp_path: Path):
+        ir_file = tmp_path / "hello_c.ll"
+        ir_file.write_text(SAMPLE_C_IR)
+        opt_cwds: list[Path] = []
+
+        def fake_opt(ir_path, cwd, ir_text=None):
+            opt_cwds.append(cwd)
+            (cwd / ".main.dot").write_text("digraph {}")
+            (cwd / ".binary_search.dot").write_text("digraph {}")
+            (cwd / ".printf.dot").write_text("digraph {}")
+
+        with (
+            patch("struco.cfg._run_opt", side_effect=fake_opt),
+            patch("struco.cfg.render_dots", side_effect=lambda dots, *a: list(dots)),
+        ):
+            dots = extract_cfg_from_ir(ir_file, language="c")
+
+        assert opt_cwds[0] != Path.cwd()
+        assert not opt_cwds[0].exists(), "scratch directory should be removed"
+        assert [d.name for d in dots] == [".binary_search.dot", ".main.dot"]
+        assert all(d.parent == tmp_path / "hello_c_cfg" for d in dots)
+
+    def test_unrelated_dot_files_in_cwd_untouched(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        ir_file = tmp_path / "hello_c.ll"
+        ir_file.write_text(SAMPLE_C_IR)
+        workdir = tmp_path / "work"
+        workdir.mkdir()
+        foreign = workdir / ".main.dot"
+        foreign.write_text("belongs to another run")
+        monkeypatch.chdir(workdir)
+
         with (
             patch("struco.cfg._run_opt"),
-            patch("struco.cfg.Path.cwd") as mock_cwd,
-            patch("struco.cfg.Path.iterdir", return_value=iter([])),
+            patch("struco.cfg.render_dots", return_value=[]),
         ):
-            mock_cwd.return_value = tmp_path
-            # Should not raise even though language is a string
-            extract_cfg_from_ir(ir_file, language="c", output_format="png")
+            extract_cfg_from_ir(ir_file, language="c")
+
+        assert foreign.read_text() == "belongs to another run"
+
+    @patch("struco.scheduler._run_child")
+    def test_failed_render_leaves_no_partial_output(self, mock_run: MagicMock, tmp_path: Path):
+        dot_file = tmp_path / ".main.dot"
+        dot_file.write_text("digraph {}")
+        output_dir = tmp_path / "pngs"
+        output_dir.mkdir()
+
+        def failing_dot(cmd, **kwargs):
+            Path(cmd[cmd.index("-o") + 1]).write_text("partial")
+            return MagicMock(returncode=1, stderr="killed", stdout="")
+
+        mock_run.side_effect = failing_dot
+
+        assert _convert_dot(dot_file, output_dir, "png") is None
+        assert list(output_dir.iterdir()) == []
+
+    @patch("struco.scheduler._run_child")
+    def test_frontend_output_is_renamed_into_place(self, mock_run: MagicMock, tmp_path: Path):
+        source = tmp_path / "hello.c"
+        source.write_text("int main() { return 0; }")
+        outputs: list[str] = []
+
+        def compile_side_effect(cmd, **kwargs):
+            out = cmd[cmd.index("-o") + 1]
+            outputs.append(out)
+            Path(out).write_text("define i32 @main() {}")
+            return MagicMock(returncode=0, stderr="", stdout="")
+
+        mock_run.side_effect = compile_side_effect
+
+        result = _run_frontend(source, Language.C)
+
+        assert outputs[0] != str(result.ir_path)
+        assert not Path(outputs[0]).exists()
+        assert result.ir_path.read_text() == "define i32 @main() {}"
+        assert list(result.ir_path.parent.iterdir()) == [result.ir_path]
+
+    @patch("struco.scheduler._run_child")
+    def test_frontend_failure_removes_temporary_output(self, mock_run: MagicMock, tmp_path: Path):
+        source = tmp_path / "bad.c"
+        source.write_text("not c")
+        mock_run.return_value = MagicMock(returncode=1, stderr="error", stdout="")
+
+        with pytest.raises(RuntimeError):
+            _run_frontend(source, Language.C)
+
+        assert list((tmp_path / "bad_c_ll_files").iterdir()) == []
+
+
+# In-memory IR and output roots
+class TestDisklessIR:
+    @patch("struco.scheduler._run_child")
+    def test_discarded_ir_is_read_from_stdout(self, mock_run: MagicMock, tmp_path: Path):
+        source = tmp_path / "hello.c"
+        source.write_text("int main() { return 0; }")
+        mock_run.return_value = MagicMock(returncode=0, stderr="", stdout=SAMPLE_C_IR)
+
+        result = extract_ir(source, keep_ir=False)
+
+        cmd = mock_run.call_args[0][0]
+        assert cmd[cmd.index("-o") + 1] == "-"
+        assert result.ir_text == SAMPLE_C_IR
+        assert result.ir_path == tmp_path / "hello_c_ll_files" / "hello_c.ll"
+        assert list(tmp_path.iterdir()) == [source]
+
+    @patch("struco.scheduler._run_child")
+    def test_codon_output_is_read_back_from_scratch(self, mock_run: MagicMock, tmp_path: Path):
+        source = tmp_path / "hello.py"
+        source.write_text("print('hello')")
+
+        def compile_side_effect(cmd, **kwargs):
+            Path(cmd[cmd.index("-o") + 1]).write_text(SAMPLE_C_IR)
+            return MagicMock(returncode=0, stderr="", stdout="")
+
+        mock_run.side_effect = compile_side_effect
+
+        result = extract_ir(source, keep_ir=False)
+
+        assert result.ir_text == SAMPLE_C_IR
+        assert list(tmp_path.iterdir()) == [source]
+
+    def test_in_memory_ir_to_structured_output(self, tmp_path: Path):
+        ir_path = tmp_path / "hello_c.ll"
+
+        outputs = extract_cfg_from_ir(
+            ir_path, language="c", output_format="json", ir_text=SAMPLE_C_IR
+        )
+
+        assert outputs == [
+            tmp_path / "hello_c_cfg" / "jsons" / "main.json",
+            tmp_path / "hello_c_cfg" / "jsons" / "binary_search.json",
+        ]
+        assert not ir_path.exists()
+
+    def test_opt_reads_in_memory_ir_from_stdin(self, tmp_path: Path):
+        calls: list[tuple[list[str], str | None]] = []
+
+        def run(cmd, **kwargs):
+            calls.append((cmd, kwargs.get("input")))
+            return MagicMock(returncode=0, stderr="", stdout="")
+
+        with (
+            patch("struco.scheduler._run_child", side_effect=run),
+            patch("struco.cfg.render_dots", return_value=[]),
+        ):
+            extract_cfg_from_ir(tmp_path / "hello_c.ll", language="c", ir_text=SAMPLE_C_IR)
+
+        [(cmd, stdin)] = calls
+        assert cmd[0] == "opt"
+        assert cmd[-1] == "-"
+        assert stdin == SAMPLE_C_IR
+
+    def test_slice_reads_in_memory_ir_from_stdin(self, tmp_path: Path):
+        calls: list[tuple[list[str], str | None]] = []
+
+        def run(cmd, **kwargs):
+            calls.append((cmd, kwargs.get("input")))
+            if cmd[0] == "llvm-extract":
+                Path(cmd[cmd.index("-o") + 1]).write_text("sliced")
+            return MagicMock(returncode=0, stderr="", stdout="")
+
+        with (
+            patch("struco.scheduler._run_child", side_effect=run),
+            patch("struco.cfg.render_dots", return_value=[]),
+        ):
+            extract_cfg_from_ir(
+                tmp_path / "hello_c.ll", language="c", functions=["main"], ir_text=SAMPLE_C_IR
+            )
+
+        (slice_cmd, slice_stdin), (opt_cmd, opt_stdin) = calls
+        assert slice_cmd[0] == "llvm-extract"
+        assert slice_cmd[slice_cmd.index("-o") - 1] == "-"
+        assert slice_stdin == SAMPLE_C_IR
+        assert opt_cmd[-1] != "-"
+        assert opt_stdin is None
+
+    def test_ir_output_path_mirrors_source_under_root(self, tmp_path: Path):
+        source = tmp_path / "src" / "hello.c"
+        root = tmp_path / "out"
+        expected = root / tmp_path.relative_to("/") / "src" / "hello_c_ll_files" / "hello_c.ll"
+        assert ir_output_path(source, root) == expected
+
+    @patch("struco.scheduler._run_child")
+    def test_output_root_keeps_source_tree_clean(self, mock_run: MagicMock, tmp_path: Path):
+        src = tmp_path / "src"
+        src.mkdir()
+        source = src / "hello.c"
+        source.write_text("int main() { return 0; }")
+        root = tmp_path / "out"
+        mock_run.return_value = MagicMock(returncode=0, stderr="", stdout=SAMPLE_C_IR)
+
+        result = extract_ir(source, output_root=root, keep_ir=False)
+        outputs = extract_cfg_from_ir(
+            result.ir_path, result.language, output_format="json", ir_text=result.ir_text
+        )
+
+        assert list(src.iterdir()) == [source]
+        assert all(root in output.parents for output in outputs)
+        assert len(outputs) == 2
+
+
+ALLOCA_IR = textwrap.dedent("""\
+    define i32 @pick(i32 %x) {
+    entry:
+      %p = alloca i32
+      store i32 %x, i32* %p
+      br label %test
+
+    test:
+      %v = load i32, i32* %p
+      %c = icmp sgt i32 %v, 0
+      br i1 %c, label %pos, label %neg
+
+    pos:
+      br label %end
+
+    neg:
+      br label %end
+
+    end:
+      %r = phi i32 [ 1, %pos ], [ 2, %neg ]
+      ret i32 %r
+    }
+""")
+
+needs_opt = pytest.mark.skipif(shutil.which("opt") is None, reason="LLVM opt not installed")
+
+
+# opt pass pipelines
+class TestOptPipeline:
+    def test_presets_and_custom_pipelines(self):
+        assert resolve_opt_pipeline(None) == ""
+        assert resolve_opt_pipeline("none") == ""
+        assert resolve_opt_pipeline("canonical") == "mem2reg,simplifycfg"
+        assert resolve_opt_pipeline(" sroa,gvn ") == "sroa,gvn"
+
+    @needs_opt
+    def test_pipeline_shrinks_graph_for_every_engine(self, tmp_path: Path):
+        ir_file = tmp_path / "m_c.ll"
+        ir_file.write_text(ALLOCA_IR)
+
+        plain = build_cfgs(ir_file)[0]
+        [output] = extract_cfg_from_ir(
+            ir_file, language="c", output_format="json", opt_pipeline="canonical"
+        )
+
+        doc = json.loads(output.read_text())
+        assert len(plain) == 5
+        assert len(doc["blocks"]) < len(plain)
+        assert not any("alloca" in i for b in doc["blocks"] for i in b["instructions"])
+
+    @needs_opt
+    def test_provenance_records_pipeline_per_artifact(self, tmp_path: Path):
+        ir_file = tmp_path / "m_c.ll"
+        ir_file.write_text(ALLOCA_IR + "\ndefine i32 @main() {\nentry:\n  ret i32 0\n}\n")
+        output_dir = tmp_path / "m_c_cfg" / "jsons"
+
+        extract_cfg_from_ir(ir_file, "c", output_format="json", opt_pipeline="mem2reg")
+        extract_cfg_from_ir(ir_file, "c", output_format="json", functions=["main"])
+
+        provenance = read_provenance(output_dir)
+        assert provenance["pick.json"]["pipeline"] == "mem2reg"
+        assert provenance["pick.json"]["opt"].startswith(("LLVM version", "Debian LLVM"))
+        assert provenance["main.json"]["pipeline"] == ""
+        assert provenance["main.json"]["ir"] == str(ir_file)
+
+    def test_no_provenance_without_pipeline(self, tmp_path: Path):
+        ir_file = tmp_path / "m_c.ll"
+        ir_file.write_text(ALLOCA_IR)
+        extract_cfg_from_ir(ir_file, "c", output_format="json")
+        assert read_provenance(tmp_path / "m_c_cfg" / "jsons") == {}
+
+    def test_pipeline_output_feeds_opt_engine(self, tmp_path: Path):
+        calls: list[tuple[list[str], str | None]] = []
+
+        def run(cmd, **kwargs):
+            calls.append((cmd, kwargs.get("input")))
+            stdout = "; canonical\n" + ALLOCA_IR if "-S" in cmd else "LLVM version 14.0.6"
+            return MagicMock(returncode=0, stderr="", stdout=stdout)
+
+        with (
+            patch("struco.scheduler._run_child", side_effect=run),
+            patch("struco.cfg.render_dots", return_value=[]),
+        ):
+            extract_cfg_from_ir(
+                tmp_path / "m_c.ll", "c", ir_text=ALLOCA_IR, opt_pipeline="canonical"
+            )
+
+        (pipe_cmd, pipe_stdin), (dot_cmd, dot_stdin) = calls[:2]
+        assert "-passes=mem2reg,simplifycfg" in pipe_cmd
+        assert pipe_stdin == ALLOCA_IR
+        assert "-passes=dot-cfg" in dot_cmd
+        assert dot_stdin.startswith("; canonical")
+
+    def test_missing_opt(self, tmp_path: Path):
+        ir_file = tmp_path / "m_c.ll"
+        ir_file.write_text(ALLOCA_IR)
+        with (
+            patch("struco.scheduler._run_child", side_effect=FileNotFoundError),
+            pytest.raises(RuntimeError, match="requires LLVM opt"),
+        ):
+            extract_cfg_from_ir(ir_file, "c", output_format="json", opt_pipeline="mem2reg")
+
+    def test_cli_rejects_pipeline_for_ast_engine(self, tmp_path: Path):
+        with pytest.raises(SystemExit):
+            main([str(tmp_path / "a.c"), "--engine", "ast", "--opt-pipeline", "canonical"])
+
+    @needs_opt
+    def test_invalid_pipeline(self, tmp_path: Path):
+        ir_file = tmp_path / "m_c.ll"
+        ir_file.write_text(ALLOCA_IR)
+        with pytest.raises(RuntimeError, match="opt pipeline 'bogus' failed"):
+            extract_cfg_from_ir(ir_file, "c", output_format="json", opt_pipeline="bogus")
 
 
 # Regression tests
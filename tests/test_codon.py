@@ -0,0 +1,219 @@
+"""Tests for struco.codon module."""
+
+from __future__ import annotations
+
+import textwrap
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from struco.ast_cfg import extract_cfg_from_source
+from struco.cfg import Language, get_function_names
+from struco.codon import (
+    CodonFilter,
+    RuntimeFingerprints,
+    clear_fingerprints,
+    codon_path,
+    fingerprint,
+    runtime_fingerprints,
+    std_types,
+)
+from struco.ir import iter_text_definitions
+from struco.symbols import SymbolFilter
+
+
+def _define(name: str, body: str = "ret void") -> str:
+    return f'define void @"{name}"() {{\nentry:\n  {body}\n}}\n\n'
+
+
+# A realization of a stdlib method, once under its std name and once in a user module
+STDLIB_BODY = 'call void @"std.internal.gc.alloc:0[int].{id}"()\n  ret void'
+
+MODULE = "".join(
+    [
+        _define("std.internal.gc.alloc:0[int].412"),
+        _define("std.internal.types.array.List.append:0[List[int],int].1877"),
+        _define("List[int].__getitem__:0[int].96"),
+        _define("seq_exc_init"),
+        _define("binary_search:0[List[int],int].95", "br label %entry"),
+        _define("mypkg.util.helper:0[].7"),
+        _define("main"),
+    ]
+)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_fingerprints():
+    clear_fingerprints()
+    yield
+    clear_fingerprints()
+
+
+def _select(codon_filter: CodonFilter, text: str, fingerprints=None) -> list[str]:
+    data = text.encode()
+    return codon_filter.select(iter_text_definitions(data), data, fingerprints)
+
+
+# codon_path
+class TestCodonPath:
+    @pytest.mark.parametrize(
+        ("name", "path"),
+        [
+            ("std.internal.gc.alloc:0[int].412", ("std", "internal", "gc", "alloc")),
+            ("List[Tuple[int,str]].append:0[int].9", ("List", "append")),
+            ("mypkg.Point.__init__:1[Point,float].3", ("mypkg", "Point", "__init__")),
+            ("main", ("main",)),
+            ("seq_exc_init", ("seq_exc_init",)),
+        ],
+    )
+    def test_paths(self, name, path):
+        assert codon_path(name) == path
+
+
+# CodonFilter
+class TestCodonFilter:
+    def test_default_drops_runtime_and_stdlib(self):
+        assert _select(CodonFilter(), MODULE) == [
+            "binary_search:0[List[int],int].95",
+            "mypkg.util.helper:0[].7",
+            "main",
+        ]
+
+    def test_module_rules(self):
+        codon_filter = CodonFilter.from_options(
+            include=["mypkg", "std.internal.gc"], exclude=["mypkg.util"]
+        )
+        assert _select(codon_filter, MODULE) == ["std.internal.gc.alloc:0[int].412"]
+
+    def test_known_runtime_code_is_dropped_under_other_names(self):
+        fingerprints = RuntimeFingerprints()
+        first = _define("std.collections.Counter.total:0[].51", STDLIB_BODY.format(id=412))
+        _select(CodonFilter(), first, fingerprints)
+        assert len(fingerprints) == 1
+
+        # Same method realized in a user module of another build, with other ids
+        second = _define("mypkg.Counter.total:0[].77", STDLIB_BODY.format(id=9)) + _define(
+            "mypkg.Counter.size:0[].78", STDLIB_BODY.format(id=9)
+        )
+        assert _select(CodonFilter(), second, fingerprints) == ["mypkg.Counter.size:0[].78"]
+        # An include rule keeps it regardless
+        kept = _select(CodonFilter(include=("mypkg",)), second, fingerprints)
+        assert kept == ["mypkg.Counter.total:0[].77", "mypkg.Counter.size:0[].78"]
+
+    def test_user_class_named_like_a_builtin_type_is_kept(self):
+        user = "".join(
+            [
+                _define("C.__init__:0[C,int].5", "br label %entry"),
+                _define("C.foo:0[C].6", "br label %entry"),
+                _define("List[int].__len__:0[List[int]].7", "ret i64 0"),
+                _define("main"),
+            ]
+        )
+        assert _select(CodonFilter(), user) == [
+            "C.__init__:0[C,int].5",
+            "C.foo:0[C].6",
+            "List[int].__len__:0[List[int]].7",
+            "main",
+        ]
+        # Once the module realizes List from std, its bare methods are Codon's
+        stdlib = _define("std.internal.types.array.List.__init__:0[List[int]].8")
+        assert _select(CodonFilter(), user + stdlib) == [
+            "C.__init__:0[C,int].5",
+            "C.foo:0[C].6",
+            "main",
+        ]
+        # and are recognized by fingerprint in modules that do not
+        assert _select(CodonFilter(), user) == ["C.__init__:0[C,int].5", "C.foo:0[C].6", "main"]
+
+    def test_std_types(self):
+        paths = [("std", "internal", "types", "array", "List", "append"), ("C", "foo"), ("std",)]
+        assert std_types(paths) == {"List"}
+
+    def test_trivial_user_methods_of_other_classes_are_kept(self):
+        fingerprints = RuntimeFingerprints()
+        _select(CodonFilter(), _define("std.internal.types.Slice.__init__:0[].3"), fingerprints)
+
+        user = _define("mypkg.Point.__init__:0[].8") + _define("mypkg.Slice.__init__:0[].9")
+        assert _select(CodonFilter(), user, fingerprints) == ["mypkg.Point.__init__:0[].8"]
+
+    def test_every_realization_is_recorded(self):
+        fingerprints = RuntimeFingerprints()
+        generic = _define("std.Box.get:0[int].4", "ret i64 0") + _define(
+            "std.Box.get:0[str].5", STDLIB_BODY.format(id=2)
+        )
+        _select(CodonFilter(), generic, fingerprints)
+        assert len(fingerprints) == 2
+
+        user = _define("mypkg.Box.get:0[str].6", STDLIB_BODY.format(id=7))
+        assert _select(CodonFilter(), user, fingerprints) == []
+
+    def test_runtime_functions_are_hashed_once_per_process(self):
+        with patch("struco.codon.fingerprint", wraps=fingerprint) as spy:
+            _select(CodonFilter(), MODULE)
+            first = spy.call_count
+            _select(CodonFilter(), MODULE.replace(".412", ".5").replace(".1877", ".6"))
+        # Four runtime functions, then only the three kept functions are checked
+        assert first == 4 + 3
+        assert spy.call_count == first + 3
+        assert len(runtime_fingerprints()) == 4
+
+    def test_fingerprint_ignores_build_ids(self):
+        path = ("std", "f")
+        assert fingerprint(path, STDLIB_BODY.format(id=1).encode()) == fingerprint(
+            path, STDLIB_BODY.format(id=2).encode()
+        )
+        assert fingerprint(path, b"ret void") != fingerprint(("std", "g"), b"ret void")
+
+
+# get_function_names and the AST engine
+class TestExtraction:
+    def test_python_ir_is_filtered(self, tmp_path: Path):
+        ir_file = tmp_path / "m_py.ll"
+        ir_file.write_text(MODULE)
+
+        assert get_function_names(ir_file, Language.PYTHON) == [
+            "binary_search:0[List[int],int].95",
+            "mypkg.util.helper:0[].7",
+            "main",
+        ]
+        in_memory = get_function_names(
+            ir_file, Language.PYTHON, ir_text=MODULE, symbol_filter=SymbolFilter(("mypkg",))
+        )
+        assert in_memory == ["mypkg.util.helper:0[].7"]
+
+    def test_ast_engine_uses_module_rules(self, tmp_path: Path):
+        source = tmp_path / "shapes.py"
+        source.write_text(
+            textwrap.dedent("""\
+                class Square:
+                    def area(self):
+                        return 1
+
+                def main():
+                    return 0
+            """)
+        )
+
+        outputs = extract_cfg_from_source(
+            source, output_format="json", output_root=tmp_path, exclude_namespaces=["Square"]
+        )
+        assert [p.stem for p in outputs] == ["main"]
+
+    def test_ast_engine_keeps_user_classes_named_like_builtin_types(self, tmp_path: Path):
+        source = tmp_path / "ffi.py"
+        source.write_text(
+            textwrap.dedent("""\
+                class C:
+                    def foo(self):
+                        return 1
+
+                def main():
+                    return 0
+            """)
+        )
+
+        outputs = extract_cfg_from_source(
+            source, output_format="json", output_root=tmp_path, exclude_namespaces=["mypkg"]
+        )
+        assert sorted(p.stem for p in outputs) == ["C.foo", "main"]
@@ -0,0 +1,182 @@
+"""Tests for struco.compdb module."""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from benchmarks.toolchain import fake_toolchain
+from struco.__main__ import main
+from struco.cache import IRCache
+from struco.cfg import Language, _run_frontend, extract_ir
+from struco.compdb import (
+    COMPDB_NAME,
+    CompilationDatabase,
+    compile_flags,
+    load_compilation_database,
+)
+from struco.incremental import build_incremental, is_stale
+from struco.scheduler import run_tool
+
+SOURCE = "int add(int a, int b) {\n  return a + b;\n}\n"
+
+
+def _write_db(build_dir: Path, entries: list[dict]) -> Path:
+    build_dir.mkdir(parents=True, exist_ok=True)
+    path = build_dir / COMPDB_NAME
+    path.write_text(json.dumps(entries))
+    return path
+
+
+@pytest.fixture()
+def project(tmp_path: Path) -> Path:
+    """A source tree with a CMake-style build directory next to it."""
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.cpp").write_text(SOURCE)
+    (tmp_path / "src" / "b.cpp").write_text(SOURCE)
+    _write_db(
+        tmp_path / "build",
+        [
+            {
+                "directory": str(tmp_path / "build"),
+                "file": "../src/a.cpp",
+                "arguments": [
+                    "/usr/bin/c++",
+                    "-I../include",
+                    "-DNDEBUG",
+                    "-std=c++17",
+                    "-o",
+                    "a.o",
+                    "-c",
+                    "../src/a.cpp",
+                ],
+            },
+            {
+                "directory": str(tmp_path / "build"),
+                "file": str(tmp_path / "src" / "b.cpp"),
+                "command": "g++ -isystem /opt/boost -MD -MF b.d -O2 -c ../src/b.cpp -ob.o",
+            },
+        ],
+    )
+    return tmp_path
+
+
+# compile_flags and load_compilation_database
+class TestLoad:
+    def test_flags_per_file(self, project: Path):
+        db = load_compilation_database(project / "build")
+
+        assert len(db) == 2
+        assert db.path == project / "build" / COMPDB_NAME
+        a = db.get(project / "src" / "a.cpp")
+        assert a.flags == ("-I../include", "-DNDEBUG", "-std=c++17")
+        assert a.directory == project / "build"
+        assert a.frontend_args()[-2:] == ["-working-directory", str(project / "build")]
+        assert db.get(project / "src" / "b.cpp").flags == ("-isystem", "/opt/boost", "-O2")
+        assert db.get(project / "src" / "c.cpp") is None
+
+    def test_first_entry_wins(self, tmp_path: Path):
+        entry = {"directory": str(tmp_path), "file": "a.c", "arguments": ["cc", "-DFIRST", "a.c"]}
+        _write_db(tmp_path, [entry, {**entry, "arguments": ["cc", "-DSECOND", "a.c"]}])
+
+        db = load_compilation_database(tmp_path / COMPDB_NAME)
+        assert db.get(tmp_path / "a.c").flags == ("-DFIRST",)
+
+    def test_keeps_forced_includes(self, tmp_path: Path):
+        source = tmp_path / "a.c"
+        argv = ["cc", "-include", "config.h", "-include-pch", "old.pch", "-MTa.o", "a.c"]
+        assert compile_flags(argv, source, tmp_path) == ("-include", "config.h")
+
+    @pytest.mark.parametrize(
+        ("content", "match"),
+        [
+            ("not json", "Invalid compilation database"),
+            ('{"file": "a.c"}', "expected a list"),
+            ('[{"file": "a.c", "arguments": ["cc"]}]', "Invalid entry 0"),
+            ('[{"directory": "/", "file": "a.c"}]', "neither"),
+        ],
+    )
+    def test_invalid(self, tmp_path: Path, content: str, match: str):
+        (tmp_path / COMPDB_NAME).write_text(content)
+        with pytest.raises(ValueError, match=match):
+            load_compilation_database(tmp_path)
+
+    def test_missing(self, tmp_path: Path):
+        with pytest.raises(FileNotFoundError, match="Compilation database not found"):
+            load_compilation_database(tmp_path)
+
+
+# Frontend flags, cache keys and dependencies
+class TestFrontend:
+    @patch("struco.cfg.run_tool")
+    def test_frontend_uses_entry_flags(self, mock_run: MagicMock, project: Path):
+        mock_run.return_value = MagicMock(returncode=0, stderr="", stdout="; ModuleID\n")
+        db = load_compilation_database(project / "build")
+        (project / "src" / "a.c").write_text(SOURCE)
+
+        extract_ir(project / "src" / "a.cpp", compile_db=db, keep_ir=False)
+        extract_ir(project / "src" / "a.c", compile_db=CompilationDatabase(), keep_ir=False)
+
+        cmd = mock_run.call_args_list[0].args[0]
+        assert cmd[0] == "clang++"
+        assert cmd[cmd.index("-std=c++17") - 2 :][:4] == [
+            "-I../include",
+            "-DNDEBUG",
+            "-std=c++17",
+            "-working-directory",
+        ]
+        # Files not in the database use the default flags
+        assert "-working-directory" not in mock_run.call_args_list[1].args[0]
+
+    @patch("struco.cfg.run_tool")
+    def test_flags_are_part_of_the_cache_key(
+        self, mock_run: MagicMock, project: Path, tmp_path: Path
+    ):
+        source = project / "src" / "a.cpp"
+        command = load_compilation_database(project / "build").get(source)
+        mock_run.return_value = MagicMock(returncode=0, stderr="", stdout="; ModuleID\n")
+        cache = IRCache(tmp_path / "cache")
+
+        _run_frontend(source, Language.CPP, cache=cache, keep_ir=False)
+        _run_frontend(source, Language.CPP, cache=cache, keep_ir=False, compile_command=command)
+        _run_frontend(source, Language.CPP, cache=cache, keep_ir=False, compile_command=command)
+
+        assert mock_run.call_count == 2
+
+    def test_database_edit_makes_files_stale(self, project: Path, tmp_path: Path):
+        source = project / "src" / "a.cpp"
+        db_path = project / "build" / COMPDB_NAME
+        with fake_toolchain(tmp_path / "bin"):
+            db = load_compilation_database(db_path)
+            build_incremental(source, compile_db=db, output_format="json", engine="native")
+            assert not is_stale(source, output_format="json", engine="native")
+
+            db_path.write_text(db_path.read_text().replace("NDEBUG", "DEBUG"))
+            stat = db_path.stat()
+            os.utime(db_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+            assert is_stale(source, output_format="json", engine="native")
+
+
+# CLI
+class TestCli:
+    def test_missing_database_fails(self, project: Path):
+        source = str(project / "src" / "a.cpp")
+        assert main([source, "--compile-commands", str(project / "nowhere")]) == 1
+
+    def test_rejects_ast_engine(self, project: Path):
+        with pytest.raises(SystemExit):
+            main([str(project / "src"), "--engine", "ast", "--compile-commands", "build"])
+
+    def test_batch_uses_database(self, project: Path, tmp_path: Path):
+        argv = [str(project / "src"), "--compile-commands", str(project / "build")]
+        with fake_toolchain(tmp_path / "bin"), patch("struco.cfg.run_tool", wraps=run_tool) as run:
+            status = main([*argv, "--cfg_format", "json", "--no-cache", "-j", "1"])
+
+        assert status == 0
+        frontend = [call.args[0] for call in run.call_args_list if call.args[1] == "frontend"]
+        assert len(frontend) == 2
+        assert all("-working-directory" in cmd for cmd in frontend)
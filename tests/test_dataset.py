@@ -0,0 +1,154 @@
+"""Tests for struco.dataset module."""
+
+from __future__ import annotations
+
+import json
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from struco.cfg import Language
+from struco.dataset import INDEX_NAME, Dataset, DatasetWriter, main, write_dataset
+from struco.graph import BasicBlock, FunctionCFG, StringPool
+from struco.ir import parse_ir
+
+np = pytest.importorskip("numpy")
+
+LOOP_IR = textwrap.dedent("""\
+    define i32 @loop(i32 %n) {
+    entry:
+      br label %cond
+
+    cond:
+      %i = phi i32 [ 0, %entry ], [ %inc, %body ]
+      %cmp = icmp slt i32 %i, %n
+      br i1 %cmp, label %body, label %end
+
+    body:
+      %inc = add i32 %i, 1
+      br label %cond
+
+    end:
+      ret i32 %i
+    }
+
+    define void @straight() {
+    entry:
+      ret void
+    }
+""")
+
+
+def _corpus(count: int) -> list[FunctionCFG]:
+    cfgs = []
+    for i in range(count):
+        blocks = [BasicBlock(f"b{j}", [f"op{i} {j}"], [f"b{j + 1}"]) for j in range(i % 4)]
+        blocks.append(BasicBlock("ret", ["ret void", "ünïcode"], []))
+        cfgs.append(FunctionCFG.from_blocks(f"f{i}", blocks))
+    return cfgs
+
+
+def _same(record, cfg: FunctionCFG) -> bool:
+    rebuilt = record.to_cfg(StringPool())
+    return rebuilt.name == cfg.name and rebuilt.blocks == cfg.blocks
+
+
+# DatasetWriter
+class TestDatasetWriter:
+    def test_fixed_size_shards_and_index(self, tmp_path: Path):
+        index = write_dataset(tmp_path, ((cfg, Language.C, "a.c") for cfg in _corpus(7)), 3)
+
+        doc = json.loads(index.read_text())
+        assert index == tmp_path / INDEX_NAME
+        assert doc["functions"] == 7
+        assert [shard["functions"] for shard in doc["shards"]] == [3, 3, 1]
+        assert sorted(p.name for p in tmp_path.glob("shard-*.bin")) == [
+            "shard-00000.bin",
+            "shard-00001.bin",
+            "shard-00002.bin",
+        ]
+        assert all(spec["offset"] % 64 == 0 for spec in doc["shards"][0]["columns"].values())
+
+    def test_rewrite_removes_stale_shards(self, tmp_path: Path):
+        write_dataset(tmp_path, ((cfg, "c", "") for cfg in _corpus(6)), 2)
+        write_dataset(tmp_path, ((cfg, "c", "") for cfg in _corpus(3)), 2)
+
+        assert len(list(tmp_path.glob("shard-*.bin"))) == 2
+        assert len(Dataset(tmp_path)) == 3
+
+    def test_failed_export_leaves_no_index(self, tmp_path: Path):
+        with pytest.raises(KeyError), DatasetWriter(tmp_path, shard_size=1) as writer:
+            writer.extend(_corpus(2), "c")
+            raise KeyError
+
+        assert not (tmp_path / INDEX_NAME).exists()
+        with pytest.raises(FileNotFoundError, match="No dataset index"):
+            Dataset(tmp_path)
+
+    def test_invalid_shard_size(self, tmp_path: Path):
+        with pytest.raises(ValueError, match="shard_size"):
+            DatasetWriter(tmp_path, shard_size=0)
+
+
+# Dataset
+class TestDataset:
+    def test_round_trip(self, tmp_path: Path):
+        cfgs = parse_ir(LOOP_IR)
+        write_dataset(tmp_path, [(cfgs[0], Language.CPP, "m.cpp"), (cfgs[1], "py", "")])
+
+        with Dataset(tmp_path) as dataset:
+            loop, straight = dataset[0], dataset[1]
+
+        assert (loop.name, loop.language, loop.source) == ("loop", "cpp", "m.cpp")
+        assert loop.labels == ("entry", "cond", "body", "end")
+        assert loop.instructions[2] == ("%inc = add i32 %i, 1", "br label %cond")
+        assert loop.edges.tolist() == [[0, 1], [1, 2], [1, 3], [2, 1]]
+        assert straight.language == "py"
+        assert _same(loop, cfgs[0])
+        assert _same(straight, cfgs[1])
+
+    def test_random_access_and_iteration_across_shards(self, tmp_path: Path):
+        cfgs = _corpus(10)
+        write_dataset(tmp_path, ((cfg, "c", "") for cfg in cfgs), shard_size=4)
+        dataset = Dataset(tmp_path)
+
+        assert len(dataset) == 10
+        assert dataset.num_shards == 3
+        assert dataset[-1].name == "f9"
+        assert _same(dataset[5], cfgs[5])
+        assert [record.name for record in dataset] == [cfg.name for cfg in cfgs]
+        assert [record.name for record in dataset.iter_shard(2)] == ["f8", "f9"]
+        with pytest.raises(IndexError):
+            dataset[10]
+
+    def test_edges_are_views_into_the_shard(self, tmp_path: Path):
+        write_dataset(tmp_path, [(cfg, "c", "") for cfg in _corpus(4)])
+        edges = Dataset(tmp_path)[3].edges
+
+        assert edges.dtype == np.int32
+        assert not edges.flags.writeable
+        assert not edges.flags.owndata
+
+    def test_empty_function(self, tmp_path: Path):
+        write_dataset(tmp_path, [(FunctionCFG("empty"), "c", "")])
+        record = Dataset(tmp_path)[0]
+        assert (record.labels, record.instructions, record.edges.shape) == ((), (), (0, 2))
+
+    def test_rejects_other_index(self, tmp_path: Path):
+        (tmp_path / INDEX_NAME).write_text('{"format": "other"}')
+        with pytest.raises(ValueError, match="struco dataset"):
+            Dataset(tmp_path)
+
+    def test_cli_exports_ir_files(self, tmp_path: Path):
+        ir_path = tmp_path / "m_cpp.ll"
+        ir_path.write_text(LOOP_IR)
+
+        assert main([str(ir_path), "-o", str(tmp_path / "ds"), "--shard-size", "1"]) == 0
+
+        dataset = Dataset(tmp_path / "ds")
+        assert dataset.num_shards == 2
+        assert [(r.name, r.language, r.source) for r in dataset] == [
+            ("loop", "cpp", str(ir_path)),
+            ("straight", "cpp", str(ir_path)),
+        ]
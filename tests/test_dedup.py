@@ -0,0 +1,121 @@
+"""Tests for struco.dedup module."""
+
+from __future__ import annotations
+
+import json
+import textwrap
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.toolchain import fake_toolchain
+from struco.cfg import Language, extract_cfg_from_ir
+from struco.dedup import MANIFEST_NAME, group_by_shape, read_manifest, structural_hash
+from struco.graph import StringPool
+from struco.incremental import build_incremental
+from struco.ir import parse_ir
+
+
+def _function(name: str, op: str = "add", value: int = 1) -> str:
+    return textwrap.dedent(f"""\
+        define i32 @{name}(i32 %x) {{
+        entry:
+          %c = icmp eq i32 %x, {value}
+          br i1 %c, label %then, label %done
+
+        then:
+          %y = {op} i32 %x, {value}
+          br label %done
+
+        done:
+          ret i32 %x
+        }}
+
+    """)
+
+
+# structural_hash
+class TestStructuralHash:
+    def test_ignores_names_operands_and_pool(self):
+        a = parse_ir(_function("a", value=1))[0]
+        b = parse_ir(_function("b", value=7), pool=StringPool())[0]
+        assert structural_hash(a) == structural_hash(b)
+
+    def test_opcodes_and_edges_matter(self):
+        base = parse_ir(_function("a"))[0]
+        other_op = parse_ir(_function("a", op="mul"))[0]
+        straight = parse_ir("define i32 @a(i32 %x) {\nentry:\n  ret i32 %x\n}\n")[0]
+        hashes = {structural_hash(cfg) for cfg in (base, other_op, straight)}
+        assert len(hashes) == 3
+
+    def test_group_by_shape_keeps_order(self):
+        cfgs = parse_ir(_function("a") + _function("b", op="mul") + _function("c"))
+        groups = group_by_shape(cfgs)
+        assert [[cfg.name for cfg in members] for members in groups.values()] == [
+            ["a", "c"],
+            ["b"],
+        ]
+
+
+@pytest.fixture()
+def ir_file(tmp_path: Path) -> Path:
+    path = tmp_path / "m_c.ll"
+    path.write_text(_function("a") + _function("b", op="mul") + _function("c", value=3))
+    return path
+
+
+# extract_cfg_from_ir(dedup=True)
+class TestDedupExtraction:
+    def test_one_artifact_per_shape_with_manifest(self, ir_file: Path):
+        outputs = extract_cfg_from_ir(ir_file, Language.C, output_format="json", dedup=True)
+
+        output_dir = ir_file.parent / "m_c_cfg" / "jsons"
+        assert outputs == [output_dir / "a.json", output_dir / "b.json"]
+        assert not (output_dir / "c.json").exists()
+        assert read_manifest(output_dir / MANIFEST_NAME) == {
+            "a": output_dir / "a.json",
+            "b": output_dir / "b.json",
+            "c": output_dir / "a.json",
+        }
+        doc = json.loads((output_dir / MANIFEST_NAME).read_text())
+        assert (doc["functions"], doc["shapes"]) == (3, 2)
+        assert doc["entries"]["c"]["canonical"] is False
+
+    def test_native_engine_renders_each_shape_once(self, ir_file: Path):
+        with patch("struco.cfg.render_dots", return_value=[]) as render:
+            extract_cfg_from_ir(ir_file, Language.C, engine="native", dedup=True)
+
+        dot_paths = render.call_args.args[0]
+        assert [p.name for p in dot_paths] == [".a.dot", ".b.dot"]
+
+    def test_shape_store_is_shared_across_files(self, ir_file: Path, tmp_path: Path):
+        other = tmp_path / "n_c.ll"
+        other.write_text(_function("d", value=9))
+        store = tmp_path / "store"
+
+        first = extract_cfg_from_ir(ir_file, Language.C, output_format="json", shape_store=store)
+        with patch("struco.cfg.serialize_cfgs") as serialize:
+            second = extract_cfg_from_ir(
+                other, Language.C, output_format="json", shape_store=store
+            )
+
+        assert serialize.call_args.args[0] == []
+        assert second == [first[0]]
+        assert first[0].parent == store / "jsons"
+        manifest = read_manifest(tmp_path / "n_c_cfg" / "jsons" / MANIFEST_NAME)
+        assert manifest == {"d": first[0]}
+
+    def test_opt_engine_renders_canonical_functions(self, ir_file: Path, tmp_path: Path):
+        store = tmp_path / "store"
+        with fake_toolchain(tmp_path / "bin"):
+            outputs = extract_cfg_from_ir(ir_file, Language.C, shape_store=store)
+
+        shapes = list(group_by_shape(parse_ir(ir_file.read_text())))
+        assert outputs == [store / "pngs" / f"{shape}.png" for shape in shapes]
+        assert all(path.exists() for path in outputs)
+        assert not list((ir_file.parent / "m_c_cfg" / "pngs").glob("*.png"))
+
+    def test_incremental_rejects_dedup(self, tmp_path: Path):
+        with pytest.raises(ValueError, match="deduplication"):
+            build_incremental(tmp_path / "a.c", dedup=True)
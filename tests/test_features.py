@@ -0,0 +1,139 @@
+"""Tests for struco.features module."""
+
+from __future__ import annotations
+
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from struco.features import FeatureMatrix, extract_features, main
+from struco.graph import BasicBlock, FunctionCFG, StringPool
+from struco.ir import parse_ir
+
+np = pytest.importorskip("numpy")
+
+LOOP_IR = textwrap.dedent("""\
+    define i32 @loop(i32 %n) {
+    entry:
+      br label %cond
+
+    cond:
+      %i = phi i32 [ 0, %entry ], [ %inc, %body ]
+      %cmp = icmp slt i32 %i, %n
+      br i1 %cmp, label %body, label %end
+
+    body:
+      %inc = add i32 %i, 1
+      br label %cond
+
+    end:
+      ret i32 %i
+    }
+
+    define void @straight() {
+    entry:
+      ret void
+    }
+""")
+
+
+def _blocks() -> list[BasicBlock]:
+    return [
+        BasicBlock("entry", ["br label %cond"], ["cond"]),
+        BasicBlock("cond", ["br i1 %c, label %body, label %end"], ["body", "end"]),
+        BasicBlock("body", ["br label %cond"], ["cond"]),
+        BasicBlock("end", ["ret void"], []),
+    ]
+
+
+# extract_features
+class TestExtractFeatures:
+    def test_counts(self):
+        matrix = extract_features(parse_ir(LOOP_IR))
+
+        assert matrix.rows == ("loop", "straight")
+        assert matrix.values.dtype == np.int64
+        assert matrix.column("blocks").tolist() == [4, 1]
+        assert matrix.column("edges").tolist() == [4, 0]
+        assert matrix.column("instructions").tolist() == [7, 1]
+        assert matrix.column("exits").tolist() == [1, 1]
+        assert matrix.column("back_edges").tolist() == [1, 0]
+        assert matrix.column("loop_headers").tolist() == [1, 0]
+
+    def test_degree_histograms(self):
+        matrix = extract_features(parse_ir(LOOP_IR), degree_bins=2)
+
+        out_hist = matrix.values[:, matrix.columns.index("out_degree_0") :][:, :2]
+        # loop: one exit, three blocks with one or more successors (last bin)
+        assert out_hist.tolist() == [[1, 3], [1, 0]]
+        assert matrix.column("in_degree_1").tolist() == [3, 0]
+
+    def test_wl_hash_ignores_block_order_and_pool(self):
+        blocks = _blocks()
+        shuffled = [blocks[0], blocks[3], blocks[1], blocks[2]]
+        cfgs = [
+            FunctionCFG.from_blocks("a", blocks),
+            FunctionCFG.from_blocks("b", shuffled, StringPool()),
+        ]
+
+        hashes = extract_features(cfgs).wl_hashes()
+
+        assert hashes.dtype == np.uint64
+        assert (hashes[0] == hashes[1]).all()
+
+    def test_wl_hash_separates_structure_and_labels(self):
+        blocks = _blocks()
+        no_latch = [*blocks[:2], BasicBlock("body", ["br label %end"], ["end"]), blocks[3]]
+        relabelled = [*blocks[:3], BasicBlock("end", ["unreachable"], [])]
+        cfgs = [FunctionCFG.from_blocks(str(i), b) for i, b in enumerate((blocks, no_latch))]
+        cfgs.append(FunctionCFG.from_blocks("2", relabelled))
+
+        terminator = extract_features(cfgs, wl_rounds=2).wl_hashes()
+        shape = extract_features(cfgs, wl_rounds=2, node_labels="none").wl_hashes()
+
+        assert terminator[0, -1] != terminator[1, -1]
+        assert terminator[0, -1] != terminator[2, -1]
+        assert shape[0, -1] == shape[2, -1]
+
+    def test_rows_do_not_depend_on_batch(self):
+        cfgs = parse_ir(LOOP_IR)
+        together = extract_features(cfgs)
+        alone = [extract_features([cfg]).values[0] for cfg in cfgs]
+        assert (together.values == np.stack(alone)).all()
+
+    def test_empty_inputs(self):
+        empty = FunctionCFG("empty")
+        assert extract_features([]).values.shape == (0, 20)
+        assert extract_features([empty]).column("blocks").tolist() == [0]
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [{"wl_rounds": -1}, {"degree_bins": 0}, {"node_labels": "opcode"}, {"rows": ["x", "y"]}],
+    )
+    def test_invalid_arguments(self, kwargs):
+        with pytest.raises(ValueError):
+            extract_features(parse_ir(LOOP_IR)[:1], **kwargs)
+
+
+# FeatureMatrix
+class TestFeatureMatrix:
+    def test_save_and_load(self, tmp_path: Path):
+        matrix = extract_features(parse_ir(LOOP_IR), rows=["a:loop", "a:straight"])
+        path = tmp_path / "features.npz"
+
+        matrix.save(path)
+        loaded = FeatureMatrix.load(path)
+
+        assert loaded.rows == ("a:loop", "a:straight")
+        assert loaded.columns == matrix.columns
+        assert (loaded.values == matrix.values).all()
+
+    def test_cli_reads_ir_files(self, tmp_path: Path):
+        ir_path = tmp_path / "m_c.ll"
+        ir_path.write_text(LOOP_IR)
+        output = tmp_path / "out.npz"
+
+        assert main([str(ir_path), "-o", str(output)]) == 0
+
+        assert FeatureMatrix.load(output).rows == (f"{ir_path}:loop", f"{ir_path}:straight")
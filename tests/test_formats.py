@@ -0,0 +1,124 @@
+"""Tests for struco.formats module."""
+
+from __future__ import annotations
+
+import io
+import json
+import textwrap
+from pathlib import Path
+from xml.etree import ElementTree as ET
+
+import pytest
+
+from struco.cfg import extract_cfg_from_ir
+from struco.formats import serialize_cfg, to_graphml, to_json, to_npz
+from struco.ir import parse_ir
+
+LOOP_IR = textwrap.dedent("""\
+    define i32 @loop(i32 %n) {
+    entry:
+      br label %cond
+
+    cond:
+      %i = phi i32 [ 0, %entry ], [ %inc, %body ]
+      %cmp = icmp slt i32 %i, %n
+      br i1 %cmp, label %body, label %end
+
+    body:
+      %inc = add i32 %i, 1
+      br label %cond
+
+    end:
+      ret i32 %i
+    }
+""")
+
+EDGES = [[0, 1], [1, 2], [1, 3], [2, 1]]
+
+_NS = {"g": "http://graphml.graphdrawing.org/xmlns"}
+
+
+@pytest.fixture()
+def cfg():
+    (loop,) = parse_ir(LOOP_IR)
+    return loop
+
+
+# JSON
+class TestJSON:
+    def test_structure(self, cfg):
+        doc = json.loads(to_json(cfg, "c"))
+        assert doc["function"] == "loop"
+        assert doc["language"] == "c"
+        assert doc["entry"] == 0
+        assert [b["label"] for b in doc["blocks"]] == ["entry", "cond", "body", "end"]
+        assert doc["edges"] == EDGES
+
+    def test_instructions_preserved(self, cfg):
+        doc = json.loads(to_json(cfg))
+        assert doc["blocks"][3]["instructions"] == ["ret i32 %i"]
+
+
+# GraphML
+class TestGraphML:
+    def test_nodes_and_edges(self, cfg):
+        root = ET.fromstring(to_graphml(cfg, "c"))
+        graph = root.find("g:graph", _NS)
+        assert graph.get("edgedefault") == "directed"
+        assert len(graph.findall("g:node", _NS)) == 4
+        edges = [
+            [int(e.get("source")[1:]), int(e.get("target")[1:])]
+            for e in graph.findall("g:edge", _NS)
+        ]
+        assert edges == EDGES
+
+    def test_edge_order_attribute(self, cfg):
+        root = ET.fromstring(to_graphml(cfg))
+        orders = [d.text for d in root.iterfind("g:graph/g:edge/g:data", _NS)]
+        assert orders == ["0", "0", "1", "0"]
+
+
+# NPZ
+class TestNPZ:
+    def test_arrays(self, cfg):
+        np = pytest.importorskip("numpy")
+        archive = np.load(io.BytesIO(to_npz(cfg, "c")))
+        assert archive["edges"].tolist() == EDGES
+        assert archive["block_labels"].tolist() == ["entry", "cond", "body", "end"]
+        offsets = archive["instruction_offsets"]
+        assert offsets.tolist() == [0, 1, 4, 6, 7]
+        assert archive["instructions"][offsets[3] : offsets[4]].tolist() == ["ret i32 %i"]
+        assert str(archive["function"]) == "loop"
+
+
+# serialize_cfg
+class TestSerializeCfg:
+    def test_dispatches_by_format(self, cfg):
+        assert serialize_cfg(cfg, "json", "c") == to_json(cfg, "c")
+
+    def test_render_format_rejected(self, cfg):
+        with pytest.raises(ValueError, match="Unsupported structured format"):
+            serialize_cfg(cfg, "png")
+
+    def test_long_function_names_get_short_file_names(self, tmp_path: Path):
+        name = "_ZN4acme" + "9Container" * 40 + "4loopEi"
+        ir_file = tmp_path / "long_cpp.ll"
+        ir_file.write_text(LOOP_IR.replace("@loop", f"@{name}"))
+
+        [output] = extract_cfg_from_ir(ir_file, output_format="json")
+
+        assert len(output.name.encode()) <= 255
+        assert output.name.startswith("_ZN4acme9Container")
+        assert json.loads(output.read_text())["function"] == name
+
+    def test_unsafe_function_names_stay_in_the_output_dir(self, tmp_path: Path):
+        ir_file = tmp_path / "ops_cpp.ll"
+        ir_file.write_text(
+            LOOP_IR.replace("@loop", '@"operator/"') + LOOP_IR.replace("@loop", '@"operator*"')
+        )
+
+        outputs = extract_cfg_from_ir(ir_file, output_format="json")
+
+        assert len({p.parent for p in outputs}) == 1
+        assert [p.name.split("~")[0] for p in outputs] == ["operator_", "operator_"]
+        assert len(set(outputs)) == 2
@@ -0,0 +1,112 @@
+"""Tests for struco.graph module."""
+
+from __future__ import annotations
+
+import io
+import textwrap
+
+import pytest
+
+from struco.formats import to_npz
+from struco.graph import DEFAULT_POOL, BasicBlock, FunctionCFG, StringPool
+from struco.ir import parse_ir
+
+SWITCH_IR = textwrap.dedent("""\
+    define i32 @sw(i32 %x) {
+    entry:
+      switch i32 %x, label %done [
+        i32 0, label %a
+        i32 1, label %a
+      ]
+
+    a:
+      br label %done
+
+    done:
+      ret i32 0
+    }
+""")
+
+
+# StringPool
+class TestStringPool:
+    def test_same_string_same_id(self):
+        pool = StringPool()
+        assert pool.intern("ret void") == pool.intern("ret void")
+        assert len(pool) == 1
+
+    def test_lookup_by_id(self):
+        pool = StringPool()
+        idx = pool.intern("br label %x")
+        assert pool[idx] == "br label %x"
+
+    def test_instructions_shared_across_graphs(self):
+        pool = StringPool()
+        parse_ir(SWITCH_IR, pool=pool)
+        size = len(pool)
+        parse_ir(SWITCH_IR, pool=pool)
+        assert len(pool) == size
+
+    def test_each_parse_gets_its_own_pool(self):
+        shared = len(DEFAULT_POOL)
+        first = parse_ir(SWITCH_IR + SWITCH_IR.replace("@sw", "@sw2"))
+        second = parse_ir(SWITCH_IR)
+
+        assert first[0].pool is first[1].pool
+        assert first[0].pool is not second[0].pool
+        assert len(DEFAULT_POOL) == shared
+
+
+# FunctionCFG
+class TestFunctionCFG:
+    def test_csr_layout(self):
+        (cfg,) = parse_ir(SWITCH_IR, pool=StringPool())
+        assert len(cfg) == 3
+        assert cfg.successor_offsets.tolist() == [0, 3, 4, 4]
+        assert cfg.successor_targets.tolist() == [2, 1, 1, 2]
+        assert cfg.instruction_offsets.tolist() == [0, 1, 2, 3]
+
+    def test_accessors(self):
+        (cfg,) = parse_ir(SWITCH_IR, pool=StringPool())
+        assert cfg.label(1) == "a"
+        assert cfg.instructions(2) == ["ret i32 0"]
+        assert cfg.opcodes(0) == ["switch"]
+        assert list(cfg.successors(1)) == [2]
+
+    def test_block_view_matches_labels(self):
+        (cfg,) = parse_ir(SWITCH_IR, pool=StringPool())
+        assert cfg.entry == BasicBlock(
+            label="entry",
+            instructions=cfg.instructions(0),
+            successors=["done", "a", "a"],
+        )
+
+    def test_unknown_successor_dropped(self):
+        blocks = [BasicBlock("entry", ["br label %nowhere"], ["nowhere"])]
+        cfg = FunctionCFG.from_blocks("f", blocks, StringPool())
+        assert cfg.edges() == []
+
+    def test_memory_per_block_is_fixed(self):
+        blocks = [BasicBlock(str(i), ["ret void"]) for i in range(1000)]
+        cfg = FunctionCFG.from_blocks("f", blocks, StringPool())
+        # label id, two offsets, one instruction + opcode id per block
+        assert cfg.nbytes() == 1000 * (4 + 4 + 4 + 8) + 8
+
+    def test_empty_function(self):
+        cfg = FunctionCFG("f")
+        assert cfg.entry is None
+        assert cfg.edges() == []
+        assert cfg.blocks == []
+
+    def test_to_networkx(self):
+        nx = pytest.importorskip("networkx")
+        (cfg,) = parse_ir(SWITCH_IR, pool=StringPool())
+        graph = cfg.to_networkx()
+        assert isinstance(graph, nx.DiGraph)
+        assert graph.nodes[1]["label"] == "a"
+        assert sorted(graph.edges()) == [(0, 1), (0, 2), (1, 2)]
+
+    def test_npz_of_empty_function(self):
+        np = pytest.importorskip("numpy")
+        archive = np.load(io.BytesIO(to_npz(FunctionCFG("f"))))
+        assert archive["edges"].shape == (0, 2)
@@ -0,0 +1,218 @@
+"""Tests for struco.incremental module."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from struco.incremental import (
+    Manifest,
+    build_incremental,
+    function_callees,
+    function_digests,
+    is_stale,
+    manifest_path,
+    parse_depfile,
+    watch,
+)
+
+FOO_IR = "define i32 @foo() #0 {\nentry:\n  ret i32 {value}\n}\n\n"
+BAR_IR = "define i32 @bar() #1 {\nentry:\n  ret i32 0, !dbg !{dbg}\n}\n\n"
+
+CALLER_IR = "define i32 @foo() {\nentry:\n  %r = call i32 @bar()\n  ret i32 %r\n}\n\n"
+
+JSON_OPTIONS = {"output_format": "json", "engine": "native"}
+
+
+@pytest.fixture()
+def project(tmp_path: Path) -> dict:
+    """A C source including a header, with a fake clang that honours -MF."""
+    source = tmp_path / "prog.c"
+    header = tmp_path / "prog.h"
+    source.write_text('#include "prog.h"\nint foo(void) { return 1; }\n')
+    header.write_text("int bar(void);\n")
+    state = {"ir": FOO_IR.replace("{value}", "1") + BAR_IR.replace("{dbg}", "7")}
+
+    def fake_clang(cmd, **kwargs):
+        Path(cmd[cmd.index("-o") + 1]).write_text(state["ir"])
+        if "-MF" in cmd:
+            Path(cmd[cmd.index("-MF") + 1]).write_text(f"prog.o: {source} \\\n  {header}\n")
+        return MagicMock(returncode=0, stderr="", stdout="")
+
+    with patch("struco.scheduler._run_child", side_effect=fake_clang) as mock_run:
+        yield {"source": source, "header": header, "state": state, "run": mock_run}
+
+
+def _touch(path: Path, text: str) -> None:
+    path.write_text(text)
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+# parse_depfile
+class TestParseDepfile:
+    def test_continuations_and_escaped_spaces(self):
+        deps = parse_depfile("out.o: /src/a.c \\\n  /inc/my\\ header.h /inc/b.h\n")
+        assert deps == [Path("/src/a.c"), Path("/inc/my header.h"), Path("/inc/b.h")]
+
+    def test_empty(self):
+        assert parse_depfile("") == []
+
+
+# function_digests
+class TestFunctionDigests:
+    def test_metadata_renumbering_ignored(self, tmp_path: Path):
+        a = tmp_path / "a.ll"
+        b = tmp_path / "b.ll"
+        a.write_text(BAR_IR.replace("{dbg}", "7"))
+        b.write_text(BAR_IR.replace("{dbg}", "42").replace("#1", "#3"))
+        assert function_digests(a) == function_digests(b)
+
+    def test_body_change_changes_digest(self, tmp_path: Path):
+        a = tmp_path / "a.ll"
+        b = tmp_path / "b.ll"
+        a.write_text(FOO_IR.replace("{value}", "1"))
+        b.write_text(FOO_IR.replace("{value}", "2"))
+        assert function_digests(a)["foo"] != function_digests(b)["foo"]
+
+    def test_callees(self, tmp_path: Path):
+        ir = tmp_path / "a.ll"
+        ir.write_text(
+            CALLER_IR
+            + BAR_IR.replace("{dbg}", "7")
+            + 'define void @"q.x"() {\n  call void @"q.x"()\n  call void @puts()\n  ret void\n}\n'
+        )
+        assert function_callees(ir) == {
+            "foo": frozenset({"bar"}),
+            "bar": frozenset(),
+            "q.x": frozenset(),
+        }
+
+
+# build_incremental
+class TestBuildIncremental:
+    def test_first_build_renders_everything(self, project: dict):
+        result = build_incremental(project["source"], **JSON_OPTIONS)
+        assert set(result.rebuilt) == {"foo", "bar"}
+        assert [p.name for p in result.outputs] == ["foo.json", "bar.json"]
+        assert "-MD" in project["run"].call_args[0][0]
+
+    def test_unchanged_source_skips_compiler(self, project: dict):
+        build_incremental(project["source"], **JSON_OPTIONS)
+        result = build_incremental(project["source"], **JSON_OPTIONS)
+        assert result.up_to_date
+        assert project["run"].call_count == 1
+        assert [p.name for p in result.outputs] == ["foo.json", "bar.json"]
+
+    def test_touch_without_content_change_is_up_to_date(self, project: dict):
+        build_incremental(project["source"], **JSON_OPTIONS)
+        _touch(project["source"], project["source"].read_text())
+        assert not is_stale(project["source"], **JSON_OPTIONS)
+
+    def test_header_change_rerenders_only_changed_functions(self, project: dict):
+        first = build_incremental(project["source"], **JSON_OPTIONS)
+        bar_output = first.outputs[1]
+        bar_mtime = bar_output.stat().st_mtime_ns
+
+        _touch(project["header"], "int bar(void); /* edited */\n")
+        project["state"]["ir"] = FOO_IR.replace("{value}", "2") + BAR_IR.replace("{dbg}", "9")
+        result = build_incremental(project["source"], **JSON_OPTIONS)
+
+        assert project["run"].call_count == 2
+        assert result.rebuilt == ("foo",)
+        assert bar_output.stat().st_mtime_ns == bar_mtime
+
+    def test_option_change_rebuilds_everything(self, project: dict):
+        build_incremental(project["source"], **JSON_OPTIONS)
+        result = build_incremental(project["source"], output_format="graphml", engine="native")
+        assert set(result.rebuilt) == {"foo", "bar"}
+        assert [p.name for p in result.outputs] == ["foo.graphml", "bar.graphml"]
+        assert not list(result.outputs[0].parent.parent.rglob("*.json"))
+
+    @pytest.mark.parametrize(
+        ("pipeline", "rebuilt"), [(None, ("bar",)), ("cleanup", ("foo", "bar"))]
+    )
+    def test_callee_change_rerenders_callers_after_a_pipeline(
+        self, project: dict, pipeline: str | None, rebuilt: tuple[str, ...]
+    ):
+        project["state"]["ir"] = CALLER_IR + BAR_IR.replace("{dbg}", "7")
+        options = {**JSON_OPTIONS, "opt_pipeline": pipeline}
+
+        def optimize(ir_path, pipeline, ir_text=None):
+            return ir_text if ir_text is not None else Path(ir_path).read_text()
+
+        with patch("struco.cfg._optimize_ir", side_effect=optimize):
+            build_incremental(project["source"], **options)
+            _touch(project["header"], "int bar(void); /* edited */\n")
+            project["state"]["ir"] = CALLER_IR + BAR_IR.replace("ret i32 0", "ret i32 1")
+            result = build_incremental(project["source"], **options)
+
+        assert result.rebuilt == rebuilt
+
+    def test_removed_function_output_deleted(self, project: dict):
+        first = build_incremental(project["source"], **JSON_OPTIONS)
+        _touch(project["source"], "int foo(void) { return 1; }\n")
+        project["state"]["ir"] = FOO_IR.replace("{value}", "1")
+
+        result = build_incremental(project["source"], **JSON_OPTIONS)
+
+        assert result.rebuilt == ()
+        assert [p.name for p in result.outputs] == ["foo.json"]
+        assert not first.outputs[1].exists()
+
+    def test_corrupt_manifest_treated_as_missing(self, project: dict):
+        path = manifest_path(project["source"])
+        path.parent.mkdir(parents=True)
+        path.write_text("{not json")
+        assert Manifest.load(path) == Manifest()
+        assert set(build_incremental(project["source"], **JSON_OPTIONS).rebuilt) == {
+            "foo",
+            "bar",
+        }
+
+    def test_long_function_names_are_tracked(self, project: dict):
+        name = "foo" + "x" * 300
+        project["state"]["ir"] = FOO_IR.replace("{value}", "1").replace("@foo", f"@{name}")
+
+        first = build_incremental(project["source"], **JSON_OPTIONS)
+        assert first.rebuilt == (name,)
+        assert len(first.outputs[0].name) < 255
+        second = build_incremental(project["source"], **JSON_OPTIONS)
+        assert second.up_to_date
+        assert second.outputs == first.outputs
+
+    def test_render_timeout_is_an_output_option(self, project: dict):
+        build_incremental(project["source"], **JSON_OPTIONS)
+        assert is_stale(project["source"], render_timeout=5.0, **JSON_OPTIONS)
+
+
+# watch
+class TestWatch:
+    def test_idle_polls_do_not_reparse_manifests(self, project: dict):
+        build_incremental(project["source"], **JSON_OPTIONS)
+        polls = []
+
+        def sleep(seconds: float) -> None:
+            polls.append(seconds)
+            if len(polls) == 3:
+                _touch(project["source"], "int foo(void) { return 3; }\n")
+                project["state"]["ir"] = FOO_IR.replace("{value}", "3") + BAR_IR.replace(
+                    "{dbg}", "7"
+                )
+            elif len(polls) == 5:
+                raise KeyboardInterrupt
+
+        with (
+            patch("struco.incremental.time.sleep", side_effect=sleep),
+            patch.object(Manifest, "load", wraps=Manifest.load) as load,
+        ):
+            polling = watch([project["source"]], **JSON_OPTIONS)
+            [result] = next(polling)
+            assert result.rebuilt == ("foo",)
+            with pytest.raises(KeyboardInterrupt):
+                next(polling)
+        # First poll, the rebuild itself, and the first poll after the rebuild
+        assert load.call_count == 3
@@ -0,0 +1,200 @@
+"""Tests for struco.ir module."""
+
+from __future__ import annotations
+
+import textwrap
+from pathlib import Path
+
+from struco.ir import iter_function_definitions, iter_text_definitions, opcode, parse_ir
+
+SWITCH_IR = textwrap.dedent("""\
+    define dso_local i32 @sw(i32 %0) #0 {
+      %2 = alloca i32, align 4
+      store i32 %0, i32* %2, align 4
+      %3 = load i32, i32* %2, align 4
+      switch i32 %3, label %6 [
+        i32 0, label %4
+        i32 1, label %5
+        i32 2, label %5
+      ]
+
+    4:                                                ; preds = %1
+      br label %6
+
+    5:                                                ; preds = %1, %1
+      br label %6
+
+    6:                                                ; preds = %5, %4, %1
+      ret i32 0
+    }
+""")
+
+LOOP_IR = textwrap.dedent("""\
+    define dso_local i32 @"loop.q"(i32 %n) {
+    entry:
+      br label %for.cond
+
+    for.cond:                                         ; preds = %for.body, %entry
+      %i = phi i32 [ 0, %entry ], [ %inc, %for.body ]
+      %cmp = icmp slt i32 %i, %n
+      br i1 %cmp, label %for.body, label %for.end
+
+    for.body:
+      %inc = add i32 %i, 1
+      br label %for.cond
+
+    for.end:
+      ret i32 %i
+    }
+
+    declare i32 @printf(i8*, ...)
+""")
+
+INVOKE_IR = textwrap.dedent("""\
+    define void @_Z1fv() personality ptr @__gxx_personality_v0 {
+    entry:
+      invoke void @_Z1gv()
+              to label %cont unwind label %lpad
+
+    cont:
+      ret void
+
+    lpad:
+      %0 = landingpad { ptr, i32 }
+              catch ptr null
+      resume { ptr, i32 } %0
+    }
+""")
+
+
+# parse_ir
+class TestParseIR:
+    def test_unnamed_entry_block_numbered_after_arguments(self):
+        (cfg,) = parse_ir(SWITCH_IR)
+        assert [b.label for b in cfg.blocks] == ["1", "4", "5", "6"]
+
+    def test_switch_successors_in_operand_order(self):
+        (cfg,) = parse_ir(SWITCH_IR)
+        assert cfg.blocks[0].successors == ["6", "4", "5", "5"]
+
+    def test_multiline_switch_is_one_instruction(self):
+        (cfg,) = parse_ir(SWITCH_IR)
+        assert len(cfg.blocks[0].instructions) == 4
+        assert cfg.blocks[0].instructions[-1].startswith("switch i32 %3")
+
+    def test_loop_edges(self):
+        (cfg,) = parse_ir(LOOP_IR)
+        assert cfg.name == "loop.q"
+        assert cfg.edges() == [
+            ("entry", "for.cond"),
+            ("for.cond", "for.body"),
+            ("for.cond", "for.end"),
+            ("for.body", "for.cond"),
+        ]
+
+    def test_phi_brackets_do_not_join_lines(self):
+        (cfg,) = parse_ir(LOOP_IR)
+        assert len(cfg.blocks[1].instructions) == 3
+
+    def test_declarations_are_skipped(self):
+        names = [cfg.name for cfg in parse_ir(LOOP_IR)]
+        assert names == ["loop.q"]
+
+    def test_invoke_continuation_and_landingpad_clauses(self):
+        (cfg,) = parse_ir(INVOKE_IR)
+        assert cfg.blocks[0].successors == ["cont", "lpad"]
+        assert len(cfg.blocks[2].instructions) == 2
+        assert "catch ptr null" in cfg.blocks[2].instructions[0]
+
+    def test_function_filter(self):
+        cfgs = parse_ir(SWITCH_IR + LOOP_IR, functions={"sw"})
+        assert [cfg.name for cfg in cfgs] == ["sw"]
+
+    def test_empty_module(self):
+        assert parse_ir("; empty module\n") == []
+
+
+# FunctionCFG.to_dot
+class TestToDot:
+    def test_one_node_per_block(self):
+        (cfg,) = parse_ir(LOOP_IR)
+        dot = cfg.to_dot()
+        assert dot.startswith("digraph \"CFG for 'loop.q' function\" {")
+        assert dot.count("shape=record") == 4
+
+    def test_conditional_branch_ports(self):
+        (cfg,) = parse_ir(LOOP_IR)
+        dot = cfg.to_dot()
+        assert "<s0>T|<s1>F" in dot
+        assert "Node1:s1 -> Node3;" in dot
+
+    def test_switch_ports_use_case_values(self):
+        (cfg,) = parse_ir(SWITCH_IR)
+        assert "<s0>def|<s1>0|<s2>1|<s3>2" in cfg.to_dot()
+
+    def test_record_special_characters_escaped(self):
+        (cfg,) = parse_ir(INVOKE_IR)
+        assert "\\{ ptr, i32 \\}" in cfg.to_dot()
+
+
+# opcode
+class TestOpcode:
+    def test_assignment(self):
+        assert opcode("%1 = add i32 %a, %b") == "add"
+
+    def test_tail_call(self):
+        assert opcode("%r = tail call i32 @f()") == "call"
+
+    def test_terminator(self):
+        assert opcode("br label %exit") == "br"
+
+
+# iter_function_definitions
+class TestIterFunctionDefinitions:
+    def test_names_and_byte_offsets(self, tmp_path: Path):
+        ir_file = tmp_path / "t.ll"
+        ir_file.write_text(LOOP_IR + SWITCH_IR)
+        data = ir_file.read_bytes()
+
+        defs = list(iter_function_definitions(ir_file))
+
+        assert [d.name for d in defs] == ["loop.q", "sw"]
+        for d in defs:
+            assert data[d.offset :].startswith(b"define ")
+
+    def test_define_on_first_line(self, tmp_path: Path):
+        ir_file = tmp_path / "t.ll"
+        ir_file.write_text("define void @f() {\n  ret void\n}\n")
+        assert [d.offset for d in iter_function_definitions(ir_file)] == [0]
+
+    def test_pointer_return_and_long_attributes(self, tmp_path: Path):
+        ir_file = tmp_path / "t.ll"
+        ir_file.write_text(
+            "define linkonce_odr noundef nonnull align 8 dereferenceable(16) ptr "
+            "@_ZN3Foo3getEv(ptr noundef nonnull align 8 dereferenceable(16) %this) "
+            "#2 comdat align 2 personality ptr @__gxx_personality_v0 !dbg !7 {\n"
+            "  ret ptr %this\n}\n"
+        )
+        assert [d.name for d in iter_function_definitions(ir_file)] == ["_ZN3Foo3getEv"]
+
+    def test_ignores_declarations_and_indented_text(self, tmp_path: Path):
+        ir_file = tmp_path / "t.ll"
+        ir_file.write_text(
+            "declare i32 @printf(ptr, ...)\n"
+            "; define void @commented()\n"
+            "@definedness = global i32 0\n"
+        )
+        assert list(iter_function_definitions(ir_file)) == []
+
+    def test_empty_file(self, tmp_path: Path):
+        ir_file = tmp_path / "empty.ll"
+        ir_file.write_bytes(b"")
+        assert list(iter_function_definitions(ir_file)) == []
+
+    def test_text_matches_file(self, tmp_path: Path):
+        ir_file = tmp_path / "t.ll"
+        ir_file.write_text(LOOP_IR + SWITCH_IR)
+        assert list(iter_text_definitions(LOOP_IR + SWITCH_IR)) == list(
+            iter_function_definitions(ir_file)
+        )
+        assert list(iter_text_definitions("")) == []
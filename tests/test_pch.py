@@ -0,0 +1,202 @@
+"""Tests for struco.pch module."""
+
+from __future__ import annotations
+
+import json
+import textwrap
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from benchmarks.toolchain import fake_toolchain
+from struco.batch import run_batch
+from struco.cfg import Language, _run_frontend, get_frontend_config
+from struco.compdb import COMPDB_NAME, load_compilation_database
+from struco.incremental import parse_depfile
+from struco.pch import (
+    PchPlan,
+    clear_failures,
+    include_prefix,
+    pch_key,
+    plan_pch,
+    precompiled_header,
+)
+from struco.scheduler import run_tool
+
+HEADER_PREFIX = "#include <vector>\n#include <string>\n"
+
+CPP = get_frontend_config(Language.CPP)
+
+SOURCE = "int add(int a, int b) {\n  return a + b;\n}\n"
+
+
+@pytest.fixture(autouse=True)
+def _fresh_failures():
+    clear_failures()
+    yield
+    clear_failures()
+
+
+@pytest.fixture()
+def sources(tmp_path: Path) -> list[Path]:
+    """Two files sharing a header prefix, one with its own, and a Python file."""
+    files = {
+        "a.cpp": HEADER_PREFIX + SOURCE,
+        "b.cpp": "// b\n" + HEADER_PREFIX + '#include "b.h"\n' + SOURCE,
+        "c.cpp": "#include <map>\n" + SOURCE,
+        "d.py": "def f():\n    return 1\n",
+    }
+    (tmp_path / "src").mkdir()
+    for name, text in files.items():
+        (tmp_path / "src" / name).write_text(text)
+    return [tmp_path / "src" / name for name in files]
+
+
+def _frontend_calls(run: MagicMock) -> list[list[str]]:
+    return [call.args[0] for call in run.call_args_list if call.args[1] == "frontend"]
+
+
+# include_prefix
+class TestIncludePrefix:
+    def test_leading_system_includes(self, tmp_path: Path):
+        source = tmp_path / "a.cpp"
+        source.write_text(
+            textwrap.dedent("""\
+                /* License
+                 * text */
+                #pragma once
+                // comment
+                #  include   <vector>
+                #include <sys/types.h>  // types
+
+                #include "local.h"
+                #include <string>
+            """)
+        )
+        assert include_prefix(source) == ("#include <vector>", "#include <sys/types.h>")
+
+    @pytest.mark.parametrize(
+        "text", ["#define X 1\n#include <vector>\n", "int x;\n#include <vector>\n", ""]
+    )
+    def test_prefix_ends_at_other_lines(self, tmp_path: Path, text: str):
+        source = tmp_path / "a.cpp"
+        source.write_text(text)
+        assert include_prefix(source) == ()
+
+
+# plan_pch
+class TestPlan:
+    def test_shared_prefixes_only(self, sources: list[Path], tmp_path: Path):
+        plan = plan_pch(sources, root=tmp_path / "pch")
+
+        assert plan.root == tmp_path / "pch"
+        assert len(plan.keys) == 1
+        assert len(plan_pch(sources, root=tmp_path / "pch", min_shared=1).keys) == 2
+        with pytest.raises(ValueError, match="min_shared"):
+            plan_pch(sources, min_shared=0)
+
+    def test_flags_separate_prefixes(self, sources: list[Path], tmp_path: Path):
+        entry = {"directory": str(tmp_path), "file": str(sources[0]), "arguments": ["c++", "-O2"]}
+        (tmp_path / COMPDB_NAME).write_text(json.dumps([entry]))
+        db = load_compilation_database(tmp_path)
+
+        assert plan_pch(sources, db, tmp_path / "pch").keys == frozenset()
+
+    def test_existing_pch_is_reused_by_single_files(self, sources: list[Path], tmp_path: Path):
+        (tmp_path / "pch").mkdir()
+        for key in plan_pch(sources, root=tmp_path / "pch", min_shared=1).keys:
+            PchPlan(tmp_path / "pch").path(key).write_text("pch")
+
+        assert len(plan_pch(sources[2:3], root=tmp_path / "pch").keys) == 1
+
+    def test_key_covers_flags_and_includes(self):
+        base = pch_key("clang++", ["-O0"], ["#include <vector>"])
+        assert base == pch_key("clang++", ["-O0"], ["#include <vector>"])
+        assert base != pch_key("clang++", ["-O2"], ["#include <vector>"])
+        assert base != pch_key("clang++", ["-O0"], ["#include <map>"])
+
+
+# precompiled_header and the frontend
+class TestFrontend:
+    def test_batch_builds_each_pch_once(self, sources: list[Path], tmp_path: Path):
+        with (
+            fake_toolchain(tmp_path / "bin"),
+            patch("struco.cfg.run_tool", wraps=run_tool) as run,
+            patch("struco.pch.run_tool", wraps=run_tool) as build,
+        ):
+            report = run_batch(
+                sources[:3], "json", jobs=1, engine="native", pch_dir=tmp_path / "pch"
+            )
+
+        assert not report.failed
+        assert build.call_count == 1
+        [header] = (tmp_path / "pch").glob("*.h")
+        assert header.read_text() == HEADER_PREFIX
+        compiled = _frontend_calls(run)
+        assert [("-include-pch" in cmd) for cmd in compiled] == [True, True, False]
+        assert compiled[0][compiled[0].index("-include-pch") + 1] == str(
+            header.with_suffix(".pch")
+        )
+
+    def test_failed_build_is_not_retried(self, sources: list[Path], tmp_path: Path):
+        plan = plan_pch(sources, root=tmp_path / "pch")
+        with patch(
+            "struco.pch.run_tool", return_value=MagicMock(returncode=1, stderr="no")
+        ) as run:
+            for source in sources[:2]:
+                assert precompiled_header(plan, CPP.command, CPP.args, "cpp", source) is None
+        assert run.call_count == 1
+
+    @patch("struco.cfg.run_tool")
+    def test_rejected_pch_falls_back_and_is_removed(
+        self, mock_run: MagicMock, sources: list[Path], tmp_path: Path
+    ):
+        plan = plan_pch(sources, root=tmp_path / "pch")
+        pch = plan.path(next(iter(plan.keys)))
+        pch.parent.mkdir()
+        pch.write_text("stale")
+        pch.with_suffix(".d").write_text(f"{pch}: /usr/include/vector\n")
+        stale = "fatal error: file '/usr/include/vector' has been modified since the "
+        mock_run.side_effect = [
+            MagicMock(returncode=1, stderr=stale + "precompiled header was built", stdout=""),
+            MagicMock(returncode=0, stderr="", stdout="; ModuleID\n"),
+        ]
+
+        result = _run_frontend(sources[0], Language.CPP, keep_ir=False, pch=plan)
+
+        assert result.ir_text == "; ModuleID\n"
+        first, second = _frontend_calls(mock_run)
+        assert "-include-pch" in first
+        assert "-include-pch" not in second
+        assert not pch.exists()
+
+    @patch("struco.cfg.run_tool")
+    def test_source_errors_are_not_retried_without_pch(
+        self, mock_run: MagicMock, sources: list[Path], tmp_path: Path
+    ):
+        plan = plan_pch(sources, root=tmp_path / "pch")
+        pch = plan.path(next(iter(plan.keys)))
+        pch.parent.mkdir()
+        pch.write_text("pch")
+        pch.with_suffix(".d").write_text(f"{pch}: /usr/include/vector\n")
+        syntax = "a.cpp:3:1: error: expected ';' after expression"
+        mock_run.return_value = MagicMock(returncode=1, stderr=syntax, stdout="")
+
+        with pytest.raises(RuntimeError, match="expected ';'"):
+            _run_frontend(sources[0], Language.CPP, keep_ir=False, pch=plan)
+
+        assert len(_frontend_calls(mock_run)) == 1
+        assert pch.exists()
+
+    def test_depfile_lists_pch_headers(self, sources: list[Path], tmp_path: Path):
+        plan = plan_pch(sources, root=tmp_path / "pch")
+        depfile = tmp_path / "a.d"
+        with fake_toolchain(tmp_path / "bin"):
+            _run_frontend(
+                sources[0], Language.CPP, depfile=depfile, output_root=tmp_path / "out", pch=plan
+            )
+
+        [header] = (tmp_path / "pch").glob("*.h")
+        assert header in parse_depfile(depfile.read_text())
+        assert sources[0] in parse_depfile(depfile.read_text())
@@ -0,0 +1,223 @@
+"""Tests for struco.profile module."""
+
+from __future__ import annotations
+
+import json
+import logging
+import textwrap
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from struco.__main__ import main
+from struco.batch import run_batch
+from struco.cfg import IRResult, Language, extract_cfg_from_ir
+from struco.profile import (
+    Profiler,
+    Span,
+    add_hook,
+    capture,
+    current_profiler,
+    is_enabled,
+    profiling,
+    record_child,
+    remove_hook,
+    span,
+)
+
+IR = textwrap.dedent("""\
+    define i32 @main() {
+    entry:
+      ret i32 0
+    }
+
+    define i32 @helper(i32 %x) {
+    entry:
+      ret i32 %x
+    }
+""")
+
+
+@pytest.fixture()
+def hook_spans():
+    spans: list[Span] = []
+    add_hook(spans.append)
+    yield spans
+    remove_hook(spans.append)
+
+
+# span
+class TestSpan:
+    def test_records_into_active_profiler(self):
+        with profiling() as profiler, span("frontend", "a.c"):
+            pass
+        [recorded] = profiler.spans
+        assert recorded.stage == "frontend"
+        assert recorded.name == "a.c"
+        assert recorded.wall >= 0.0
+        assert recorded.child_max_rss_kb >= 0
+
+    def test_noop_without_profiler_or_hooks(self):
+        assert current_profiler() is None
+        assert not is_enabled()
+        with span("frontend"):
+            pass
+
+    def test_recorded_when_block_raises(self):
+        with profiling() as profiler, pytest.raises(RuntimeError), span("opt"):
+            raise RuntimeError("boom")
+        assert [s.stage for s in profiler.spans] == ["opt"]
+
+    def test_child_usage_is_per_span_and_reaches_parents(self):
+        with profiling() as profiler, span("file", "a.c"):
+            with span("frontend", "a.c"):
+                record_child(1.5, 4096)
+            with span("opt", "a.ll"):
+                record_child(0.5, 1024)
+        record_child(9.0, 1 << 20)  # outside any span: dropped
+        frontend, opt, file = profiler.spans
+        assert (frontend.child_cpu, frontend.child_max_rss_kb) == (1.5, 4096)
+        assert (opt.child_cpu, opt.child_max_rss_kb) == (0.5, 1024)
+        assert (file.child_cpu, file.child_max_rss_kb) == (2.0, 4096)
+
+    def test_profiler_is_reset_on_exit(self):
+        with profiling():
+            assert current_profiler() is not None
+        assert current_profiler() is None
+
+
+# hooks
+class TestHooks:
+    def test_hook_receives_spans_without_profiler(self, hook_spans: list[Span]):
+        with span("render", "main"):
+            pass
+        assert [(s.stage, s.name) for s in hook_spans] == [("render", "main")]
+
+    def test_failing_hook_is_logged_not_raised(
+        self, hook_spans: list[Span], caplog: pytest.LogCaptureFixture
+    ):
+        def broken(_span: Span) -> None:
+            raise ValueError("metrics backend down")
+
+        add_hook(broken)
+        try:
+            with caplog.at_level(logging.ERROR), span("opt"):
+                pass
+        finally:
+            remove_hook(broken)
+        assert len(hook_spans) == 1
+        assert "Profiling hook" in caplog.text
+
+    def test_capture_does_not_call_hooks(self, hook_spans: list[Span]):
+        with capture() as profiler, span("frontend"):
+            pass
+        assert len(profiler.spans) == 1
+        assert hook_spans == []
+
+
+# Profiler
+class TestProfiler:
+    @staticmethod
+    def _profiler() -> Profiler:
+        profiler = Profiler()
+        profiler.record(Span("opt", "a.ll", 1.0, 0.1, 0.8, 2048))
+        profiler.record(Span("render", "main", 0.5, 0.0, 0.4, 1024))
+        profiler.record(Span("opt", "b.ll", 2.0, 0.2, 1.6, 4096))
+        return profiler
+
+    def test_stages_sum_per_stage_in_order(self):
+        stages = self._profiler().stages()
+        assert list(stages) == ["opt", "render"]
+        assert stages["opt"]["count"] == 2
+        assert stages["opt"]["wall"] == pytest.approx(3.0)
+        assert stages["opt"]["child_cpu"] == pytest.approx(2.4)
+        assert stages["opt"]["child_max_rss_kb"] == 4096
+
+    def test_write_json(self, tmp_path: Path):
+        path = tmp_path / "profile.json"
+        self._profiler().write_json(str(path))
+        report = json.loads(path.read_text())
+        assert report["stages"]["render"]["count"] == 1
+        assert report["spans"][0] == {
+            "stage": "opt",
+            "name": "a.ll",
+            "wall": 1.0,
+            "cpu": 0.1,
+            "child_cpu": 0.8,
+            "child_max_rss_kb": 2048,
+        }
+
+    def test_summary_table(self):
+        lines = self._profiler().summary_table().splitlines()
+        assert lines[0].split()[:2] == ["stage", "count"]
+        assert lines[2].split()[:3] == ["opt", "2", "3.000"]
+        assert lines[2].split()[-1] == "4.0"
+
+
+# Pipeline integration
+class TestPipelineSpans:
+    @patch("struco.scheduler._run_child")
+    def test_render_threads_record_per_function_spans(self, mock_run: MagicMock, tmp_path: Path):
+        ir_file = tmp_path / "prog.ll"
+        ir_file.write_text(IR)
+        mock_run.return_value = MagicMock(returncode=0, stderr="", stdout="")
+
+        with profiling() as profiler:
+            extract_cfg_from_ir(ir_file, language="c", engine="native", render_jobs=2)
+
+        stages = {(s.stage, s.name) for s in profiler.spans}
+        assert ("parse", "prog.ll") in stages
+        assert ("render", "main") in stages
+        assert ("render", "helper") in stages
+
+    def test_batch_records_file_spans(self, tmp_path: Path):
+        sources = [tmp_path / "a.c", tmp_path / "b.c"]
+        with (
+            patch(
+                "struco.batch.extract_ir",
+                return_value=IRResult(ir_path=tmp_path / "a_c.ll", language=Language.C),
+            ),
+            patch("struco.batch.extract_cfg_from_ir", return_value=[]),
+            profiling() as profiler,
+        ):
+            run_batch(sources, jobs=1)
+
+        assert [(s.stage, s.name) for s in profiler.spans] == [
+            ("file", "a.c"),
+            ("file", "b.c"),
+        ]
+
+    @patch("struco.scheduler._run_child")
+    def test_cli_writes_profile(
+        self, mock_run: MagicMock, tmp_path: Path, caplog: pytest.LogCaptureFixture
+    ):
+        ir_file = tmp_path / "prog.ll"
+        ir_file.write_text(IR)
+        source = tmp_path / "prog.c"
+        source.write_text("int main() { return 0; }")
+        report_path = tmp_path / "profile.json"
+
+        with (
+            patch(
+                "struco.__main__.extract_ir",
+                return_value=IRResult(ir_path=ir_file, language=Language.C),
+            ),
+            caplog.at_level(logging.INFO),
+        ):
+            status = main(
+                [
+                    str(source),
+                    "--engine",
+                    "native",
+                    "--no-cache",
+                    "--profile",
+                    str(report_path),
+                    "-v",
+                ]
+            )
+
+        assert status == 0
+        report = json.loads(report_path.read_text())
+        assert {"file", "parse", "render"} <= set(report["stages"])
+        assert "Per-stage totals" in caplog.text
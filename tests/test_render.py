@@ -0,0 +1,149 @@
+"""Tests for struco.render module."""
+
+from __future__ import annotations
+
+import textwrap
+
+import pytest
+
+from struco.ir import parse_ir
+from struco.render import (
+    RenderOptions,
+    count_nodes,
+    layout_engine,
+    skeleton_dot,
+    summarize_dot,
+)
+
+CHAIN_IR = textwrap.dedent("""\
+    define i32 @chain(i32 %x) {
+    entry:
+      %a = add i32 %x, 1
+      br label %next
+
+    next:
+      %b = mul i32 %a, 2
+      %c = icmp sgt i32 %b, 0
+      br i1 %c, label %pos, label %end
+
+    pos:
+      br label %pos.more
+
+    pos.more:
+      br label %end
+
+    end:
+      ret i32 %b
+    }
+""")
+
+LOOP_IR = textwrap.dedent("""\
+    define void @loop() {
+    entry:
+      br label %head
+
+    head:
+      br label %latch
+
+    latch:
+      br label %head
+    }
+""")
+
+# Written by opt -passes=dot-cfg (LLVM 14)
+OPT_DOT = textwrap.dedent("""\
+    digraph "CFG for 'f' function" {
+    \tlabel="CFG for 'f' function";
+
+    \tNode0x1 [shape=record,color="#b70d28ff", style=filled, fillcolor="#b70d2870",label="{entry:\\l  br i1 %c, label %a, label %b\\l|{<s0>T|<s1>F}}"];
+    \tNode0x1:s0 -> Node0x2;
+    \tNode0x1:s1 -> Node0x3;
+    \tNode0x2 [shape=record,color="#b70d28ff", style=filled, fillcolor="#e8765c70",label="{a:                                                \\l  br label %b\\l}"];
+    \tNode0x2 -> Node0x3;
+    \tNode0x3 [shape=record,color="#b70d28ff", style=filled, fillcolor="#b70d2870",label="{b:                                                \\l  ret i32 0\\l}"];
+    }
+""")  # noqa: E501
+
+
+def _dot(ir: str) -> str:
+    return parse_ir(ir)[0].to_dot()
+
+
+# summarize_dot
+class TestSummarizeDot:
+    def test_collapses_straight_line_chains(self):
+        summary = summarize_dot(_dot(CHAIN_IR))
+
+        assert count_nodes(summary) == 3
+        assert "entry .. next (2 blocks):" in summary
+        assert "pos .. pos.more (2 blocks):" in summary
+        # The merged node keeps the branch ports and edges of its last block
+        assert "|{<s0>T|<s1>F}" in summary
+        assert "\tNode0:s0 -> Node2;" in summary
+        assert "\tNode0:s1 -> Node4;" in summary
+        assert "\tNode2 -> Node4;" in summary
+
+    def test_merge_target_is_never_entry_or_shared(self):
+        summary = summarize_dot(_dot(LOOP_IR))
+
+        assert count_nodes(summary) == 2
+        assert "head .. latch (2 blocks):" in summary
+        assert "\tNode1 -> Node1;" in summary
+
+    def test_truncates_labels(self):
+        long_line = "x" * 200
+        ir = "define void @f() {\nentry:\n" + "".join(
+            f"  %v{i} = call i32 @{long_line}()\n" for i in range(30)
+        )
+        summary = summarize_dot(_dot(ir + "  ret void\n}\n"), max_lines=4, max_chars=40)
+
+        [label] = [line for line in summary.splitlines() if 'label="{' in line]
+        lines = label.split("\\l")[1:-1]
+        assert lines == [
+            "  %v0 = call i32 @xxxxxxxxxxxxxxxxxxx...",
+            "  %v1 = call i32 @xxxxxxxxxxxxxxxxxxx...",
+            "  %v2 = call i32 @xxxxxxxxxxxxxxxxxxx...",
+            "  ... (28 more)",
+            "  ret void",
+        ]
+
+    def test_keeps_opt_attributes(self):
+        summary = summarize_dot(OPT_DOT)
+
+        assert count_nodes(summary) == 3
+        assert 'fillcolor="#e8765c70",label="{a:\\l  br label %b\\l}"' in summary
+        assert "\tNode0x1:s1 -> Node0x3;" in summary
+
+    def test_truncation_keeps_escapes_whole(self):
+        dot = 'digraph {\n\tNode0 [shape=record,label="{entry:\\l  ab\\{cdef\\l}"];\n}\n'
+        assert "\\l  ab...\\l" in summarize_dot(dot, max_chars=8)
+        assert "\\l  ab\\{...\\l" in summarize_dot(dot, max_chars=9)
+
+    def test_unknown_syntax_is_unchanged(self):
+        dot = "digraph { a -> b }"
+        assert summarize_dot(dot) == dot
+        assert skeleton_dot(dot) == dot
+
+
+# skeleton_dot and layout_engine
+class TestSkeleton:
+    def test_structure_only(self):
+        skeleton = skeleton_dot(_dot(CHAIN_IR))
+
+        assert 'label="{' not in skeleton
+        assert "\tnode [shape=point];" in skeleton
+        assert skeleton.count(" -> ") == 3
+        assert ":s0" not in skeleton
+
+    def test_layout_engine_threshold(self):
+        dot = _dot(CHAIN_IR)
+        assert layout_engine(dot, threshold=5) == "dot"
+        assert layout_engine(dot, threshold=4) == "sfdp"
+        assert layout_engine(dot, threshold=None) == "dot"
+
+    @pytest.mark.parametrize(
+        "options", [{"layout_threshold": 0}, {"timeout": 0}, {"timeout": -1.0}]
+    )
+    def test_invalid_options(self, options):
+        with pytest.raises(ValueError, match="must be"):
+            RenderOptions(**options)
@@ -0,0 +1,228 @@
+"""Tests for struco.scheduler module."""
+
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import errno
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from struco.__main__ import main
+from struco.batch import FileResult, process_file
+from struco.cfg import ir_output_path
+from struco.profile import profiling, span
+from struco.scheduler import (
+    ResourceLimits,
+    StageTimeoutError,
+    current_limits,
+    estimate_cost,
+    order_by_cost,
+    resource_limits,
+    run_tool,
+)
+
+NO_DELAY = {"retry_delay": 0.0}
+
+
+# ResourceLimits and resource_limits
+class TestLimits:
+    def test_defaults(self):
+        limits = current_limits()
+        assert limits.timeout("opt") is None
+        assert limits.memory_limit is None
+        assert limits.retries == 2
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {"timeouts": {"link": 1.0}},
+            {"timeouts": {"opt": 0}},
+            {"memory_limit": 0},
+            {"retries": -1},
+        ],
+    )
+    def test_invalid(self, kwargs):
+        with pytest.raises(ValueError, match="(?i)stage|must be"):
+            ResourceLimits(**kwargs)
+
+    def test_context_reaches_threads(self):
+        limits = ResourceLimits(timeouts={"render": 3.0})
+        with resource_limits(limits), ThreadPoolExecutor(1) as pool:
+            ctx = contextvars.copy_context()
+            seen = pool.submit(ctx.run, current_limits).result()
+            with resource_limits(None):
+                assert current_limits() is limits
+        assert seen is limits
+        assert current_limits() is not limits
+
+
+# run_tool
+class TestRunTool:
+    def test_stage_timeout_kills_tool(self):
+        start = time.perf_counter()
+        with (
+            resource_limits(ResourceLimits(timeouts={"opt": 0.2})),
+            pytest.raises(StageTimeoutError, match=r"opt: sleep timed out after 0.2s"),
+        ):
+            run_tool(["sleep", "5"], "opt")
+        assert time.perf_counter() - start < 3
+
+    def test_shorter_timeout_wins(self):
+        with patch("struco.scheduler._run_child") as run:
+            run.return_value = MagicMock(returncode=0)
+            with resource_limits(ResourceLimits(timeouts={"render": 10.0})):
+                run_tool(["dot"], "render", timeout=60.0)
+                assert run.call_args.kwargs["timeout"] == 10.0
+                run_tool(["dot"], "render", timeout=2.0)
+                assert run.call_args.kwargs["timeout"] == 2.0
+            run_tool(["dot"], "render")
+            assert run.call_args.kwargs["timeout"] is None
+
+    def test_memory_limit(self):
+        allocate = [sys.executable, "-c", "b = bytearray(512 << 20)"]
+        with resource_limits(ResourceLimits(memory_limit=256 << 20)):
+            result = run_tool(allocate, "frontend", capture_output=True, text=True)
+        assert result.returncode != 0
+        assert "MemoryError" in result.stderr
+        assert run_tool(allocate, "frontend").returncode == 0
+
+    def test_memory_limit_from_threads_without_preexec(self):
+        allocate = [sys.executable, "-c", "b = bytearray(512 << 20)"]
+        limits = ResourceLimits(memory_limit=256 << 20)
+
+        def run(_):
+            with resource_limits(limits):
+                return run_tool(allocate, "render", capture_output=True, text=True)
+
+        with (
+            patch("struco.scheduler.subprocess.Popen", wraps=subprocess.Popen) as popen,
+            ThreadPoolExecutor(4) as pool,
+        ):
+            results = list(pool.map(run, range(4)))
+        assert all("MemoryError" in result.stderr for result in results)
+        assert all("preexec_fn" not in call.kwargs for call in popen.call_args_list)
+
+    def test_input_and_output(self):
+        result = run_tool(
+            [sys.executable, "-c", "import sys; print(sys.stdin.read().upper())"],
+            "opt",
+            input="ir",
+            capture_output=True,
+            text=True,
+        )
+        assert (result.returncode, result.stdout, result.stderr) == (0, "IR\n", "")
+
+    def test_records_each_childs_own_usage(self):
+        allocate = [
+            sys.executable,
+            "-c",
+            "b = bytearray(256 << 20); b[::4096] = b'x' * len(b[::4096])",
+        ]
+        with profiling() as profiler:
+            with span("frontend", "big"):
+                assert run_tool(allocate, "frontend").returncode == 0
+            with span("frontend", "small"):
+                assert run_tool([sys.executable, "-c", "pass"], "frontend").returncode == 0
+        big, small = profiler.spans
+        assert big.child_max_rss_kb > 200 << 10
+        assert small.child_max_rss_kb < big.child_max_rss_kb // 2
+        assert small.child_cpu > 0
+
+    def test_retries_transient_failures(self):
+        outcomes = [
+            OSError(errno.EAGAIN, "Resource temporarily unavailable"),
+            MagicMock(returncode=-9),
+            MagicMock(returncode=0),
+        ]
+        with (
+            patch("struco.scheduler._run_child", side_effect=outcomes) as run,
+            resource_limits(ResourceLimits(**NO_DELAY)),
+        ):
+            assert run_tool(["clang"], "frontend").returncode == 0
+        assert run.call_count == 3
+
+    def test_gives_up_after_retries(self):
+        with (
+            patch("struco.scheduler._run_child", return_value=MagicMock(returncode=-9)) as run,
+            resource_limits(ResourceLimits(retries=1, **NO_DELAY)),
+        ):
+            assert run_tool(["clang"], "frontend").returncode == -9
+        assert run.call_count == 2
+
+    @pytest.mark.parametrize(
+        "outcome", [MagicMock(returncode=1), MagicMock(returncode=-11), FileNotFoundError()]
+    )
+    def test_does_not_retry_real_failures(self, outcome):
+        with (
+            patch("struco.scheduler._run_child", side_effect=[outcome]) as run,
+            resource_limits(ResourceLimits(**NO_DELAY)),
+            contextlib.suppress(FileNotFoundError),
+        ):
+            run_tool(["opt"], "opt")
+        assert run.call_count == 1
+
+    def test_timeouts_are_not_retried(self):
+        expired = subprocess.TimeoutExpired(["opt"], 1.0)
+        with (
+            patch("struco.scheduler._run_child", side_effect=expired) as run,
+            pytest.raises(StageTimeoutError, match="after 1s"),
+        ):
+            run_tool(["opt"], "opt", timeout=1.0)
+        assert run.call_count == 1
+
+
+# Cost ordering
+class TestCostOrder:
+    def test_largest_first_and_previous_ir_wins(self, tmp_path: Path):
+        small, large, compiled = (tmp_path / name for name in ("small.c", "large.c", "old.c"))
+        small.write_text("x" * 10)
+        large.write_text("x" * 1000)
+        compiled.write_text("x" * 10)
+        ir = ir_output_path(compiled)
+        ir.parent.mkdir()
+        ir.write_text("x" * 100_000)
+
+        assert estimate_cost(small) == 160
+        assert estimate_cost(compiled) == 100_000
+        assert estimate_cost(tmp_path / "missing.c") == 0
+        assert order_by_cost([small, large, compiled, small]) == [2, 1, 0, 3]
+
+    def test_batch_files_run_under_limits(self, tmp_path: Path):
+        limits = ResourceLimits(timeouts={"frontend": 5.0})
+        seen = []
+
+        def process_one(*args):
+            seen.append(current_limits())
+            return FileResult(source=tmp_path / "a.c")
+
+        with patch("struco.batch._process_one", side_effect=process_one):
+            process_file(tmp_path / "a.c", None, {}, limits=limits)
+            process_file(tmp_path / "a.c", None, {}, collect_spans=True, limits=limits)
+        assert seen == [limits, limits]
+
+    def test_cli_options(self, tmp_path: Path):
+        seen = []
+
+        def run_single(*args):
+            seen.append(current_limits())
+            return 0
+
+        with patch("struco.__main__._run_single", side_effect=run_single):
+            argv = [str(tmp_path / "a.c"), "--stage-timeout", "opt=30", "--memory-limit", "512"]
+            assert main([*argv, "--stage-timeout", "frontend=90", "--retries", "0"]) == 0
+
+        assert seen == [
+            ResourceLimits(
+                timeouts={"opt": 30.0, "frontend": 90.0}, memory_limit=512 << 20, retries=0
+            )
+        ]
+        for bad in ("link=3", "opt=never", "opt=-1"):
+            with pytest.raises(SystemExit):
+                main([str(tmp_path / "a.c"), "--stage-timeout", bad])
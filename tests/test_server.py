@@ -0,0 +1,165 @@
+"""Tests for struco.server and struco.client modules."""
+
+from __future__ import annotations
+
+import os
+import stat
+import sys
+import tempfile
+import textwrap
+import threading
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from struco import server as server_module
+from struco.client import default_socket_path, run_remote, send_request
+from struco.codon import runtime_fingerprints
+from struco.server import StrucoServer
+
+SAMPLE_IR = textwrap.dedent("""\
+    define dso_local i32 @main() {
+    entry:
+      ret i32 0
+    }
+""")
+
+FAKE_CLANG = f"""\
+import sys
+out = sys.argv[sys.argv.index("-o") + 1]
+open(out, "w").write({SAMPLE_IR!r})
+"""
+
+
+@pytest.fixture()
+def server(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    clang = bin_dir / "clang"
+    clang.write_text(f"#!{sys.executable}\n{FAKE_CLANG}")
+    clang.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    srv = StrucoServer(tmp_path / "s.sock", workers=1)
+    thread = threading.Thread(target=srv.serve_forever, daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    thread.join(timeout=10)
+
+
+def _replies(srv: StrucoServer, argv: list[str], cwd: Path) -> list[dict]:
+    return list(send_request({"argv": argv, "cwd": str(cwd)}, srv.socket_path))
+
+
+# Jobs
+class TestJobs:
+    def test_outputs_streamed_then_done(self, server: StrucoServer, tmp_path: Path):
+        (tmp_path / "prog.c").write_text("int main(void) { return 0; }")
+
+        replies = _replies(server, ["prog.c", "--cfg_format", "json", "--no-cache"], tmp_path)
+
+        expected = tmp_path / "prog_c_ll_files" / "prog_c_cfg" / "jsons" / "main.json"
+        assert replies == [
+            {"type": "output", "path": str(expected)},
+            {"type": "done", "status": 0},
+        ]
+        assert expected.exists()
+
+    def test_failed_source_reported(self, server: StrucoServer, tmp_path: Path):
+        replies = _replies(server, ["missing.c", "--no-cache"], tmp_path)
+        assert replies[0]["type"] == "error"
+        assert replies[0]["source"] == str(tmp_path / "missing.c")
+        assert replies[-1] == {"type": "done", "status": 1}
+
+    def test_relative_cache_dir_is_under_client_cwd(self, server: StrucoServer, tmp_path: Path):
+        (tmp_path / "prog.c").write_text("int main(void) { return 0; }")
+
+        replies = _replies(
+            server, ["prog.c", "--cfg_format", "json", "--cache-dir", "ir"], tmp_path
+        )
+
+        assert replies[-1] == {"type": "done", "status": 0}
+        assert any((tmp_path / "ir").iterdir())
+
+    def test_worker_caches_dropped_between_jobs(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setitem(server_module._worker_state, "job", None)
+        fingerprints = runtime_fingerprints()
+        with patch("struco.server.process_file") as process:
+            fingerprints.add("std.f.1", "digest")
+            server_module._process_job_file(1, "a.c")
+            assert len(fingerprints) == 0
+
+            fingerprints.add("std.f.1", "digest")
+            server_module._process_job_file(1, "b.c")
+            assert len(fingerprints) == 1
+            server_module._process_job_file(2, "c.c")
+            assert len(fingerprints) == 0
+        assert [c.args for c in process.call_args_list] == [("a.c",), ("b.c",), ("c.c",)]
+
+    def test_usage_error_does_not_stop_server(self, server: StrucoServer, tmp_path: Path):
+        replies = _replies(server, ["x.c", "--cfg_format", "svg"], tmp_path)
+        assert replies[-1] == {"type": "done", "status": 2}
+        assert "usage" in replies[0]["message"]
+
+        replies = _replies(server, ["x.c", "--watch"], tmp_path)
+        assert "--watch" in replies[0]["message"]
+
+    def test_run_remote_prints_outputs(
+        self,
+        server: StrucoServer,
+        tmp_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ):
+        (tmp_path / "prog.c").write_text("int main(void) { return 0; }")
+        monkeypatch.chdir(tmp_path)
+
+        status = run_remote(["prog.c", "--cfg_format", "json", "--no-cache"], server.socket_path)
+
+        assert status == 0
+        assert capsys.readouterr().out.strip().endswith("main.json")
+
+
+# Lifecycle
+class TestLifecycle:
+    def test_no_daemon_raises(self, tmp_path: Path):
+        with pytest.raises(ConnectionError, match="No struco daemon"):
+            list(send_request({"command": "shutdown"}, tmp_path / "none.sock"))
+
+    def test_second_daemon_on_same_socket_refused(self, server: StrucoServer):
+        with pytest.raises(RuntimeError, match="already listening"):
+            StrucoServer(server.socket_path, workers=1)
+
+    def test_socket_is_owner_only(self, server: StrucoServer):
+        assert stat.S_IMODE(server.socket_path.stat().st_mode) & 0o077 == 0
+
+    def test_socket_of_another_user_refused(
+        self, server: StrucoServer, monkeypatch: pytest.MonkeyPatch
+    ):
+        monkeypatch.setattr(os, "getuid", lambda: server.socket_path.stat().st_uid + 1)
+        with pytest.raises(ConnectionError, match="not to the current user"):
+            list(send_request({"command": "shutdown"}, server.socket_path))
+
+    def test_default_socket_in_private_directory(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        monkeypatch.delenv("STRUCO_SOCKET", raising=False)
+        monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+        path = default_socket_path()
+        assert path == tmp_path / f"struco-{os.getuid()}" / "struco.sock"
+        assert stat.S_IMODE(path.parent.stat().st_mode) == 0o700
+        assert default_socket_path() == path
+
+        path.parent.chmod(0o777)
+        with pytest.raises(PermissionError, match="not private"):
+            default_socket_path()
+
+    def test_socket_removed_on_close(self, tmp_path: Path):
+        srv = StrucoServer(tmp_path / "s.sock", workers=1)
+        srv.server_close()
+        assert not (tmp_path / "s.sock").exists()
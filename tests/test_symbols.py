@@ -0,0 +1,235 @@
+"""Tests for struco.symbols module."""
+
+from __future__ import annotations
+
+import json
+import shutil
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.toolchain import fake_toolchain
+from struco.__main__ import main
+from struco.cfg import Language, extract_cfg_from_ir, get_function_names
+from struco.incremental import build_incremental
+from struco.symbols import (
+    NamespaceTrie,
+    SymbolFilter,
+    clear_cache,
+    demangle,
+    file_stem,
+    namespace_path,
+    readable_stems,
+)
+
+needs_demangler = pytest.mark.skipif(
+    shutil.which("llvm-cxxfilt") is None and shutil.which("c++filt") is None,
+    reason="no C++ demangler installed",
+)
+
+FUNCTIONS = {
+    "_ZN4acme4core3addEii": "acme::core::add(int, int)",
+    "_ZN4acme6detail6helperEv": "acme::detail::helper()",
+    "_ZN5boost6detail4initEv": "boost::detail::init()",
+    "_ZNSt3__14swapIiEEvRT_S2_": "void std::__1::swap<int>(int&, int&)",
+    "main": "main",
+}
+
+
+def _module(names) -> str:
+    return "".join(f"define void @{name}() {{\nentry:\n  ret void\n}}\n\n" for name in names)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+def _fake_demangler(cmd, **kwargs):
+    lines = [FUNCTIONS.get(name, name) for name in kwargs["input"].splitlines()]
+    return subprocess.CompletedProcess(cmd, 0, stdout="\n".join(lines) + "\n", stderr="")
+
+
+# namespace_path
+class TestNamespacePath:
+    @pytest.mark.parametrize(
+        ("demangled", "path"),
+        [
+            ("std::__1::vector<int, std::__1::allocator<int> >::push_back(int&&)",
+             ("std", "vector", "push_back")),
+            ("void std::__1::swap<int>(int&, int&)", ("std", "swap")),
+            ("std::vector<int> ns::f<int>()", ("ns", "f")),
+            ("(anonymous namespace)::f()", ("(anonymous namespace)", "f")),
+            ("ns::operator<(ns::A const&, ns::A const&)", ("ns", "operator<")),
+            ("ns::A::operator()() const", ("ns", "A", "operator()")),
+            ("ns::A::operator int() const", ("ns", "A", "operator int")),
+            ("main", ("main",)),
+            ("main::{lambda(int)#2}::operator()(int) const",
+             ("main", "{lambda(int)#2}", "operator()")),
+            ("ns::A::g() const::'lambda0'()::operator()() const",
+             ("ns", "A", "g", "'lambda0'", "operator()")),
+            ("foo(int)::Local::run()", ("foo", "Local", "run")),
+        ],
+    )  # fmt: skip
+    def test_paths(self, demangled, path):
+        assert namespace_path(demangled) == path
+
+
+# NamespaceTrie and SymbolFilter
+class TestSymbolFilter:
+    def test_trie_longest_prefix_wins(self):
+        trie = NamespaceTrie()
+        trie.insert(("acme",), include=False)
+        trie.insert(("acme", "core"), include=True)
+        assert trie.match(("acme", "core", "add")) is True
+        assert trie.match(("acme", "detail")) is False
+        assert trie.match(("acmex",)) is None
+
+    def test_default_excludes_and_internals(self):
+        names = [*FUNCTIONS, "_ZTV1A", "_ZThn8_N1A1fEv", "_GLOBAL__sub_I_a.cpp"]
+        with patch("struco.symbols.subprocess.run", side_effect=_fake_demangler):
+            kept = SymbolFilter().select(names)
+        assert kept == ["_ZN4acme4core3addEii", "_ZN4acme6detail6helperEv", "main"]
+
+    def test_include_and_exclude_rules(self):
+        with patch("struco.symbols.subprocess.run", side_effect=_fake_demangler):
+            only_core = SymbolFilter(include=("acme::core",)).select(list(FUNCTIONS))
+            no_detail = SymbolFilter(exclude=("acme::detail",)).select(list(FUNCTIONS))
+            with_boost = SymbolFilter(include=("boost", "main")).select(list(FUNCTIONS))
+        assert only_core == ["_ZN4acme4core3addEii"]
+        assert no_detail == ["_ZN4acme4core3addEii", "main"]
+        assert with_boost == ["_ZN5boost6detail4initEv", "main"]
+
+    def test_mangled_prefix_fallback_without_demangler(self):
+        with patch("struco.symbols._demangler", return_value=None):
+            kept = SymbolFilter().select(["_ZNSt6vectorIiSaIiEE9push_backERKi", "_Z1fv"])
+        assert kept == ["_Z1fv"]
+
+
+# demangle and readable_stems
+class TestDemangle:
+    def test_one_batched_call_and_cache(self):
+        with patch("struco.symbols.subprocess.run", side_effect=_fake_demangler) as run:
+            first = demangle(FUNCTIONS)
+            second = demangle(["_ZN4acme4core3addEii", "main"])
+
+        assert first == FUNCTIONS
+        assert second == {"_ZN4acme4core3addEii": "acme::core::add(int, int)", "main": "main"}
+        # main is not mangled and the second call is served from the cache
+        run.assert_called_once()
+        assert "main" not in run.call_args.kwargs["input"].split()
+
+    def test_cache_keeps_most_recently_used_names(self):
+        with (
+            patch("struco.symbols._CACHE_SIZE", 2),
+            patch("struco.symbols.subprocess.run", side_effect=_fake_demangler) as run,
+        ):
+            demangle(["_ZN4acme4core3addEii", "_ZN4acme6detail6helperEv"])
+            demangle(["_ZN4acme4core3addEii", "_ZN5boost6detail4initEv"])
+            assert demangle(["_ZN4acme4core3addEii"]) == {
+                "_ZN4acme4core3addEii": "acme::core::add(int, int)"
+            }
+            assert run.call_count == 2
+            demangle(["_ZN4acme6detail6helperEv"])
+        assert run.call_count == 3
+        assert run.call_args.kwargs["input"] == "_ZN4acme6detail6helperEv\n"
+
+    def test_failed_demangler_keeps_names(self):
+        failed = subprocess.CompletedProcess([], 1, stdout="", stderr="boom")
+        with patch("struco.symbols.subprocess.run", return_value=failed):
+            assert demangle(["_Z1fv"]) == {"_Z1fv": "_Z1fv"}
+
+    def test_readable_stems(self):
+        names = ["_ZN4acme4core3addEii", "_Z3maxIiET_S0_S0_", "_Z3maxIlET_S0_S0_", "main"]
+        demangled = {
+            **FUNCTIONS,
+            "_Z3maxIiET_S0_S0_": "int max<int>(int, int)",
+            "_Z3maxIlET_S0_S0_": "long max<long>(int, int)",
+        }
+        with (
+            patch.dict(FUNCTIONS, demangled),
+            patch("struco.symbols.subprocess.run", side_effect=_fake_demangler),
+        ):
+            stems = readable_stems(names)
+
+        assert stems[0] == "acme.core.add(int,_int)"
+        assert stems[1] == "max(int,_int)"
+        assert stems[2].startswith("max(int,_int)~")
+        assert stems[3] == "main"
+
+    def test_file_stem_shortens_long_names(self):
+        long_name = "_Z" + "x" * 300
+        assert file_stem("main") == "main"
+        stem = file_stem(long_name)
+        assert len(stem.encode()) <= 150
+        assert stem != file_stem(long_name + "y")
+        assert stem.startswith("_Zxxx")
+        assert file_stem("ns::operator/").startswith("ns_operator_~")
+        assert file_stem("operator/") != file_stem("operator*")
+
+    @needs_demangler
+    def test_real_demangler(self):
+        assert demangle(["_ZNSt3__14swapIiEEvRT_S2_"]) == {
+            "_ZNSt3__14swapIiEEvRT_S2_": "void std::__1::swap<int>(int&, int&)"
+        }
+
+
+@pytest.fixture()
+def cpp_ir(tmp_path: Path) -> Path:
+    path = tmp_path / "m_cpp.ll"
+    path.write_text(_module(FUNCTIONS))
+    return path
+
+
+# extract_cfg_from_ir and the CLI
+@needs_demangler
+class TestExtraction:
+    def test_default_filter_drops_libcxx_and_boost(self, cpp_ir: Path):
+        assert get_function_names(cpp_ir, Language.CPP) == [
+            "_ZN4acme4core3addEii",
+            "_ZN4acme6detail6helperEv",
+            "main",
+        ]
+
+    def test_namespace_rules_and_readable_names(self, cpp_ir: Path):
+        outputs = extract_cfg_from_ir(
+            cpp_ir,
+            Language.CPP,
+            output_format="json",
+            exclude_namespaces=["acme::detail"],
+            demangle_names=True,
+        )
+
+        assert [p.name for p in outputs] == ["acme.core.add(int,_int).json", "main.json"]
+        assert json.loads(outputs[0].read_text())["function"] == "_ZN4acme4core3addEii"
+
+    def test_opt_engine_renames_dot_files(self, cpp_ir: Path):
+        with (
+            patch("struco.cfg._run_opt") as run_opt,
+            patch("struco.cfg.render_dots", side_effect=lambda dots, *a: list(dots)),
+        ):
+            run_opt.side_effect = lambda path, cwd, ir_text=None: (
+                cwd / "._ZN4acme4core3addEii.dot"
+            ).write_text("digraph {}")
+            outputs = extract_cfg_from_ir(
+                cpp_ir, Language.CPP, include_namespaces=["acme::core"], demangle_names=True
+            )
+
+        assert [p.name for p in outputs] == [".acme.core.add(int,_int).dot"]
+
+    def test_dedup_renders_shapes_under_readable_names(self, cpp_ir: Path, tmp_path: Path):
+        with fake_toolchain(tmp_path / "bin"):
+            outputs = extract_cfg_from_ir(cpp_ir, Language.CPP, dedup=True, demangle_names=True)
+
+        assert [p.name for p in outputs] == ["acme.core.add(int,_int).png"]
+        assert outputs[0].exists()
+
+    def test_incremental_rejects_demangled_names(self, tmp_path: Path):
+        with pytest.raises(ValueError, match="demangled"):
+            build_incremental(tmp_path / "a.cpp", demangle_names=True)
+        with pytest.raises(SystemExit):
+            main([str(tmp_path / "a.cpp"), "--demangle-names", "--incremental"])